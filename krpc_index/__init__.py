@@ -1,7 +1,11 @@
 from .index import KRPCSearchIndex, load_dataset
+from .links import ApiLinks
+from .symbols import Symbol, SymbolTable
 
 __all__ = [
+    "ApiLinks",
     "KRPCSearchIndex",
     "load_dataset",
+    "Symbol",
+    "SymbolTable",
 ]
-
@@ -0,0 +1,118 @@
+"""
+Section-level chunking of kRPC doc pages.
+
+The scraped `content_text` keeps Sphinx's permalink markers: every heading and every API member
+signature is followed by a line holding only "¶". A chunk runs from one such header to the next.
+Member signatures are split over several lines ("flight\n(\n[\nreference_frame\n=\nNone\n]\n)"),
+so the header is walked back to the member name (and a leading "class"/"static" keyword).
+Chunks longer than `max_chars` (tutorial pages with few headings) are cut on line boundaries.
+
+Each chunk is matched to the page's anchor list where possible, so a hit can link straight to
+`url#anchor`.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import List
+
+MARK = "¶"
+_KEYWORDS = {"class", "static", "classmethod", "staticmethod", "property", "exception", "enum"}
+
+
+@dataclass
+class Chunk:
+    doc: int
+    label: str
+    anchor: str
+    start: int
+    end: int
+    body: int  # where the section text starts, after its header
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def _header_start(lines: List[str], mark: int) -> int:
+    """Index of the first line of the header that ends just before `lines[mark]` (the ¶ line)."""
+    i = mark - 1
+    if i < 0:
+        return mark
+    if lines[i].strip() == ")":
+        depth = 0
+        while i >= 0:
+            s = lines[i].strip()
+            depth += s.count(")") - s.count("(")
+            if depth <= 0 and "(" in s:
+                break
+            i -= 1
+        i -= 1  # the member name sits right above "("
+        if i < 0:
+            return 0
+    if i > 0 and lines[i - 1].strip() in _KEYWORDS:
+        i -= 1
+    return i
+
+
+def _label(lines: List[str]) -> str:
+    parts = [ln.strip() for ln in lines if ln.strip()]
+    if not parts:
+        return ""
+    if parts[0] in _KEYWORDS and len(parts) > 1:
+        return f"{parts[0]} {_label(parts[1:])}"
+    return "".join(parts).replace(",", ", ")
+
+
+def chunk_text(text: str, anchors: List[str], doc: int = 0, *, max_chars: int = 1500) -> List[Chunk]:
+    lines = text.split("\n")
+    starts = [0]
+    for ln in lines:
+        starts.append(starts[-1] + len(ln) + 1)
+
+    # (first header line, first body line) for each ¶ marker
+    heads = []
+    for m, ln in enumerate(lines):
+        if ln.strip() == MARK:
+            h = _header_start(lines, m)
+            if heads and h < heads[-1][1]:
+                h = heads[-1][1]
+            if _label(lines[h:m]).endswith("."):
+                continue  # figure caption permalink, not a section
+            heads.append((h, m + 1))
+
+    sections = []  # [label, first line, first body line, end line]
+    if not heads or heads[0][0] > 0:
+        sections.append(["", 0, 0, heads[0][0] if heads else len(lines)])
+    carry = None  # start of a header with no body of its own (page title, group heading), merged into the next
+    for j, (h, body) in enumerate(heads):
+        end = heads[j + 1][0] if j + 1 < len(heads) else len(lines)
+        if j + 1 < len(heads) and not "".join(lines[body:end]).strip():
+            carry = h if carry is None else carry
+            continue
+        sections.append([_label(lines[h:body - 1]), h if carry is None else carry, body, end])
+        carry = None
+
+    out: List[Chunk] = []
+    pointer = 0
+    for label, first, body, end in sections:
+        anchor = ""
+        name = label.split("(")[0].split()[-1] if label else ""
+        for k in range(pointer, len(anchors)):
+            a = anchors[k]
+            if name and (a.rsplit(".", 1)[-1] == name or a == _slug(label)):
+                anchor, pointer = a, k + 1
+                break
+        # Cut long sections on line boundaries.
+        pieces = []
+        piece_start = first
+        for ln_idx in range(first, end):
+            if ln_idx > piece_start and starts[ln_idx + 1] - starts[piece_start] > max_chars:
+                pieces.append((piece_start, ln_idx))
+                piece_start = ln_idx
+        pieces.append((piece_start, end))
+        for part, (a, b) in enumerate(pieces, start=1):
+            piece_label = label if part == 1 else f"{label or 'Introduction'} (part {part})"
+            start = starts[a]
+            out.append(Chunk(doc, piece_label, anchor, start, min(starts[b], len(text)), starts[body] if part == 1 else start))
+    return [c for c in out if text[c.start:c.end].strip()]
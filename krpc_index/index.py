@@ -1,10 +1,40 @@
+"""
+BM25F search over the kRPC docs dataset (`data/krpc_python_docs.jsonl`).
+
+Pages are split into section-level chunks (see chunks.py) and each chunk is a search unit with
+three fields: page title, section label (plus its anchor) and section text. A term's per-field
+frequencies are length-normalised and weighted into one pseudo-frequency
+    tf~ = sum_f w_f * tf_f / (1 - b_f + b_f * len_f / avg_len_f)
+and scored as idf * tf~ / (k1 + tf~). That weight depends only on (term, chunk), so it is
+computed once at build time; a query just sums the flat posting weights and keeps the top k in
+a heap. Page-level search ranks each page by its best chunk.
+
+The same arrays can be saved to a compact binary file next to the dataset and memory-mapped at
+startup, so nothing is tokenized at query time and docs are parsed from the JSONL only when a
+result needs them:
+    b"KDIX" | u32 version | u32 meta_len | meta JSON (terms, urls, titles, line offsets, chunks,
+    params, source sha256) | pad to 8 | weights f32[P] | offsets u32[T+1] | post_chunks u32[P]
+
+Build it with `python -m krpc_index.index --data data/krpc_python_docs.jsonl` (this also writes
+the API symbol table, see symbols.py).
+"""
 from __future__ import annotations
 
+import argparse
+import hashlib
+import heapq
 import json
+import math
+import mmap
 import re
+import struct
+import sys
+from array import array
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .chunks import Chunk, chunk_text
 
 
 TOKEN_RE = re.compile(r"[A-Za-z0-9_]+")
@@ -20,16 +50,76 @@ class Doc:
 
 
 def _tokenize(text: str) -> List[str]:
-    return [t.lower() for t in TOKEN_RE.findall(text)]
+    out = []
+    for t in TOKEN_RE.findall(text):
+        t = t.lower()
+        out.append(t)
+        # snake_case API names also count as their parts ("available_thrust" -> available, thrust)
+        if "_" in t.strip("_"):
+            out.extend(p for p in t.split("_") if p)
+    return out
+
+
+_SENTENCE_BREAK = re.compile(r"(?<=[\.!?])\s+|\n+")
+_LOOSE_PUNCT = re.compile(r" (?=[.,:;)\]])|(?<=[(\[]) ")
+
+
+def reflow(text: str) -> str:
+    """Rejoin scraped text, which breaks lines at every inline element, into running prose:
+    whitespace collapsed, permalink marks dropped, punctuation reattached."""
+    return _LOOSE_PUNCT.sub("", " ".join(t for t in text.split() if t != "¶"))
 
 
 def _sentences(text: str) -> List[str]:
     # Simple sentence segmentation: split on ., !, ?, or newlines
-    parts = re.split(r"(?<=[\.!?])\s+|\n+", text)
+    parts = _SENTENCE_BREAK.split(text)
     # Keep non-empty
     return [p.strip() for p in parts if p and p.strip()]
 
 
+def _parse_doc(line: str) -> Doc:
+    obj = json.loads(line)
+    return Doc(
+        url=obj.get("url", ""),
+        title=obj.get("title", ""),
+        headings=obj.get("headings", []) or [],
+        anchors=obj.get("anchors", []) or [],
+        content_text=obj.get("content_text", ""),
+    )
+
+
+def _dataset_lines(data: bytes) -> List[Tuple[int, int]]:
+    """(byte offset, length) of every non-blank line."""
+    out: List[Tuple[int, int]] = []
+    pos = 0
+    for raw in data.splitlines(keepends=True):
+        if raw.strip():
+            out.append((pos, len(raw)))
+        pos += len(raw)
+    return out
+
+
+def _first_sentence_with(text: str, tokens: List[str]) -> Optional[str]:
+    """Same result as scanning `_sentences(text)` for the first one containing a token, without
+    splitting the whole text: tokens never span a sentence break, so the earliest hit decides."""
+    low = text.lower()
+    if len(low) != len(text):  # lowercasing changed offsets; take the slow path
+        for s in _sentences(text):
+            s_l = s.lower()
+            if any(t in s_l for t in tokens):
+                return s
+        return None
+    hits = [p for p in (low.find(t) for t in tokens) if p >= 0]
+    if not hits:
+        return None
+    hit = min(hits)
+    start = 0
+    for m in _SENTENCE_BREAK.finditer(text, 0, hit):
+        start = m.end()
+    m = _SENTENCE_BREAK.search(text, hit)
+    return text[start:m.start() if m else len(text)].strip()
+
+
 def load_dataset(path: Path) -> List[Doc]:
     docs: List[Doc] = []
     with path.open("r", encoding="utf-8") as f:
@@ -37,91 +127,337 @@ def load_dataset(path: Path) -> List[Doc]:
             line = line.strip()
             if not line:
                 continue
-            obj = json.loads(line)
-            docs.append(
-                Doc(
-                    url=obj.get("url", ""),
-                    title=obj.get("title", ""),
-                    headings=obj.get("headings", []) or [],
-                    anchors=obj.get("anchors", []) or [],
-                    content_text=obj.get("content_text", ""),
-                )
-            )
+            docs.append(_parse_doc(line))
     return docs
 
 
+def source_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+MAGIC = b"KDIX"
+VERSION = 2
+_HEADER = struct.Struct("<4sII")
+
+# BM25F parameters: per-field weight and length normalisation (title, section label, text).
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)
+FIELD_B = (0.5, 0.5, 0.75)
+K1 = 1.2
+
+
+def _fields(d: Doc, c: Chunk) -> Tuple[List[str], List[str], List[str]]:
+    return _tokenize(d.title), _tokenize(f"{c.label} {c.anchor}"), _tokenize(d.content_text[c.start:c.end])
+
+
+def _chunk_docs(docs: Sequence[Doc]) -> List[Chunk]:
+    return [c for i, d in enumerate(docs) for c in chunk_text(d.content_text, d.anchors, i)]
+
+
+def _bm25f_postings(docs: Sequence[Doc], chunks: Sequence[Chunk]) -> Tuple[List[str], array, array, array]:
+    """Sorted terms and flat postings (offsets, chunk ids, precomputed BM25F weights)."""
+    n = len(chunks)
+    tfs: Dict[str, Dict[int, List[int]]] = {}
+    lens = []
+    for i, c in enumerate(chunks):
+        fields = _fields(docs[c.doc], c)
+        lens.append([len(f) for f in fields])
+        for f, toks in enumerate(fields):
+            for tok in toks:
+                per_doc = tfs.setdefault(tok, {})
+                counts = per_doc.get(i)
+                if counts is None:
+                    counts = per_doc[i] = [0, 0, 0]
+                counts[f] += 1
+    avg = [max(1e-9, sum(l[f] for l in lens) / max(1, n)) for f in range(3)]
+    norms = [
+        [1.0 - FIELD_B[f] + FIELD_B[f] * l[f] / avg[f] for f in range(3)]
+        for l in lens
+    ]
+    terms = sorted(tfs)
+    offsets = array("I", [0])
+    post_chunks = array("I")
+    weights = array("f")  # float32 is plenty for ranking and halves the postings
+    for t in terms:
+        per_doc = tfs[t]
+        idf = math.log(1.0 + (n - len(per_doc) + 0.5) / (len(per_doc) + 0.5))
+        for i in sorted(per_doc):
+            counts = per_doc[i]
+            tf = sum(FIELD_WEIGHTS[f] * counts[f] / norms[i][f] for f in range(3) if counts[f])
+            post_chunks.append(i)
+            weights.append(idf * tf / (K1 + tf))
+        offsets.append(len(post_chunks))
+    return terms, offsets, post_chunks, weights
+
+
+def _as_array(typecode: str, buf) -> Sequence:
+    """Zero-copy view on little-endian hosts; byte-swapped copy elsewhere."""
+    if sys.byteorder == "little":
+        return memoryview(buf).cast(typecode)
+    arr = array(typecode)
+    arr.frombytes(bytes(buf))
+    arr.byteswap()
+    return arr
+
+
+class _LazyDocs(Sequence):
+    """Docs parsed from their JSONL line on first access."""
+
+    def __init__(self, data, lines: Sequence[Tuple[int, int]]) -> None:
+        self._data = data
+        self._lines = lines
+        self._cache: List[Optional[Doc]] = [None] * len(lines)
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        d = self._cache[i]
+        if d is None:
+            off, size = self._lines[i]
+            d = self._cache[i] = _parse_doc(bytes(self._data[off:off + size]).decode("utf-8"))
+        return d
+
+
 class KRPCSearchIndex:
     def __init__(self, docs: Iterable[Doc]):
-        self.docs: List[Doc] = list(docs)
-        self.by_url: Dict[str, Doc] = {d.url: d for d in self.docs}
-        # Inverted index: token -> {doc_idx: tf}
-        self.inv: Dict[str, Dict[int, int]] = {}
-        # For boosts
-        self.title_tokens: Dict[int, set[str]] = {}
-        self.heading_tokens: Dict[int, set[str]] = {}
-
-        for i, d in enumerate(self.docs):
-            # Title/headings token sets (for boosts)
-            t_tokens = set(_tokenize(d.title))
-            h_tokens = set()
-            for h in d.headings:
-                h_tokens.update(_tokenize(h))
-            self.title_tokens[i] = t_tokens
-            self.heading_tokens[i] = h_tokens
-
-            # Full-text bag of words from title + headings + body
-            all_text = "\n".join([d.title, *d.headings, d.content_text])
-            for tok in _tokenize(all_text):
-                bucket = self.inv.setdefault(tok, {})
-                bucket[i] = bucket.get(i, 0) + 1
+        docs = list(docs)
+        chunks = _chunk_docs(docs)
+        terms, offsets, post_chunks, weights = _bm25f_postings(docs, chunks)
+        self._setup(docs, [d.url for d in docs], [d.title for d in docs], chunks, terms, offsets, post_chunks, weights)
+        self.source: Optional[str] = None
+        self._lines: List[Tuple[int, int]] = []
+
+    def _setup(self, docs: Sequence[Doc], urls: List[str], titles: List[str], chunks: List[Chunk], terms: List[str], offsets, post_chunks, weights) -> None:
+        self.docs = docs
+        self.chunks = chunks
+        self._urls = urls
+        self._titles = titles
+        self._by_url: Dict[str, int] = {u: i for i, u in enumerate(urls)}
+        self._term_list = terms
+        self.terms: Dict[str, int] = {t: i for i, t in enumerate(terms)}
+        self.offsets = offsets
+        self.post_chunks = post_chunks
+        self.weights = weights
+        self._page_chunks: Dict[int, List[int]] = {}
+        for i, c in enumerate(chunks):
+            self._page_chunks.setdefault(c.doc, []).append(i)
+
+    # ---- build / persist ----
+
+    @classmethod
+    def build(cls, data_path: Path) -> "KRPCSearchIndex":
+        """In-memory index over the dataset, remembering line offsets and digest so it can be saved."""
+        raw = data_path.read_bytes()
+        lines = _dataset_lines(raw)
+        idx = cls(_parse_doc(raw[o:o + n].decode("utf-8")) for o, n in lines)
+        idx.source = hashlib.sha256(raw).hexdigest()
+        idx._lines = lines
+        return idx
+
+    def save(self, path: Path) -> None:
+        if len(self._lines) != len(self._urls):
+            raise ValueError("Only indexes created with KRPCSearchIndex.build() can be saved")
+        meta = json.dumps({
+            "terms": self._term_list,
+            "urls": self._urls,
+            "titles": self._titles,
+            "lines": self._lines,
+            "chunks": [[c.doc, c.label, c.anchor, c.start, c.end, c.body] for c in self.chunks],
+            "params": {"weights": FIELD_WEIGHTS, "b": FIELD_B, "k1": K1},
+            "source": self.source,
+            "counts": {"terms": len(self._term_list), "postings": len(self.post_chunks)},
+        }, ensure_ascii=False).encode("utf-8")
+        head = _HEADER.pack(MAGIC, VERSION, len(meta)) + meta
+        head += b"\0" * (-len(head) % 8)
+
+        def le(typecode: str, values) -> bytes:
+            arr = array(typecode, values)
+            if sys.byteorder != "little":
+                arr.byteswap()
+            return arr.tobytes()
+
+        body = le("f", self.weights) + le("I", self.offsets) + le("I", self.post_chunks)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(head + body)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, data_path: Path) -> "KRPCSearchIndex":
+        """Memory-map a saved index; docs are read lazily from `data_path`."""
+        with path.open("rb") as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_len = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a v{VERSION} kRPC docs index: {path}")
+        pos = _HEADER.size
+        meta = json.loads(bytes(buf[pos:pos + meta_len]).decode("utf-8"))
+        pos += meta_len
+        pos += -pos % 8
+        n_terms = meta["counts"]["terms"]
+        n_post = meta["counts"]["postings"]
+        view = memoryview(buf)
+
+        def take(typecode: str, count: int, size: int):
+            nonlocal pos
+            out = _as_array(typecode, view[pos:pos + count * size])
+            pos += count * size
+            return out
+
+        weights = take("f", n_post, 4)
+        offsets = take("I", n_terms + 1, 4)
+        post_chunks = take("I", n_post, 4)
+        with data_path.open("rb") as fh:
+            data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        lines = [tuple(x) for x in meta["lines"]]
+        idx = cls.__new__(cls)
+        chunks = [Chunk(*c) for c in meta["chunks"]]
+        idx._setup(_LazyDocs(data, lines), meta["urls"], meta["titles"], chunks, meta["terms"], offsets, post_chunks, weights)
+        idx.source = meta.get("source")
+        idx._lines = lines
+        idx._buffers = (buf, data)  # keep the mmaps alive for the views above
+        return idx
+
+    @classmethod
+    def open(cls, data_path: Path, index_path: Optional[Path] = None) -> "KRPCSearchIndex":
+        """The prebuilt index when it matches the dataset, otherwise an in-memory build."""
+        index_path = index_path or data_path.with_suffix(".bin")
+        if index_path.exists():
+            try:
+                idx = cls.load(index_path, data_path)
+                if idx.source == source_digest(data_path):
+                    return idx
+            except (OSError, ValueError, KeyError):
+                pass
+        return cls.build(data_path)
+
+    # ---- query ----
 
     def get(self, url: str) -> Doc | None:
-        return self.by_url.get(url)
+        i = self._by_url.get(url.split("#", 1)[0])
+        return None if i is None else self.docs[i]
+
+    def chunk_url(self, chunk: Chunk) -> str:
+        url = self._urls[chunk.doc]
+        return f"{url}#{chunk.anchor}" if chunk.anchor else url
+
+    def chunk_text(self, chunk: Chunk) -> str:
+        return self.docs[chunk.doc].content_text[chunk.start:chunk.end].strip()
+
+    def passage_text(self, chunk: Chunk) -> str:
+        """The chunk reflowed for display: its header on the first line, its body on the next."""
+        text = self.docs[chunk.doc].content_text
+        head, body = reflow(text[chunk.start:chunk.body]), reflow(text[chunk.body:chunk.end])
+        return f"{head}\n{body}" if head and body else head or body
+
+    def page_chunks(self, url: str) -> List[Chunk]:
+        i = self._by_url.get(url.split("#", 1)[0])
+        return [] if i is None else [self.chunks[c] for c in self._page_chunks.get(i, [])]
+
+    def _score(self, q_tokens: List[str], allowed: Optional[set] = None) -> Dict[int, float]:
+        offsets, post_chunks, weights = self.offsets, self.post_chunks, self.weights
+        scores: Dict[int, float] = {}
+        for tok in q_tokens:
+            tid = self.terms.get(tok)
+            if tid is None:
+                continue
+            for p in range(offsets[tid], offsets[tid + 1]):
+                c = post_chunks[p]
+                if allowed is None or c in allowed:
+                    scores[c] = scores.get(c, 0.0) + weights[p]
+        return scores
+
+    def _rank_key(self, doc: int):
+        return len(self._titles[doc]), self._urls[doc]
+
+    def search_chunks(self, query: str, top_k: int = 10, url: Optional[str] = None) -> List[Tuple[Doc, Chunk, float, str]]:
+        """Top chunks for `query`, optionally restricted to one page: (doc, chunk, score, snippet)."""
+        q_tokens = [t for t in _tokenize(query) if t]
+        if not q_tokens:
+            return []
+        allowed = None
+        if url is not None:
+            i = self._by_url.get(url.split("#", 1)[0])
+            if i is None:
+                return []
+            allowed = set(self._page_chunks.get(i, []))
+        scores = self._score(q_tokens, allowed)
+        chunks = self.chunks
+        # Highest score first, then shorter page title, URL and position in the page
+        ranked = heapq.nsmallest(top_k, scores.items(), key=lambda kv: (-kv[1], *self._rank_key(chunks[kv[0]].doc), kv[0]))
+        out: List[Tuple[Doc, Chunk, float, str]] = []
+        for ci, sc in ranked:
+            c = chunks[ci]
+            d = self.docs[c.doc]
+            out.append((d, c, sc, self._make_snippet(d, q_tokens, chunk=c)))
+        return out
 
     def search(self, query: str, top_k: int = 10) -> List[Tuple[Doc, float, str]]:
         q_tokens = [t for t in _tokenize(query) if t]
         if not q_tokens:
             return []
 
-        scores: Dict[int, float] = {}
-        for tok in q_tokens:
-            postings = self.inv.get(tok)
-            if not postings:
-                continue
-            for doc_idx, tf in postings.items():
-                # Base content weight by term frequency
-                score = tf * 1.0
-                # Boost if token appears in title/headings
-                if tok in self.title_tokens.get(doc_idx, ()):  # +2 each hit
-                    score += 2.0
-                if tok in self.heading_tokens.get(doc_idx, ()):  # +1 each hit
-                    score += 1.0
-                scores[doc_idx] = scores.get(doc_idx, 0.0) + score
-
-        # Sort by score desc, then shorter title (tie-breaker), then URL
-        ranked = sorted(
-            scores.items(), key=lambda kv: (-kv[1], len(self.docs[kv[0]].title), self.docs[kv[0]].url)
-        )[:top_k]
+        # A page scores as its best chunk; the snippet comes from that chunk.
+        best: Dict[int, Tuple[float, int]] = {}
+        chunks = self.chunks
+        for ci, sc in self._score(q_tokens).items():
+            doc = chunks[ci].doc
+            cur = best.get(doc)
+            if cur is None or sc > cur[0] or (sc == cur[0] and ci < cur[1]):
+                best[doc] = (sc, ci)
+
+        # Highest score first, then shorter title (tie-breaker), then URL
+        ranked = heapq.nsmallest(top_k, best.items(), key=lambda kv: (-kv[1][0], *self._rank_key(kv[0])))
 
         results: List[Tuple[Doc, float, str]] = []
-        for idx, sc in ranked:
+        for idx, (sc, ci) in ranked:
             d = self.docs[idx]
-            snippet = self._make_snippet(d, q_tokens)
+            snippet = self._make_snippet(d, q_tokens, chunk=chunks[ci])
             results.append((d, sc, snippet))
         return results
 
-    def _make_snippet(self, d: Doc, q_tokens: List[str], max_len: int = 180) -> str:
-        hay = d.content_text or d.title
+    def _make_snippet(self, d: Doc, q_tokens: List[str], max_len: int = 180, chunk: Optional[Chunk] = None) -> str:
+        hay = d.content_text
+        if chunk is not None:
+            # Skip the section header so the snippet shows its text.
+            hay = d.content_text[chunk.body:chunk.end]
+            if not hay.strip():
+                hay = d.content_text[chunk.start:chunk.end]
+            hay = reflow(hay)
+        hay = hay or d.title
         # Find first sentence containing any token
-        sent = None
-        for s in _sentences(hay):
-            s_l = s.lower()
-            if any(t in s_l for t in q_tokens):
-                sent = s
-                break
+        sent = _first_sentence_with(hay, q_tokens)
         if sent is None:
             sent = hay.strip().split("\n", 1)[0]
         if len(sent) <= max_len:
             return sent
         return sent[: max_len - 1].rstrip() + "…"
 
+
+def symbols_path(index_path: Path) -> Path:
+    """Symbol table file saved alongside an index (`krpc_python_docs.bin` -> `krpc_python_docs.symbols.json`)."""
+    return index_path.with_suffix(".symbols.json")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Build the memory-mappable BM25F index for the kRPC docs dataset")
+    ap.add_argument("--data", required=True, type=Path, help="Path to krpc_python_docs.jsonl")
+    ap.add_argument("--out", type=Path, help="Output path (default: <data>.bin next to the JSONL)")
+    args = ap.parse_args(argv)
+    out = args.out or args.data.with_suffix(".bin")
+    idx = KRPCSearchIndex.build(args.data)
+    idx.save(out)
+    print(f"wrote {out} ({out.stat().st_size} bytes, {len(idx.docs)} docs, {len(idx.chunks)} chunks, {len(idx.terms)} terms, {len(idx.post_chunks)} postings)")
+    from .symbols import SymbolTable
+
+    sym_out = symbols_path(out)
+    table = SymbolTable.from_index(idx)
+    table.save(sym_out)
+    print(f"wrote {sym_out} ({sym_out.stat().st_size} bytes, {len(table)} symbols)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
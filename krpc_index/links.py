@@ -0,0 +1,379 @@
+"""
+Links between snippet code and the kRPC API reference.
+
+Each snippet's source is parsed with `ast` and its attribute chains are resolved against the
+symbol table (symbols.py) by following return types from the connection:
+    conn.space_center.active_vessel.auto_pilot.engage()
+      -> SpaceCenter.active_vessel (Vessel) -> SpaceCenter.Vessel.auto_pilot (AutoPilot)
+      -> SpaceCenter.AutoPilot.engage
+Simple assignments (`vessel = conn.space_center.active_vessel`, `self.vessel = ...`), `for`
+loops over `list(...)` results and `getattr(obj, "name")` (the `add_stream` idiom) carry types
+along. Names never assigned in the snippet (function parameters such as `vessel`, `flight`,
+`ap`) are typed by their name when it matches an API class. Attributes on values of unknown type
+link only when the member name is unique in the whole API.
+
+The result is stored in both directions: APIs used by each snippet, and example snippets for
+each symbol and each doc page, ranked so short, unrestricted examples come first. Build it with
+`python -m krpc_index.links --data data/krpc_python_docs.jsonl --snippets
+data/krpc-snippets/snippets_enriched.jsonl`; it is rebuilt in memory when either dataset no
+longer matches the saved digests.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import re
+import textwrap
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .symbols import Symbol, SymbolTable, _snake
+
+_CONN = "<conn>"
+_CONN_NAMES = {"conn", "connection", "client", "krpc_conn"}
+# Common short names for API objects in user code, beyond snake_case class names.
+_ALIASES = {"ap": "AutoPilot", "sc": "SpaceCenter", "body": "CelestialBody", "frame": "ReferenceFrame", "ref_frame": "ReferenceFrame"}
+_MIN_UNIQUE = 8  # shortest member name trusted on a receiver of unknown type
+
+
+class _Resolver:
+    """Maps API class/service names and member names from a symbol table."""
+
+    def __init__(self, table: SymbolTable) -> None:
+        self.members: Dict[str, Symbol] = {s.name: s for s in table.symbols}
+        self.services = {s.name.split(".", 1)[0] for s in table.symbols}
+        self.classes = {s.name for s in table.symbols if s.kind == "class"} | self.services
+        short: Dict[str, List[str]] = {}
+        for c in self.classes:
+            short.setdefault(c.rsplit(".", 1)[-1], []).append(c)
+        self.by_short = {k: v[0] for k, v in short.items() if len(v) == 1}
+        self.service_attrs = {_snake(s): s for s in self.services}
+        self.by_var: Dict[str, str] = {}
+        for k, c in self.by_short.items():
+            self.by_var.setdefault(_snake(k), c)
+        for var, k in _ALIASES.items():
+            if k in self.by_short:
+                self.by_var.setdefault(var, self.by_short[k])
+        bare: Dict[str, List[str]] = {}
+        for s in table.symbols:
+            if s.kind not in ("class", "enum value"):
+                bare.setdefault(s.name.rsplit(".", 1)[-1], []).append(s.name)
+        self.unique = {k: v[0] for k, v in bare.items() if len(v) == 1 and "_" in k and len(k) >= _MIN_UNIQUE}
+
+    def qualify(self, name: str, near: str) -> Optional[str]:
+        if name in self.classes:
+            return name
+        service = near.split(".", 1)[0]
+        if f"{service}.{name}" in self.classes:
+            return f"{service}.{name}"
+        return self.by_short.get(name)
+
+    def result_type(self, sym: Symbol) -> Optional[str]:
+        """Type of `obj.member` (or of calling it): a class/service name or "list:<class>"."""
+        if sym.kind == "class":
+            return sym.name
+        m = re.match(r"(list|set)?\(?\s*([A-Za-z_][\w.]*)", sym.returns)
+        if not m:
+            return None
+        cls = self.qualify(m.group(2), sym.name)
+        if cls is None:
+            return None
+        return f"list:{cls}" if m.group(1) else cls
+
+    def guess(self, name: str) -> Optional[str]:
+        n = name.lstrip("_").lower()
+        if n in _CONN_NAMES:
+            return _CONN
+        if n in self.service_attrs:
+            return self.service_attrs[n]
+        if n in self.by_var:
+            return self.by_var[n]
+        tail = n.rsplit("_", 1)[-1]  # target_vessel, current_body
+        return self.by_var.get(tail) if tail != n else None
+
+
+class _UseCollector(ast.NodeVisitor):
+    def __init__(self, resolver: _Resolver) -> None:
+        self.r = resolver
+        self.env: Dict[str, Optional[str]] = {}
+        self.used: Dict[str, None] = {}  # ordered set of symbol names
+
+    def _member(self, base: Optional[str], attr: str) -> Optional[str]:
+        if base == _CONN:
+            return self.r.service_attrs.get(attr)
+        sym = None
+        if base and not base.startswith("list:"):
+            sym = self.r.members.get(f"{base}.{attr}")
+        elif base is None and attr in self.r.unique:
+            sym = self.r.members[self.r.unique[attr]]
+        elif base is None and attr.lstrip("_").lower() in _CONN_NAMES:
+            return _CONN  # a connection kept on some object: Ktimer.conn, self.app.conn
+        if sym is None:
+            return None
+        self.used[sym.name] = None
+        return self.r.result_type(sym)
+
+    def _getattr(self, obj: ast.AST, name: ast.AST) -> Optional[str]:
+        if isinstance(name, ast.Constant) and isinstance(name.value, str):
+            return self._member(self._type(obj), name.value)
+        return None
+
+    def _type(self, node: ast.AST) -> Optional[str]:
+        if isinstance(node, ast.Name):
+            if node.id in self.env:
+                return self.env[node.id]
+            return self.r.guess(node.id)
+        if isinstance(node, ast.Attribute):
+            if isinstance(node.value, ast.Name) and node.value.id == "self":
+                key = f"self.{node.attr}"
+                return self.env[key] if key in self.env else self.r.guess(node.attr)
+            return self._member(self._type(node.value), node.attr)
+        if isinstance(node, ast.Call):
+            f = node.func
+            # getattr(obj, "name"), and conn.add_stream(getattr, obj, "name")
+            args = node.args
+            if isinstance(f, ast.Name) and f.id == "getattr" and len(args) >= 2:
+                t = self._getattr(args[0], args[1])
+                if t is not None:
+                    return t
+            elif args and isinstance(args[0], ast.Name) and args[0].id == "getattr" and len(args) >= 3:
+                self._getattr(args[1], args[2])
+            t = self._type(f)
+            for a in node.args:
+                self.visit(a)
+            for kw in node.keywords:
+                self.visit(kw.value)
+            return t
+        if isinstance(node, ast.Subscript):
+            t = self._type(node.value)
+            self.visit(node.slice)
+            return t[5:] if t and t.startswith("list:") else None
+        self.generic_visit(node)
+        return None
+
+    def _bind(self, target: ast.AST, t: Optional[str]) -> None:
+        if isinstance(target, ast.Name):
+            self.env[target.id] = t
+        elif isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == "self":
+            self.env[f"self.{target.attr}"] = t
+        elif isinstance(target, ast.Attribute):
+            self._type(target)  # vessel.control.throttle = 1 uses Control.throttle
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for el in target.elts:
+                self._bind(el, None)
+        else:
+            self.visit(target)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        self._type(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        self._type(node)
+
+    def visit_Subscript(self, node: ast.Subscript) -> None:
+        self._type(node)
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        t = self._type(node.value)
+        for target in node.targets:
+            self._bind(target, t)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        if node.value is not None:
+            self._bind(node.target, self._type(node.value))
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        self._type(node.value)
+        if isinstance(node.target, ast.Attribute):
+            self._type(node.target)
+
+    def visit_For(self, node: ast.For) -> None:
+        t = self._type(node.iter)
+        self._bind(node.target, t[5:] if t and t.startswith("list:") else None)
+        for stmt in node.body + node.orelse:
+            self.visit(stmt)
+
+    def visit_arguments(self, node: ast.arguments) -> None:
+        # Parameters are typed by name on use; an assignment elsewhere must not leak into them.
+        for a in node.posonlyargs + node.args + node.kwonlyargs:
+            self.env.pop(a.arg, None)
+        self.generic_visit(node)
+
+
+def extract_api_uses(code: str, table: SymbolTable, resolver: Optional[_Resolver] = None) -> List[str]:
+    """Names of the API symbols a piece of code uses, in order of first use."""
+    try:
+        tree = ast.parse(textwrap.dedent(code))  # methods are stored with their class indent
+    except (SyntaxError, ValueError):
+        return []
+    collector = _UseCollector(resolver or _Resolver(table))
+    collector.visit(tree)
+    return list(collector.used)
+
+
+def _page(url: str) -> str:
+    return url.split("#", 1)[0]
+
+
+class ApiLinks:
+    def __init__(
+        self,
+        symbols: List[Tuple[str, str]],
+        snippets: List[Tuple[str, str, str]],
+        uses: List[List[int]],
+        examples: List[List[int]],
+        pages: Dict[str, List[int]],
+        source: Optional[str] = None,
+        snippets_source: Optional[str] = None,
+    ) -> None:
+        self.symbols = symbols  # (name, url)
+        self.snippets = snippets  # (id, name, path)
+        self.uses = uses  # per snippet: symbol indexes
+        self.examples = examples  # per symbol: snippet indexes, best first
+        self.pages = pages  # page url -> snippet indexes, best first
+        self.source = source
+        self.snippets_source = snippets_source
+        self._snippet_ids = {s[0]: i for i, s in enumerate(snippets)}
+        self._symbol_urls = {url: i for i, (_, url) in enumerate(symbols)}
+
+    def __len__(self) -> int:
+        return len(self.snippets)
+
+    # ---- build / persist ----
+
+    @classmethod
+    def build(cls, table: SymbolTable, records: Iterable[dict], snippets_source: Optional[str] = None) -> "ApiLinks":
+        resolver = _Resolver(table)
+        urls = {s.name: s.url for s in table.symbols}
+        symbols: List[Tuple[str, str]] = []
+        sym_ids: Dict[str, int] = {}
+        snippets: List[Tuple[str, str, str]] = []
+        uses: List[List[int]] = []
+        rank: List[Tuple[bool, int, str]] = []
+        for r in records:
+            if (r.get("lang") or "python") != "python" or not r.get("code"):
+                continue
+            names = extract_api_uses(r["code"], table, resolver)
+            if not names:
+                continue
+            ids = []
+            for n in names:
+                if n not in sym_ids:
+                    sym_ids[n] = len(symbols)
+                    symbols.append((n, urls[n]))
+                ids.append(sym_ids[n])
+            snippets.append((r["id"], r.get("name") or "", r.get("path") or ""))
+            uses.append(ids)
+            loc = r.get("lines_of_code") or r["code"].count("\n") + 1
+            rank.append((bool(r.get("restricted")), int(loc), r.get("name") or ""))
+
+        examples: List[List[int]] = [[] for _ in symbols]
+        page_hits: Dict[str, Dict[int, int]] = {}
+        for si, ids in enumerate(uses):
+            for i in ids:
+                examples[i].append(si)
+                counts = page_hits.setdefault(_page(symbols[i][1]), {})
+                counts[si] = counts.get(si, 0) + 1
+        for lst in examples:
+            lst.sort(key=lambda si: rank[si])
+        # A page's best examples use the most of its members.
+        pages = {p: sorted(c, key=lambda si: (-c[si], rank[si])) for p, c in page_hits.items()}
+        return cls(symbols, snippets, uses, examples, pages, source=table.source, snippets_source=snippets_source)
+
+    def save(self, path: Path) -> None:
+        payload = {
+            "source": self.source,
+            "snippets_source": self.snippets_source,
+            "symbols": self.symbols,
+            "snippets": self.snippets,
+            "uses": self.uses,
+            "examples": self.examples,
+            "pages": self.pages,
+        }
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ApiLinks":
+        p = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            [tuple(s) for s in p["symbols"]],
+            [tuple(s) for s in p["snippets"]],
+            p["uses"],
+            p["examples"],
+            p["pages"],
+            source=p.get("source"),
+            snippets_source=p.get("snippets_source"),
+        )
+
+    @classmethod
+    def load_fresh(cls, path: Path, docs_source: Optional[str], snippets_path: Path) -> Optional["ApiLinks"]:
+        """The saved links when both datasets still match their digests, else None (no symbol table needed)."""
+        from .index import source_digest
+
+        if not docs_source or not path.exists():
+            return None
+        digest = source_digest(snippets_path) if snippets_path.exists() else None
+        try:
+            links = cls.load(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return links if links.source == docs_source and links.snippets_source == digest else None
+
+    @classmethod
+    def open(cls, table: SymbolTable, snippets_path: Path, path: Optional[Path] = None) -> "ApiLinks":
+        """The saved links when both datasets still match their digests, otherwise rebuilt from `snippets_path`."""
+        from .index import source_digest
+
+        links = cls.load_fresh(path, table.source, snippets_path) if path is not None else None
+        if links is not None:
+            return links
+        digest = source_digest(snippets_path) if snippets_path.exists() else None
+        records: List[dict] = []
+        if digest is not None:
+            with snippets_path.open("r", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        return cls.build(table, records, snippets_source=digest)
+
+    # ---- lookup ----
+
+    def apis(self, snippet_id: str) -> List[Tuple[str, str]]:
+        """(symbol name, doc URL) for every API the snippet uses, in order of first use."""
+        si = self._snippet_ids.get(snippet_id)
+        return [] if si is None else [self.symbols[i] for i in self.uses[si]]
+
+    def examples_for(self, url: str, limit: int = 5) -> List[Tuple[str, str, str]]:
+        """(id, name, path) of snippets using the symbol at `url#anchor`, or any API on the page at `url`."""
+        i = self._symbol_urls.get(url)
+        ids = self.examples[i] if i is not None else self.pages.get(_page(url), [])
+        return [self.snippets[si] for si in ids[: max(0, limit)]]
+
+
+def links_path(index_path: Path) -> Path:
+    """Links file saved alongside an index (`krpc_python_docs.bin` -> `krpc_python_docs.links.json`)."""
+    return index_path.with_suffix(".links.json")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Link snippet code to the kRPC API symbols it uses")
+    ap.add_argument("--data", required=True, type=Path, help="Path to krpc_python_docs.jsonl")
+    ap.add_argument("--snippets", required=True, type=Path, help="Path to snippets_enriched.jsonl")
+    ap.add_argument("--out", type=Path, help="Output path (default: <data>.links.json next to the JSONL)")
+    args = ap.parse_args(argv)
+    from .index import KRPCSearchIndex, symbols_path
+
+    index_path = args.data.with_suffix(".bin")
+    idx = KRPCSearchIndex.open(args.data)
+    table = SymbolTable.open(idx, symbols_path(index_path))
+    out = args.out or links_path(index_path)
+    links = ApiLinks.open(table, args.snippets)
+    links.save(out)
+    pairs = sum(len(u) for u in links.uses)
+    print(f"wrote {out} ({out.stat().st_size} bytes, {len(links.snippets)} snippets, {len(links.symbols)} symbols, {pairs} links)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
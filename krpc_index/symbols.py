@@ -0,0 +1,239 @@
+"""
+Symbol table for the kRPC Python API reference.
+
+Every API member chunk (anchor like `SpaceCenter.Vessel.flight` on a `/python/api/` page)
+becomes a `Symbol` with its signature, return type, access, parameters and a one-line summary
+parsed from the section text. Exact lookups go through a dict of normalised keys: the full
+name, the name without the service, the bare member, and the snake_case service form used by
+the Python client (`space_center.vessel.flight`). Misspelt names fall back to trigram (Dice)
+similarity over the same keys, re-ranked with difflib.
+
+`python -m krpc_index.index` writes the table next to the dataset
+(`krpc_python_docs.symbols.json`); it is rebuilt from the search index when that file is
+missing or stale.
+"""
+from __future__ import annotations
+
+import difflib
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .index import KRPCSearchIndex
+
+_SYMBOL_ANCHOR = re.compile(r"^[A-Z]\w*(?:\.\w+)+$")
+_FIELD = re.compile(r"\s(Parameters|Attribute|Return type|Returns|Game Scenes)\s:\s|\sNote\s")
+_PREFIXES = ("class ", "static ")
+
+
+@dataclass
+class Symbol:
+    name: str
+    kind: str
+    signature: str
+    returns: str
+    access: str
+    summary: str
+    params: str
+    url: str
+
+
+def _snake(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def _tidy(text: str) -> str:
+    return re.sub(r"\s+([)\],.])", r"\1", re.sub(r"([(\[])\s+", r"\1", text)).strip()
+
+
+def _split_fields(body: str) -> Tuple[str, Dict[str, str]]:
+    """Summary text and the Sphinx field list ("Parameters : ...", "Return type : ...")."""
+    text = " " + " ".join(body.split()) + " "
+    marks = list(_FIELD.finditer(text))
+    summary = text[: marks[0].start()] if marks else text
+    fields: Dict[str, str] = {}
+    for j, m in enumerate(marks):
+        end = marks[j + 1].start() if j + 1 < len(marks) else len(text)
+        if m.group(1) and m.group(1) not in fields:
+            fields[m.group(1)] = text[m.end():end].strip()
+    return summary.strip(), fields
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def symbol_keys(name: str) -> List[str]:
+    parts = name.split(".")
+    keys = [name.lower(), ".".join(parts[1:]).lower(), parts[-1].lower()]
+    keys.append(".".join([_snake(parts[0])] + parts[1:]).lower())
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+def normalize_name(query: str) -> str:
+    """`conn.space_center.active_vessel`, `Vessel.flight(ref)` -> `space_center.active_vessel`, `vessel.flight`."""
+    q = query.strip().split("(", 1)[0].strip().rstrip(".")
+    q = re.sub(r"^(?:conn|krpc|self)\.", "", q)
+    return q.replace(" ", "").lower()
+
+
+def _grams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolTable:
+    def __init__(self, symbols: List[Symbol], source: Optional[str] = None) -> None:
+        self.symbols = symbols
+        self.source = source
+        self.exact: Dict[str, List[int]] = {}
+        for i, s in enumerate(symbols):
+            for k in symbol_keys(s.name):
+                self.exact.setdefault(k, []).append(i)
+        self._keys = list(self.exact)
+        # Trigram index for fuzzy lookups, built on the first miss so exact lookups stay cheap.
+        self._grams: List[Set[str]] = []
+        self._postings: Dict[str, List[int]] = {}
+
+    def _gram_index(self) -> Dict[str, List[int]]:
+        if not self._postings:
+            self._grams = [_grams(k) for k in self._keys]
+            for ki, grams in enumerate(self._grams):
+                for g in grams:
+                    self._postings.setdefault(g, []).append(ki)
+        return self._postings
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    # ---- build / persist ----
+
+    @classmethod
+    def from_index(cls, index: "KRPCSearchIndex") -> "SymbolTable":
+        symbols: List[Symbol] = []
+        seen: Set[str] = set()
+        for c in index.chunks:
+            url = index.chunk_url(c)
+            if not _SYMBOL_ANCHOR.match(c.anchor) or "/python/api/" not in url or c.anchor in seen:
+                continue
+            seen.add(c.anchor)
+            doc = index.docs[c.doc]
+            summary, fields = _split_fields(doc.content_text[c.body:c.end])
+            label = c.label
+            kind = "member"
+            if label.startswith("class "):
+                kind = "class"
+            elif label.startswith("static "):
+                kind = "static method"
+            elif "(" in label:
+                kind = "method"
+            elif "Attribute" in fields:
+                kind = "attribute"
+            signature = label
+            for p in _PREFIXES:
+                if signature.startswith(p):
+                    signature = signature[len(p):]
+            symbols.append(Symbol(
+                name=c.anchor,
+                kind=kind,
+                signature=f"{c.anchor.rsplit('.', 1)[0]}.{signature}",
+                returns=_tidy(fields.get("Return type", "")),
+                access=fields.get("Attribute", ""),
+                summary=_clip(_tidy(summary), 300),
+                params=_clip(_tidy(fields.get("Parameters", "")), 400),
+                url=url,
+            ))
+        # Members of a class whose members are all bare names (no call, no fields) are enum values.
+        plain: Dict[str, bool] = {}
+        for sym in symbols:
+            if sym.kind != "class":
+                parent = sym.name.rsplit(".", 1)[0]
+                plain[parent] = plain.get(parent, True) and sym.kind == "member" and not sym.returns and not sym.params
+        for sym in symbols:
+            if sym.kind == "member" and plain.get(sym.name.rsplit(".", 1)[0]) and sym.name.count(".") == 2:
+                sym.kind = "enum value"
+        return cls(symbols, source=index.source)
+
+    def save(self, path: Path) -> None:
+        # Rows instead of objects, and page URLs stored once: the anchor is the symbol name.
+        pages = sorted({s.url.split("#", 1)[0] for s in self.symbols})
+        page_ids = {u: i for i, u in enumerate(pages)}
+        rows = [
+            [s.name, s.kind, s.signature, s.returns, s.access, s.summary, s.params, page_ids[s.url.split("#", 1)[0]]]
+            for s in self.symbols
+        ]
+        payload = {"source": self.source, "pages": pages, "symbols": rows}
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SymbolTable":
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        pages = payload.get("pages") or []
+        symbols = [Symbol(*row[:7], url=f"{pages[row[7]]}#{row[0]}") for row in payload.get("symbols", [])]
+        return cls(symbols, source=payload.get("source"))
+
+    @classmethod
+    def open(cls, index: "KRPCSearchIndex", path: Optional[Path] = None) -> "SymbolTable":
+        """The saved table when it was built from the same dataset, otherwise one derived from `index`."""
+        if path is not None and path.exists():
+            try:
+                table = cls.load(path)
+                if table.source and table.source == index.source:
+                    return table
+            except (OSError, ValueError, TypeError):
+                pass
+        return cls.from_index(index)
+
+    # ---- lookup ----
+
+    def lookup(self, name: str, limit: int = 5) -> Tuple[bool, List[Symbol]]:
+        """(exact, symbols): all exact matches, or up to `limit` closest names when there are none."""
+        key = normalize_name(name)
+        if not key:
+            return False, []
+        hits = self.exact.get(key)
+        if hits:
+            # The fully qualified match first, then classes, then by name.
+            ranked = sorted(hits, key=lambda i: (self.symbols[i].name.lower() != key, self.symbols[i].kind != "class", self.symbols[i].name))
+            return True, [self.symbols[i] for i in ranked]
+        return False, self.fuzzy(key, limit)
+
+    def fuzzy(self, key: str, limit: int = 5, cutoff: float = 0.5) -> List[Symbol]:
+        q = _grams(key)
+        postings = self._gram_index()
+        shared: Dict[int, int] = {}
+        for g in q:
+            for ki in postings.get(g, ()):
+                shared[ki] = shared.get(ki, 0) + 1
+        # Dice on trigrams narrows the candidates; difflib orders the survivors.
+        dice = sorted(((2.0 * n / (len(q) + len(self._grams[ki])), ki) for ki, n in shared.items()), reverse=True)[:50]
+        scored = []
+        for d, ki in dice:
+            ratio = difflib.SequenceMatcher(None, key, self._keys[ki]).ratio()
+            if max(d, ratio) >= cutoff:
+                scored.append((ratio + d, self._keys[ki]))
+        out: List[Symbol] = []
+        seen: Set[int] = set()
+        for _, k in sorted(scored, key=lambda x: (-x[0], x[1])):
+            for i in self.exact[k]:
+                if i not in seen:
+                    seen.add(i)
+                    out.append(self.symbols[i])
+            if len(out) >= limit:
+                break
+        return out[:limit]
+
+
+def format_symbol(s: Symbol, max_chars: int = 600) -> str:
+    head = s.signature + (f" -> {s.returns}" if s.returns else "")
+    lines = [f"{head}  [{s.kind}{', ' + s.access.lower() if s.access else ''}]", s.url]
+    if s.summary:
+        lines.append(s.summary)
+    if s.params:
+        lines.append(f"Parameters: {s.params}")
+    return _clip("\n".join(lines), max_chars)
@@ -0,0 +1,264 @@
+"""Stream-driven gravity-turn ascent guidance with TWR limiting and automatic staging."""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List
+
+from ..utils.krpc_utils import readers
+from ..utils.krpc_utils.streams import FrameClock, StreamGroup
+from ..utils.physics_utils import twr_limited_throttle
+from . import node_execution
+
+FLAMEOUT_THRUST_N = 1.0
+STAGE_LOCKOUT_S = 1.0  # UT seconds between staging events
+APOAPSIS_RAMP_M = 2000.0  # throttle back over the last stretch to the target apoapsis
+APOAPSIS_SLACK_M = 250.0  # coast-phase drag loss tolerated before a corrective burn
+PITCH_DEADBAND_DEG = 0.25
+MAX_ASCENT_S = 900.0  # UT seconds from liftoff before guidance gives up
+LOG_INTERVAL_S = 2.0
+
+
+@dataclass
+class TurnProfile:
+    """Pitch program: vertical until turn_start, then pitch = 90 - (90 - final) * frac**shape."""
+
+    turn_start_alt_m: float = 1000.0
+    turn_end_alt_m: float = 45000.0
+    final_pitch_deg: float = 0.0
+    shape: float = 0.5
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any] | None) -> "TurnProfile":
+        known = {f.name for f in fields(cls)}
+        kwargs = {k: float(v) for k, v in (data or {}).items() if k in known and v is not None}
+        return cls(**kwargs)
+
+    def pitch_at(self, altitude_m: float) -> float:
+        if altitude_m <= self.turn_start_alt_m:
+            return 90.0
+        span = max(1.0, self.turn_end_alt_m - self.turn_start_alt_m)
+        frac = min(1.0, (altitude_m - self.turn_start_alt_m) / span)
+        return 90.0 - (90.0 - self.final_pitch_deg) * (frac ** max(0.05, self.shape))
+
+
+def _final_engine_stage(vessel) -> int:
+    """Lowest ignition stage that still carries an engine; staging below it would fire chutes/payload."""
+    try:
+        stages = [int(e.part.stage) for e in vessel.parts.engines]
+    except Exception:
+        stages = []
+    return min(stages) if stages else 0
+
+
+def _watch_dropping_engines(vessel, streams: StreamGroup, current_stage: int) -> List[Any]:
+    """Stream has_fuel for ignited engines that the next stage would decouple (e.g. boosters)."""
+    watched = []
+    try:
+        for e in vessel.parts.engines:
+            try:
+                if e.active and int(e.part.decouple_stage) == current_stage - 1:
+                    watched.append(streams.attr(e, "has_fuel"))
+            except Exception:
+                continue
+    except Exception:
+        pass
+    return watched
+
+
+def fly_ascent(
+    conn,
+    handle,
+    stop,
+    *,
+    target_apoapsis_m: float = 80000.0,
+    heading_deg: float = 90.0,
+    turn_profile: Dict[str, Any] | None = None,
+    max_twr: float | None = 2.2,
+    circularize: bool = True,
+    sample_interval_s: float = 1.0,
+) -> Dict[str, Any]:
+    """Fly from the pad to target apoapsis, coast out of the atmosphere and hand off to a circularization node."""
+    sc = conn.space_center
+    vessel = sc.active_vessel
+    if vessel is None:
+        raise RuntimeError("No active vessel")
+    profile = TurnProfile.from_dict(turn_profile)
+    body = vessel.orbit.body
+    mu = float(body.gravitational_parameter)
+    radius = float(body.equatorial_radius)
+    atmosphere_depth = float(getattr(body, "atmosphere_depth", 0.0) or 0.0)
+    final_stage = _final_engine_stage(vessel)
+    ctrl = vessel.control
+
+    report: Dict[str, Any] = {
+        "target_apoapsis_m": target_apoapsis_m,
+        "heading_deg": heading_deg,
+        "turn_profile": profile.__dict__,
+        "max_twr": max_twr,
+        "stage_plan": readers.stage_plan_approx(conn).get("stages", []),
+        "final_engine_stage": final_stage,
+        "stages_activated": [],
+        "phases": [],
+        "telemetry": [],
+        "meco": None,
+        "circularization": None,
+        "outcome": None,
+    }
+
+    streams = StreamGroup(conn)
+    stage_streams = StreamGroup(conn)
+    try:
+        clock = FrameClock(streams, sc)
+        flight = vessel.flight(body.reference_frame)
+        altitude = streams.attr(flight, "mean_altitude")
+        speed = streams.attr(flight, "speed")
+        q = streams.attr(flight, "dynamic_pressure")
+        apoapsis = streams.attr(vessel.orbit, "apoapsis_altitude")
+        periapsis = streams.attr(vessel.orbit, "periapsis_altitude")
+        time_to_ap = streams.attr(vessel.orbit, "time_to_apoapsis")
+        thrust = streams.attr(vessel, "available_thrust")
+        mass = streams.attr(vessel, "mass")
+
+        ap = vessel.auto_pilot
+        ap.reference_frame = vessel.surface_reference_frame
+        ap.target_pitch_and_heading(90.0, heading_deg)
+        ap.engage()
+        ctrl.sas = False
+
+        state = {"stage": int(ctrl.current_stage), "last_stage_ut": -1e12, "throttle": None, "pitch": 90.0}
+        watched = _watch_dropping_engines(vessel, stage_streams, state["stage"])
+        last_sample_ut = -1e12
+        last_log = 0.0
+
+        def set_throttle(value: float) -> None:
+            if state["throttle"] is None or abs(value - state["throttle"]) >= 0.01:
+                ctrl.throttle = value
+                state["throttle"] = value
+
+        def maybe_stage(now: float) -> None:
+            nonlocal watched
+            current = state["stage"]
+            if current <= final_stage or now - state["last_stage_ut"] < STAGE_LOCKOUT_S:
+                return
+            flameout = float(thrust()) <= FLAMEOUT_THRUST_N
+            boosters_dry = any(not s() for s in watched)
+            if not (flameout or boosters_dry):
+                return
+            ctrl.activate_next_stage()
+            state["last_stage_ut"] = now
+            state["stage"] = int(ctrl.current_stage)
+            reason = "flameout" if flameout else "boosters_dry"
+            report["stages_activated"].append(
+                {"ut": now, "from_stage": current, "to_stage": state["stage"], "reason": reason, "altitude_m": altitude()}
+            )
+            handle.log(f"[ascent] staged {current}->{state['stage']} ({reason}) at {altitude():.0f} m")
+            stage_streams.close()
+            watched = _watch_dropping_engines(vessel, stage_streams, state["stage"])
+
+        def sample(now: float, phase: str) -> None:
+            nonlocal last_sample_ut, last_log
+            if now - last_sample_ut >= sample_interval_s:
+                last_sample_ut = now
+                m = float(mass())
+                alt = float(altitude())
+                g = mu / (radius + alt) ** 2
+                report["telemetry"].append({
+                    "ut": now,
+                    "phase": phase,
+                    "altitude_m": alt,
+                    "apoapsis_m": float(apoapsis()),
+                    "periapsis_m": float(periapsis()),
+                    "speed_m_s": float(speed()),
+                    "dynamic_pressure_pa": float(q()),
+                    "pitch_cmd_deg": state["pitch"],
+                    "throttle": state["throttle"],
+                    "stage": state["stage"],
+                    "twr": (float(thrust()) * (state["throttle"] or 0.0)) / (m * g) if m > 0 else None,
+                })
+            if time.monotonic() - last_log >= LOG_INTERVAL_S:
+                last_log = time.monotonic()
+                handle.log(
+                    f"[ascent] {phase}: alt {altitude():.0f} m Ap {apoapsis():.0f} m pitch {state['pitch']:.1f} "
+                    f"throttle {state['throttle'] or 0.0:.2f} stage {state['stage']}"
+                )
+
+        # Powered ascent -------------------------------------------------------
+        liftoff_ut = clock.now()
+        report["phases"].append({"phase": "ascent", "ut": liftoff_ut})
+        handle.log(f"[ascent] liftoff guidance armed: target Ap {target_apoapsis_m:.0f} m heading {heading_deg:.1f}")
+        while True:
+            if stop.is_set():
+                report["outcome"] = "cancelled"
+                return report
+            now = clock.wait()
+            if now - liftoff_ut > MAX_ASCENT_S:
+                report["outcome"] = "timeout"
+                return report
+            maybe_stage(now)
+            apo = float(apoapsis())
+            if apo >= target_apoapsis_m:
+                break
+            alt = float(altitude())
+            pitch = profile.pitch_at(alt)
+            if abs(pitch - state["pitch"]) >= PITCH_DEADBAND_DEG:
+                ap.target_pitch_and_heading(pitch, heading_deg)
+                state["pitch"] = pitch
+            g = mu / (radius + alt) ** 2
+            throttle = twr_limited_throttle(max_twr, float(mass()), g, float(thrust()))
+            throttle *= max(0.05, min(1.0, (target_apoapsis_m - apo) / APOAPSIS_RAMP_M))
+            set_throttle(throttle)
+            sample(now, "ascent")
+
+        set_throttle(0.0)
+        meco_ut = clock.now()
+        report["meco"] = {"ut": meco_ut, "altitude_m": float(altitude()), "apoapsis_m": float(apoapsis())}
+        handle.log(f"[ascent] MECO at {altitude():.0f} m with Ap {apoapsis():.0f} m")
+
+        # Coast out of the atmosphere, topping up apoapsis lost to drag --------
+        report["phases"].append({"phase": "coast", "ut": meco_ut})
+        ap.reference_frame = vessel.surface_velocity_reference_frame
+        ap.target_direction = (0.0, 1.0, 0.0)
+        while float(altitude()) < atmosphere_depth:
+            if stop.is_set():
+                report["outcome"] = "cancelled"
+                return report
+            now = clock.wait()
+            if float(time_to_ap()) < 30.0:
+                break
+            if float(apoapsis()) < target_apoapsis_m - APOAPSIS_SLACK_M:
+                set_throttle(0.1)
+            elif state["throttle"]:
+                set_throttle(0.0)
+            sample(now, "coast")
+        set_throttle(0.0)
+        report["final_orbit"] = {"apoapsis_m": float(apoapsis()), "periapsis_m": float(periapsis())}
+
+        # Hand off to a circularization node ------------------------------------
+        proposal = readers.propose_circularize_node(conn, at="apoapsis")
+        if proposal.get("error"):
+            report["circularization"] = {"error": proposal["error"]}
+            report["outcome"] = "apoapsis_reached"
+            return report
+        node = ctrl.add_node(proposal["ut"], proposal["prograde"], 0.0, 0.0)
+        node_index = list(ctrl.nodes).index(node)
+        report["circularization"] = {"node": proposal, "node_index": node_index, "burn": None}
+        report["phases"].append({"phase": "circularize_node", "ut": clock.now()})
+        handle.log(f"[ascent] circularization node: {proposal['prograde']:.1f} m/s at UT {proposal['ut']:.1f}")
+    finally:
+        stage_streams.close()
+        streams.close()
+
+    if circularize:
+        burn = node_execution.execute_node(conn, handle, stop, node_index=node_index)
+        report["circularization"]["burn"] = burn
+        orbit = readers.orbit_info(conn)
+        report["final_orbit"] = {
+            "apoapsis_m": orbit.get("apoapsis_altitude_m"),
+            "periapsis_m": orbit.get("periapsis_altitude_m"),
+            "eccentricity": orbit.get("eccentricity"),
+        }
+        report["outcome"] = "orbit" if burn.get("cutoff_reason") == "tolerance" else "circularization_incomplete"
+    else:
+        report["outcome"] = "node_created"
+    return report
@@ -0,0 +1,271 @@
+"""Stream-driven final approach and docking using RCS translation in the target port's frame."""
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Dict, List, Tuple
+
+from ..utils.krpc_utils.streams import FrameClock, StreamGroup
+
+LATERAL_GAIN = 0.1  # 1/s: lateral offset (m) -> lateral speed command (m/s)
+LATERAL_MAX_M_S = 0.5
+CONE_SLOPE = 0.15  # allowed lateral offset per metre of axial distance before closing in
+CONE_MIN_M = 0.3
+VELOCITY_GAIN = 2.0  # RCS command per m/s of velocity error
+RCS_DEADBAND = 0.02
+ALIGN_MAX_DEG = 5.0  # do not close in while the ports are misaligned by more than this
+BACKOFF_M_S = 0.2
+LOG_INTERVAL_S = 2.0
+
+
+def _dot(a, b) -> float:
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _norm(v) -> float:
+    return math.sqrt(_dot(v, v))
+
+
+def _angle_deg(a, b) -> float:
+    na, nb = _norm(a), _norm(b)
+    if na <= 0 or nb <= 0:
+        return 0.0
+    return math.degrees(math.acos(max(-1.0, min(1.0, _dot(a, b) / (na * nb)))))
+
+
+def _clamp(x: float, limit: float) -> float:
+    return max(-limit, min(limit, x))
+
+
+def _state_name(state) -> str:
+    return str(getattr(state, "name", state)).split(".")[-1].lower()
+
+
+def _port_label(port) -> str:
+    part = port.part
+    tag = getattr(part, "tag", "") or ""
+    return f"{part.title} [{tag}]" if tag else part.title
+
+
+def _matches(port, query: str | None) -> bool:
+    if not query:
+        return True
+    q = query.lower()
+    part = port.part
+    return q in (part.title or "").lower() or q == (getattr(part, "tag", "") or "").lower()
+
+
+def speed_limit(distance_m: float, *, max_speed_m_s: float, final_speed_m_s: float, time_constant_s: float = 20.0) -> float:
+    """Closing speed allowed at a given distance: distance / time_constant, bounded to [final, max]."""
+    return max(final_speed_m_s, min(max_speed_m_s, distance_m / time_constant_s))
+
+
+def approach_velocity(
+    rel_pos: Tuple[float, float, float],
+    *,
+    standoff_m: float,
+    max_speed_m_s: float,
+    final_speed_m_s: float,
+    aligned: bool,
+) -> Tuple[Tuple[float, float, float], str]:
+    """
+    Desired velocity of our port in the target port frame (y out of the target port).
+
+    Outside the approach cone (or behind the standoff point while off-axis) we translate back to the
+    axis first; inside it we close in along -y at the distance-scheduled speed limit.
+    """
+    x, y, z = rel_pos
+    lateral = math.hypot(x, z)
+    lat_speed = min(LATERAL_MAX_M_S, LATERAL_GAIN * lateral)
+    lat_cmd = (-x / lateral * lat_speed, -z / lateral * lat_speed) if lateral > 1e-6 else (0.0, 0.0)
+    limit = speed_limit(_norm(rel_pos), max_speed_m_s=max_speed_m_s, final_speed_m_s=final_speed_m_s)
+    cone = max(CONE_MIN_M, CONE_SLOPE * max(0.0, y))
+    if y < standoff_m and lateral > cone:
+        # Too close to come in sideways: back out to the standoff distance while centring.
+        axial = min(limit, BACKOFF_M_S + 0.1 * (standoff_m - y))
+        return (lat_cmd[0], axial, lat_cmd[1]), "backoff"
+    if lateral > cone or not aligned:
+        return (lat_cmd[0], 0.0, lat_cmd[1]), "align"
+    return (lat_cmd[0], -limit, lat_cmd[1]), "approach"
+
+
+def resolve_ports(sc, vessel, *, target_vessel: str | None, target_port: str | None, own_port: str | None):
+    """Pick (own_port, target_port) docking port objects, raising ValueError with the options on failure."""
+    tv = None
+    tport = None
+    if target_vessel:
+        for v in sc.vessels:
+            if v.name == target_vessel:
+                tv = v
+                break
+        if tv is None:
+            raise ValueError(f"Target vessel '{target_vessel}' not found")
+    else:
+        tport = sc.target_docking_port if not target_port else None
+        tv = tport.part.vessel if tport is not None else sc.target_vessel
+    if tv is None:
+        raise ValueError("No target: set a target vessel/port in game or pass target_vessel")
+
+    if tport is None:
+        candidates: List[Any] = [
+            p for p in tv.parts.docking_ports if _state_name(p.state) == "ready" and _matches(p, target_port)
+        ]
+        if not candidates:
+            options = [_port_label(p) for p in tv.parts.docking_ports]
+            raise ValueError(f"No free docking port matching '{target_port}' on {tv.name}; ports: {options}")
+        tport = min(candidates, key=lambda p: _norm(p.position(vessel.reference_frame)))
+
+    mine = [p for p in vessel.parts.docking_ports if _state_name(p.state) == "ready" and _matches(p, own_port)]
+    if not mine:
+        options = [_port_label(p) for p in vessel.parts.docking_ports]
+        raise ValueError(f"No free docking port matching '{own_port}' on the active vessel; ports: {options}")
+    controlling = vessel.parts.controlling
+    oport = next((p for p in mine if p.part == controlling), None) if not own_port else None
+    if oport is None:
+        oport = min(mine, key=lambda p: _norm(p.position(tport.reference_frame)))
+    return oport, tport
+
+
+def fly_docking(
+    conn,
+    handle,
+    stop,
+    *,
+    target_vessel: str | None = None,
+    target_port: str | None = None,
+    own_port: str | None = None,
+    standoff_m: float = 10.0,
+    max_speed_m_s: float = 1.0,
+    final_speed_m_s: float = 0.15,
+    max_distance_m: float = 300.0,
+    max_time_s: float = 1800.0,
+    sample_interval_s: float = 1.0,
+) -> Dict[str, Any]:
+    """Translate our port onto the target port's axis and close in with RCS; returns a docking report."""
+    sc = conn.space_center
+    vessel = sc.active_vessel
+    if vessel is None:
+        raise RuntimeError("No active vessel")
+    oport, tport = resolve_ports(sc, vessel, target_vessel=target_vessel, target_port=target_port, own_port=own_port)
+    ctrl = vessel.control
+    port_rf = tport.reference_frame
+    vessel.parts.controlling = oport.part
+
+    report: Dict[str, Any] = {
+        "own_port": _port_label(oport),
+        "target_port": _port_label(tport),
+        "target_vessel": tport.part.vessel.name,
+        "initial": None,
+        "phases": [],
+        "samples": [],
+        "final": None,
+        "outcome": None,
+    }
+    handle.log(f"[docking] {report['own_port']} -> {report['target_port']} on {report['target_vessel']}")
+
+    streams = StreamGroup(conn)
+    try:
+        clock = FrameClock(streams, sc)
+        rel_pos = streams.add(oport.position, port_rf)
+        rel_vel = streams.add(vessel.velocity, port_rf)
+        facing = streams.add(oport.direction, port_rf)
+        port_state = streams.attr(oport, "state")
+        # Vessel control axes expressed in the target port frame: right (+x), forward (+y), down (+z).
+        axes = [streams.add(sc.transform_direction, basis, vessel.reference_frame, port_rf)
+                for basis in ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))]
+
+        ap = vessel.auto_pilot
+        ap.reference_frame = port_rf
+        ap.target_direction = (0.0, -1.0, 0.0)
+        ctrl.sas = False
+        ap.engage()
+        ctrl.rcs = True
+
+        def metrics() -> Dict[str, float]:
+            p, v = rel_pos(), rel_vel()
+            dist = _norm(p)
+            return {
+                "distance_m": dist,
+                "axial_m": p[1],
+                "lateral_m": math.hypot(p[0], p[2]),
+                "closing_speed_m_s": -_dot(p, v) / dist if dist > 0 else 0.0,
+                "relative_speed_m_s": _norm(v),
+                "alignment_deg": _angle_deg(facing(), (0.0, -1.0, 0.0)),
+            }
+
+        report["initial"] = metrics()
+        start_ut = clock.now()
+        phase = None
+        last_cmd = (None, None, None)
+        last_sample = -math.inf
+        last_log = 0.0
+        while True:
+            if stop.is_set():
+                report["outcome"] = "cancelled"
+                break
+            now = clock.wait()
+            state = _state_name(port_state())
+            if state in ("docked", "docking"):
+                # Magnetic capture has taken over; stop translating and let the ports latch.
+                ctrl.forward = ctrl.right = ctrl.up = 0.0
+                if state == "docked":
+                    report["outcome"] = "docked"
+                    break
+                continue
+            m = metrics()
+            if m["distance_m"] > max_distance_m:
+                report["outcome"] = "aborted_out_of_range"
+                handle.log(f"[docking] abort: {m['distance_m']:.0f} m from the port (limit {max_distance_m:.0f} m)")
+                break
+            if now - start_ut > max_time_s:
+                report["outcome"] = "timeout"
+                break
+
+            aligned = m["alignment_deg"] <= ALIGN_MAX_DEG
+            desired, new_phase = approach_velocity(
+                rel_pos(),
+                standoff_m=standoff_m,
+                max_speed_m_s=max_speed_m_s,
+                final_speed_m_s=final_speed_m_s,
+                aligned=aligned,
+            )
+            if new_phase != phase:
+                phase = new_phase
+                report["phases"].append({"phase": phase, "ut": now, **m})
+                handle.log(f"[docking] phase {phase} at {m['distance_m']:.1f} m")
+
+            v = rel_vel()
+            err = (desired[0] - v[0], desired[1] - v[1], desired[2] - v[2])
+            right, forward, down = (_clamp(VELOCITY_GAIN * _dot(err, axis()), 1.0) for axis in axes)
+            cmd = tuple(0.0 if abs(c) < RCS_DEADBAND else round(c, 2) for c in (right, forward, -down))
+            if cmd != last_cmd:
+                ctrl.right, ctrl.forward, ctrl.up = cmd
+                last_cmd = cmd
+
+            if now - last_sample >= sample_interval_s:
+                last_sample = now
+                report["samples"].append({"ut": now, "phase": phase, **m})
+            if time.monotonic() - last_log >= LOG_INTERVAL_S:
+                last_log = time.monotonic()
+                handle.log(
+                    f"[docking] {phase}: dist {m['distance_m']:.2f} m axial {m['axial_m']:.2f} m "
+                    f"lateral {m['lateral_m']:.2f} m closing {m['closing_speed_m_s']:.2f} m/s "
+                    f"align {m['alignment_deg']:.1f} deg"
+                )
+
+        try:
+            report["final"] = metrics()
+        except Exception:
+            report["final"] = None
+        handle.log(f"[docking] {report['outcome']}")
+        return report
+    finally:
+        try:
+            ctrl.forward = ctrl.right = ctrl.up = 0.0
+        except Exception:
+            pass
+        try:
+            vessel.auto_pilot.disengage()
+        except Exception:
+            pass
+        streams.close()
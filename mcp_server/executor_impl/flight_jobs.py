@@ -0,0 +1,481 @@
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Callable, Dict
+
+from ..mcp_context import mcp
+from ..utils.helper_utils import utc_timestamp
+from ..utils.krpc_helpers import best_effort_cut_throttle, best_effort_pause, best_effort_unpause
+from ..utils.krpc_utils.client import KRPCConnectionError, connect_to_game
+from .job_artifacts import job_resource_uri, save_job_artifact
+from .jobs import job_registry
+from . import ascent_guidance, docking_guidance, landing_guidance, node_execution, warp_control
+
+
+def _start_flight_job(
+    *,
+    kind: str,
+    params: Dict[str, Any],
+    guidance: Callable[..., Dict[str, Any]],
+    guidance_kwargs: Dict[str, Any] | None = None,
+) -> str:
+    """
+    Run a closed-loop guidance routine as a background job.
+
+    The guidance callable receives (conn, handle, stop_event, **guidance_kwargs), must poll
+    stop_event inside its loop, and returns a JSON-serializable result dict. Cancelling the job
+    sets stop_event and immediately zeroes the throttle from the cancelling thread; the job then
+    writes whatever the guidance returned (or the error) to the artifact.
+    """
+    guidance_kwargs = guidance_kwargs or {}
+
+    def job_fn(handle):
+        job_id = handle.job_id
+        handle.log(
+            f"[{kind}] Connecting to kRPC at {params['address']}:{params['rpc_port']}/{params['stream_port']}"
+        )
+        try:
+            conn = connect_to_game(
+                params["address"],
+                rpc_port=params["rpc_port"],
+                stream_port=params["stream_port"],
+                name=params.get("name"),
+                timeout=params["timeout"],
+            )
+        except KRPCConnectionError as exc:
+            handle.log(f"[{kind}] Connection failed: {exc}")
+            raise
+
+        stop = threading.Event()
+
+        def _cancel() -> None:
+            stop.set()
+            best_effort_cut_throttle(conn)
+            handle.log(f"[{kind}] cancellation requested; throttle zeroed")
+
+        handle.register_cancel_callback(_cancel)
+
+        result: Dict[str, Any] = {}
+        error: str | None = None
+        try:
+            if params.get("unpause_on_start", True):
+                best_effort_unpause(conn)
+            handle.log(f"[{kind}] Guidance running...")
+            result = guidance(conn, handle, stop, **guidance_kwargs) or {}
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            handle.log(f"[{kind}] Guidance failed: {error}")
+            raise
+        finally:
+            best_effort_cut_throttle(conn)
+            paused = None
+            if params.get("pause_on_end", True):
+                try:
+                    paused = best_effort_pause(conn)
+                except Exception:
+                    paused = None
+            artifact_payload = {
+                "job_id": job_id,
+                "kind": kind,
+                "requested_at": utc_timestamp(),
+                "params": params,
+                "result": result,
+                "error": error,
+                "cancelled": stop.is_set(),
+                "paused": paused,
+            }
+            try:
+                save_job_artifact(job_id, artifact_payload)
+                handle.set_result_resource(job_resource_uri(job_id))
+                handle.log(f"[{kind}] Artifact saved; exposing as resource.")
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    metadata = {"kind": kind, "params": params}
+    job_id = job_registry.create_job(job_fn, metadata=metadata)
+    return json.dumps(
+        {
+            "job_id": job_id,
+            "status": "PENDING",
+            "note": (
+                "Guidance job started. Poll get_job_status(job_id) for live telemetry logs; "
+                "call cancel_job(job_id) to abort (throttle is zeroed immediately)."
+            ),
+        }
+    )
+
+
+@mcp.tool()
+def start_execute_node_job(
+    address: str,
+    rpc_port: int = 50000,
+    stream_port: int = 50001,
+    name: str | None = None,
+    *,
+    timeout: float = 5.0,
+    node_index: int = 0,
+    environment: str = "current",
+    warp: bool = True,
+    tolerance_m_s: float = 0.1,
+    remove_node: bool = True,
+    pause_on_end: bool = True,
+) -> str:
+    """
+    Start a background job that flies a maneuver node with a stream-driven, frame-rate burn loop.
+
+    Behavior:
+      - Lead time comes from readers.compute_burn_time (Tsiolkovsky, half the burn before node UT).
+      - Points the autopilot along the remaining burn vector, warps to just before burn start, then
+        tracks remaining Δv every physics frame, feathers the throttle near cutoff and stages on flameout.
+      - Cancelling via cancel_job(job_id) zeroes the throttle immediately.
+
+    Usage pattern:
+        1. Create the node (set_maneuver_node / compute_* helpers), then call start_execute_node_job(...).
+        2. Poll get_job_status(job_id) for burn telemetry logs.
+        3. When finished, read_resource(result_resource) for the per-burn report: planned vs residual Δv,
+           ignition timing error, burn duration, staging events and cutoff reason.
+
+    Args:
+      node_index: 0-based index of the node to execute (default: next node)
+      environment: Isp environment for the burn-time estimate ('current', 'vacuum', 'sea_level')
+      warp: Warp to the burn start (minus a short settle period) when it is in the future
+      tolerance_m_s: Stop when remaining Δv drops below this value
+      remove_node: Remove the node after a successful burn
+      pause_on_end: Best-effort pause the game when the job ends
+    """
+    params = {
+        "address": address,
+        "rpc_port": rpc_port,
+        "stream_port": stream_port,
+        "name": name,
+        "timeout": timeout,
+        "node_index": node_index,
+        "environment": environment,
+        "warp": warp,
+        "tolerance_m_s": tolerance_m_s,
+        "remove_node": remove_node,
+        "pause_on_end": pause_on_end,
+    }
+    guidance_kwargs = {
+        "node_index": node_index,
+        "environment": environment,
+        "warp": warp,
+        "tolerance_m_s": tolerance_m_s,
+        "remove_node": remove_node,
+    }
+    return _start_flight_job(
+        kind="execute_node",
+        params=params,
+        guidance=node_execution.execute_node,
+        guidance_kwargs=guidance_kwargs,
+    )
+
+
+@mcp.tool()
+def start_ascent_job(
+    address: str,
+    rpc_port: int = 50000,
+    stream_port: int = 50001,
+    name: str | None = None,
+    *,
+    timeout: float = 5.0,
+    target_apoapsis_m: float = 80000.0,
+    heading_deg: float = 90.0,
+    turn_profile: dict[str, float] | None = None,
+    max_twr: float | None = 2.2,
+    circularize: bool = True,
+    sample_interval_s: float = 1.0,
+    pause_on_end: bool = True,
+) -> str:
+    """
+    Start a background job that flies a gravity-turn ascent with a stream-driven guidance loop.
+
+    Behavior:
+      - Pitch program from turn_profile, throttle capped at max_twr and eased off as apoapsis nears
+        target, automatic staging on flameout or when boosters dropped by the next stage run dry
+        (never stages past the last engine stage, so chutes/payload stay attached).
+      - After MECO: holds surface prograde and tops up apoapsis until leaving the atmosphere, then
+        creates a circularization node and (circularize=true) flies it via the node executor.
+      - Cancelling via cancel_job(job_id) zeroes the throttle immediately.
+
+    Usage pattern:
+        1. On the pad (throttle/SAS as per preflight), call start_ascent_job(...).
+        2. Poll get_job_status(job_id) for ascent telemetry and staging logs.
+        3. read_resource(result_resource) for the artifact: staging events, MECO, circularization burn report
+           and sampled telemetry (altitude, Ap/Pe, speed, q, pitch command, throttle, TWR) for post-flight analysis.
+
+    Args:
+      target_apoapsis_m: Apoapsis altitude to reach before MECO
+      heading_deg: Launch heading (90 = due east)
+      turn_profile: Optional {turn_start_alt_m, turn_end_alt_m, final_pitch_deg, shape}; defaults
+                    1000 / 45000 / 0 / 0.5 (shape < 1 turns earlier)
+      max_twr: Thrust-to-weight cap (null to fly at full throttle)
+      circularize: Execute the circularization node after creating it
+      sample_interval_s: UT seconds between telemetry samples
+      pause_on_end: Best-effort pause the game when the job ends
+    """
+    params = {
+        "address": address,
+        "rpc_port": rpc_port,
+        "stream_port": stream_port,
+        "name": name,
+        "timeout": timeout,
+        "target_apoapsis_m": target_apoapsis_m,
+        "heading_deg": heading_deg,
+        "turn_profile": turn_profile,
+        "max_twr": max_twr,
+        "circularize": circularize,
+        "sample_interval_s": sample_interval_s,
+        "pause_on_end": pause_on_end,
+    }
+    guidance_kwargs = {
+        "target_apoapsis_m": target_apoapsis_m,
+        "heading_deg": heading_deg,
+        "turn_profile": turn_profile,
+        "max_twr": max_twr,
+        "circularize": circularize,
+        "sample_interval_s": sample_interval_s,
+    }
+    return _start_flight_job(
+        kind="ascent",
+        params=params,
+        guidance=ascent_guidance.fly_ascent,
+        guidance_kwargs=guidance_kwargs,
+    )
+
+
+@mcp.tool()
+def start_landing_job(
+    address: str,
+    rpc_port: int = 50000,
+    stream_port: int = 50001,
+    name: str | None = None,
+    *,
+    timeout: float = 5.0,
+    target_lat: float | None = None,
+    target_lon: float | None = None,
+    margin_m: float = 10.0,
+    throttle_margin: float = 0.9,
+    touchdown_speed_m_s: float = 1.5,
+    pause_on_end: bool = True,
+) -> str:
+    """
+    Start a background job that flies a powered hoverslam landing from a descending trajectory.
+
+    Behavior:
+      - Predicts impact point, ignition time and burn Δv with a local integrator (body μ/radius and
+        rotation, sampled atmosphere density, live drag area, thrust/Isp from the stage plan); the
+        burn prediction (a few ms) is re-run in-process every physics frame, no RPCs per step.
+      - Go/no-go before burning: aborts without firing if the trajectory never reaches the surface,
+        the stage has no thrust, TWR is below 1 at throttle_margin, or the burn needs more Δv than the
+        stage plan holds.
+      - Ignites when a retrograde burn at throttle_margin would stop margin_m above the terrain, flies a
+        suicide-burn throttle law, then a constant-rate touchdown; stages on flameout; deploys gear.
+      - In-burn abort: every ~0.1 s of the burn re-predicts a full-throttle stop; if even that cannot
+        stop above the terrain, or needs more Δv than is left, it holds full throttle and records an
+        `abort` (abort_cannot_stop / abort_insufficient_dv) in the landing report.
+      - Cancelling via cancel_job(job_id) zeroes the throttle immediately.
+
+    Usage pattern:
+        1. Deorbit (or start from a suborbital hop) so the trajectory intersects the surface.
+        2. Call start_landing_job(...), optionally with target_lat/target_lon to predict the miss distance
+           and use the target's terrain height.
+        3. Poll get_job_status(job_id); read_resource(result_resource) for predictions, ignition, touchdown
+           speed/coordinates, miss distance and predictor timing.
+
+    Args:
+      target_lat/target_lon: Optional landing site (degrees); both or neither
+      margin_m: Height above the terrain (below the vessel's lowest point) at which the burn should stop
+      throttle_margin: Throttle assumed when predicting ignition (<1 keeps authority in reserve)
+      touchdown_speed_m_s: Final descent rate
+      pause_on_end: Best-effort pause the game when the job ends
+    """
+    params = {
+        "address": address,
+        "rpc_port": rpc_port,
+        "stream_port": stream_port,
+        "name": name,
+        "timeout": timeout,
+        "target_lat": target_lat,
+        "target_lon": target_lon,
+        "margin_m": margin_m,
+        "throttle_margin": throttle_margin,
+        "touchdown_speed_m_s": touchdown_speed_m_s,
+        "pause_on_end": pause_on_end,
+    }
+    guidance_kwargs = {
+        "target_lat": target_lat,
+        "target_lon": target_lon,
+        "margin_m": margin_m,
+        "throttle_margin": throttle_margin,
+        "touchdown_speed_m_s": touchdown_speed_m_s,
+    }
+    return _start_flight_job(
+        kind="landing",
+        params=params,
+        guidance=landing_guidance.fly_landing,
+        guidance_kwargs=guidance_kwargs,
+    )
+
+
+@mcp.tool()
+def start_docking_job(
+    address: str,
+    rpc_port: int = 50000,
+    stream_port: int = 50001,
+    name: str | None = None,
+    *,
+    timeout: float = 5.0,
+    target_port: str | None = None,
+    target_vessel: str | None = None,
+    own_port: str | None = None,
+    standoff_m: float = 10.0,
+    max_speed_m_s: float = 1.0,
+    final_speed_m_s: float = 0.15,
+    max_distance_m: float = 300.0,
+    max_time_s: float = 1800.0,
+    pause_on_end: bool = True,
+) -> str:
+    """
+    Start a background job that flies the final docking approach with RCS translation.
+
+    Behavior:
+      - Controls from our docking port and points it at the target port with the autopilot.
+      - Streams our port's position and velocity in the target port's reference frame, plus the
+        vessel's control axes in that frame, so each frame's RCS command needs no extra RPCs.
+      - Centres on the port axis (backing out to standoff_m if too close off-axis), then closes in with a
+        distance-scheduled speed limit (max_speed_m_s far out, final_speed_m_s at contact).
+      - Logs distance, axial/lateral offset, closing speed and port alignment every ~2 s.
+      - Aborts beyond max_distance_m or after max_time_s; cancel_job(job_id) zeroes all translation.
+
+    Usage pattern:
+        1. Finish the rendezvous (within ~200 m, relative velocity killed), target the station or port.
+        2. Call start_docking_job(...); poll get_job_status(job_id) for approach metrics.
+        3. read_resource(result_resource) for the phase history, sampled metrics and outcome ('docked', ...).
+
+    Args:
+      target_port: Target port part title substring or exact name tag (default: game target port, else
+                   the closest free port on the target vessel)
+      target_vessel: Target vessel name (default: current game target)
+      own_port: Our port title substring or name tag (default: controlling part if it is a port, else closest)
+      standoff_m: Axial distance to hold while aligning when off-axis
+      max_speed_m_s / final_speed_m_s: Closing-speed limits far out / at contact
+      max_distance_m: Abort if the ports drift further apart than this
+      max_time_s: UT budget for the approach
+      pause_on_end: Best-effort pause the game when the job ends
+    """
+    params = {
+        "address": address,
+        "rpc_port": rpc_port,
+        "stream_port": stream_port,
+        "name": name,
+        "timeout": timeout,
+        "target_port": target_port,
+        "target_vessel": target_vessel,
+        "own_port": own_port,
+        "standoff_m": standoff_m,
+        "max_speed_m_s": max_speed_m_s,
+        "final_speed_m_s": final_speed_m_s,
+        "max_distance_m": max_distance_m,
+        "max_time_s": max_time_s,
+        "pause_on_end": pause_on_end,
+    }
+    guidance_kwargs = {
+        "target_port": target_port,
+        "target_vessel": target_vessel,
+        "own_port": own_port,
+        "standoff_m": standoff_m,
+        "max_speed_m_s": max_speed_m_s,
+        "final_speed_m_s": final_speed_m_s,
+        "max_distance_m": max_distance_m,
+        "max_time_s": max_time_s,
+    }
+    return _start_flight_job(
+        kind="docking",
+        params=params,
+        guidance=docking_guidance.fly_docking,
+        guidance_kwargs=guidance_kwargs,
+    )
+
+
+@mcp.tool()
+def start_warp_until_job(
+    address: str,
+    rpc_port: int = 50000,
+    stream_port: int = 50001,
+    name: str | None = None,
+    *,
+    timeout: float = 5.0,
+    ut: float | None = None,
+    duration_s: float | None = None,
+    node_lead_s: float | None = None,
+    stop_on_soi_change: bool = True,
+    stop_on_atmosphere: bool = True,
+    min_ec_fraction: float | None = None,
+    max_rails_rate: float = 100000.0,
+    allow_physics_warp: bool = False,
+    pause_on_end: bool = True,
+) -> str:
+    """
+    Start a background job that time-warps until any stop condition trips, without blocking on warp_to.
+
+    Behavior:
+      - Every frame picks the highest rails rate the game allows at the current altitude
+        (maximum_rails_warp_factor) that cannot overrun the earliest predicted condition within ~2 s of
+        wall clock, stepping down as it approaches; optional physics warp where rails is not allowed.
+      - Conditions are read from streams: target UT / duration, next node UT minus node_lead_s,
+        SOI change (predicted + confirmed by orbit body), descent into the atmosphere, EC below a fraction.
+      - Drops to 1x as soon as one trips and returns which one fired; cancel_job(job_id) also stops warp.
+
+    Usage pattern:
+        1. Call start_warp_until_job(ut=..., node_lead_s=60, min_ec_fraction=0.2, ...).
+        2. Poll get_job_status(job_id) (rate and time to next trip are logged every ~2 s).
+        3. read_resource(result_resource): { fired, ut, game_s, wall_s, max_rate, conditions }.
+
+    Args:
+      ut: Stop at this universal time
+      duration_s: Stop after this many game seconds
+      node_lead_s: Stop this many seconds before the next maneuver node
+      stop_on_soi_change: Stop when the vessel changes sphere of influence
+      stop_on_atmosphere: Stop when descending into the body's atmosphere
+      min_ec_fraction: Stop when ElectricCharge drops below this fraction of capacity
+      max_rails_rate: Cap on the rails warp rate (1-100000)
+      allow_physics_warp: Use physics warp (2-4x) where rails warp is not allowed
+      pause_on_end: Best-effort pause the game when the job ends
+    """
+    params = {
+        "address": address,
+        "rpc_port": rpc_port,
+        "stream_port": stream_port,
+        "name": name,
+        "timeout": timeout,
+        "ut": ut,
+        "duration_s": duration_s,
+        "node_lead_s": node_lead_s,
+        "stop_on_soi_change": stop_on_soi_change,
+        "stop_on_atmosphere": stop_on_atmosphere,
+        "min_ec_fraction": min_ec_fraction,
+        "max_rails_rate": max_rails_rate,
+        "allow_physics_warp": allow_physics_warp,
+        "pause_on_end": pause_on_end,
+    }
+    guidance_kwargs = {
+        "ut": ut,
+        "duration_s": duration_s,
+        "node_lead_s": node_lead_s,
+        "stop_on_soi_change": stop_on_soi_change,
+        "stop_on_atmosphere": stop_on_atmosphere,
+        "min_ec_fraction": min_ec_fraction,
+        "max_rails_rate": max_rails_rate,
+        "allow_physics": allow_physics_warp,
+    }
+    return _start_flight_job(
+        kind="warp_until",
+        params=params,
+        guidance=warp_control.fly_warp_until,
+        guidance_kwargs=guidance_kwargs,
+    )
@@ -0,0 +1,404 @@
+"""Stream-driven hoverslam landing with an in-process trajectory predictor."""
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Dict, Tuple
+
+from ..utils.descent_model import (
+    AtmosphereTable,
+    DescentModel,
+    find_ignition_delay,
+    great_circle,
+    lat_lon,
+    simulate,
+)
+from ..utils.krpc_utils import readers
+from ..utils.krpc_utils.streams import FrameClock, StreamGroup
+
+FLAMEOUT_THRUST_N = 1.0
+STAGE_LOCKOUT_S = 0.5
+MIN_BURN_THROTTLE = 0.05
+FINAL_ALT_M = 30.0  # below this (above the landing legs) switch to a constant-rate touchdown
+FINAL_SPEED_M_S = 8.0
+UPRIGHT_HSPEED_M_S = 1.0  # point straight up once horizontal drift is this small
+DESCENT_RATE_GAIN = 0.8
+DRAG_MIN_Q_PA = 50.0  # only trust drag-area estimates with meaningful dynamic pressure
+TERRAIN_REFRESH_S = 2.0
+ABORT_CHECK_S = 0.1  # UT between full-throttle stop predictions during the burn (about 5 physics frames)
+MAX_DESCENT_S = 3600.0
+LOG_INTERVAL_S = 2.0
+
+
+def _norm(v) -> float:
+    return math.sqrt(sum(x * x for x in v))
+
+
+def _situation_name(sit) -> str:
+    return str(getattr(sit, "name", sit)).split(".")[-1].lower()
+
+
+def _bottom_offset_m(vessel) -> float:
+    """Distance from the centre of mass down to the lowest point of the vessel."""
+    try:
+        lo, _hi = vessel.bounding_box(vessel.surface_reference_frame)
+        return max(0.0, -float(lo[0]))
+    except Exception:
+        return 2.0
+
+
+def _stage_performance(conn, current_stage: int) -> Dict[str, Any]:
+    """Thrust/Isp of the current stage and the Δv left in it and below, from the stage plan."""
+    stages = readers.stage_plan_approx(conn).get("stages", [])
+    active = next((s for s in stages if s.get("stage") == current_stage), None)
+    if active is None:
+        active = next((s for s in stages if (s.get("max_thrust_n") or 0) > 0), {})
+    total_dv = sum(float(s.get("delta_v_m_s") or 0.0) for s in stages if s.get("stage", 0) <= current_stage)
+    return {
+        "stage": active.get("stage"),
+        "max_thrust_n": active.get("max_thrust_n"),
+        "combined_isp_s": active.get("combined_isp_s"),
+        "available_dv_m_s": total_dv or None,
+    }
+
+
+def fly_landing(
+    conn,
+    handle,
+    stop,
+    *,
+    target_lat: float | None = None,
+    target_lon: float | None = None,
+    margin_m: float = 10.0,
+    throttle_margin: float = 0.9,
+    touchdown_speed_m_s: float = 1.5,
+) -> Dict[str, Any]:
+    """Predict impact and ignition locally, then fly a hoverslam to touchdown and return a landing report."""
+    sc = conn.space_center
+    vessel = sc.active_vessel
+    if vessel is None:
+        raise RuntimeError("No active vessel")
+    if (target_lat is None) != (target_lon is None):
+        raise ValueError("target_lat and target_lon must be given together")
+    body = vessel.orbit.body
+    rf = body.reference_frame
+    ctrl = vessel.control
+
+    perf = _stage_performance(conn, int(ctrl.current_stage))
+    atmosphere = AtmosphereTable.from_body(body)
+    model = DescentModel(
+        mu=float(body.gravitational_parameter),
+        radius_m=float(body.equatorial_radius),
+        rotation_rate_rad_s=float(getattr(body, "rotational_speed", 0.0) or 0.0),
+        thrust_n=float(perf.get("max_thrust_n") or 0.0),
+        isp_s=perf.get("combined_isp_s"),
+        atmosphere=atmosphere,
+    )
+    bottom = _bottom_offset_m(vessel)
+
+    report: Dict[str, Any] = {
+        "body": body.name,
+        "target": {"lat": target_lat, "lon": target_lon} if target_lat is not None else None,
+        "stage_performance": perf,
+        "atmosphere_samples": len(atmosphere.altitudes_m) if atmosphere else 0,
+        "bottom_offset_m": bottom,
+        "initial_prediction": None,
+        "ignition": None,
+        "stages_activated": [],
+        "predictor": None,
+        "abort": None,
+        "touchdown": None,
+        "outcome": None,
+    }
+
+    def terrain_at(lat: float, lon: float) -> float:
+        try:
+            return float(body.surface_height(lat, lon))
+        except Exception:
+            return 0.0
+
+    streams = StreamGroup(conn)
+    try:
+        clock = FrameClock(streams, sc)
+        position = streams.add(vessel.position, rf)
+        velocity = streams.add(vessel.velocity, rf)
+        mass = streams.attr(vessel, "mass")
+        thrust = streams.attr(vessel, "available_thrust")
+        flight = vessel.flight(rf)
+        surface_alt = streams.attr(flight, "surface_altitude")
+        q = streams.attr(flight, "dynamic_pressure")
+        drag = streams.attr(flight, "drag")
+        situation = streams.attr(vessel, "situation")
+
+        def refresh_model() -> None:
+            live = float(thrust())
+            if live > FLAMEOUT_THRUST_N:
+                model.thrust_n = live
+            if atmosphere is not None and float(q()) > DRAG_MIN_Q_PA:
+                model.drag_area_m2 = _norm(drag()) / float(q())
+
+        def miss(lat: float, lon: float) -> Dict[str, Any] | None:
+            if target_lat is None:
+                return None
+            dist, bearing = great_circle(model.radius_m, target_lat, target_lon, lat, lon)
+            return {"distance_m": dist, "bearing_deg": bearing}
+
+        # Initial prediction and go/no-go ----------------------------------------
+        refresh_model()
+        r0, v0, m0 = position(), velocity(), float(mass())
+        terrain = terrain_at(target_lat, target_lon) if target_lat is not None else 0.0
+        impact = simulate(model, r0, v0, m0, terrain_alt_m=terrain)
+        if target_lat is None:
+            terrain = terrain_at(impact.latitude_deg, impact.longitude_deg)
+            impact = simulate(model, r0, v0, m0, terrain_alt_m=terrain)
+        prediction: Dict[str, Any] = {
+            "ut": clock.now(),
+            "terrain_alt_m": terrain,
+            "impact_lat": impact.latitude_deg,
+            "impact_lon": impact.longitude_deg,
+            "time_to_impact_s": impact.time_s,
+            "impact_speed_m_s": impact.speed_m_s,
+            "miss": miss(impact.latitude_deg, impact.longitude_deg),
+        }
+        report["initial_prediction"] = prediction
+        if impact.altitude_m > terrain + 1.0:
+            report["outcome"] = "no_impact"
+            handle.log("[landing] trajectory does not intersect the surface; deorbit first")
+            return report
+        if model.thrust_n <= FLAMEOUT_THRUST_N:
+            report["outcome"] = "abort_no_thrust"
+            handle.log("[landing] no thrust available in the current stage")
+            return report
+        g_surface = model.mu / (model.radius_m + terrain) ** 2
+        if model.thrust_n * throttle_margin < m0 * g_surface:
+            report["outcome"] = "abort_insufficient_twr"
+            handle.log(f"[landing] TWR {model.thrust_n / (m0 * g_surface):.2f} too low for a hoverslam")
+            return report
+
+        stop_alt = terrain + bottom + margin_m
+        delay, burn = find_ignition_delay(
+            model, r0, v0, m0, terrain_alt_m=terrain, stop_alt_m=stop_alt, throttle=throttle_margin
+        )
+        if burn is not None:
+            prediction.update({
+                "ignition_in_s": delay,
+                "ignition_ut": prediction["ut"] + delay,
+                "burn_dv_m_s": burn.dv_used_m_s,
+                "landing_lat": burn.latitude_deg,
+                "landing_lon": burn.longitude_deg,
+                "landing_miss": miss(burn.latitude_deg, burn.longitude_deg),
+            })
+            available_dv = perf.get("available_dv_m_s")
+            if available_dv and burn.dv_used_m_s > available_dv:
+                report["outcome"] = "abort_insufficient_dv"
+                handle.log(
+                    f"[landing] burn needs {burn.dv_used_m_s:.0f} m/s but stage plan has {available_dv:.0f} m/s"
+                )
+                return report
+        handle.log(
+            f"[landing] impact in {impact.time_s:.1f}s at {impact.latitude_deg:.4f},{impact.longitude_deg:.4f}; "
+            + (f"ignition in {delay:.1f}s" if delay is not None else "ignition now (late)")
+        )
+
+        ap = vessel.auto_pilot
+        ap.reference_frame = vessel.surface_velocity_reference_frame
+        ap.target_direction = (0.0, -1.0, 0.0)
+        ap.engage()
+        ctrl.sas = False
+
+        # Coast: re-predict every frame until the stopping point reaches the margin ----
+        start_ut = clock.now()
+        last_log = 0.0
+        last_terrain = time.monotonic()
+        predictions = 0
+        predict_s = 0.0
+        while True:
+            if stop.is_set():
+                report["outcome"] = "cancelled"
+                return report
+            now = clock.wait()
+            if now - start_ut > MAX_DESCENT_S:
+                report["outcome"] = "timeout"
+                return report
+            refresh_model()
+            r, v, m = position(), velocity(), float(mass())
+            if target_lat is None and time.monotonic() - last_terrain >= TERRAIN_REFRESH_S:
+                last_terrain = time.monotonic()
+                lat, lon = lat_lon(simulate(model, r, v, m, terrain_alt_m=terrain).position)
+                terrain = terrain_at(lat, lon)
+                stop_alt = terrain + bottom + margin_m
+            t0 = time.perf_counter()
+            pred = simulate(model, r, v, m, terrain_alt_m=terrain, throttle=throttle_margin)
+            predict_s += time.perf_counter() - t0
+            predictions += 1
+            if not pred.stopped or pred.altitude_m <= stop_alt:
+                break
+            if time.monotonic() - last_log >= LOG_INTERVAL_S:
+                last_log = time.monotonic()
+                handle.log(
+                    f"[landing] coasting: alt {float(surface_alt()):.0f} m speed {_norm(v):.1f} m/s "
+                    f"burn would stop at {pred.altitude_m - terrain:.0f} m AGL"
+                )
+
+        # Hoverslam ---------------------------------------------------------------
+        ignition_ut = clock.now()
+        late = not pred.stopped or pred.altitude_m < terrain + bottom
+        report["ignition"] = {
+            "ut": ignition_ut,
+            "surface_altitude_m": float(surface_alt()),
+            "speed_m_s": _norm(velocity()),
+            "predicted_stop_agl_m": pred.altitude_m - terrain,
+            "late": late,
+        }
+        handle.log(
+            f"[landing] ignition at {float(surface_alt()):.0f} m"
+            + (" (late: cannot stop above terrain at planned throttle)" if late else "")
+        )
+        try:
+            ctrl.gear = True
+        except Exception:
+            pass
+
+        def abort_reason(r, v, m: float, dv_spent: float) -> Tuple[str | None, Dict[str, Any]]:
+            """Why even a full-throttle retrograde burn from here ends badly, or None while it still stops."""
+            full = simulate(model, r, v, m, terrain_alt_m=terrain, throttle=1.0)
+            available_dv = perf.get("available_dv_m_s")
+            dv_left = available_dv - dv_spent if available_dv else None
+            detail = {
+                "predicted_stop_agl_m": full.altitude_m - terrain if full.stopped else None,
+                "dv_needed_m_s": full.dv_used_m_s,
+                "dv_left_m_s": dv_left,
+            }
+            if not full.stopped or full.altitude_m < terrain + bottom:
+                return "abort_cannot_stop", detail
+            if dv_left is not None and full.dv_used_m_s > dv_left:
+                return "abort_insufficient_dv", detail
+            return None, detail
+
+        upright = False
+        last_throttle: float | None = None
+        last_stage_ut = -math.inf
+        last_check = -math.inf
+        last_ut = ignition_ut
+        dv_spent = 0.0
+        bailout = False
+        while True:
+            if stop.is_set():
+                report["outcome"] = "cancelled"
+                break
+            now = clock.wait()
+            sit = _situation_name(situation())
+            if sit in ("landed", "splashed"):
+                report["outcome"] = sit
+                break
+            if now - ignition_ut > MAX_DESCENT_S:
+                report["outcome"] = "timeout"
+                break
+            r, v, m = position(), velocity(), float(mass())
+            available = float(thrust())
+            if last_throttle is not None and available > FLAMEOUT_THRUST_N:
+                dv_spent += last_throttle * available / m * max(0.0, now - last_ut)
+            last_ut = now
+            if available <= FLAMEOUT_THRUST_N:
+                current = int(ctrl.current_stage)
+                if current <= 0:
+                    report["outcome"] = "out_of_thrust"
+                    handle.log("[landing] out of thrust during descent")
+                    break
+                if now - last_stage_ut >= STAGE_LOCKOUT_S:
+                    ctrl.activate_next_stage()
+                    last_stage_ut = now
+                    report["stages_activated"].append({"ut": now, "from_stage": current})
+                    handle.log(f"[landing] flameout; staged from {current}")
+                continue
+
+            rn = _norm(r)
+            up = tuple(x / rn for x in r)
+            vs = sum(a * b for a, b in zip(v, up))
+            speed = _norm(v)
+            hspeed = math.sqrt(max(0.0, speed * speed - vs * vs))
+            h = max(0.1, float(surface_alt()) - bottom)
+            g = model.mu / (rn * rn)
+            a_max = available / m
+
+            if h < FINAL_ALT_M or speed < FINAL_SPEED_M_S:
+                # Constant-rate touchdown: descend at a rate proportional to height, floored at touchdown speed.
+                target_vs = -max(touchdown_speed_m_s, min(FINAL_SPEED_M_S, 0.2 * h))
+                a_req = g + DESCENT_RATE_GAIN * (target_vs - vs)
+                cos_tilt = 1.0 if upright else max(0.2, -vs / speed) if speed > 0 else 1.0
+                if not upright and hspeed < UPRIGHT_HSPEED_M_S:
+                    ap.reference_frame = vessel.surface_reference_frame
+                    ap.target_pitch_and_heading(90.0, 0.0)
+                    upright = True
+            else:
+                # Suicide-burn law: decelerate so the vertical speed reaches zero at the margin height.
+                h_eff = max(0.5, h - margin_m)
+                a_req = vs * vs / (2.0 * h_eff) + g
+                cos_tilt = max(0.2, -vs / speed) if speed > 0 else 1.0
+                # The law only sees vertical kinematics; re-check the full trajectory, remaining Δv included,
+                # and hold full throttle for as long as even that cannot stop above the terrain.
+                if now - last_check >= ABORT_CHECK_S:
+                    last_check = now
+                    model.thrust_n = available
+                    reason, detail = abort_reason(r, v, m, dv_spent)
+                    if (reason is not None) != bailout:
+                        bailout = reason is not None
+                        handle.log(
+                            f"[landing] {reason}: full throttle at h {h:.0f} m vs {vs:.1f} m/s"
+                            if bailout else "[landing] full-throttle stop is safe again; back on the burn law"
+                        )
+                    if bailout and report["abort"] is None:
+                        report["abort"] = {"ut": now, "reason": reason, "surface_altitude_m": h + bottom,
+                                           "speed_m_s": speed, **detail}
+                if bailout:
+                    a_req = a_max * cos_tilt
+            thr = max(0.0, min(1.0, a_req / (a_max * cos_tilt)))
+            if vs < 0:
+                thr = max(MIN_BURN_THROTTLE, thr)
+            if last_throttle is None or abs(thr - last_throttle) >= 0.01:
+                ctrl.throttle = thr
+                last_throttle = thr
+
+            if time.monotonic() - last_log >= LOG_INTERVAL_S:
+                last_log = time.monotonic()
+                handle.log(
+                    f"[landing] burn: h {h:.1f} m vs {vs:.1f} m/s hs {hspeed:.1f} m/s throttle {thr:.2f}"
+                )
+
+        ctrl.throttle = 0.0
+        r, v = position(), velocity()
+        rn = _norm(r) or 1.0
+        vs = sum(a * b for a, b in zip(v, r)) / rn
+        lat, lon = lat_lon(r)
+        report["touchdown"] = {
+            "ut": clock.now(),
+            "vertical_speed_m_s": vs,
+            "horizontal_speed_m_s": math.sqrt(max(0.0, _norm(v) ** 2 - vs * vs)),
+            "lat": lat,
+            "lon": lon,
+            "miss": miss(lat, lon),
+            "burn_duration_s": clock.now() - ignition_ut,
+            "mass_kg": float(mass()),
+        }
+        report["predictor"] = {
+            "predictions": predictions,
+            "mean_ms": (predict_s / predictions * 1000.0) if predictions else None,
+            "drag_area_m2": model.drag_area_m2,
+        }
+        handle.log(f"[landing] {report['outcome']}: touchdown vs {vs:.2f} m/s at {lat:.4f},{lon:.4f}")
+        if report["outcome"] in ("landed", "splashed"):
+            try:
+                ctrl.sas = True
+            except Exception:
+                pass
+        return report
+    finally:
+        try:
+            ctrl.throttle = 0.0
+        except Exception:
+            pass
+        try:
+            vessel.auto_pilot.disengage()
+        except Exception:
+            pass
+        streams.close()
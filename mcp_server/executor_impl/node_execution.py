@@ -0,0 +1,221 @@
+"""Closed-loop maneuver node execution driven by kRPC streams."""
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Dict
+
+from ..utils.krpc_utils import readers
+from ..utils.krpc_utils.streams import FrameClock, StreamGroup
+from ..utils.physics_utils import feathered_throttle
+from .warp_control import UTCondition, warp_until
+
+WARP_SETTLE_S = 10.0  # arrive this long before ignition so the autopilot can settle
+FEATHER_S = 1.0  # final seconds of (full-thrust) burn flown with a proportional throttle
+MIN_THROTTLE = 0.05
+FLAMEOUT_THRUST_N = 1.0  # available thrust at/below this counts as flameout
+STAGE_LOCKOUT_S = 0.5  # UT seconds between consecutive staging events
+STEER_FREEZE_DV_M_S = 2.0  # stop re-aiming once the remaining vector gets noisy
+STEER_DEADBAND_DEG = 1.0
+LOG_INTERVAL_S = 2.0  # wall-clock seconds between telemetry log lines
+
+
+def _angle_deg(a, b) -> float:
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(x * x for x in b))
+    if na <= 0 or nb <= 0:
+        return 0.0
+    c = sum(x * y for x, y in zip(a, b)) / (na * nb)
+    return math.degrees(math.acos(max(-1.0, min(1.0, c))))
+
+
+def _unit(v):
+    n = math.sqrt(sum(x * x for x in v))
+    if n <= 0:
+        return (0.0, 1.0, 0.0)
+    return tuple(x / n for x in v)
+
+
+def execute_node(
+    conn,
+    handle,
+    stop,
+    *,
+    node_index: int = 0,
+    environment: str = "current",
+    warp: bool = True,
+    tolerance_m_s: float = 0.1,
+    remove_node: bool = True,
+) -> Dict[str, Any]:
+    """Fly one maneuver node and return a burn report (planned vs residual Δv, timing, staging)."""
+    sc = conn.space_center
+    vessel = sc.active_vessel
+    if vessel is None:
+        raise RuntimeError("No active vessel")
+    nodes = list(vessel.control.nodes)
+    if not nodes:
+        raise RuntimeError("No maneuver nodes to execute")
+    if node_index < 0 or node_index >= len(nodes):
+        raise ValueError(f"node_index {node_index} out of range (have {len(nodes)} nodes)")
+    node = nodes[node_index]
+    ctrl = vessel.control
+
+    planned_dv = float(node.delta_v)
+    node_ut = float(node.ut)
+    estimate = readers.compute_burn_time(conn, planned_dv, environment)
+    burn_time = estimate.get("burn_time_tsiolkovsky_s") or estimate.get("burn_time_simple_s")
+    if burn_time is None:
+        handle.log("[execute_node] no thrust in current stage; igniting at node UT and staging on demand")
+        burn_time = 0.0
+    lead = burn_time / 2.0
+    burn_start_ut = node_ut - lead
+
+    report: Dict[str, Any] = {
+        "node_index": node_index,
+        "node_ut": node_ut,
+        "planned_dv_m_s": planned_dv,
+        "burn_time_estimate_s": burn_time,
+        "lead_time_s": lead,
+        "planned_start_ut": burn_start_ut,
+        "burn_estimate": estimate,
+        "ignition_ut": None,
+        "cutoff_ut": None,
+        "burn_duration_s": None,
+        "ignition_error_s": None,
+        "residual_dv_m_s": None,
+        "residual_vector_m_s": None,
+        "stages_activated": [],
+        "cutoff_reason": None,
+        "node_removed": False,
+        "warp": None,
+    }
+    handle.log(
+        f"[execute_node] node {node_index}: dv={planned_dv:.1f} m/s, est burn {burn_time:.1f}s, "
+        f"start UT {burn_start_ut:.1f}"
+    )
+
+    streams = StreamGroup(conn)
+    try:
+        clock = FrameClock(streams, sc)
+        ap = vessel.auto_pilot
+        ap.reference_frame = node.reference_frame
+        ap.target_direction = (0.0, 1.0, 0.0)
+        ap.engage()
+        pointing_error = streams.attr(ap, "error")
+
+        if warp and burn_start_ut - clock.now() > WARP_SETTLE_S + 1.0:
+            handle.log(f"[execute_node] warping to UT {burn_start_ut - WARP_SETTLE_S:.1f}")
+            report["warp"] = warp_until(
+                sc, streams, clock, [UTCondition("burn_start", burn_start_ut - WARP_SETTLE_S)], stop
+            )
+
+        last_log = 0.0
+        while clock.now() < burn_start_ut:
+            if stop.is_set():
+                report["cutoff_reason"] = "cancelled"
+                return report
+            now = clock.wait()
+            if time.monotonic() - last_log >= LOG_INTERVAL_S:
+                last_log = time.monotonic()
+                handle.log(
+                    f"[execute_node] T-{burn_start_ut - now:.1f}s pointing error {pointing_error():.1f} deg"
+                )
+
+        remaining = streams.attr(node, "remaining_delta_v")
+        burn_vector = streams.add(node.remaining_burn_vector, node.reference_frame)
+        thrust = streams.attr(vessel, "available_thrust")
+        mass = streams.attr(vessel, "mass")
+        stage = streams.attr(ctrl, "current_stage")
+
+        ignition_ut = clock.now()
+        report["ignition_ut"] = ignition_ut
+        report["ignition_error_s"] = ignition_ut - burn_start_ut
+        handle.log(f"[execute_node] ignition at UT {ignition_ut:.2f}")
+
+        min_remaining = math.inf
+        last_throttle: float | None = None
+        last_stage_ut = -math.inf
+        aim = (0.0, 1.0, 0.0)
+        reason = None
+        while True:
+            if stop.is_set():
+                reason = "cancelled"
+                break
+            dv = float(remaining())
+            if dv <= tolerance_m_s:
+                reason = "tolerance"
+                break
+            vec = burn_vector()
+            if vec[1] < 0.0:
+                # Remaining burn points backwards along the original burn direction.
+                reason = "overshoot"
+                break
+            if dv > min_remaining + max(0.5, 5.0 * tolerance_m_s):
+                reason = "diverging"
+                break
+            min_remaining = min(min_remaining, dv)
+
+            now = clock.now()
+            available = float(thrust())
+            if available <= FLAMEOUT_THRUST_N:
+                current = int(stage())
+                if current <= 0:
+                    reason = "out_of_thrust"
+                    break
+                if now - last_stage_ut >= STAGE_LOCKOUT_S:
+                    ctrl.activate_next_stage()
+                    last_stage_ut = now
+                    report["stages_activated"].append({"ut": now, "from_stage": current, "remaining_dv_m_s": dv})
+                    handle.log(f"[execute_node] flameout; staged from {current} with {dv:.1f} m/s remaining")
+                clock.wait()
+                continue
+
+            m = float(mass())
+            accel = available / m if m > 0 else None
+            thr = feathered_throttle(dv, accel, feather_s=FEATHER_S, min_throttle=MIN_THROTTLE)
+            if last_throttle is None or abs(thr - last_throttle) >= 0.01:
+                ctrl.throttle = thr
+                last_throttle = thr
+
+            if dv > STEER_FREEZE_DV_M_S and _angle_deg(vec, aim) > STEER_DEADBAND_DEG:
+                aim = _unit(vec)
+                ap.target_direction = aim
+
+            if time.monotonic() - last_log >= LOG_INTERVAL_S:
+                last_log = time.monotonic()
+                handle.log(
+                    f"[execute_node] remaining {dv:.2f} m/s throttle {thr:.2f} "
+                    f"pointing error {pointing_error():.1f} deg"
+                )
+            clock.wait()
+
+        ctrl.throttle = 0.0
+        cutoff_ut = clock.now()
+        residual = float(remaining())
+        report.update({
+            "cutoff_ut": cutoff_ut,
+            "burn_duration_s": cutoff_ut - ignition_ut,
+            "residual_dv_m_s": residual,
+            "residual_vector_m_s": list(burn_vector()),
+            "cutoff_reason": reason,
+        })
+        handle.log(
+            f"[execute_node] cutoff ({reason}) after {cutoff_ut - ignition_ut:.2f}s; residual {residual:.2f} m/s"
+        )
+        if remove_node and reason == "tolerance":
+            try:
+                node.remove()
+                report["node_removed"] = True
+            except Exception:
+                pass
+        return report
+    finally:
+        try:
+            ctrl.throttle = 0.0
+        except Exception:
+            pass
+        try:
+            vessel.auto_pilot.disengage()
+        except Exception:
+            pass
+        streams.close()
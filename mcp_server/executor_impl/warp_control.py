@@ -0,0 +1,302 @@
+"""Non-blocking time warp that drops out when any of a set of streamed conditions trips."""
+from __future__ import annotations
+
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from ..utils.krpc_utils.streams import FrameClock, StreamGroup
+
+RAILS_RATES = (1, 5, 10, 50, 100, 1000, 10000, 100000)  # stock rails warp factors 0..7
+PHYSICS_RATES = (1, 2, 3, 4)  # stock physics warp factors 0..3
+HORIZON_S = 2.0  # wall-clock seconds of warp allowed before the earliest predicted trip
+LOG_INTERVAL_S = 2.0
+
+
+class WarpCondition(ABC):
+    """A stop condition: `tripped(now)` ends the warp, `time_to_trip(now)` (UT seconds) caps the rate."""
+
+    name = "condition"
+
+    def time_to_trip(self, now: float) -> float | None:
+        return None
+
+    @abstractmethod
+    def tripped(self, now: float) -> bool:
+        ...
+
+    def detail(self) -> Dict[str, Any]:
+        return {}
+
+
+class UTCondition(WarpCondition):
+    def __init__(self, name: str, ut: float) -> None:
+        self.name = name
+        self.ut = float(ut)
+
+    def time_to_trip(self, now: float) -> float | None:
+        return self.ut - now
+
+    def tripped(self, now: float) -> bool:
+        return now >= self.ut
+
+    def detail(self) -> Dict[str, Any]:
+        return {"ut": self.ut}
+
+
+class BodyChangeCondition(WarpCondition):
+    """SOI change: predicted from orbit.time_to_soi_change, confirmed by the streamed orbit body."""
+
+    name = "soi_change"
+
+    def __init__(self, body_stream, predicted_ut: float | None) -> None:
+        self._body = body_stream
+        self._initial = body_stream()
+        self.predicted_ut = predicted_ut
+
+    def time_to_trip(self, now: float) -> float | None:
+        return None if self.predicted_ut is None else self.predicted_ut - now
+
+    def tripped(self, now: float) -> bool:
+        return self._body() != self._initial
+
+    def detail(self) -> Dict[str, Any]:
+        return {"predicted_ut": self.predicted_ut}
+
+
+class AltitudeBelowCondition(WarpCondition):
+    """Descending through an altitude (e.g. the atmosphere boundary), extrapolated from vertical speed."""
+
+    def __init__(self, name: str, altitude_stream, vertical_speed_stream, threshold_m: float) -> None:
+        self.name = name
+        self._alt = altitude_stream
+        self._vs = vertical_speed_stream
+        self.threshold_m = float(threshold_m)
+
+    def time_to_trip(self, now: float) -> float | None:
+        vs = float(self._vs())
+        if vs >= 0:
+            return None
+        # Half the straight-line estimate: the fall accelerates towards the body.
+        return 0.5 * (float(self._alt()) - self.threshold_m) / -vs
+
+    def tripped(self, now: float) -> bool:
+        return float(self._alt()) <= self.threshold_m
+
+    def detail(self) -> Dict[str, Any]:
+        return {"threshold_m": self.threshold_m}
+
+
+class ResourceFractionCondition(WarpCondition):
+    """A resource (ElectricCharge) dropping below a fraction of capacity, extrapolated from its drain rate."""
+
+    def __init__(self, name: str, amount_stream, capacity: float, min_fraction: float) -> None:
+        self.name = name
+        self._amount = amount_stream
+        self.threshold = float(capacity) * float(min_fraction)
+        self._last: Tuple[float, float] | None = None
+        self._rate: float | None = None
+
+    def time_to_trip(self, now: float) -> float | None:
+        amount = float(self._amount())
+        if self._last is not None and now > self._last[0]:
+            self._rate = (amount - self._last[1]) / (now - self._last[0])
+        self._last = (now, amount)
+        if self._rate is None or self._rate >= 0:
+            return None
+        return (amount - self.threshold) / -self._rate
+
+    def tripped(self, now: float) -> bool:
+        return float(self._amount()) <= self.threshold
+
+    def detail(self) -> Dict[str, Any]:
+        return {"threshold": self.threshold}
+
+
+def choose_warp(
+    time_to_trip_s: float | None,
+    max_rails_factor: int,
+    *,
+    max_rails_rate: float = RAILS_RATES[-1],
+    allow_physics: bool = False,
+    max_physics_rate: float = PHYSICS_RATES[-1],
+) -> Tuple[str, int]:
+    """
+    Highest (mode, factor) whose rate would not carry us past the next predicted trip within
+    HORIZON_S of wall clock. Rails is capped by the game's altitude-limited maximum factor; physics
+    warp is only used where rails is not allowed.
+    """
+    budget = math.inf if time_to_trip_s is None else max(0.0, time_to_trip_s) / HORIZON_S
+    factor = 0
+    for f in range(1, min(int(max_rails_factor), len(RAILS_RATES) - 1) + 1):
+        if RAILS_RATES[f] <= max_rails_rate and RAILS_RATES[f] <= budget:
+            factor = f
+    if factor > 0:
+        return "rails", factor
+    if allow_physics and int(max_rails_factor) == 0:
+        for f in range(len(PHYSICS_RATES) - 1, 0, -1):
+            if PHYSICS_RATES[f] <= max_physics_rate and PHYSICS_RATES[f] <= budget:
+                return "physics", f
+    return "none", 0
+
+
+def stop_warp(sc) -> None:
+    for attr in ("rails_warp_factor", "physics_warp_factor"):
+        try:
+            setattr(sc, attr, 0)
+        except Exception:
+            pass
+
+
+def warp_until(
+    sc,
+    streams: StreamGroup,
+    clock: FrameClock,
+    conditions: Sequence[WarpCondition],
+    stop,
+    *,
+    max_rails_rate: float = RAILS_RATES[-1],
+    allow_physics: bool = False,
+    max_physics_rate: float = PHYSICS_RATES[-1],
+    log: Callable[[str], None] | None = None,
+) -> Dict[str, Any]:
+    """
+    Warp without blocking until a condition trips (or `stop` is set), re-choosing the rate every
+    frame, and return {fired, ut, game_s, wall_s, max_rate}. Warp is always reset to 1x on exit.
+    """
+    max_rails = streams.attr(sc, "maximum_rails_warp_factor")
+    rails_factor = streams.attr(sc, "rails_warp_factor")
+    physics_factor = streams.attr(sc, "physics_warp_factor")
+    rate = streams.attr(sc, "warp_rate")
+    start_ut = clock.now()
+    start_wall = time.monotonic()
+    fired: str | None = None
+    peak = 1.0
+    last_log = 0.0
+    try:
+        while True:
+            if stop.is_set():
+                fired = "cancelled"
+                break
+            now = clock.now()
+            hit = next((c for c in conditions if c.tripped(now)), None)
+            if hit is not None:
+                fired = hit.name
+                break
+            estimates = [t for t in (c.time_to_trip(now) for c in conditions) if t is not None]
+            choice = choose_warp(
+                min(estimates) if estimates else None,
+                int(max_rails()),
+                max_rails_rate=max_rails_rate,
+                allow_physics=allow_physics,
+                max_physics_rate=max_physics_rate,
+            )
+            # Compare with the game's actual factors: KSP lowers warp on its own near altitude limits.
+            mode, factor = choice
+            want_rails = factor if mode == "rails" else 0
+            want_physics = factor if mode == "physics" else 0
+            if int(physics_factor()) != want_physics and want_physics == 0:
+                sc.physics_warp_factor = 0
+            if int(rails_factor()) != want_rails:
+                sc.rails_warp_factor = want_rails
+            if int(physics_factor()) != want_physics and want_physics > 0:
+                sc.physics_warp_factor = want_physics
+            peak = max(peak, float(rate()))
+            if log is not None and time.monotonic() - last_log >= LOG_INTERVAL_S:
+                last_log = time.monotonic()
+                nxt = min(estimates) if estimates else None
+                log(
+                    f"[warp] UT {now:.0f} rate {float(rate()):g}x "
+                    + (f"next trip in {nxt:.0f}s" if nxt is not None else "no predicted trip")
+                )
+            clock.wait()
+    finally:
+        stop_warp(sc)
+    end_ut = clock.now()
+    return {
+        "fired": fired,
+        "ut": end_ut,
+        "game_s": end_ut - start_ut,
+        "wall_s": time.monotonic() - start_wall,
+        "max_rate": peak,
+    }
+
+
+def fly_warp_until(
+    conn,
+    handle,
+    stop,
+    *,
+    ut: float | None = None,
+    duration_s: float | None = None,
+    node_lead_s: float | None = None,
+    stop_on_soi_change: bool = True,
+    stop_on_atmosphere: bool = True,
+    min_ec_fraction: float | None = None,
+    max_rails_rate: float = RAILS_RATES[-1],
+    allow_physics: bool = False,
+) -> Dict[str, Any]:
+    """Build the requested conditions from the current vessel state and warp until one fires."""
+    sc = conn.space_center
+    vessel = sc.active_vessel
+    if vessel is None:
+        raise RuntimeError("No active vessel")
+    streams = StreamGroup(conn)
+    try:
+        clock = FrameClock(streams, sc)
+        now = clock.now()
+        orbit = vessel.orbit
+        body = orbit.body
+        conditions: List[WarpCondition] = []
+        if ut is not None:
+            conditions.append(UTCondition("ut", ut))
+        if duration_s is not None:
+            conditions.append(UTCondition("duration", now + float(duration_s)))
+        if node_lead_s is not None:
+            nodes = list(vessel.control.nodes)
+            if nodes:
+                conditions.append(UTCondition("node_lead", float(nodes[0].ut) - float(node_lead_s)))
+            else:
+                handle.log("[warp] node_lead_s given but there is no maneuver node; ignoring")
+        if stop_on_soi_change:
+            t_soi = float(orbit.time_to_soi_change)
+            predicted = now + t_soi if math.isfinite(t_soi) and t_soi > 0 else None
+            conditions.append(BodyChangeCondition(streams.attr(orbit, "body"), predicted))
+        if stop_on_atmosphere and getattr(body, "has_atmosphere", False):
+            depth = float(body.atmosphere_depth)
+            flight = vessel.flight(body.reference_frame)
+            altitude = streams.attr(flight, "mean_altitude")
+            if float(altitude()) > depth:
+                conditions.append(
+                    AltitudeBelowCondition("atmosphere", altitude, streams.attr(flight, "vertical_speed"), depth)
+                )
+        if min_ec_fraction is not None:
+            capacity = float(vessel.resources.max("ElectricCharge"))
+            if capacity > 0:
+                amount = streams.add(vessel.resources.amount, "ElectricCharge")
+                conditions.append(ResourceFractionCondition("low_ec", amount, capacity, min_ec_fraction))
+            else:
+                handle.log("[warp] vessel has no ElectricCharge capacity; ignoring min_ec_fraction")
+        if not conditions:
+            raise ValueError("No warp conditions: pass ut, duration_s, node_lead_s or enable a stop condition")
+
+        handle.log("[warp] conditions: " + ", ".join(f"{c.name} {c.detail()}" for c in conditions))
+        result = warp_until(
+            sc,
+            streams,
+            clock,
+            conditions,
+            stop,
+            max_rails_rate=max_rails_rate,
+            allow_physics=allow_physics,
+            log=handle.log,
+        )
+        result["conditions"] = [{"name": c.name, **c.detail()} for c in conditions]
+        handle.log(
+            f"[warp] stopped by {result['fired']} at UT {result['ut']:.1f}: "
+            f"{result['game_s']:.0f}s game time in {result['wall_s']:.1f}s"
+        )
+        return result
+    finally:
+        streams.close()
@@ -10,17 +10,20 @@ from .executor_impl.core import (
 )
 
 # Import implementation modules so their resources are registered
+from .executor_impl import flight_jobs as _flight_jobs
 from .executor_impl import job_artifacts as _job_artifacts
 from .executor_impl import job_tools as _job_tools
 from .executor_impl import jobs as _jobs
 from .executor_impl import script_jobs as _script_jobs
 
 # Expose implementation modules under the historical mcp_server.executor_tools.*
+flight_jobs = _flight_jobs
 job_artifacts = _job_artifacts
 job_tools = _job_tools
 jobs = _jobs
 script_jobs = _script_jobs
 
+sys.modules[__name__ + ".flight_jobs"] = _flight_jobs
 sys.modules[__name__ + ".job_artifacts"] = _job_artifacts
 sys.modules[__name__ + ".job_tools"] = _job_tools
 sys.modules[__name__ + ".jobs"] = _jobs
@@ -142,6 +142,8 @@ def warp_to(address: str, ut: float, lead_time_s: float = 0.0, rpc_port: int = 5
 
     When to use:
       - Warp to a node or event time with optional lead time.
+      - For long warps that should stop early (SOI change, atmosphere entry, low EC, node lead),
+        prefer start_warp_until_job, which warps without blocking and reports the condition that fired.
 
     Args:
       ut: Target universal time to arrive at
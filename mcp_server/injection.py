@@ -172,6 +172,11 @@ class InjectionAwareToolManager(ToolManager):
             "start_part_tree_job",
             "start_stage_plan_job",
             "start_execute_script_job",
+            "start_execute_node_job",
+            "start_ascent_job",
+            "start_landing_job",
+            "start_docking_job",
+            "start_warp_until_job",
             "execute_script",
         }
 
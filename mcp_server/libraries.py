@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from .mcp_context import mcp
-from .library_impl import krpc_docs, ksp_wiki, snippets
+from .library_impl import krpc_docs, ksp_wiki, search_all as search_all_lib, snippets
 
 
 def _copy_doc(target, source):
@@ -19,27 +19,70 @@ def search_krpc_docs(query: str, limit: int = 10) -> str:
         query: Free-text query
         limit: Max results to return (default 10)
     Returns:
-        A newline-delimited list of formatted results with title and URL and a short snippet.
+        A newline-delimited list of section-level hits: page title › section, URL with the section
+        anchor, and a short snippet.
     """
     return krpc_docs.search_krpc_docs_impl(query=query, limit=limit)
 
 
 @mcp.tool()
-def get_krpc_doc(url: str, max_chars: int = 5000) -> str:
+def get_krpc_doc(url: str, max_chars: int = 5000, query: str | None = None, passages: int = 3, examples: int = 3) -> str:
     """
     Retrieve a kRPC doc page by URL and return its text content. Use with URLs from search_krpc_docs.
     When to use:
         - Pull the full text of a doc page to inspect details and examples.
+        - Pass `query` to get only the best-matching sections of a large page (e.g. SpaceCenter.Vessel).
     Args:
-        url: Exact page URL from the dataset
+        url: Exact page URL from the dataset; a `#anchor` from a search hit returns just that section
         max_chars: Truncate returned content to this many characters (default 5000)
+        query: Optional text; when set, return the top-scoring sections of the page instead of its start
+        passages: Number of sections to return with `query` (default 3)
+        examples: Max snippets from the example library that use this API (or this page's APIs) to list (default 3, 0 to skip)
     Returns:
-        Title, URL, and cleaned page text (truncated) with basic headings metadata.
+        Title, URL, and cleaned page text (truncated) with basic headings metadata; or the matching
+        sections, each headed by its label and anchor URL. Followed by example snippet ids when any
+        snippet uses the API.
     """
-    return krpc_docs.get_krpc_doc_impl(url=url, max_chars=max_chars)
+    return krpc_docs.get_krpc_doc_impl(url=url, max_chars=max_chars, query=query, passages=passages, examples=examples)
 
 
 
+@mcp.tool()
+def lookup_krpc_symbol(name: str, limit: int = 5) -> str:
+    """
+    Look up a kRPC Python API symbol by name and return its signature and description.
+    When to use:
+        - You know (roughly) the member you need, e.g. "Vessel.flight", "Orbit.time_to_apoapsis"
+          or "conn.space_center.active_vessel", and want its signature without fetching a page.
+    Args:
+        name: Symbol name; the service prefix and call arguments are optional and typos are tolerated
+        limit: Max alternatives to list for ambiguous or fuzzy matches (default 5)
+    Returns:
+        The best match (signature -> return type, kind, doc URL with anchor, summary, parameters),
+        followed by other candidates one per line.
+    """
+    return krpc_docs.lookup_krpc_symbol_impl(name=name, limit=limit)
+
+
+
+@mcp.tool()
+def search_all(query: str, sources: list[str] | None = None, k: int = 10) -> str:
+    """
+    Search the kRPC docs, the snippet library and the KSP wiki at once and return one fused list.
+    When to use:
+        - First look at a topic when it is unclear which source has the answer.
+
+    Args:
+        query: Free-text query
+        sources: Subset of "docs", "snippets", "wiki" (default: all)
+        k: Max fused results to return (default 10)
+    Returns:
+        Numbered lines "[source] title — url or snippet id" with a short snippet, then one status
+        line per source (result count and latency, or why it was skipped).
+    """
+    return search_all_lib.search_all_impl(query=query, sources=sources, k=k)
+
+
 @mcp.tool()
 def get_job_status(job_id: str) -> str:
     """
@@ -114,6 +157,23 @@ def get_ksp_wiki_page(title: str, max_chars: int = 5000) -> str:
 
 
 
+@mcp.tool()
+def get_ksp_wiki_pages(titles: list[str], max_chars: int = 5000) -> str:
+    """
+    Fetch several KSP Wiki pages (English) in one call.
+    When to use:
+        - Read a handful of related articles at once instead of calling get_ksp_wiki_page repeatedly.
+
+    Args:
+        titles: Page titles (duplicates are ignored; at most 20 are fetched)
+        max_chars: Truncate each page's text to this many characters (default 5000)
+    Returns:
+        One block per title in request order (same layout as get_ksp_wiki_page), separated by "---" lines.
+    """
+    return ksp_wiki.get_ksp_wiki_pages_impl(titles=titles, max_chars=max_chars)
+
+
+
 @mcp.tool()
 def get_ksp_wiki_section(title: str, heading: str, max_chars: int = 3000) -> str:
     """
@@ -152,43 +212,62 @@ def snippets_search(query: str, k: int = 10, mode: str = "keyword", and_logic: b
 
 
 @mcp.tool()
-def snippets_get(id: str, include_code: bool = False) -> str:
+def snippets_code_search(pattern: str, regex: bool = False, ignore_case: bool = False, k: int = 20, context: int = 2, max_matches: int = 5, category: str | None = None, exclude_restricted: bool = False) -> str:
     """
-    Search the snippet library.
+    Find snippets whose code contains a substring or regex (e.g. an API call like 'auto_pilot.target_pitch_and_heading').
 
     Args:
-      query: free-text query
-      k: number of results
-      mode: 'keyword' or 'hybrid'
-      and_logic: when true, use AND semantics for keyword token combination
+      pattern: literal text, or a Python regex when regex=True
+      regex: treat pattern as a regular expression
+      ignore_case: case-insensitive matching
+      k: max snippets returned
+      context: lines of context before/after each match
+      max_matches: match locations returned per snippet
       category: optional category filter
       exclude_restricted: exclude GPL/AGPL/LGPL when true
-      rerank: re-score Top-M with an LLM (when available) in hybrid mode
     Returns:
-      JSON: { items: [...], source: {...} }
+      JSON: { items: [{id, name, path, categories, total_matches, matches: [{line, col, text, before, after}]}], source: {...} }
+    """
+    return snippets.snippets_code_search_impl(pattern=pattern, regex=regex, ignore_case=ignore_case, k=k, context=context, max_matches=max_matches, category=category, exclude_restricted=exclude_restricted)
+
+
+@mcp.tool()
+def snippets_get(id: str, include_code: bool = False) -> str:
+    """
+    Get a snippet record by id.
+
+    Args:
+      id: snippet id from a search result
+      include_code: include the snippet's source code
+    Returns:
+      JSON: { ok, snippet?, apis? } where apis lists the kRPC API symbols the code uses, each
+      with its doc URL (precomputed).
     """
     return snippets.snippets_get_impl(id=id, include_code=include_code)
 
 
 @mcp.tool()
-def snippets_resolve(id: str | None = None, name: str | None = None, max_bytes: int = 25000, max_nodes: int = 25) -> str:
+def snippets_resolve(id: str | None = None, name: str | None = None, max_bytes: int = 25000, max_nodes: int = 25, tree_shake: bool = False, strip_docstrings: bool = False) -> str:
     """
     Resolve a snippet (by id or module.qualname) into a paste-ready bundle including dependencies.
 
+    Args:
+      tree_shake: keep only the functions, methods and constants reachable from the target
+      strip_docstrings: also remove docstrings and comments from the bundle
     Returns JSON: { ok, bundle_code?, include_ids?, unresolved?, truncated?, stats? }.
     """
-    return snippets.snippets_resolve_impl(id=id, name=name, max_bytes=max_bytes, max_nodes=max_nodes)
+    return snippets.snippets_resolve_impl(id=id, name=name, max_bytes=max_bytes, max_nodes=max_nodes, tree_shake=tree_shake, strip_docstrings=strip_docstrings)
 
 
 
 @mcp.tool()
-def snippets_search_and_resolve(query: str, k: int = 10, mode: str = "hybrid", rerank: bool = False, and_logic: bool = False, category: str | None = None, exclude_restricted: bool = False, max_bytes: int = 25000, max_nodes: int = 25) -> str:
+def snippets_search_and_resolve(query: str, k: int = 10, mode: str = "hybrid", rerank: bool = False, and_logic: bool = False, category: str | None = None, exclude_restricted: bool = False, max_bytes: int = 25000, max_nodes: int = 25, tree_shake: bool = False, strip_docstrings: bool = False) -> str:
     """
     Search and resolve top-1 result into a code bundle.
 
     Returns JSON with top result metadata and bundle fields.
     """
-    return snippets.snippets_search_and_resolve_impl(query=query, k=k, mode=mode, rerank=rerank, and_logic=and_logic, category=category, exclude_restricted=exclude_restricted, max_bytes=max_bytes, max_nodes=max_nodes)
+    return snippets.snippets_search_and_resolve_impl(query=query, k=k, mode=mode, rerank=rerank, and_logic=and_logic, category=category, exclude_restricted=exclude_restricted, max_bytes=max_bytes, max_nodes=max_nodes, tree_shake=tree_shake, strip_docstrings=strip_docstrings)
 
 
 @mcp.resource("resource://snippets/usage")
@@ -0,0 +1,68 @@
+"""
+kRPC docs data shared by the docs and snippet tools: the search index, the API symbol table and
+the links between snippets and the API symbols their code uses.
+
+The index and symbols are loaded lazily and kept for the life of the process. The links are keyed
+on the snippet corpus' FileStamp, the same one the snippet store reloads on, so a corpus rebuild
+is picked up by both. The saved links file is used without loading the docs index as long as both
+datasets still match the digests it was built from, so snippets_get stays cheap; a stale or
+missing file is rebuilt from the symbol table.
+"""
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+from krpc_index import ApiLinks, KRPCSearchIndex, SymbolTable
+from krpc_index.index import source_digest, symbols_path
+from krpc_index.links import links_path
+
+from .snippets_runtime import FileStamp
+
+_DATA = Path(__file__).resolve().parents[2] / "data"
+DOCS_PATH = _DATA / "krpc_python_docs.jsonl"
+INDEX_PATH = DOCS_PATH.with_suffix(".bin")
+SNIPPETS_DIR = _DATA / "krpc-snippets"
+
+_INDEX: KRPCSearchIndex | None = None
+_SYMBOLS: SymbolTable | None = None
+_LINKS: Tuple[Optional[FileStamp], ApiLinks | None] = (None, None)
+_links_lock = threading.Lock()
+
+
+def snippets_path() -> Path:
+    enriched = SNIPPETS_DIR / "snippets_enriched.jsonl"
+    return enriched if enriched.exists() else SNIPPETS_DIR / "snippets_extracted.jsonl"
+
+
+def get_index() -> KRPCSearchIndex:
+    global _INDEX
+    if _INDEX is None:
+        # Memory-maps data/krpc_python_docs.bin when it matches the dataset; builds in memory otherwise.
+        _INDEX = KRPCSearchIndex.open(DOCS_PATH, INDEX_PATH)
+    return _INDEX
+
+
+def get_symbols() -> SymbolTable:
+    global _SYMBOLS
+    if _SYMBOLS is None:
+        _SYMBOLS = SymbolTable.open(get_index(), symbols_path(INDEX_PATH))
+    return _SYMBOLS
+
+
+def get_links() -> ApiLinks:
+    global _LINKS
+    corpus = snippets_path()
+    stamp = FileStamp.of(corpus)
+    cached_stamp, links = _LINKS
+    if links is not None and cached_stamp == stamp:
+        return links
+    with _links_lock:
+        if _LINKS[1] is None or _LINKS[0] != stamp:
+            docs_source = source_digest(DOCS_PATH) if DOCS_PATH.exists() else None
+            links = ApiLinks.load_fresh(links_path(INDEX_PATH), docs_source, corpus) or ApiLinks.open(
+                get_symbols(), corpus, links_path(INDEX_PATH)
+            )
+            _LINKS = (stamp, links)
+        return _LINKS[1]
@@ -1,24 +1,44 @@
 from __future__ import annotations
 
 import json
-from pathlib import Path
 from typing import List
 
 from ..executor_tools.jobs import JobStatus, job_registry
-from krpc_index import KRPCSearchIndex, load_dataset
+from .api_links import get_index, get_links, get_symbols
+from krpc_index.symbols import format_symbol
 
 
-_INDEX: KRPCSearchIndex | None = None
+def _examples_block(url: str, limit: int) -> str:
+    found = get_links().examples_for(url, limit) if limit > 0 else []
+    if not found:
+        return ""
+    lines = [f"- {name or '(module)'} ({path}) — id {sid}" for sid, name, path in found]
+    return "\n\nExamples using this API (fetch with snippets_get):\n" + "\n".join(lines)
 
 
-def _get_index() -> KRPCSearchIndex:
-    global _INDEX
-    if _INDEX is None:
-        base = Path(__file__).resolve().parents[2]
-        data_path = base / "data" / "krpc_python_docs.jsonl"
-        docs = load_dataset(data_path)
-        _INDEX = KRPCSearchIndex(docs)
-    return _INDEX
+def lookup_krpc_symbol_impl(name: str, limit: int = 5) -> str:
+    """
+    Look up a kRPC Python API symbol by name and return its signature and description.
+    When to use:
+        - You know (roughly) the member you need, e.g. "Vessel.flight", "Orbit.time_to_apoapsis"
+          or "conn.space_center.active_vessel", and want its signature without fetching a page.
+    Args:
+        name: Symbol name; the service prefix and call arguments are optional and typos are tolerated
+        limit: Max alternatives to list for ambiguous or fuzzy matches (default 5)
+    Returns:
+        The best match (signature -> return type, kind, doc URL with anchor, summary, parameters),
+        followed by other candidates one per line.
+    """
+    exact, symbols = get_symbols().lookup(name, limit=max(1, min(limit, 20)))
+    if not symbols:
+        return f"No kRPC symbol matches {name!r}. Try search_krpc_docs."
+    out = format_symbol(symbols[0])
+    if not exact:
+        out = f"No exact match for {name!r}; closest:\n{out}"
+    others = symbols[1:max(1, min(limit, 20))]
+    if others:
+        out += "\n\nAlso: " + ", ".join(s.name for s in others)
+    return out
 
 
 def search_krpc_docs_impl(query: str, limit: int = 10) -> str:
@@ -30,39 +50,66 @@ def search_krpc_docs_impl(query: str, limit: int = 10) -> str:
         query: Free-text query
         limit: Max results to return (default 10)
     Returns:
-        A newline-delimited list of formatted results with title and URL and a short snippet.
+        A newline-delimited list of section-level hits: page title › section, URL with the section
+        anchor, and a short snippet.
     """
-    idx = _get_index()
-    results = idx.search(query, top_k=max(1, min(limit, 25)))
+    idx = get_index()
+    results = idx.search_chunks(query, top_k=max(1, min(limit, 25)))
     if not results:
         return "No results found."
     lines: List[str] = []
-    for doc, score, snippet in results:
+    for doc, chunk, score, snippet in results:
         title = doc.title or "(untitled)"
-        lines.append(f"- {title} — {doc.url}\n  {snippet}")
+        if chunk.label:
+            title = f"{title} › {chunk.label}"
+        lines.append(f"- {title} — {idx.chunk_url(chunk)}\n  {snippet}")
     return "\n".join(lines)
 
 
-def get_krpc_doc_impl(url: str, max_chars: int = 5000) -> str:
+def _clip(text: str, max_chars: int) -> str:
+    if len(text) > max_chars:
+        return text[: max_chars - 1].rstrip() + "…"
+    return text
+
+
+def get_krpc_doc_impl(url: str, max_chars: int = 5000, query: str | None = None, passages: int = 3, examples: int = 3) -> str:
     """
     Retrieve a kRPC doc page by URL and return its text content. Use with URLs from search_krpc_docs.
     When to use:
         - Pull the full text of a doc page to inspect details and examples.
+        - Pass `query` to get only the best-matching sections of a large page (e.g. SpaceCenter.Vessel).
     Args:
-        url: Exact page URL from the dataset
+        url: Exact page URL from the dataset; a `#anchor` from a search hit returns just that section
         max_chars: Truncate returned content to this many characters (default 5000)
+        query: Optional text; when set, return the top-scoring sections of the page instead of its start
+        passages: Number of sections to return with `query` (default 3)
+        examples: Max snippets from the example library that use this API (or this page's APIs) to list (default 3, 0 to skip)
     Returns:
-        Title, URL, and cleaned page text (truncated) with basic headings metadata.
+        Title, URL, and cleaned page text (truncated) with basic headings metadata; or the matching
+        sections, each headed by its label and anchor URL. Followed by example snippet ids when any
+        snippet uses the API.
     """
-    idx = _get_index()
+    idx = get_index()
     doc = idx.get(url)
     if not doc:
         return "Not found. Ensure the URL matches a search result."
+    anchor = url.split("#", 1)[1] if "#" in url else ""
+    if query and query.strip():
+        hits = idx.search_chunks(query, top_k=max(1, min(passages, 10)), url=url)
+        if not hits:
+            labels = ", ".join(c.label for c in idx.page_chunks(url)[:15] if c.label)
+            return f"{doc.title}\n{doc.url}\n\nNo sections match {query!r}. Sections include: {labels}"
+        blocks = [f"## {c.label or doc.title} — {idx.chunk_url(c)}\n{idx.passage_text(c)}" for _, c, _, _ in hits]
+        return _clip(f"{doc.title}\n{doc.url}\n\n" + "\n\n".join(blocks), max_chars) + _examples_block(doc.url, examples)
+    if anchor:
+        section = [c for c in idx.page_chunks(url) if c.anchor == anchor]
+        if section:
+            body = "\n\n".join(idx.passage_text(c) for c in section)
+            out = _clip(f"{doc.title} › {section[0].label}\n{idx.chunk_url(section[0])}\n\n{body}", max_chars)
+            return out + _examples_block(idx.chunk_url(section[0]), examples)
     heads = ", ".join(h for h in doc.headings[:10])
-    body = (doc.content_text or "").strip()
-    if len(body) > max_chars:
-        body = body[: max_chars - 1].rstrip() + "…"
-    return f"{doc.title}\n{doc.url}\n\nHeadings: {heads}\n\n{body}"
+    body = _clip((doc.content_text or "").strip(), max_chars)
+    return f"{doc.title}\n{doc.url}\n\nHeadings: {heads}\n\n{body}" + _examples_block(doc.url, examples)
 
 
 def get_job_status_impl(job_id: str) -> str:
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
-from typing import List
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
 
-from .ksp_wiki_client import KspWikiClient
+import requests
 
+from .ksp_wiki_client import KspWikiClient, WikiSearchResult
+from .ksp_wiki_mirror import DEFAULT_PATH, WikiMirror
+
+T = TypeVar("T")
 
 _client: KspWikiClient | None = None
+# (path, mtime_ns, size) of the loaded mirror, so a re-ingest is picked up without a restart.
+_mirror: Tuple[Optional[Tuple[str, int, int]], Optional[WikiMirror]] = (None, None)
+_mirror_lock = threading.Lock()
 
 
 def _get_client() -> KspWikiClient:
@@ -15,6 +26,53 @@ def _get_client() -> KspWikiClient:
     return _client
 
 
+def _mirror_path() -> Path:
+    return Path(os.environ.get("KSP_WIKI_MIRROR") or DEFAULT_PATH)
+
+
+def _get_mirror() -> Optional[WikiMirror]:
+    """The offline mirror when one has been ingested (see ksp_wiki_mirror.py), else None."""
+    global _mirror
+    path = _mirror_path()
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    stamp = (str(path), st.st_mtime_ns, st.st_size)
+    with _mirror_lock:
+        if _mirror[0] != stamp:
+            # The old mirror is not closed: calls already holding it may still have queries to run.
+            # Its read-only connection is closed when the last of them drops it.
+            try:
+                _mirror = (stamp, WikiMirror(path))
+            except Exception:
+                _mirror = (stamp, None)
+        return _mirror[1]
+
+
+def _live_allowed() -> bool:
+    return os.environ.get("KSP_WIKI_OFFLINE", "").strip().lower() not in ("1", "true", "yes")
+
+
+def _lookup(local: Callable[[WikiMirror], T], live: Callable[[KspWikiClient], T], empty: T) -> T:
+    """Serve from the mirror; fall back to the live API when it has no answer (unless KSP_WIKI_OFFLINE)."""
+    mirror = _get_mirror()
+    if mirror is not None:
+        try:
+            result = local(mirror)
+        except sqlite3.Error:
+            result = empty  # e.g. the file was replaced mid-query by a re-ingest
+        if result or not _live_allowed():
+            return result
+        try:
+            return live(_get_client())
+        except requests.RequestException:
+            return result
+    if not _live_allowed():
+        return empty
+    return live(_get_client())
+
+
 def search_ksp_wiki_impl(query: str, limit: int = 10) -> str:
     """
     Search the KSP Wiki (English) and return the top results.
@@ -27,8 +85,7 @@ def search_ksp_wiki_impl(query: str, limit: int = 10) -> str:
     Returns:
         Newline-delimited items: "- Title — URL" with a short snippet below.
     """
-    client = _get_client()
-    items = client.search(query, limit=limit)
+    items: List[WikiSearchResult] = _lookup(lambda m: m.search(query, limit=limit), lambda c: c.search(query, limit=limit), [])
     if not items:
         return "No results found."
     lines: List[str] = []
@@ -52,16 +109,58 @@ def get_ksp_wiki_page_impl(title: str, max_chars: int = 5000) -> str:
     Returns:
         Title, canonical URL, and plain text (truncated).
     """
-    client = _get_client()
-    body = client.get_page(title)
+    body = _lookup(lambda m: m.get_page(title), lambda c: c.get_page(title), None)
     if not body:
         return "Page not found."
+    return _format_page(title, body, max_chars)
+
+
+_MAX_PAGES = 20
+
+
+def _format_page(title: str, body: str, max_chars: int) -> str:
     if len(body) > max_chars:
         body = body[: max_chars - 1].rstrip() + "…"
     url = f"https://wiki.kerbalspaceprogram.com/wiki/{title.replace(' ', '_')}"
     return f"{title}\n{url}\n\n{body}"
 
 
+def get_ksp_wiki_pages_impl(titles: List[str], max_chars: int = 5000) -> str:
+    """
+    Fetch several KSP Wiki pages (English) in one call.
+    When to use:
+        - Read a handful of related articles at once instead of calling get_ksp_wiki_page repeatedly.
+
+    Args:
+        titles: Page titles (duplicates are ignored; at most 20 are fetched)
+        max_chars: Truncate each page's text to this many characters (default 5000)
+    Returns:
+        One block per title in request order (same layout as get_ksp_wiki_page), separated by "---" lines.
+    """
+    wanted = list(dict.fromkeys(str(t).strip() for t in titles or [] if str(t).strip()))
+    if not wanted:
+        return "No titles given."
+    dropped = len(wanted) - _MAX_PAGES
+    wanted = wanted[:_MAX_PAGES]
+
+    bodies: Dict[str, Optional[str]] = {t: None for t in wanted}
+    mirror = _get_mirror()
+    if mirror is not None:
+        for t in wanted:
+            bodies[t] = mirror.get_page(t)
+    missing = [t for t in wanted if not bodies[t]]
+    if missing and _live_allowed():
+        try:
+            bodies.update(_get_client().get_pages(missing))
+        except requests.RequestException:
+            pass
+
+    blocks = [_format_page(t, bodies[t], max_chars) if bodies[t] else f"{t}\n\nPage not found." for t in wanted]
+    if dropped > 0:
+        blocks.append(f"({dropped} more title(s) skipped; at most {_MAX_PAGES} per call.)")
+    return "\n\n---\n\n".join(blocks)
+
+
 def get_ksp_wiki_section_impl(title: str, heading: str, max_chars: int = 3000) -> str:
     """
     Fetch a specific section from a KSP Wiki page (English).
@@ -75,11 +174,10 @@ def get_ksp_wiki_section_impl(title: str, heading: str, max_chars: int = 3000) -
     Returns:
         Title + section heading + canonical URL and the section text, or a not-found message.
     """
-    client = _get_client()
-    text = client.get_section(title, heading)
+    text = _lookup(lambda m: m.get_section(title, heading), lambda c: c.get_section(title, heading), None)
     if not text:
         # Provide available sections hint
-        secs = client.list_sections(title)
+        secs = _lookup(lambda m: m.list_sections(title), lambda c: c.list_sections(title), [])
         if not secs:
             return "Section not found."
         names = ", ".join(s for _, s in secs[:10])
@@ -2,12 +2,16 @@ from __future__ import annotations
 
 import html
 import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import difflib
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 try:  # optional runtime cache
     import requests_cache  # type: ignore
 except Exception:  # pragma: no cover
@@ -59,8 +63,114 @@ def _is_english_title(title: str) -> bool:
     return True
 
 
+def choose_section(sections: List[Tuple[str, str]], heading: str) -> Optional[str]:
+    """Pick a section index for `heading` from (index, line) pairs.
+
+    Numeric headings select by index; otherwise case-insensitive exact match, then a
+    contains-match either way, then the closest fuzzy match.
+    """
+    if not sections:
+        return None
+    h_norm = heading.strip().lower()
+
+    # Numeric index support
+    if h_norm.isdigit():
+        for idx, _line in sections:
+            if idx == h_norm:
+                return idx
+
+    # Exact match
+    for idx, line in sections:
+        if line.lower().strip() == h_norm:
+            return idx
+    # Contains (both ways)
+    for idx, line in sections:
+        ln = line.lower().strip()
+        if h_norm in ln or ln in h_norm:
+            return idx
+    # Fuzzy best match
+    labels = [line for _idx, line in sections]
+    best = difflib.get_close_matches(heading, labels, n=1, cutoff=0.6)
+    if best:
+        for idx, line in sections:
+            if line == best[0]:
+                return idx
+    return None
+
+
+class RateLimiter:
+    """Token bucket shared by every thread that talks to the wiki.
+
+    `rate` tokens per second refill up to `burst`; `acquire` takes one token and blocks
+    (outside the lock) until it is due. A rate of 0 disables limiting.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._stamp = clock()
+        self.acquired = 0
+        self.waited = 0.0
+
+    def acquire(self) -> float:
+        """Take a token, sleeping if the bucket is empty; returns the time slept."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            # Go into debt for the token: later callers queue behind this one.
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.acquired += 1
+            self.waited += wait
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+_limiters: Dict[float, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def shared_limiter(throttle: float) -> RateLimiter:
+    """Process-wide limiter allowing one request per `throttle` seconds (small bursts allowed)."""
+    with _limiters_lock:
+        limiter = _limiters.get(throttle)
+        if limiter is None:
+            limiter = _limiters[throttle] = RateLimiter(1.0 / throttle if throttle > 0 else 0.0, burst=2)
+        return limiter
+
+
+class _ThrottledAdapter(HTTPAdapter):
+    """Transport adapter that charges the rate limiter for each request that reaches the network.
+
+    requests_cache answers cache hits before the adapter is called, so hits are free.
+    """
+
+    def __init__(self, limiter: RateLimiter, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        self.limiter.acquire()
+        return super().send(request, **kwargs)
+
+
 class KspWikiClient:
-    def __init__(self, throttle: float = 0.25, timeout: int = 15):
+    def __init__(self, throttle: float = 0.25, timeout: int = 15, limiter: Optional[RateLimiter] = None, max_cached_pages: int = 128):
         if requests_cache is not None:
             # Cache GET responses for 24h to reduce network load
             self.session = requests_cache.CachedSession(
@@ -76,6 +186,39 @@ class KspWikiClient:
         })
         self.throttle = throttle
         self.timeout = timeout
+        self.limiter = limiter or shared_limiter(throttle)
+        adapter = _ThrottledAdapter(self.limiter)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Parsed `action=parse` results per page, so a section lookup and its not-found hint
+        # share one response: title -> sections, (title, index) -> section text.
+        self.max_cached_pages = max_cached_pages
+        self._parse_lock = threading.Lock()
+        self._sections: "OrderedDict[str, List[Tuple[str, str]]]" = OrderedDict()
+        self._section_text: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._page_text: "OrderedDict[str, str]" = OrderedDict()
+
+    def _remember(self, cache: OrderedDict, key, value) -> None:
+        with self._parse_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.max_cached_pages:
+                cache.popitem(last=False)
+
+    def _remember_many(self, cache: OrderedDict, items: Dict) -> None:
+        with self._parse_lock:
+            for key, value in items.items():
+                cache[key] = value
+                cache.move_to_end(key)
+            while len(cache) > self.max_cached_pages:
+                cache.popitem(last=False)
+
+    def _recall(self, cache: OrderedDict, key):
+        with self._parse_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
 
     def search(self, query: str, limit: int = 10) -> List[WikiSearchResult]:
         params = {
@@ -99,10 +242,12 @@ class KspWikiClient:
                 results.append(WikiSearchResult(title=title, url=url, snippet=snippet))
             if len(results) >= limit:
                 break
-        time.sleep(self.throttle)
         return results
 
     def get_page(self, title: str) -> Optional[str]:
+        cached = self._recall(self._page_text, title)
+        if cached is not None:
+            return cached
         # Try action=query extracts first
         params = {
             "action": "query",
@@ -122,22 +267,97 @@ class KspWikiClient:
             for p in pages.values():
                 extract = p.get("extract") if isinstance(p, dict) else None
                 if extract:
-                    time.sleep(self.throttle)
                     return str(extract)
 
         # Fallback: REST plain endpoint
         rest_url = f"{REST_PLAIN}/{_title_to_path(title)}"
         r2 = self.session.get(rest_url, timeout=self.timeout)
         if r2.status_code == 200:
-            time.sleep(self.throttle)
             return r2.text
         return None
 
+    def _fetch_extracts(self, titles: List[str]) -> Dict[str, str]:
+        """Plain-text extracts for up to 20 titles in one `action=query`, keyed by requested title.
+
+        Follows `continue` (whole-page extracts may be paged out across responses) and maps
+        normalised and redirected titles back to the titles that were asked for.
+        """
+        params = {
+            "action": "query",
+            "prop": "extracts",
+            "explaintext": 1,
+            "exsectionformat": "plain",
+            "exlimit": "max",
+            "redirects": 1,
+            "titles": "|".join(titles),
+            "format": "json",
+            "formatversion": 2,
+        }
+        by_final: Dict[str, str] = {}
+        alias: Dict[str, str] = {t: t for t in titles}
+        cont: Dict[str, str] = {}
+        for _ in range(len(titles) + 1):
+            r = self.session.get(API, params={**params, **cont}, timeout=self.timeout)
+            r.raise_for_status()
+            data = r.json() or {}
+            query = data.get("query", {}) or {}
+            for step in ("normalized", "redirects"):
+                hops = {h.get("from"): h.get("to") for h in query.get(step, []) or [] if isinstance(h, dict)}
+                alias = {t: hops.get(cur, cur) for t, cur in alias.items()}
+            pages = query.get("pages", []) or []
+            if isinstance(pages, dict):  # formatversion=1 shape
+                pages = list(pages.values())
+            for p in pages:
+                if isinstance(p, dict) and p.get("extract"):
+                    by_final[str(p.get("title", ""))] = str(p["extract"])
+            cont = {k: str(v) for k, v in (data.get("continue") or {}).items()}
+            if not cont:
+                break
+        return {t: by_final[final] for t, final in alias.items() if final in by_final}
+
+    def _fetch_plain(self, title: str) -> Optional[str]:
+        r = self.session.get(f"{REST_PLAIN}/{_title_to_path(title)}", timeout=self.timeout)
+        return r.text if r.status_code == 200 else None
+
+    def get_pages(self, titles: Iterable[str], *, batch_size: int = 20, max_workers: int = 4) -> Dict[str, Optional[str]]:
+        """Plain text for several pages, keyed by title (None when a page cannot be found).
+
+        Titles are fetched `batch_size` at a time with multi-title `action=query` extracts; pages
+        without an extract fall back to the REST plain endpoint on up to `max_workers` threads
+        (the shared rate limiter still paces them). Results are added to the page cache in one pass.
+        """
+        wanted = list(dict.fromkeys(t for t in titles if t))
+        out: Dict[str, Optional[str]] = {}
+        missing: List[str] = []
+        for t in wanted:
+            cached = self._recall(self._page_text, t)
+            if cached is not None:
+                out[t] = cached
+            else:
+                missing.append(t)
+        fetched: Dict[str, str] = {}
+        for i in range(0, len(missing), max(1, batch_size)):
+            fetched.update(self._fetch_extracts(missing[i:i + max(1, batch_size)]))
+        rest = [t for t in missing if t not in fetched]
+        if rest:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rest))), thread_name_prefix="ksp-wiki") as pool:
+                for t, text in zip(rest, pool.map(self._fetch_plain, rest)):
+                    if text:
+                        fetched[t] = text
+        self._remember_many(self._page_text, fetched)
+        for t in missing:
+            out[t] = fetched.get(t)
+        return {t: out[t] for t in wanted}
+
     def list_sections(self, title: str) -> list[tuple[str, str]]:
         """Return a list of (index, line) section descriptors for a page.
 
         Uses action=parse with prop=sections. Returns an empty list if unavailable.
+        Results are kept per page, so repeated lookups do not hit the API again.
         """
+        cached = self._recall(self._sections, title)
+        if cached is not None:
+            return list(cached)
         params = {
             "action": "parse",
             "page": title,
@@ -157,8 +377,8 @@ class KspWikiClient:
             line = str(s.get("line", "")).strip()
             if idx and line:
                 out.append((idx, line))
-        time.sleep(self.throttle)
-        return out
+        self._remember(self._sections, title, out)
+        return list(out)
 
     def get_section(self, title: str, heading: str) -> Optional[str]:
         """Fetch a specific section by heading name.
@@ -166,45 +386,12 @@ class KspWikiClient:
         Matches case-insensitive; prefers exact match, otherwise first contains-match.
         Returns plain text or None if not found.
         """
-        sections = self.list_sections(title)
-        if not sections:
-            return None
-        h_norm = heading.strip().lower()
-
-        # Numeric index support
-        if h_norm.isdigit():
-            for idx, _line in sections:
-                if idx == h_norm:
-                    chosen_idx = idx
-                    break
-
-        # Exact match
-        chosen_idx: Optional[str] = None
-        if chosen_idx is None:
-            for idx, line in sections:
-                ln = line.lower().strip()
-                if ln == h_norm:
-                    chosen_idx = idx
-                    break
-        # Contains (both ways)
-        if chosen_idx is None:
-            for idx, line in sections:
-                ln = line.lower().strip()
-                if h_norm in ln or ln in h_norm:
-                    chosen_idx = idx
-                    break
-        # Fuzzy best match
-        if chosen_idx is None:
-            labels = [line for _idx, line in sections]
-            best = difflib.get_close_matches(heading, labels, n=1, cutoff=0.6)
-            if best:
-                best_label = best[0]
-                for idx, line in sections:
-                    if line == best_label:
-                        chosen_idx = idx
-                        break
+        chosen_idx = choose_section(self.list_sections(title), heading)
         if chosen_idx is None:
             return None
+        cached = self._recall(self._section_text, (title, chosen_idx))
+        if cached is not None:
+            return cached
 
         params = {
             "action": "parse",
@@ -222,5 +409,6 @@ class KspWikiClient:
         html_text = (data.get("parse", {}).get("text", "") or "")
         if not isinstance(html_text, str):
             return None
-        time.sleep(self.throttle)
-        return _strip_html(html_text)
+        text = _strip_html(html_text)
+        self._remember(self._section_text, (title, chosen_idx), text)
+        return text
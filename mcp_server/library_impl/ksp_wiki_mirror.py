@@ -0,0 +1,474 @@
+"""
+Offline mirror of the KSP Wiki: a compressed page store with a section-level inverted index.
+
+`python -m mcp_server.library_impl.ksp_wiki_mirror ingest <dump>` reads a MediaWiki export
+(Special:Export XML, an API `query` JSON response, a JSON list or JSONL of {title, text}),
+keeps English main-namespace pages, converts wikitext to plain text, splits each page into
+sections and writes one SQLite file:
+
+- pages / redirects: titles (plus a case-folded lookup key) and redirect targets;
+- sections: page, MediaWiki section index (0 = lead), level, heading and the zlib-compressed
+  section text;
+- postings: term -> packed (section id, term frequency) pairs, for BM25 over sections.
+
+The wiki tools read it through `WikiMirror`, which answers search / page / section requests
+with a few indexed lookups and decompresses only the sections it returns.
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from .ksp_wiki_client import BASE, WikiSearchResult, _is_english_title, _title_to_path, choose_section
+
+SCHEMA_VERSION = "1"
+DEFAULT_PATH = Path(__file__).resolve().parents[2] / "data" / "ksp_wiki" / "mirror.sqlite"
+
+_SCHEMA = """
+create table meta (key text primary key, value text not null);
+create table pages (id integer primary key, title text not null unique, lookup text not null);
+create index pages_lookup on pages (lookup);
+create table redirects (title text primary key, lookup text not null, target text not null);
+create index redirects_lookup on redirects (lookup);
+create table sections (
+    id integer primary key,
+    page_id integer not null,
+    idx integer not null,
+    level integer not null,
+    heading text not null,
+    length integer not null,
+    body blob not null
+);
+create index sections_page on sections (page_id, idx);
+create table postings (term text primary key, data blob not null);
+"""
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are as at be by for from in is it of on or that the this to with".split())
+_HEADING_RE = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$")
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def normalize_title(title: str) -> str:
+    """MediaWiki canonical form: underscores as spaces, single spaces, first letter upper-case."""
+    t = " ".join((title or "").replace("_", " ").split())
+    return t[:1].upper() + t[1:]
+
+
+def _lookup_key(title: str) -> str:
+    return normalize_title(title).casefold()
+
+
+# ---------- wikitext -> plain text ----------
+
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+_REF_RE = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.S | re.I)
+_TEMPLATE_RE = re.compile(r"\{\{[^{}]*\}\}")
+_FILE_LINK_RE = re.compile(r"\[\[(?:File|Image|Media|Category|[a-z]{2,3}(?:-[a-z]{2})?):[^\[\]]*\]\]", re.I)
+_LINK_RE = re.compile(r"\[\[([^\[\]|]*)\|?([^\[\]]*)\]\](\w*)")
+_EXT_LINK_RE = re.compile(r"\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]")
+_QUOTES_RE = re.compile(r"'{2,5}")
+_TAG_RE = re.compile(r"<[^>]+>")
+_MAGIC_RE = re.compile(r"__[A-Z]+__")
+
+
+def _strip_nested(pattern: re.Pattern, text: str) -> str:
+    # Innermost-first until nothing matches, so nested templates/links disappear completely.
+    while True:
+        text, n = pattern.subn("", text)
+        if not n:
+            return text
+
+
+def _table_to_text(lines: List[str]) -> List[str]:
+    out: List[str] = []
+    row: List[str] = []
+    depth = 0
+    for line in lines:
+        s = line.strip()
+        if s.startswith("{|"):
+            depth += 1
+            continue
+        if depth == 0:
+            out.append(line)
+            continue
+        if s.startswith("|}"):
+            depth -= 1
+            if row:
+                out.append(" | ".join(row))
+                row = []
+            continue
+        if s.startswith("|-") or s.startswith("|+"):
+            if row:
+                out.append(" | ".join(row))
+                row = []
+            continue
+        if s[:1] in ("|", "!"):
+            for cell in re.split(r"\|\||!!", s[1:]):
+                # "style=... | content" -> content
+                cell = cell.split("|", 1)[1] if "|" in cell and "=" in cell.split("|", 1)[0] else cell
+                if cell.strip():
+                    row.append(cell.strip())
+        elif s:
+            row.append(s)
+    if row:
+        out.append(" | ".join(row))
+    return out
+
+
+def wikitext_to_text(src: str) -> str:
+    text = _COMMENT_RE.sub("", src or "")
+    text = _REF_RE.sub("", text)
+    text = _strip_nested(_TEMPLATE_RE, text)
+    text = "\n".join(_table_to_text(text.split("\n")))
+    text = _strip_nested(_FILE_LINK_RE, text)
+    text = _LINK_RE.sub(lambda m: (m.group(2) or m.group(1).split("#")[0] or m.group(1)) + m.group(3), text)
+    text = _EXT_LINK_RE.sub(lambda m: m.group(1), text)
+    text = _QUOTES_RE.sub("", text)
+    text = _MAGIC_RE.sub("", text)
+    text = html.unescape(_TAG_RE.sub("", text)).replace("\xa0", " ")
+    lines = []
+    for line in text.split("\n"):
+        line = line.rstrip()
+        m = re.match(r"^([*#:;]+)\s*", line)
+        if m:
+            line = "- " + line[m.end():]
+        lines.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+@dataclass
+class Section:
+    idx: int
+    level: int
+    heading: str
+    text: str
+
+
+def split_sections(wikitext: str, title: str) -> List[Section]:
+    """Section 0 is the lead (headed by the page title); headed sections are numbered from 1."""
+    sections = [Section(0, 1, title, "")]
+    buf: List[str] = []
+    for line in (wikitext or "").split("\n"):
+        m = _HEADING_RE.match(line.strip())
+        if m:
+            sections[-1].text = wikitext_to_text("\n".join(buf))
+            buf = []
+            sections.append(Section(len(sections), len(m.group(1)), wikitext_to_text(m.group(2)), ""))
+        else:
+            buf.append(line)
+    sections[-1].text = wikitext_to_text("\n".join(buf))
+    return sections
+
+
+# ---------- dump readers ----------
+
+
+@dataclass
+class DumpPage:
+    title: str
+    text: str
+    ns: int = 0
+    redirect: Optional[str] = None
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _read_xml(path: Path) -> Iterator[DumpPage]:
+    for _, elem in ElementTree.iterparse(str(path), events=("end",)):
+        if _local(elem.tag) != "page":
+            continue
+        title, ns, redirect, text = "", 0, None, ""
+        for child in elem.iter():
+            tag = _local(child.tag)
+            if tag == "title":
+                title = child.text or ""
+            elif tag == "ns":
+                ns = int(child.text or 0)
+            elif tag == "redirect":
+                redirect = child.get("title")
+            elif tag == "text":
+                text = child.text or ""  # last revision wins
+        yield DumpPage(title, text, ns, redirect)
+        elem.clear()
+
+
+_REDIRECT_RE = re.compile(r"^\s*#REDIRECT\s*\[\[([^\]|#]+)", re.I)
+
+
+def _page_from_json(obj: Dict) -> Optional[DumpPage]:
+    title = str(obj.get("title") or "")
+    if not title:
+        return None
+    text = obj.get("text") or obj.get("wikitext") or obj.get("content") or obj.get("extract")
+    if text is None:
+        revs = obj.get("revisions") or []
+        if revs:
+            rev = revs[-1]
+            main = (rev.get("slots") or {}).get("main") or rev
+            text = main.get("content") or main.get("*")
+    return DumpPage(title, str(text or ""), int(obj.get("ns") or 0), obj.get("redirect") if isinstance(obj.get("redirect"), str) else None)
+
+
+def _read_json(path: Path) -> Iterator[DumpPage]:
+    if path.suffix == ".jsonl":
+        objs: Iterable = (json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip())
+    else:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            pages = (data.get("query") or {}).get("pages", data.get("pages", []))
+            objs = pages.values() if isinstance(pages, dict) else pages
+        else:
+            objs = data
+    for obj in objs:
+        page = _page_from_json(obj) if isinstance(obj, dict) else None
+        if page is not None:
+            yield page
+
+
+def read_dump(path: Path) -> Iterator[DumpPage]:
+    """Pages from an XML export or a JSON / JSONL dump; wikitext `#REDIRECT` pages become redirects."""
+    pages = _read_xml(path) if path.suffix == ".xml" else _read_json(path)
+    for page in pages:
+        if page.redirect is None:
+            m = _REDIRECT_RE.match(page.text)
+            if m:
+                page.redirect = m.group(1).strip()
+        yield page
+
+
+# ---------- build ----------
+
+
+def build_mirror(pages: Iterable[DumpPage], out: Path, *, source: str = "") -> Dict[str, int]:
+    """Write the mirror to `out` (atomically replaced). Returns page/section/redirect/term counts."""
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    if tmp.exists():
+        tmp.unlink()
+    conn = sqlite3.connect(str(tmp))
+    conn.executescript(_SCHEMA)
+    postings: Dict[str, array] = {}
+    counts = {"pages": 0, "sections": 0, "redirects": 0, "skipped": 0}
+    total_len = 0
+    seen: set = set()
+    for page in pages:
+        title = normalize_title(page.title)
+        if page.ns != 0 or not title or not _is_english_title(title) or title in seen:
+            counts["skipped"] += 1
+            continue
+        seen.add(title)
+        if page.redirect:
+            conn.execute("insert or replace into redirects values (?, ?, ?)", (title, _lookup_key(title), normalize_title(page.redirect)))
+            counts["redirects"] += 1
+            continue
+        page_id = conn.execute("insert into pages (title, lookup) values (?, ?)", (title, _lookup_key(title))).lastrowid
+        counts["pages"] += 1
+        for sec in split_sections(page.text, title):
+            tokens = tokenize(sec.heading) + tokenize(sec.text)
+            sid = conn.execute(
+                "insert into sections (page_id, idx, level, heading, length, body) values (?, ?, ?, ?, ?, ?)",
+                (page_id, sec.idx, sec.level, sec.heading, len(tokens), zlib.compress(sec.text.encode("utf-8"), 9)),
+            ).lastrowid
+            counts["sections"] += 1
+            total_len += len(tokens)
+            tf: Dict[str, int] = {}
+            for t in tokens:
+                tf[t] = tf.get(t, 0) + 1
+            for t, n in tf.items():
+                postings.setdefault(t, array("I")).extend((sid, n))
+    for term, arr in postings.items():
+        if sys.byteorder != "little":
+            arr.byteswap()
+        conn.execute("insert into postings values (?, ?)", (term, arr.tobytes()))
+    counts["terms"] = len(postings)
+    meta = {
+        "version": SCHEMA_VERSION,
+        "source": source,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sections": str(counts["sections"]),
+        "avg_len": str(total_len / max(1, counts["sections"])),
+    }
+    conn.executemany("insert into meta values (?, ?)", meta.items())
+    conn.commit()
+    conn.execute("vacuum")
+    conn.close()
+    os.replace(tmp, out)
+    return counts
+
+
+# ---------- reader ----------
+
+
+class WikiMirror:
+    """Read-only view of a built mirror; safe to share between threads."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        meta = dict(self._conn.execute("select key, value from meta"))
+        if meta.get("version") != SCHEMA_VERSION:
+            self._conn.close()
+            raise ValueError(f"{path}: unsupported wiki mirror version {meta.get('version')!r}")
+        self.meta = meta
+        self.n_sections = int(meta.get("sections") or 0)
+        self.avg_len = float(meta.get("avg_len") or 1.0) or 1.0
+        # Small per-section tables kept in memory for scoring (section ids are 1..n_sections):
+        # owning page and the BM25 length normaliser k1 * (1 - b + b * len / avg_len).
+        self._sec_page = array("I", [0]) * (self.n_sections + 1)
+        self._sec_norm = array("d", [0.0]) * (self.n_sections + 1)
+        for sid, pid, length in self._conn.execute("select id, page_id, length from sections"):
+            self._sec_page[sid] = pid
+            self._sec_norm[sid] = _BM25_K1 * (1.0 - _BM25_B + _BM25_B * length / self.avg_len)
+        self._titles: Dict[int, str] = dict(self._conn.execute("select id, title from pages"))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def resolve_title(self, title: str) -> Optional[Tuple[int, str]]:
+        """(page id, canonical title), following one redirect; exact title first, then case-insensitive."""
+        norm = normalize_title(title)
+        for _ in range(2):
+            rows = self._query("select id, title from pages where title = ?", (norm,)) or self._query(
+                "select id, title from pages where lookup = ? order by id limit 1", (_lookup_key(norm),)
+            )
+            if rows:
+                return int(rows[0][0]), str(rows[0][1])
+            red = self._query("select target from redirects where title = ?", (norm,)) or self._query(
+                "select target from redirects where lookup = ? limit 1", (_lookup_key(norm),)
+            )
+            if not red:
+                return None
+            norm = normalize_title(red[0][0])
+        return None
+
+    def _sections(self, page_id: int) -> List[Tuple[int, int, str, bytes]]:
+        return self._query("select idx, level, heading, body from sections where page_id = ? order by idx", (page_id,))
+
+    def get_page(self, title: str) -> Optional[str]:
+        hit = self.resolve_title(title)
+        if hit is None:
+            return None
+        parts: List[str] = []
+        for idx, _level, heading, body in self._sections(hit[0]):
+            text = zlib.decompress(body).decode("utf-8")
+            if idx == 0:
+                if text:
+                    parts.append(text)
+            else:
+                parts.append(f"{heading}\n{text}" if text else heading)
+        return "\n\n".join(parts)
+
+    def list_sections(self, title: str) -> List[Tuple[str, str]]:
+        """(index, heading) for the headed sections, like action=parse&prop=sections."""
+        hit = self.resolve_title(title)
+        if hit is None:
+            return []
+        rows = self._query("select idx, heading from sections where page_id = ? and idx > 0 order by idx", (hit[0],))
+        return [(str(idx), str(heading)) for idx, heading in rows]
+
+    def get_section(self, title: str, heading: str) -> Optional[str]:
+        hit = self.resolve_title(title)
+        if hit is None:
+            return None
+        chosen = choose_section(self.list_sections(hit[1]), heading)
+        if chosen is None:
+            return None
+        rows = self._query("select body from sections where page_id = ? and idx = ?", (hit[0], int(chosen)))
+        return zlib.decompress(rows[0][0]).decode("utf-8") if rows else None
+
+    def search(self, query: str, limit: int = 10) -> List[WikiSearchResult]:
+        """BM25 over sections, best section per page, plus a bonus for query terms in the title."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        sec_scores: Dict[int, float] = {}
+        idf: Dict[str, float] = {}
+        for term in terms:
+            rows = self._query("select data from postings where term = ?", (term,))
+            if not rows:
+                continue
+            arr = array("I")
+            arr.frombytes(rows[0][0])
+            if sys.byteorder != "little":
+                arr.byteswap()
+            df = len(arr) // 2
+            w = idf[term] = math.log(1.0 + (self.n_sections - df + 0.5) / (df + 0.5))
+            wk = w * (_BM25_K1 + 1.0)
+            norms = self._sec_norm
+            get = sec_scores.get
+            for sid, tf in zip(arr[0::2], arr[1::2]):
+                sec_scores[sid] = get(sid, 0.0) + wk * tf / (tf + norms[sid])
+        pages: Dict[int, Tuple[float, int]] = {}
+        for sid, score in sec_scores.items():
+            pid = self._sec_page[sid]
+            if pid not in pages or score > pages[pid][0]:
+                pages[pid] = (score, sid)
+        ranked = []
+        for pid, (score, sid) in pages.items():
+            title_terms = set(tokenize(self._titles.get(pid, "")))
+            bonus = sum(idf[t] for t in terms if t in title_terms and t in idf)
+            ranked.append((score + bonus, pid, sid))
+        ranked.sort(key=lambda r: (-r[0], len(self._titles.get(r[1], "")), self._titles.get(r[1], "")))
+        out: List[WikiSearchResult] = []
+        for _score, pid, sid in ranked[: max(1, limit)]:
+            title = self._titles[pid]
+            out.append(WikiSearchResult(title=title, url=f"{BASE}/wiki/{_title_to_path(title)}", snippet=self._snippet(sid, terms)))
+        return out
+
+    def _snippet(self, sid: int, terms: List[str], max_len: int = 180) -> str:
+        rows = self._query("select heading, body from sections where id = ?", (sid,))
+        if not rows:
+            return ""
+        text = zlib.decompress(rows[0][1]).decode("utf-8")
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if s.strip()]
+        sent = next((s for s in sentences if set(tokenize(s)) & set(terms)), sentences[0] if sentences else rows[0][0])
+        return sent if len(sent) <= max_len else sent[: max_len - 1].rstrip() + "…"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Build the offline KSP wiki mirror from a MediaWiki export")
+    sub = ap.add_subparsers(dest="command", required=True)
+    ing = sub.add_parser("ingest", help="Build the mirror from a dump (.xml export, API .json, or .jsonl of {title, text})")
+    ing.add_argument("dump", type=Path)
+    ing.add_argument("--out", type=Path, default=DEFAULT_PATH, help=f"Mirror file (default: {DEFAULT_PATH})")
+    args = ap.parse_args(argv)
+    t0 = time.perf_counter()
+    counts = build_mirror(read_dump(args.dump), args.out, source=args.dump.name)
+    size = args.out.stat().st_size
+    print(
+        f"wrote {args.out} in {time.perf_counter() - t0:.1f}s: {counts['pages']} pages, {counts['sections']} sections, "
+        f"{counts['redirects']} redirects, {counts['terms']} terms, {counts['skipped']} skipped ({size / 1024:.0f} KiB)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+"""
+Federated search over the kRPC docs, the snippet library and the KSP wiki.
+
+The local sources run on a shared thread pool and every source gets its own deadline, measured
+from the start of the call. A source that misses its deadline (typically the live wiki) is
+reported as timed out and left to finish in the background; the answer is built from whatever
+arrived in time. The wiki can block on the network for its full request timeout plus rate-limit
+waits, so it runs on its own single-worker executor and is skipped while its previous call is
+still running: hung wiki calls can neither pile up nor starve the local sources.
+Results are fused with reciprocal rank fusion, score(item) = sum over sources 1 / (RRF_K + rank),
+and returned as one compact list with source tags.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import api_links, krpc_docs, ksp_wiki, snippets
+
+SOURCES = ("docs", "snippets", "wiki")
+# Seconds from the start of the call. The docs and snippet indexes are local; the wiki may go to the network.
+DEADLINES: Dict[str, float] = {"docs": 1.0, "snippets": 2.0, "wiki": 3.0}
+RRF_K = 60
+NETWORK_SOURCES = frozenset({"wiki"})
+
+_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search-all")
+_NET_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-all-net")
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+@dataclass
+class Hit:
+    source: str
+    title: str
+    ref: str
+    snippet: str
+
+
+def _docs(query: str, k: int) -> List[Hit]:
+    out = []
+    idx = api_links.get_index()
+    for doc, chunk, _score, snippet in idx.search_chunks(query, top_k=k):
+        title = doc.title or "(untitled)"
+        if chunk.label:
+            title = f"{title} › {chunk.label}"
+        out.append(Hit("docs", title, idx.chunk_url(chunk), snippet))
+    return out
+
+
+def _snippets(query: str, k: int) -> List[Hit]:
+    rows = snippets.search_items(query, k, mode="hybrid")
+    return [Hit("snippets", str(r.get("name") or r.get("id")), f"snippet:{r.get('id')}", (r.get("preview") or "").strip()) for r in rows]
+
+
+def _wiki(query: str, k: int) -> List[Hit]:
+    items = ksp_wiki._lookup(lambda m: m.search(query, limit=k), lambda c: c.search(query, limit=k), [])
+    return [Hit("wiki", it.title, it.url, it.snippet) for it in items]
+
+
+_SEARCHERS: Dict[str, Callable[[str, int], List[Hit]]] = {"docs": _docs, "snippets": _snippets, "wiki": _wiki}
+
+
+def _submit(source: str, query: str, k: int) -> Optional[Future]:
+    """Start one source; None when a network source's previous call has not finished yet."""
+    if source not in NETWORK_SOURCES:
+        return _POOL.submit(_SEARCHERS[source], query, k)
+    with _inflight_lock:
+        running = _inflight.get(source)
+        if running is not None and not running.done():
+            return None
+        future = _inflight[source] = _NET_POOL.submit(_SEARCHERS[source], query, k)
+        return future
+
+
+def _gather(query: str, sources: Sequence[str], k: int, deadlines: Dict[str, float]) -> Tuple[Dict[str, List[Hit]], Dict[str, str]]:
+    start = time.monotonic()
+    futures = {s: _submit(s, query, k) for s in sources}
+    results: Dict[str, List[Hit]] = {}
+    status: Dict[str, str] = {s: "skipped (previous call still running)" for s, f in futures.items() if f is None}
+    # Wait in deadline order so every source gets its full budget and the call never exceeds the largest one.
+    for s in sorted((s for s in sources if futures[s] is not None), key=lambda s: deadlines.get(s, 0.0)):
+        remaining = start + deadlines.get(s, 0.0) - time.monotonic()
+        try:
+            results[s] = futures[s].result(timeout=max(0.0, remaining))
+            status[s] = f"{len(results[s])} in {(time.monotonic() - start) * 1000:.0f} ms"
+        except TimeoutError:
+            status[s] = f"timed out after {deadlines.get(s, 0.0):g} s"
+        except Exception as e:  # a failing source must not sink the others
+            status[s] = f"error: {type(e).__name__}"
+    return results, status
+
+
+def fuse(ranked: Dict[str, List[Hit]], k: int, order: Sequence[str] = SOURCES) -> List[Tuple[float, Hit]]:
+    """Reciprocal rank fusion; hits with the same ref from several sources are merged."""
+    scores: Dict[str, float] = {}
+    first: Dict[str, Tuple[int, int, Hit]] = {}
+    for si, source in enumerate(order):
+        for rank, hit in enumerate(ranked.get(source) or [], start=1):
+            scores[hit.ref] = scores.get(hit.ref, 0.0) + 1.0 / (RRF_K + rank)
+            first.setdefault(hit.ref, (rank, si, hit))
+    keys = sorted(scores, key=lambda r: (-scores[r], first[r][0], first[r][1]))
+    return [(scores[r], first[r][2]) for r in keys[:k]]
+
+
+def search_all_impl(query: str, sources: Optional[List[str]] = None, k: int = 10) -> str:
+    """
+    Search the kRPC docs, the snippet library and the KSP wiki at once and return one fused list.
+    When to use:
+        - First look at a topic when it is unclear which source has the answer.
+
+    Args:
+        query: Free-text query
+        sources: Subset of "docs", "snippets", "wiki" (default: all)
+        k: Max fused results to return (default 10)
+    Returns:
+        Numbered lines "[source] title — url or snippet id" with a short snippet, then one status
+        line per source (result count and latency, or why it was skipped).
+    """
+    if not (query or "").strip():
+        return "Provide a query."
+    wanted = [s for s in SOURCES if s in (sources or SOURCES)]
+    unknown = sorted(set(sources or ()) - set(SOURCES))
+    if not wanted:
+        return f"No known sources in {sources!r}; choose from {', '.join(SOURCES)}."
+    k = max(1, min(int(k), 25))
+    results, status = _gather(query, wanted, k, DEADLINES)
+    fused = fuse(results, k, order=wanted)
+
+    lines: List[str] = []
+    for n, (_score, hit) in enumerate(fused, start=1):
+        lines.append(f"{n}. [{hit.source}] {hit.title} — {hit.ref}")
+        snip = " ".join(hit.snippet.split())
+        if snip:
+            snip = snip if len(snip) <= 160 else snip[:159].rstrip() + "…"
+            lines.append(f"   {snip}")
+    if not lines:
+        lines.append("No results found.")
+    lines.append("")
+    lines.append("Sources: " + "; ".join(f"{s} {status[s]}" for s in wanted))
+    if unknown:
+        lines.append(f"Ignored unknown sources: {', '.join(unknown)}")
+    return "\n".join(lines)
@@ -2,19 +2,17 @@ from __future__ import annotations
 
 import json
 import os
+import re
+from dataclasses import asdict
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
+from .api_links import get_links, snippets_path
 from .snippets_runtime import (
-    KeywordConfig,
-    KeywordIndex,
+    ModelCache,
     RerankConfig,
-    build_index,
-    keyword_search as runtime_keyword_search,
-    load_embeddings_jsonl,
-    load_embeddings_parquet,
-    load_embeddings_sqlite,
-    load_keyword_index,
+    SnippetData,
+    SnippetStore,
     rerank_results,
     resolve_snippet as runtime_resolve_snippet,
     search_hybrid,
@@ -34,65 +32,51 @@ def _default_paths() -> Dict[str, Path]:
         "snippets_enriched": base / "snippets_enriched.jsonl",
         "snippets_extracted": base / "snippets_extracted.jsonl",
         "keyword_index": base / "keyword_index.json",
+        "keyword_index_bin": base / "keyword_index.bin",
+        "emb_npy": base / "embeddings.npy",
         "emb_sqlite": base / "embeddings.sqlite",
         "emb_jsonl": base / "embeddings.jsonl",
         "emb_parquet": base / "embeddings.parquet",
+        "emb_ivf": base / "embeddings_ivf.npz",
+        "local_embedder": base / "local_embedder.json",
+        "model_cache": base / "model_cache.sqlite",
+        "rerank_model": base / "rerank_model.json",
     }
 
 
-def _snippets_path() -> Path:
+def _store_paths() -> Dict[str, Optional[Path]]:
     p = _default_paths()
-    return p["snippets_enriched"] if p["snippets_enriched"].exists() else p["snippets_extracted"]
-
+    vectors = next((p[k] for k in ("emb_npy", "emb_sqlite", "emb_jsonl", "emb_parquet") if p[k].exists()), None)
+    corpus = snippets_path()
+    corpus_bin = corpus.with_suffix(".bin")
+    return {
+        "corpus": corpus,
+        "corpus_bin": corpus_bin if corpus_bin.exists() else None,
+        "index": p["keyword_index"] if p["keyword_index"].exists() else None,
+        "index_bin": p["keyword_index_bin"] if p["keyword_index_bin"].exists() else None,
+        "vectors": vectors,
+        "ann": p["emb_ivf"] if p["emb_ivf"].exists() else None,
+        "embedder": p["local_embedder"] if p["local_embedder"].exists() else None,
+        "reranker": p["rerank_model"] if p["rerank_model"].exists() else None,
+    }
 
-def _load_snippets(path: Optional[Path] = None) -> List[Dict[str, Any]]:
-    path = path or _snippets_path()
-    recs: List[Dict[str, Any]] = []
-    try:
-        for line in path.read_text(encoding="utf-8").splitlines():
-            s = line.strip()
-            if not s:
-                continue
-            recs.append(json.loads(s))
-    except Exception:
-        pass
-    return recs
 
+# Loaded once per process and revalidated against file mtime/size on every access.
+_STORE = SnippetStore(_store_paths)
 
-# ---------- Search helpers ----------
 
-def _build_keyword_index(recs: List[Dict[str, Any]]):
-    cfg = KeywordConfig()
-    return build_index(recs, cfg)
+def _snapshot() -> SnippetData:
+    return _STORE.snapshot()
 
 
-def _load_keyword_index_or_build() -> Any:
-    p = _default_paths()["keyword_index"]
-    if p.exists():
-        try:
-            return KeywordIndex.load(p)
-        except Exception:
-            pass
-    recs = _load_snippets()
-    return _build_keyword_index(recs)
+# Remote query embeddings and rerank scores, shared across calls (LRU-bounded).
+_MODEL_CACHE = ModelCache(_default_paths()["model_cache"])
 
 
-def _load_vec_store_or_none():
-    p = _default_paths()
-    try:
-        if p["emb_sqlite"].exists():
-            return load_embeddings_sqlite(p["emb_sqlite"])
-        if p["emb_jsonl"].exists():
-            return load_embeddings_jsonl(p["emb_jsonl"])
-        if p["emb_parquet"].exists():
-            return load_embeddings_parquet(p["emb_parquet"])
-    except Exception:
-        return None
-    return None
-
+# ---------- Search helpers ----------
 
 def _keyword_search(idx, query: str, k: int, use_and: bool, category: Optional[str], exclude_restricted: bool) -> List[Dict[str, Any]]:
-    res = runtime_keyword_search(idx, query, k=k, use_and=use_and, category=category, exclude_restricted=exclude_restricted)
+    res = idx.search(query, k=k, use_and=use_and, category=category, exclude_restricted=exclude_restricted)
     out: List[Dict[str, Any]] = []
     for rid, sc, doc in res:
         out.append({
@@ -106,17 +90,9 @@ def _keyword_search(idx, query: str, k: int, use_and: bool, category: Optional[s
     return out
 
 
-def _hybrid_search(query: str, k: int, use_and: bool, category: Optional[str], exclude_restricted: bool, rerank: bool) -> List[Dict[str, Any]]:
-    p = _default_paths()
-    idx = load_keyword_index(p["keyword_index"]) if p["keyword_index"].exists() else _load_keyword_index_or_build()
-    # Embeddings
-    store = None
-    if p["emb_sqlite"].exists():
-        store = load_embeddings_sqlite(p["emb_sqlite"])
-    elif p["emb_jsonl"].exists():
-        store = load_embeddings_jsonl(p["emb_jsonl"])
-    elif p["emb_parquet"].exists():
-        store = load_embeddings_parquet(p["emb_parquet"])
+def _hybrid_search(data: SnippetData, query: str, k: int, use_and: bool, category: Optional[str], exclude_restricted: bool, rerank: bool) -> List[Dict[str, Any]]:
+    idx = data.index
+    store = data.vectors
     if store is None:
         # Fallback to keyword-only
         return _keyword_search(idx, query, k, use_and, category, exclude_restricted)
@@ -131,9 +107,12 @@ def _hybrid_search(query: str, k: int, use_and: bool, category: Optional[str], e
         category=category,
         exclude_restricted=exclude_restricted,
         mock_query_embed=mock_query,
+        ann=data.ann,
+        embedder=data.embedder,
+        cache=_MODEL_CACHE,
     )
     if rerank:
-        cfg = RerankConfig(mock=not bool(os.environ.get("OPENAI_API_KEY")))
+        cfg = RerankConfig(mock=not bool(os.environ.get("OPENAI_API_KEY")), cache=_MODEL_CACHE, local=data.reranker)
         res = rerank_results(query, res, cfg)
     # Shape output
     out: List[Dict[str, Any]] = []
@@ -154,6 +133,24 @@ def _hybrid_search(query: str, k: int, use_and: bool, category: Optional[str], e
     return out
 
 
+def search_items(
+    query: str,
+    k: int = 10,
+    *,
+    mode: str = "hybrid",
+    and_logic: bool = False,
+    category: Optional[str] = None,
+    exclude_restricted: bool = False,
+    rerank: bool = False,
+    data: Optional[SnippetData] = None,
+) -> List[Dict[str, Any]]:
+    """Ranked rows ({id, name, path, categories, preview, scores}) as snippets_search returns them under items."""
+    data = data or _snapshot()
+    if (mode or "keyword").lower() == "keyword":
+        return _keyword_search(data.index, query, k, and_logic, category, exclude_restricted)
+    return _hybrid_search(data, query, k, and_logic, category, exclude_restricted, rerank)
+
+
 # ---------- FastMCP tools ----------
 
 
@@ -172,72 +169,121 @@ def snippets_search_impl(query: str, k: int = 10, mode: str = "keyword", and_log
     Returns:
       JSON: { items: [...], source: {...} }
     """
-    idx = _load_keyword_index_or_build()
+    items = search_items(query, k, mode=mode, and_logic=and_logic, category=category, exclude_restricted=exclude_restricted, rerank=rerank)
     if (mode or "keyword").lower() == "keyword":
-        items = _keyword_search(idx, query, k, and_logic, category, exclude_restricted)
         src = {"mode": "keyword", "index": str(_default_paths()["keyword_index"]) }
     else:
-        items = _hybrid_search(query, k, and_logic, category, exclude_restricted, rerank)
-        src = {"mode": "hybrid", "index": str(_default_paths()["keyword_index"]) }
+        src = {"mode": "hybrid", "index": str(_default_paths()["keyword_index"]), "model_cache": _MODEL_CACHE.stats()}
+    return json.dumps({"items": items, "source": src})
+
+
+def snippets_code_search_impl(pattern: str, regex: bool = False, ignore_case: bool = False, k: int = 20, context: int = 2, max_matches: int = 5, category: str | None = None, exclude_restricted: bool = False) -> str:
+    """
+    Substring (or regex) search over the full code of every snippet, via the trigram code index.
+
+    Returns JSON: { items: [{id, name, path, categories, total_matches, matches: [{line, col, text, before, after}]}], source: {...} }
+    """
+    if not pattern:
+        return json.dumps({"ok": False, "error": "Provide a pattern"})
+    data = _snapshot()
+
+    def allowed(rid: str) -> bool:
+        doc = data.by_id.get(rid) or {}
+        if category and category not in (doc.get("categories") or []):
+            return False
+        return not (exclude_restricted and doc.get("restricted"))
+
+    try:
+        hits, scanned = data.code_index.search(
+            pattern,
+            regex=bool(regex),
+            ignore_case=bool(ignore_case),
+            context=max(0, int(context)),
+            max_matches=max(1, int(max_matches)),
+            allowed=allowed if category or exclude_restricted else None,
+        )
+    except re.error as e:
+        return json.dumps({"ok": False, "error": f"invalid regex: {e}"})
+    items = []
+    for rid, matches, total in hits[: max(0, int(k))]:
+        doc = data.by_id.get(rid) or {}
+        items.append({
+            "id": rid,
+            "name": doc.get("name"),
+            "path": doc.get("path"),
+            "categories": doc.get("categories"),
+            "total_matches": total,
+            "matches": [asdict(m) for m in matches],
+        })
+    src = {"mode": "code", "docs": len(data.code_index), "scanned": scanned, "matched_docs": len(hits)}
     return json.dumps({"items": items, "source": src})
 
 
 def snippets_get_impl(id: str, include_code: bool = False) -> str:
     """
     Get a snippet record by id.
-    Returns JSON: { ok, snippet? }.
-    """
-    recs = _load_snippets()
-    for r in recs:
-        if r.get("id") == id:
-            out = dict(r)
-            if not include_code:
-                # Normalize hidden code to empty string for predictable consumers.
-                out["code"] = ""
-            return json.dumps({"ok": True, "snippet": out})
-    return json.dumps({"ok": False, "error": f"id not found: {id}"})
-
-
-def snippets_resolve_impl(id: str | None = None, name: str | None = None, max_bytes: int = 25000, max_nodes: int = 25) -> str:
+    apis lists the kRPC API symbols the snippet's code uses, with their doc URLs (precomputed).
+    Returns JSON: { ok, snippet?, apis? }.
     """
-    Resolve a snippet (by id or module.qualname) into a paste-ready bundle including dependencies.
+    out = _snapshot().record_store.get(id)
+    if out is None:
+        return json.dumps({"ok": False, "error": f"id not found: {id}"})
+    if not include_code:
+        # Normalize hidden code to empty string for predictable consumers.
+        out["code"] = ""
+    apis = [{"name": name, "url": url} for name, url in get_links().apis(id)]
+    return json.dumps({"ok": True, "snippet": out, "apis": apis})
 
-    Returns JSON: { ok, bundle_code?, include_ids?, unresolved?, truncated?, stats? }.
-    """
+
+def _resolve(data: SnippetData, id: str | None, name: str | None, max_bytes: int, max_nodes: int, tree_shake: bool = False, strip_docstrings: bool = False) -> Dict[str, Any]:
     if not id and not name:
-        return json.dumps({"ok": False, "error": "Provide id or name"})
+        return {"ok": False, "error": "Provide id or name"}
     try:
         res = runtime_resolve_snippet(
             target_id=id,
             target_name=name,
-            snippets_path=_snippets_path(),
+            graph=data.graph,
             size_cap_bytes=int(max_bytes),
             size_cap_nodes=int(max_nodes),
+            shake=bool(tree_shake),
+            strip_docstrings=bool(strip_docstrings),
         )
-        return json.dumps({
+        return {
             "ok": True,
             "bundle_code": res.bundle_code,
             "include_ids": res.include_ids,
             "unresolved": res.unresolved_deps,
             "truncated": res.truncated,
             "stats": res.stats,
-        })
+        }
     except Exception as e:
-        return json.dumps({"ok": False, "error": str(e)})
+        return {"ok": False, "error": str(e)}
+
+
+def snippets_resolve_impl(id: str | None = None, name: str | None = None, max_bytes: int = 25000, max_nodes: int = 25, tree_shake: bool = False, strip_docstrings: bool = False) -> str:
+    """
+    Resolve a snippet (by id or module.qualname) into a paste-ready bundle including dependencies.
+
+    Bundles come from the store's precomputed dependency graph and are memoized per (target, caps).
+    tree_shake keeps only the functions, methods and constants reachable from the target;
+    strip_docstrings also removes docstrings and comments. Both report stats.bytes_saved.
+    Returns JSON: { ok, bundle_code?, include_ids?, unresolved?, truncated?, stats? }.
+    """
+    return json.dumps(_resolve(_snapshot(), id, name, max_bytes, max_nodes, tree_shake, strip_docstrings))
 
 
-def snippets_search_and_resolve_impl(query: str, k: int = 10, mode: str = "hybrid", rerank: bool = False, and_logic: bool = False, category: str | None = None, exclude_restricted: bool = False, max_bytes: int = 25000, max_nodes: int = 25) -> str:
+def snippets_search_and_resolve_impl(query: str, k: int = 10, mode: str = "hybrid", rerank: bool = False, and_logic: bool = False, category: str | None = None, exclude_restricted: bool = False, max_bytes: int = 25000, max_nodes: int = 25, tree_shake: bool = False, strip_docstrings: bool = False) -> str:
     """
     Search and resolve top-1 result into a code bundle.
 
     Returns JSON with top result metadata and bundle fields.
     """
-    items = json.loads(snippets_search_impl(query, k=k, mode=mode, and_logic=and_logic, category=category, exclude_restricted=exclude_restricted, rerank=rerank)).get("items", [])
+    data = _snapshot()
+    items = search_items(query, k, mode=mode, and_logic=and_logic, category=category, exclude_restricted=exclude_restricted, rerank=rerank, data=data)
     if not items:
         return json.dumps({"ok": False, "error": "No results"})
     top = items[0]
-    rid = top.get("id")
-    res = json.loads(snippets_resolve_impl(id=rid, name=None, max_bytes=max_bytes, max_nodes=max_nodes))
+    res = _resolve(data, top.get("id"), None, max_bytes, max_nodes, tree_shake, strip_docstrings)
     res["top"] = top
     return json.dumps(res)
 
@@ -249,13 +295,37 @@ _USAGE = (
     "Snippets Tools (krpc-snippets)\n\n"
     "snippets_search(query, k=10, mode='keyword'|'hybrid', and_logic=False, category=None, exclude_restricted=False, rerank=False)\n"
     "snippets_get(id, include_code=False)\n"
-    "snippets_resolve(id=None, name=None, max_bytes=25000, max_nodes=25)\n"
+    "snippets_code_search(pattern, regex=False, ignore_case=False, k=20, context=2, max_matches=5, category=None, exclude_restricted=False)\n"
+    "snippets_resolve(id=None, name=None, max_bytes=25000, max_nodes=25, tree_shake=False, strip_docstrings=False)\n"
     "snippets_search_and_resolve(query, ...) — convenience that returns top-1 bundle\n\n"
     "Data paths (relative to repo root):\n"
-    "- Snippets JSONL: data/krpc-snippets/snippets_enriched.jsonl (fallback: snippets_extracted.jsonl)\n"
-    "- Keyword index: data/krpc-snippets/keyword_index.json\n"
-    "- Embeddings: data/krpc-snippets/embeddings.(sqlite|jsonl|parquet)\n\n"
-    "Notes:\n- Hybrid/rerank use OpenAI when OPENAI_API_KEY is set; otherwise mock.\n"
+    "- Snippets JSONL: data/krpc-snippets/snippets_enriched.jsonl (fallback: snippets_extracted.jsonl); served from\n"
+    "  the compressed record store snippets_enriched.bin when it matches, built with\n"
+    "  python -m mcp_server.library_impl.snippets_runtime.record_store --corpus <snippets.jsonl>\n"
+    "- Keyword index: data/krpc-snippets/keyword_index.json (memory-mapped from keyword_index.bin when it matches;\n"
+    "  rebuild with python -m mcp_server.library_impl.snippets_runtime.compact_index --index <json>)\n"
+    "- Embeddings: data/krpc-snippets/embeddings.(npy|sqlite|jsonl|parquet); embeddings.npy (+ embeddings.ids.json) is\n"
+    "  memory-mapped, build it with python -m mcp_server.library_impl.snippets_runtime.vector_matrix --embeddings <file>\n"
+    "- Optional ANN index (NumPy): data/krpc-snippets/embeddings_ivf.npz, built with\n"
+    "  python -m mcp_server.library_impl.snippets_runtime.ann_index --embeddings <file> [--nlist N --nprobe P]\n"
+    "- Offline query embedder: data/krpc-snippets/local_embedder.(json|npy); it and matching embeddings.npy are built with\n"
+    "  python -m mcp_server.library_impl.snippets_runtime.local_embedder --corpus <snippets.jsonl>\n\n"
+    "Notes:\n- Hybrid search embeds queries locally when the embeddings were built with the offline embedder;\n"
+    "  otherwise it uses OpenAI when OPENAI_API_KEY is set, else a deterministic mock vector.\n"
+    "- Rerank uses OpenAI when OPENAI_API_KEY is set, else the learned local model (data/krpc-snippets/rerank_model.json,\n"
+    "  trained on the graded queries in eval_rerank.json with\n"
+    "  python -m mcp_server.library_impl.snippets_runtime.learned_rerank train|report) when its stored evaluation\n"
+    "  beats token overlap and keyword-only search, else token overlap.\n"
+    "- Remote query embeddings and rerank scores are cached in data/krpc-snippets/model_cache.sqlite (LRU-bounded;\n"
+    "  keyed on model, normalised query and candidate ids); hybrid results report hit/miss stats under source.model_cache.\n"
+    "- snippets_code_search matches the full code of every snippet (snippets_search only sees the first 300 chars);\n"
+    "  a trigram index narrows the candidates, so literal and most regex patterns answer in about a millisecond.\n"
+    "- tree_shake=True bundles only the functions, methods and constants reachable from the target (a method no\n"
+    "  longer drags in its whole class); strip_docstrings=True also drops docstrings/comments. stats.bytes_saved\n"
+    "  reports the reduction against the unshaken bundle.\n"
+    "- Corpus, index and embeddings are loaded once per process and reloaded when the files change on disk.\n"
+    "  Only per-record metadata stays in memory; code and full records are decompressed per record on demand\n"
+    "  (snippets_get, resolve bundles, code-search candidates).\n"
 )
 
 
@@ -1,4 +1,6 @@
 from .keyword_index import KeywordIndex, KeywordConfig, build_index, search as keyword_search
+from .compact_index import CompactIndex
+from .code_index import CodeIndex
 from .hybrid_search import (
     VecStore,
     load_keyword_index,
@@ -7,22 +9,42 @@ from .hybrid_search import (
     load_embeddings_parquet,
     search_hybrid,
 )
+from .model_cache import ModelCache
+from .learned_rerank import LocalReranker
 from .rerank import RerankConfig, rerank_results
-from .resolver import resolve_snippet, ResolveResult
+from .resolver import DepGraph, resolve_snippet, ResolveResult
+from .vector_matrix import EmbeddingMatrix
+from .ann_index import IVFIndex
+from .local_embedder import LocalEmbedder, LocalEmbedderConfig
+from .record_store import RecordStore
+from .store import FileStamp, SnippetData, SnippetStore
 
 __all__ = [
     "KeywordIndex",
     "KeywordConfig",
     "build_index",
     "keyword_search",
+    "CompactIndex",
+    "CodeIndex",
     "VecStore",
     "load_keyword_index",
     "load_embeddings_jsonl",
     "load_embeddings_sqlite",
     "load_embeddings_parquet",
     "search_hybrid",
+    "EmbeddingMatrix",
+    "IVFIndex",
+    "LocalEmbedder",
+    "LocalEmbedderConfig",
+    "ModelCache",
+    "LocalReranker",
     "RerankConfig",
     "rerank_results",
+    "DepGraph",
     "resolve_snippet",
     "ResolveResult",
+    "RecordStore",
+    "FileStamp",
+    "SnippetData",
+    "SnippetStore",
 ]
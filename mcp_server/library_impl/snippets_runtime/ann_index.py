@@ -0,0 +1,170 @@
+"""
+Optional IVF-flat approximate nearest-neighbour index over an EmbeddingMatrix (requires NumPy).
+
+Build: spherical k-means splits the rows into `nlist` clusters; the index stores the centroids
+and the row ids grouped by cluster (`order` sliced by `offsets`).
+Query: score the centroids, scan the rows of the best `nprobe` clusters exactly, top-k them.
+
+Knobs: `nlist` (build time; more lists = smaller scans) and `nprobe` (query time; more probes =
+higher recall, more latency). `nprobe >= nlist` is an exact search. The index records a hash
+of the ids and row bytes it was built from and is ignored when the embeddings change, including
+when rows are re-embedded in place under the same ids.
+
+Build it next to keyword_index.json with
+`python -m mcp_server.library_impl.snippets_runtime.ann_index --embeddings <embeddings file>`.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from .vector_matrix import EmbeddingMatrix
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - exercised only where NumPy is missing
+    np = None
+
+
+def matrix_digest(matrix: EmbeddingMatrix) -> str:
+    h = hashlib.sha256("\n".join(matrix.ids).encode("utf-8"))
+    h.update(b"\0")
+    h.update(matrix._flat_bytes())
+    return h.hexdigest()
+
+
+def default_nlist(n: int) -> int:
+    return max(1, min(n, int(round(4 * math.sqrt(n)))))
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("The ANN index requires NumPy; exact search is used without it")
+
+
+class IVFIndex:
+    def __init__(self, centroids, order, offsets, *, source: str, nprobe: int) -> None:
+        self.centroids = centroids  # (nlist, dim) float32
+        self.order = order  # row ids grouped by list, int32
+        self.offsets = offsets  # (nlist + 1,) int64 slice bounds into `order`
+        self.source = source
+        self.nprobe = int(nprobe)
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        matrix: EmbeddingMatrix,
+        *,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        iters: int = 15,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        _require_numpy()
+        rows = np.asarray(matrix.rows, dtype=np.float32).reshape(len(matrix), matrix.dim)
+        n = rows.shape[0]
+        if n == 0:
+            raise ValueError("Cannot build an ANN index over an empty embedding matrix")
+        nlist = min(n, nlist or default_nlist(n))
+        unit = rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+        rng = np.random.default_rng(seed)
+        centroids = unit[rng.choice(n, size=nlist, replace=False)].copy()
+        assign = np.zeros(n, dtype=np.int64)
+        for _ in range(max(1, iters)):
+            assign = np.argmax(unit @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = unit[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+                else:
+                    # Re-seed an empty list with the row worst served by its centroid.
+                    worst = int(np.argmin(np.einsum("ij,ij->i", unit, centroids[assign])))
+                    centroids[c] = unit[worst]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        assign = np.argmax(unit @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist)))).astype(np.int64)
+        return cls(
+            centroids.astype(np.float32),
+            order,
+            offsets,
+            source=matrix_digest(matrix),
+            nprobe=nprobe or max(1, nlist // 8),
+        )
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as fh:
+            np.savez(
+                fh,
+                centroids=self.centroids,
+                order=self.order,
+                offsets=self.offsets,
+                source=np.array(self.source),
+                nprobe=np.array(self.nprobe),
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        _require_numpy()
+        with np.load(path) as z:
+            return cls(z["centroids"], z["order"], z["offsets"], source=str(z["source"]), nprobe=int(z["nprobe"]))
+
+    def matches(self, matrix: EmbeddingMatrix) -> bool:
+        return self.centroids.shape[1] == matrix.dim and self.source == matrix_digest(matrix)
+
+    def search(self, matrix: EmbeddingMatrix, qvec: Sequence[float], k: int = 10, *, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top-k (id, dot product) over the rows of the `nprobe` closest lists, highest first."""
+        if k <= 0 or len(qvec) != matrix.dim:
+            return []
+        q = np.asarray(qvec, dtype=np.float32)
+        probes = min(self.nlist, max(1, nprobe or self.nprobe))
+        c_scores = self.centroids @ q
+        lists = np.argpartition(-c_scores, probes - 1)[:probes] if probes < self.nlist else np.arange(self.nlist)
+        cand = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+        if cand.size == 0:
+            return []
+        cand.sort()
+        scores = np.asarray(matrix.rows[cand]) @ q
+        k = min(k, cand.size)
+        top = np.argpartition(-scores, k - 1)[:k] if k < cand.size else np.arange(cand.size)
+        top = top[np.lexsort((cand[top], -scores[top]))]
+        return [(matrix.ids[int(cand[i])], float(scores[i])) for i in top]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .store import load_vectors
+
+    ap = argparse.ArgumentParser(description="Build the IVF-flat ANN index for snippet embeddings")
+    ap.add_argument("--embeddings", required=True, type=Path, help="embeddings.(npy|sqlite|jsonl|parquet)")
+    ap.add_argument("--out", type=Path, help="Output path (default: embeddings_ivf.npz next to the embeddings)")
+    ap.add_argument("--nlist", type=int, help="Number of lists (default: 4*sqrt(N))")
+    ap.add_argument("--nprobe", type=int, help="Default lists probed per query (default: nlist/8)")
+    ap.add_argument("--iters", type=int, default=15)
+    args = ap.parse_args(argv)
+    if np is None:
+        print("NumPy is not installed; the ANN index is unavailable", file=sys.stderr)
+        return 1
+    matrix = load_vectors(args.embeddings)
+    if matrix is None:
+        print(f"could not load embeddings from {args.embeddings}", file=sys.stderr)
+        return 1
+    ivf = IVFIndex.build(matrix, nlist=args.nlist, nprobe=args.nprobe, iters=args.iters)
+    out = args.out or args.embeddings.with_name("embeddings_ivf.npz")
+    ivf.save(out)
+    print(f"wrote {out} ({len(matrix)} rows, nlist {ivf.nlist}, nprobe {ivf.nprobe})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
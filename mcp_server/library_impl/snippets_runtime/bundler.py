@@ -0,0 +1,249 @@
+"""
+AST tree-shaking for resolved snippet bundles.
+
+The resolver collects whole records: a method target pivots to its entire class and every
+module contributes its const block. `shake_records` parses those records and keeps only what is
+reachable from the target:
+
+- roots are the target function, the target method (plus `__init__`), or a whole target class;
+- a reached name pulls in the top-level function, class, import or assignment that binds it;
+- a reached class keeps its non-method body, its dunder methods and any method whose name is
+  used as an attribute anywhere in the kept code (no type inference, so this over-approximates);
+- top-level statements that bind nothing (calls, loops, ...) are always kept.
+
+Kept code is sliced from the original source by line, so formatting and comments survive.
+With `strip_docstrings` the result is re-emitted through `ast.unparse` without docstrings
+(which also drops comments). Records that do not parse are kept verbatim and every identifier
+in them counts as used.
+"""
+from __future__ import annotations
+
+import ast
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_ALWAYS_KEPT_METHODS = {"__init__", "__new__", "__post_init__"}
+
+
+def _is_dunder(name: str) -> bool:
+    return len(name) > 4 and name.startswith("__") and name.endswith("__")
+
+
+def _start_line(node: ast.stmt) -> int:
+    decorators = getattr(node, "decorator_list", None) or []
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def _bound_names(node: ast.stmt) -> Optional[Set[str]]:
+    """Names a top-level statement binds, or None for statements that must always be kept."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {node.name}
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        if any(a.name == "*" for a in node.names):
+            return None
+        return {(a.asname or a.name).split(".")[0] for a in node.names}
+    if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        names = {n.id for t in targets for n in ast.walk(t) if isinstance(n, ast.Name)}
+        return names or None
+    return None
+
+
+@dataclass
+class _Unit:
+    node: ast.stmt
+    names: Optional[Set[str]]
+    members: Dict[str, List[ast.stmt]] = field(default_factory=dict)
+
+
+def _unit(node: ast.stmt) -> _Unit:
+    unit = _Unit(node, _bound_names(node))
+    if isinstance(node, ast.ClassDef):
+        for s in node.body:
+            if isinstance(s, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                unit.members.setdefault(s.name, []).append(s)
+    return unit
+
+
+@dataclass
+class _Reach:
+    units: List[_Unit]
+    kept: Set[int] = field(default_factory=set)
+    kept_members: Dict[int, Set[str]] = field(default_factory=dict)
+    names: Set[str] = field(default_factory=set)
+    attrs: Set[str] = field(default_factory=set)
+    pending: List[ast.AST] = field(default_factory=list)
+
+    def use_tokens(self, text: str) -> None:
+        found = set(_IDENT.findall(text))
+        self.names |= found
+        self.attrs |= found
+
+    def keep(self, i: int, members: Optional[Set[str]] = None) -> None:
+        unit = self.units[i]
+        node = unit.node
+        if i not in self.kept:
+            self.kept.add(i)
+            self.kept_members[i] = set()
+            if isinstance(node, ast.ClassDef):
+                self.pending.extend(node.decorator_list + node.bases + [k.value for k in node.keywords])
+                self.pending.extend(s for s in node.body if not isinstance(s, (ast.FunctionDef, ast.AsyncFunctionDef)))
+                members = set(members or ()) | {m for m in unit.members if _is_dunder(m) or m in _ALWAYS_KEPT_METHODS}
+            else:
+                self.pending.append(node)
+        for m in members or ():
+            if m in unit.members and m not in self.kept_members[i]:
+                self.kept_members[i].add(m)
+                self.pending.extend(unit.members[m])
+
+    def run(self) -> None:
+        by_name: Dict[str, List[int]] = {}
+        for i, u in enumerate(self.units):
+            for n in u.names or ():
+                by_name.setdefault(n, []).append(i)
+        done_names: Set[str] = set()
+        done_attrs: Set[str] = set()
+        while True:
+            while self.pending:
+                for n in ast.walk(self.pending.pop()):
+                    if isinstance(n, ast.Name):
+                        self.names.add(n.id)
+                    elif isinstance(n, ast.Attribute):
+                        self.attrs.add(n.attr)
+            new_names, new_attrs = self.names - done_names, self.attrs - done_attrs
+            if not new_names and not new_attrs:
+                return
+            done_names |= new_names
+            done_attrs |= new_attrs
+            for name in new_names:
+                for i in by_name.get(name, ()):
+                    self.keep(i)
+            for i in list(self.kept):
+                hit = {a for a in done_attrs if a in self.units[i].members} - self.kept_members[i]
+                if hit:
+                    self.keep(i, hit)
+
+
+def _emit(code: str, units: List[_Unit], reach: _Reach, offset: int) -> str:
+    """Slice kept statements and kept class members out of the record's source lines.
+
+    Blank and comment lines belong to the statement that follows them (trailing ones to the last).
+    """
+    lines = code.splitlines(keepends=True)
+    keep = [True] * (len(lines) + 1)
+
+    def drop(start: int, end: int) -> None:
+        for n in range(start, min(end, len(lines)) + 1):
+            keep[n] = False
+
+    prev_end = 0
+    for j, unit in enumerate(units):
+        node = unit.node
+        start = prev_end + 1
+        # Stop short of a following statement that shares this one's last line (`a = 1; b = 2`).
+        end = _start_line(units[j + 1].node) - 1 if j < len(units) - 1 else len(lines)
+        prev_end = node.end_lineno
+        i = offset + j
+        if i not in reach.kept:
+            drop(start, end)
+            continue
+        if not unit.members:
+            continue
+        kept = reach.kept_members[i]
+        body_prev = None
+        first_dropped = None
+        all_dropped = True
+        for s in node.body:
+            s_start = _start_line(s) if body_prev is None else body_prev.end_lineno + 1
+            body_prev = s
+            is_member = isinstance(s, (ast.FunctionDef, ast.AsyncFunctionDef))
+            # Never drop a member that shares the class header line (one-line classes).
+            if not is_member or s.name in kept or _start_line(s) <= node.lineno:
+                all_dropped = False
+                continue
+            drop(s_start, s.end_lineno)
+            first_dropped = first_dropped or _start_line(s)
+        if all_dropped and first_dropped:
+            indent = re.match(r"[ \t]*", lines[first_dropped - 1]).group(0) or "    "
+            lines[first_dropped - 1] = indent + "pass\n"
+            keep[first_dropped] = True
+    return "".join(line for n, line in enumerate(lines, start=1) if keep[n])
+
+
+def _strip(code: str) -> str:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return ast.unparse(tree) + "\n"
+
+
+def _roots(reach: _Reach, owners: List[str], target: Dict) -> bool:
+    """Mark the target's units as kept; False when the target cannot be located."""
+    name = str(target.get("name") or "")
+    cat = (target.get("categories") or [None])[0]
+    parts = name.split(".")
+    for i, unit in enumerate(reach.units):
+        node = unit.node
+        if cat == "method" and len(parts) == 2 and isinstance(node, ast.ClassDef) and node.name == parts[0] and parts[1] in unit.members:
+            reach.keep(i, {parts[1]})
+            return True
+        if cat == "class" and isinstance(node, ast.ClassDef) and node.name == name:
+            reach.keep(i, set(unit.members))
+            return True
+        if cat == "function" and isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name:
+            reach.keep(i)
+            return True
+    found = False
+    for i, rid in enumerate(owners):
+        if rid == target.get("id"):
+            reach.keep(i, set(reach.units[i].members))
+            found = True
+    return found
+
+
+def shake_records(records: List[Dict], target: Dict, *, prune: bool = True, strip_docstrings: bool = False) -> Dict[str, str]:
+    """{id: code} for the records that still contain code after shaking, in input order."""
+    reach = _Reach([])
+    owners: List[str] = []
+    parsed: List[Optional[int]] = []
+    verbatim = False
+    for rec in records:
+        code = rec.get("code") or ""
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            reach.use_tokens(code)
+            parsed.append(None)
+            verbatim = verbatim or rec.get("id") == target.get("id")
+            continue
+        parsed.append(len(reach.units))
+        for stmt in tree.body:
+            reach.units.append(_unit(stmt))
+            owners.append(str(rec.get("id")))
+    if prune and not verbatim and not _roots(reach, owners, target):
+        prune = False
+    if prune:
+        for i, unit in enumerate(reach.units):
+            if unit.names is None:
+                reach.keep(i)
+        reach.run()
+
+    out: Dict[str, str] = {}
+    for rec, offset in zip(records, parsed):
+        code = rec.get("code") or ""
+        if offset is not None and prune:
+            n = sum(1 for rid in owners[offset:] if rid == str(rec.get("id")))
+            code = _emit(code, reach.units[offset:offset + n], reach, offset)
+        if strip_docstrings and code.strip():
+            code = _strip(code)
+        if code.strip():
+            out[str(rec.get("id"))] = code
+    return out
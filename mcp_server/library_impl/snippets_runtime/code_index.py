@@ -0,0 +1,222 @@
+"""
+Trigram index over full snippet code for substring and regex search.
+
+Every lower-cased 3-character window of a record's code maps to the records containing it
+(ordinal arrays). A literal query intersects the posting lists of its own trigrams,
+smallest first; a regex query does the same with the literal runs it requires (see
+`required_literals`). Only the surviving candidates are scanned with `str.find` / `re`, so a
+search touches a handful of records instead of the whole corpus. Patterns that yield no
+trigram (shorter than 3 characters, top-level alternation, ...) fall back to a full scan.
+
+The index holds ids, postings and one (id, code hash) key per record, not the code: the text of
+a candidate is fetched through `code_of(id)` (from the compressed record store at runtime) only
+when it is scanned. The index is rebuilt with the corpus; postings of records whose key is
+unchanged are carried over from the previous index, so a reload only fetches and re-trigrams
+records that changed. Records may give their code directly or as `code_sha1` (metadata rows).
+"""
+from __future__ import annotations
+
+import re
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from hashlib import sha1
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+# Escapes that stand for a character class or an assertion, not a literal character.
+_CLASS_ESCAPES = set("dDsSwWbBAZzG0123456789")
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    low = text.lower()
+    return frozenset(low[i:i + 3] for i in range(len(low) - 2))
+
+
+def required_literals(pattern: str) -> List[str]:
+    """Literal runs every match of `pattern` must contain (conservative; [] when unsure).
+
+    Only top-level text counts: groups, classes and anything with a top-level `|` are skipped,
+    and a character followed by `?`, `*` or `{` is not required.
+    """
+    runs: List[str] = []
+    cur: List[str] = []
+    depth = 0
+    i, n = 0, len(pattern)
+
+    def flush() -> None:
+        if cur:
+            runs.append("".join(cur))
+            cur.clear()
+
+    while i < n:
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < n:
+            nxt = pattern[i + 1]
+            if depth == 0 and nxt not in _CLASS_ESCAPES and not nxt.isalpha():
+                cur.append(nxt)
+            elif depth == 0:
+                flush()
+            i += 2
+            continue
+        if ch == "[":
+            # Skip the class; `]` right after `[` or `[^` is literal.
+            j = i + 1
+            if j < n and pattern[j] == "^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 2 if pattern[j] == "\\" else 1
+            if depth == 0:
+                flush()
+            i = j + 1
+            continue
+        if ch == "(":
+            depth += 1
+            flush()
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif ch == "|":
+            if depth == 0:
+                return []
+        elif depth:
+            pass
+        elif ch in "?*{":
+            if cur:
+                cur.pop()
+            flush()
+            if ch == "{":
+                while i < n and pattern[i] != "}":
+                    i += 1
+        elif ch in ".^$+":
+            flush()
+        else:
+            cur.append(ch)
+        i += 1
+    flush()
+    return [r for r in runs if len(r) >= 3]
+
+
+@dataclass
+class CodeMatch:
+    line: int
+    col: int
+    text: str
+    before: List[str]
+    after: List[str]
+
+
+class CodeIndex:
+    def __init__(self, ids: List[str], keys: List[Tuple[str, str]], postings: Dict[str, array], code_of: Callable[[str], str]) -> None:
+        self.ids = ids
+        self.keys = keys  # (id, code hash) per ordinal, matched by the next build
+        self.postings = postings
+        self.code_of = code_of
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, records: Sequence[Dict], previous: Optional["CodeIndex"] = None, code_of: Optional[Callable[[str], str]] = None) -> "CodeIndex":
+        """Index `records`; `code_of(id)` supplies code for records that carry only `code_sha1`."""
+        if code_of is None:
+            codes = {r.get("id"): r.get("code") or "" for r in records}
+            code_of = codes.__getitem__
+        old = {key: o for o, key in enumerate(previous.keys)} if previous is not None else {}
+        ids: List[str] = []
+        keys: List[Tuple[str, str]] = []
+        remap: Dict[int, int] = {}
+        fresh: List[int] = []
+        for r in records:
+            rid = r.get("id")
+            if not rid:
+                continue
+            digest = r.get("code_sha1") or sha1((r.get("code") or "").encode("utf-8")).hexdigest()
+            ordinal = len(ids)
+            ids.append(rid)
+            keys.append((rid, digest))
+            prev = old.get((rid, digest))
+            if prev is not None:
+                remap[prev] = ordinal
+            else:
+                fresh.append(ordinal)
+        postings: Dict[str, array] = {}
+        if remap:
+            for g, p in previous.postings.items():
+                kept = array("I", [remap[o] for o in p if o in remap])
+                if kept:
+                    postings[g] = kept
+        for ordinal in fresh:
+            for g in trigrams(code_of(ids[ordinal])):
+                p = postings.get(g)
+                if p is None:
+                    p = postings[g] = array("I")
+                p.append(ordinal)
+        return cls(ids, keys, postings, code_of)
+
+    def candidates(self, literals: Iterable[str]) -> Optional[List[int]]:
+        """Ordinals that contain every trigram of every literal; None means "scan everything"."""
+        grams = set()
+        for lit in literals:
+            grams |= trigrams(lit)
+        if not grams:
+            return None
+        lists = sorted((self.postings.get(g, array("I")) for g in grams), key=len)
+        out = set(lists[0])
+        for p in lists[1:]:
+            if not out:
+                break
+            out.intersection_update(p)
+        return sorted(out)
+
+    def search(
+        self,
+        pattern: str,
+        *,
+        regex: bool = False,
+        ignore_case: bool = False,
+        context: int = 2,
+        max_matches: int = 5,
+        allowed=None,
+    ) -> Tuple[List[Tuple[str, List[CodeMatch], int]], int]:
+        """[(id, first `max_matches` matches, total matches)] in corpus order, and the candidate count.
+
+        Raises re.error for an invalid regex. `allowed(id)` filters records before scanning.
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        rx = re.compile(pattern if regex else re.escape(pattern), flags | re.MULTILINE)
+        if rx.flags & re.VERBOSE:
+            cands = None  # whitespace and comments in the pattern are not literal text
+        else:
+            cands = self.candidates(required_literals(pattern) if regex else [pattern])
+        ordinals = range(len(self.ids)) if cands is None else cands
+        out = []
+        scanned = 0
+        for o in ordinals:
+            rid = self.ids[o]
+            if allowed is not None and not allowed(rid):
+                continue
+            scanned += 1
+            code = self.code_of(rid)
+            found = [m for m in rx.finditer(code) if m.end() > m.start()]
+            if not found:
+                continue
+            lines = [ln.rstrip("\r") for ln in code.split("\n")]
+            starts = [0]
+            for ln in code.split("\n"):
+                starts.append(starts[-1] + len(ln) + 1)
+            matches: List[CodeMatch] = []
+            for m in found[:max_matches]:
+                ln = bisect_right(starts, m.start()) - 1
+                matches.append(
+                    CodeMatch(
+                        line=ln + 1,
+                        col=m.start() - starts[ln] + 1,
+                        text=lines[ln],
+                        before=lines[max(0, ln - context):ln],
+                        after=lines[ln + 1:ln + 1 + context],
+                    )
+                )
+            out.append((rid, matches, len(found)))
+        return out, scanned
+
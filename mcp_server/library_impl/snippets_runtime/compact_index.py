@@ -0,0 +1,280 @@
+"""
+Compact, memory-mappable form of the keyword index.
+
+Documents get dense integer ids; each term's postings are a sorted slice of two flat arrays
+(doc ids as uint32, pre-multiplied tf*idf weights as float64) addressed through an offsets
+array. Category and restricted-license filters are per-category bitsets, combined once per
+query instead of being evaluated for every posting. Scores are bit-identical to
+keyword_index.search, so rankings match the JSON index exactly.
+
+File layout (little-endian):
+    b"KWIX" | u32 version | u32 meta_len | meta JSON (ids, docs, terms, categories, source sha256)
+    | pad to 8 | weights f64[P] | offsets u32[T+1] | post_docs u32[P]
+    | category bitsets | restricted bitset
+
+Build it with `python -m mcp_server.library_impl.snippets_runtime.compact_index --index <keyword_index.json>`.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import json
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .keyword_index import KeywordIndex, _idf, _tokenize
+
+MAGIC = b"KWIX"
+VERSION = 2
+_HEADER = struct.Struct("<4sII")
+
+
+def _bitset(n_docs: int, members: Sequence[int]) -> bytearray:
+    bits = bytearray((n_docs + 7) // 8)
+    for d in members:
+        bits[d >> 3] |= 1 << (d & 7)
+    return bits
+
+
+def _as_array(typecode: str, buf) -> Sequence:
+    """Zero-copy view on little-endian hosts; byte-swapped copy elsewhere."""
+    if sys.byteorder == "little":
+        return memoryview(buf).cast(typecode)
+    arr = array(typecode)
+    arr.frombytes(bytes(buf))
+    arr.byteswap()
+    return arr
+
+
+def source_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class CompactIndex:
+    def __init__(
+        self,
+        *,
+        ids: List[str],
+        docs: List[Dict],
+        terms: List[str],
+        offsets: Sequence[int],
+        post_docs: Sequence[int],
+        weights: Sequence[float],
+        category_bits: Dict[str, bytes],
+        restricted_bits: bytes,
+        stopwords: Sequence[str],
+        source: Optional[str] = None,
+        _buffer=None,
+    ) -> None:
+        self.ids = ids
+        self.docs = dict(zip(ids, docs))  # same shape as KeywordIndex.docs
+        self._doc_list = docs
+        self.terms = {t: i for i, t in enumerate(terms)}
+        self._term_list = terms
+        self.offsets = offsets
+        self.post_docs = post_docs
+        self.weights = weights
+        self.category_bits = category_bits
+        self.restricted_bits = restricted_bits
+        self.stopwords = frozenset(stopwords)
+        self.source = source
+        self._names = [d.get("name") or "" for d in docs]
+        self._filters: Dict[Tuple[Optional[str], bool], Optional[bytes]] = {}
+        self._buffer = _buffer  # keeps the mmap alive for the memoryviews above
+
+    @property
+    def N(self) -> int:
+        return len(self.ids)
+
+    # ---- build / persist ----
+
+    @classmethod
+    def from_keyword_index(cls, index: KeywordIndex, *, source: Optional[str] = None) -> "CompactIndex":
+        ids = list(index.docs.keys())
+        id_to_int = {rid: i for i, rid in enumerate(ids)}
+        docs = [index.docs[rid] for rid in ids]
+        terms = sorted(index.vocab.keys())
+        offsets = array("I", [0])
+        post_docs = array("I")
+        weights = array("d")
+        for t in terms:
+            w_idf = _idf(index.N, index.df.get(t, 0))
+            postings = sorted((id_to_int[rid], tfw) for rid, tfw in index.vocab[t].items() if rid in id_to_int)
+            for d, tfw in postings:
+                post_docs.append(d)
+                weights.append(tfw * w_idf)
+            offsets.append(len(post_docs))
+        members: Dict[str, List[int]] = {}
+        restricted: List[int] = []
+        for d, doc in enumerate(docs):
+            for c in doc.get("categories") or []:
+                members.setdefault(c, []).append(d)
+            if doc.get("restricted"):
+                restricted.append(d)
+        return cls(
+            ids=ids,
+            docs=docs,
+            terms=terms,
+            offsets=offsets,
+            post_docs=post_docs,
+            weights=weights,
+            category_bits={c: bytes(_bitset(len(ids), m)) for c, m in members.items()},
+            restricted_bits=bytes(_bitset(len(ids), restricted)),
+            stopwords=index.cfg.stopwords,
+            source=source,
+        )
+
+    def save(self, path: Path) -> None:
+        categories = sorted(self.category_bits)
+        meta = json.dumps({
+            "ids": self.ids,
+            "docs": self._doc_list,
+            "terms": self._term_list,
+            "categories": categories,
+            "stopwords": sorted(self.stopwords),
+            "source": self.source,
+            "counts": {"terms": len(self._term_list), "postings": len(self.post_docs)},
+        }, ensure_ascii=False).encode("utf-8")
+        head = _HEADER.pack(MAGIC, VERSION, len(meta)) + meta
+        head += b"\0" * (-len(head) % 8)
+
+        def le(typecode: str, values) -> bytes:
+            arr = array(typecode, values)
+            if sys.byteorder != "little":
+                arr.byteswap()
+            return arr.tobytes()
+
+        body = [
+            le("d", self.weights),
+            le("I", self.offsets),
+            le("I", self.post_docs),
+        ]
+        body.extend(self.category_bits[c] for c in categories)
+        body.append(self.restricted_bits)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(head + b"".join(body))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "CompactIndex":
+        with path.open("rb") as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_len = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a v{VERSION} compact keyword index: {path}")
+        pos = _HEADER.size
+        meta = json.loads(bytes(buf[pos:pos + meta_len]).decode("utf-8"))
+        pos += meta_len
+        pos += -pos % 8
+        n_terms = meta["counts"]["terms"]
+        n_post = meta["counts"]["postings"]
+        n_bytes = (len(meta["ids"]) + 7) // 8
+        view = memoryview(buf)
+
+        def take(typecode: str, count: int, size: int):
+            nonlocal pos
+            out = _as_array(typecode, view[pos:pos + count * size])
+            pos += count * size
+            return out
+
+        weights = take("d", n_post, 8)
+        offsets = take("I", n_terms + 1, 4)
+        post_docs = take("I", n_post, 4)
+        category_bits = {}
+        for c in meta["categories"]:
+            category_bits[c] = bytes(view[pos:pos + n_bytes])
+            pos += n_bytes
+        restricted_bits = bytes(view[pos:pos + n_bytes])
+        return cls(
+            ids=meta["ids"],
+            docs=meta["docs"],
+            terms=meta["terms"],
+            offsets=offsets,
+            post_docs=post_docs,
+            weights=weights,
+            category_bits=category_bits,
+            restricted_bits=restricted_bits,
+            stopwords=meta.get("stopwords") or [],
+            source=meta.get("source"),
+            _buffer=buf,
+        )
+
+    # ---- query ----
+
+    def _allowed(self, category: Optional[str], exclude_restricted: bool) -> Optional[bytes]:
+        """Bitset of documents passing the filters (cached per filter combination), None when unfiltered."""
+        if not category and not exclude_restricted:
+            return None
+        key = (category or None, bool(exclude_restricted))
+        if key not in self._filters:
+            mask = (1 << self.N) - 1
+            if category:
+                mask &= int.from_bytes(self.category_bits.get(category, b""), "little")
+            if exclude_restricted:
+                mask &= ~int.from_bytes(self.restricted_bits, "little")
+            self._filters[key] = mask.to_bytes((self.N + 7) // 8, "little")
+        return self._filters[key]
+
+    def search(
+        self,
+        query: str,
+        *,
+        k: int = 10,
+        use_and: bool = False,
+        category: Optional[str] = None,
+        exclude_restricted: bool = False,
+    ) -> List[Tuple[str, float, Dict]]:
+        q_tokens = [t for t in _tokenize(query) if t and t not in self.stopwords]
+        if not q_tokens:
+            return []
+        tids = [self.terms.get(t) for t in q_tokens]
+        if use_and and any(tid is None for tid in tids):
+            return []
+        allowed_bits = self._allowed(category, exclude_restricted)
+        if allowed_bits is not None and not any(allowed_bits):
+            return []
+
+        offsets, post_docs, weights = self.offsets, self.post_docs, self.weights
+        scores: Dict[int, float] = {}
+        hits: Dict[int, int] = {}
+        seen_terms = set()
+        for tid in tids:
+            if tid is None:
+                continue
+            first = tid not in seen_terms
+            seen_terms.add(tid)
+            for p in range(offsets[tid], offsets[tid + 1]):
+                d = post_docs[p]
+                if allowed_bits is not None and not (allowed_bits[d >> 3] >> (d & 7)) & 1:
+                    continue
+                scores[d] = scores.get(d, 0.0) + weights[p]
+                if use_and and first:
+                    hits[d] = hits.get(d, 0) + 1
+        if use_and:
+            need = len(seen_terms)
+            scores = {d: s for d, s in scores.items() if hits.get(d) == need}
+        names = self._names
+        top = heapq.nsmallest(k, scores.items(), key=lambda kv: (-kv[1], names[kv[0]]))
+        return [(self.ids[d], sc, self._doc_list[d]) for d, sc in top]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Build the compact (memory-mappable) keyword index from keyword_index.json")
+    ap.add_argument("--index", required=True, type=Path, help="Path to keyword_index.json")
+    ap.add_argument("--out", type=Path, help="Output path (default: <index>.bin next to the JSON)")
+    args = ap.parse_args(argv)
+    out = args.out or args.index.with_suffix(".bin")
+    idx = CompactIndex.from_keyword_index(KeywordIndex.load(args.index), source=source_digest(args.index))
+    idx.save(out)
+    print(f"wrote {out} ({out.stat().st_size} bytes, {idx.N} docs, {len(idx.terms)} terms, {len(idx.post_docs)} postings)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
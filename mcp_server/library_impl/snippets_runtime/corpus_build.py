@@ -0,0 +1,432 @@
+"""
+Incremental build of the consolidated snippet corpus and its search structures.
+
+Inputs are the per-author pipeline shards in `data/krpc-snippets`
+(`snippets_<stage>[_<author>].jsonl`, stage extracted < with_deps < enriched); for each author
+only the most processed stage is read, and records from fixture repos (`file://`,
+`github.com/example/`) are left out. Every record is keyed by the sha256 of its canonical JSON.
+The build state (`corpus_build.json`) maps those keys to record ids, so on the next run a record
+whose content did not change takes its enriched form, keyword postings and embedding from the
+previous outputs and only new or edited records are processed. Dropped duplicates are not in the
+corpus, so the state keeps the fields enrichment added to them.
+
+Processing runs on a process pool when there is enough of it:
+    1. enrich: license from the record or the repo table (`repo_licenses.json`, plus licenses
+       seen on other records of the same repo), `restricted` for GPL-family licenses, sizes;
+    2. dedupe: records with identical code (dedented, trailing whitespace ignored) across repos
+       and commits collapse onto one canonical record, which lists the other locations in
+       `duplicates`. A copy that the dependency resolver still needs (a symbol another record
+       depends on, or a module's const block) stays in the corpus with `duplicate_of` set;
+       the rest are dropped. Copies are never ranked by keyword or vector search;
+    3. index: keyword postings and local-embedder vectors for canonical records, applied to the
+       existing `keyword_index.json` (and its compact `.bin`) and `embeddings.npy` in place.
+       An IVF index (`embeddings_ivf.npz`), when one is present, is rebuilt over the new vectors
+       with its previous nlist/nprobe; without NumPy it is left as is and the runtime ignores it.
+The corpus is also written as a compressed record store (`snippets_enriched.bin`, see
+record_store.py). The trigram code index is not persisted: the runtime rebuilds it from the
+store's metadata and carries over the postings of records whose code hash is unchanged.
+
+Run `python -m mcp_server.library_impl.snippets_runtime.corpus_build` (see `--help`).
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .ann_index import IVFIndex
+from .compact_index import CompactIndex, source_digest
+from .keyword_index import KeywordConfig, KeywordIndex, doc_meta, doc_terms
+from .local_embedder import LocalEmbedder
+from .record_store import RecordStore
+from .resolver import _deps_for, _module_of, _symbol_key
+from .store import load_records
+from .vector_matrix import EmbeddingMatrix, np
+
+STATE_VERSION = 1
+STAGES = ("extracted", "with_deps", "enriched")
+_SHARD_RE = re.compile(r"^snippets_(extracted|with_deps|enriched)(?:_(\w+))?\.jsonl$")
+_FIXTURE_REPOS = ("file://", "https://github.com/example/")
+_RESTRICTED = ("GPL", "AGPL", "LGPL")
+POOL_MIN = 64  # fewer records than this are processed inline; spawning workers costs more
+
+
+@dataclass
+class BuildPaths:
+    corpus: Path
+    records: Path
+    index: Path
+    index_bin: Path
+    vectors: Path
+    ann: Path
+    embedder: Path
+    licenses: Path
+    state: Path
+
+    @classmethod
+    def under(cls, base: Path) -> "BuildPaths":
+        return cls(
+            corpus=base / "snippets_enriched.jsonl",
+            records=base / "snippets_enriched.bin",
+            index=base / "keyword_index.json",
+            index_bin=base / "keyword_index.bin",
+            vectors=base / "embeddings.npy",
+            ann=base / "embeddings_ivf.npz",
+            embedder=base / "local_embedder",
+            licenses=base / "repo_licenses.json",
+            state=base / "corpus_build.json",
+        )
+
+
+@dataclass
+class BuildReport:
+    shards: List[str] = field(default_factory=list)
+    records: int = 0
+    reused: int = 0
+    enriched: int = 0
+    indexed: int = 0
+    embedded: int = 0
+    removed: int = 0
+    aliases: int = 0
+    dropped: int = 0
+    corpus: int = 0
+    pooled: bool = False
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.shards)} shards, {self.records} records: {self.reused} unchanged, {self.enriched} enriched, "
+            f"{self.indexed} indexed, {self.embedded} embedded, {self.removed} removed; "
+            f"{self.dropped} duplicates dropped, {self.aliases} kept as aliases -> {self.corpus} records"
+            + (" (process pool)" if self.pooled else "")
+        )
+
+
+def discover_shards(base: Path, exclude: Sequence[Path] = ()) -> List[Path]:
+    """The most processed non-empty shard per author (`""` for the unsuffixed stage files)."""
+    skip = {p.resolve() for p in exclude}
+    best: Dict[str, Tuple[int, Path]] = {}
+    for p in sorted(base.glob("snippets_*.jsonl")):
+        m = _SHARD_RE.match(p.name)
+        if not m or p.resolve() in skip or p.stat().st_size == 0:
+            continue
+        author, stage = m.group(2) or "", STAGES.index(m.group(1))
+        if author not in best or stage > best[author][0]:
+            best[author] = (stage, p)
+    return [p for _, p in sorted(best.values(), key=lambda sp: sp[1].name)]
+
+
+def content_key(rec: Dict) -> str:
+    return hashlib.sha256(json.dumps(rec, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def code_key(code: str) -> str:
+    norm = "\n".join(line.rstrip() for line in textwrap.dedent(code or "").strip().splitlines())
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+# ---- worker side (also run inline) ----
+
+_WORKER: Dict[str, object] = {}
+
+
+def _init_worker(licenses: Dict[str, Dict[str, str]], cfg: Dict, embedder_path: Optional[str]) -> None:
+    _WORKER["licenses"] = licenses
+    _WORKER["cfg"] = KeywordConfig(**cfg)
+    _WORKER["embedder"] = LocalEmbedder.load(Path(embedder_path)) if embedder_path else None
+
+
+# Fields enrich() sets; the build state keeps them for dropped duplicates.
+ENRICHED_FIELDS = ("license", "license_url", "restricted", "size_bytes", "lines_of_code")
+
+
+def enrich(rec: Dict, licenses: Dict[str, Dict[str, str]]) -> Dict:
+    out = dict(rec)
+    out.pop("duplicates", None)
+    out.pop("duplicate_of", None)
+    lic = str(out.get("license") or "UNKNOWN")
+    url = str(out.get("license_url") or "")
+    known = licenses.get(str(out.get("repo") or ""))
+    if lic.upper() in ("", "UNKNOWN", "NOASSERTION") and known:
+        lic, url = known["license"], known.get("license_url", "")
+    out["license"] = lic
+    out["license_url"] = "" if url == "about:blank" else url
+    out["restricted"] = lic.upper().startswith(_RESTRICTED) or bool(out.get("restricted"))
+    code = str(out.get("code") or "")
+    out.setdefault("size_bytes", len(code.encode("utf-8")))
+    out.setdefault("lines_of_code", len(code.splitlines()))
+    return out
+
+
+def _enrich_task(rec: Dict) -> Dict:
+    return enrich(rec, _WORKER["licenses"])  # type: ignore[arg-type]
+
+
+def _index_task(rec: Dict) -> Tuple[Dict[str, float], Optional[List[float]]]:
+    emb = _WORKER["embedder"]
+    vec = emb.embed_record(rec) if emb is not None else None  # type: ignore[union-attr]
+    return doc_terms(rec, _WORKER["cfg"]), vec  # type: ignore[arg-type]
+
+
+# ---- driver ----
+
+
+def _repo_licenses(path: Path, records: Iterable[Dict]) -> Dict[str, Dict[str, str]]:
+    """The license table, extended with licenses already known on other records of the same repo."""
+    table: Dict[str, Dict[str, str]] = {}
+    try:
+        table.update(json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError):
+        pass
+    for r in records:
+        lic = str(r.get("license") or "")
+        repo = str(r.get("repo") or "")
+        if repo and lic.upper() not in ("", "UNKNOWN", "NOASSERTION") and repo not in table:
+            url = str(r.get("license_url") or "")
+            table[repo] = {"license": lic, "license_url": "" if url == "about:blank" else url}
+    return table
+
+
+def _file_digest(path: Path) -> Optional[str]:
+    try:
+        return source_digest(path)
+    except OSError:
+        return None
+
+
+def dedupe(records: List[Dict]) -> Tuple[List[Dict], int, int]:
+    """(corpus, aliases kept, copies dropped). `records` are enriched, in input order."""
+    groups: Dict[str, List[int]] = {}
+    for i, r in enumerate(records):
+        groups.setdefault(code_key(r.get("code") or ""), []).append(i)
+    canonical_of: Dict[int, int] = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        # Unrestricted first, then the oldest copy; ties by location so the choice is stable.
+        best = min(members, key=lambda i: (bool(records[i].get("restricted")), str(records[i].get("created_at") or ""),
+                                           str(records[i].get("repo") or ""), str(records[i].get("path") or ""), records[i].get("id") or ""))
+        for i in members:
+            if i != best:
+                canonical_of[i] = best
+
+    kept = [i not in canonical_of for i in range(len(records))]
+    changed = True
+    while changed:  # copies the resolver reaches from kept records, to a fixpoint
+        needed = {d for i, r in enumerate(records) if kept[i] for d in _deps_for(r)}
+        modules = {_module_of(r) for i, r in enumerate(records) if kept[i]}
+        changed = False
+        for i in canonical_of:
+            r = records[i]
+            is_const = (r.get("categories") or [None])[0] == "const"
+            if not kept[i] and (_symbol_key(r) in needed or (is_const and _module_of(r) in modules)):
+                kept[i] = changed = True
+
+    out: List[Dict] = []
+    dups: Dict[int, List[Dict]] = {}
+    for i, c in canonical_of.items():
+        r = records[i]
+        dups.setdefault(c, []).append({"id": r.get("id"), "repo": r.get("repo"), "path": r.get("path"), "commit": r.get("commit")})
+    for i, r in enumerate(records):
+        if not kept[i]:
+            continue
+        r = dict(r)
+        if i in canonical_of:
+            r["duplicate_of"] = records[canonical_of[i]].get("id")
+        if i in dups:
+            r["duplicates"] = dups[i]
+        out.append(r)
+    aliases = sum(1 for i in canonical_of if kept[i])
+    return out, aliases, len(canonical_of) - aliases
+
+
+def _run(task: Callable, items: List, pool: Optional[ProcessPoolExecutor], workers: int) -> List:
+    if pool is None or len(items) < POOL_MIN:
+        return [task(x) for x in items]
+    return list(pool.map(task, items, chunksize=max(1, len(items) // (4 * workers))))
+
+
+def _row(matrix: EmbeddingMatrix, i: int) -> List[float]:
+    if np is not None and isinstance(matrix.rows, np.ndarray):
+        return matrix.rows[i].tolist()
+    return [float(x) for x in matrix.rows[i * matrix.dim:(i + 1) * matrix.dim]]
+
+
+def _read_shards(shards: Sequence[Path], include_fixtures: bool) -> List[Tuple[str, Dict]]:
+    raw: List[Tuple[str, Dict]] = []
+    seen: Dict[str, int] = {}
+    for shard in shards:
+        for rec in load_records(shard):
+            rid = rec.get("id")
+            if not rid or (not include_fixtures and str(rec.get("repo") or "").startswith(_FIXTURE_REPOS)):
+                continue
+            if rid in seen:  # the same record in two shards: the later shard wins
+                raw[seen[rid]] = (content_key(rec), rec)
+            else:
+                seen[rid] = len(raw)
+                raw.append((content_key(rec), rec))
+    return raw
+
+
+def build_corpus(shards: Sequence[Path], paths: BuildPaths, *, jobs: int = 0, full: bool = False, include_fixtures: bool = False) -> BuildReport:
+    report = BuildReport(shards=[str(p) for p in shards])
+    raw = _read_shards(shards, include_fixtures)
+    report.records = len(raw)
+
+    cfg = KeywordConfig()
+    licenses = _repo_licenses(paths.licenses, (r for _, r in raw))
+    embedder_digest = _file_digest(paths.embedder.with_suffix(".json"))
+    # Anything here changing invalidates every record's derived data.
+    pipeline = {
+        "licenses": hashlib.sha256(json.dumps(licenses, sort_keys=True).encode("utf-8")).hexdigest(),
+        "keyword_cfg": cfg.__dict__,
+        "embedder": embedder_digest,
+    }
+    state: Dict = {}
+    if not full:
+        try:
+            state = json.loads(paths.state.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = {}
+        if state.get("version") != STATE_VERSION or state.get("pipeline") != pipeline:
+            state = {}
+    prev_ids: Dict[str, str] = state.get("records") or {}
+    prev_dropped: Dict[str, Dict] = state.get("dropped") or {}
+    prev_corpus = {r["id"]: r for r in load_records(paths.corpus)} if state else {}
+    index = KeywordIndex.load(paths.index) if state and paths.index.exists() else KeywordIndex(vocab={}, df={}, docs={}, N=0, cfg=cfg)
+    matrix: Optional[EmbeddingMatrix] = None
+    if state and embedder_digest and paths.vectors.exists():
+        try:
+            matrix = EmbeddingMatrix.load(paths.vectors)
+        except (OSError, ValueError):
+            matrix = None
+    rows = {rid: i for i, rid in enumerate(matrix.ids)} if matrix is not None else {}
+
+    init = (licenses, cfg.__dict__, str(paths.embedder) if embedder_digest else None)
+    _init_worker(*init)  # the inline path runs the same tasks in this process
+    workers = jobs or (os.cpu_count() or 1)
+    pool: Optional[ProcessPoolExecutor] = None
+
+    def pool_for(n: int) -> Optional[ProcessPoolExecutor]:
+        nonlocal pool
+        if pool is None and workers > 1 and n >= POOL_MIN:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init)
+            report.pooled = True
+        return pool
+
+    try:
+        # 1. enrich what changed; unchanged records come back from the previous corpus
+        enriched: List[Optional[Dict]] = []
+        unchanged = set()
+        for key, rec in raw:
+            prev = prev_corpus.get(rec["id"]) if prev_ids.get(key) == rec["id"] else None
+            if prev is None and key in prev_dropped:
+                prev = dict(rec, **prev_dropped[key])
+            if prev is not None:
+                prev = {k: v for k, v in prev.items() if k not in ("duplicates", "duplicate_of")}
+                unchanged.add(rec["id"])
+            enriched.append(prev)
+        todo = [i for i, r in enumerate(enriched) if r is None]
+        for i, rec in zip(todo, _run(_enrich_task, [raw[i][1] for i in todo], pool_for(len(todo)), workers)):
+            enriched[i] = rec
+        report.enriched, report.reused = len(todo), len(unchanged)
+
+        # 2. dedupe
+        corpus, report.aliases, report.dropped = dedupe([r for r in enriched if r is not None])
+        report.corpus = len(corpus)
+
+        # 3. update the keyword index and embeddings in place
+        ranked = {r["id"]: r for r in corpus if not r.get("duplicate_of")}
+        report.removed = index.remove([rid for rid in list(index.docs) if rid not in ranked or rid not in unchanged])
+        need = [r for rid, r in ranked.items() if rid not in index.docs or (embedder_digest and rid not in rows)]
+        fresh: Dict[str, Optional[List[float]]] = {}
+        for rec, (terms, vec) in zip(need, _run(_index_task, need, pool_for(len(need)), workers)):
+            if rec["id"] not in index.docs:
+                index.add(rec["id"], terms, doc_meta(rec))
+                report.indexed += 1
+            fresh[rec["id"]] = vec
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    vectors: Optional[Dict[str, List[float]]] = None
+    if embedder_digest:
+        vectors = {}
+        for rid in ranked:
+            vec = fresh.get(rid)
+            vectors[rid] = vec if vec is not None else _row(matrix, rows[rid])  # type: ignore[arg-type]
+        report.embedded = sum(1 for v in fresh.values() if v is not None)
+
+    _write_outputs(paths, corpus, index, vectors, _WORKER["embedder"])
+    ids = {r["id"] for r in corpus}
+    new_state = {
+        "version": STATE_VERSION,
+        "pipeline": pipeline,
+        "shards": {p.name: _file_digest(p) for p in shards},
+        "records": {key: rec["id"] for key, rec in raw},
+        "dropped": {key: {f: rec.get(f) for f in ENRICHED_FIELDS} for (key, _), rec in zip(raw, enriched) if rec["id"] not in ids},
+    }
+    _atomic_write(paths.state, json.dumps(new_state, indent=1, sort_keys=True))
+    return report
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def _write_outputs(paths: BuildPaths, corpus: List[Dict], index: KeywordIndex, vectors: Optional[Dict[str, List[float]]], embedder) -> None:
+    _atomic_write(paths.corpus, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in corpus))
+    RecordStore.from_records(corpus, source=source_digest(paths.corpus)).save(paths.records)
+    tmp = paths.index.with_suffix(paths.index.suffix + ".tmp")
+    index.save(tmp)
+    tmp.replace(paths.index)
+    CompactIndex.from_keyword_index(index, source=source_digest(paths.index)).save(paths.index_bin)
+    if vectors is not None:
+        matrix = EmbeddingMatrix.from_vectors(vectors, model=embedder.model)
+        matrix.save(paths.vectors)
+        if np is not None and paths.ann.exists():
+            _rebuild_ann(paths.ann, matrix)
+
+
+def _rebuild_ann(path: Path, matrix: EmbeddingMatrix) -> None:
+    try:
+        old = IVFIndex.load(path)
+        nlist, nprobe = old.nlist, old.nprobe
+    except Exception:
+        nlist = nprobe = None
+    if not len(matrix):
+        path.unlink()
+        return
+    IVFIndex.build(matrix, nlist=nlist, nprobe=nprobe).save(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    data = Path(__file__).resolve().parents[3] / "data" / "krpc-snippets"
+    ap = argparse.ArgumentParser(description="Build the deduplicated snippet corpus, keyword index and embeddings from pipeline shards")
+    ap.add_argument("shards", nargs="*", type=Path, help="Shard JSONL files (default: newest stage per author in --data)")
+    ap.add_argument("--data", type=Path, default=data, help="Directory holding shards and outputs")
+    ap.add_argument("--jobs", type=int, default=0, help="Worker processes (default: CPU count; 1 disables the pool)")
+    ap.add_argument("--full", action="store_true", help="Ignore the build state and reprocess every record")
+    ap.add_argument("--include-fixtures", action="store_true", help="Keep records from file:// and example repos")
+    args = ap.parse_args(argv)
+    paths = BuildPaths.under(args.data)
+    shards = args.shards or discover_shards(args.data, exclude=[paths.corpus])
+    if not shards:
+        print(f"no shards in {args.data}", file=sys.stderr)
+        return 1
+    report = build_corpus(shards, paths, jobs=args.jobs, full=args.full, include_fixtures=args.include_fixtures)
+    print(report.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
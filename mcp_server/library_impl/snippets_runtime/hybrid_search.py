@@ -4,11 +4,19 @@ import json
 import math
 import os
 import random
+import sys
+from array import array
 from dataclasses import dataclass
+from hashlib import sha256
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
+from .compact_index import CompactIndex
 from .keyword_index import KeywordIndex, search as kw_search
+from .local_embedder import LocalEmbedder
+from .model_cache import ModelCache
+from .ann_index import IVFIndex
+from .vector_matrix import EmbeddingMatrix
 
 
 @dataclass
@@ -47,7 +55,15 @@ def load_embeddings_sqlite(path: Path) -> VecStore:
     model = ""
     for rid, mdl, d, vjson in conn.execute("select id, model, dim, vector from embeddings"):
         try:
-            vec = json.loads(vjson)
+            if isinstance(vjson, (bytes, memoryview)):
+                # float32 BLOB rows (little-endian) load without a JSON parse
+                buf = array("f")
+                buf.frombytes(bytes(vjson))
+                if sys.byteorder != "little":
+                    buf.byteswap()
+                vec = buf.tolist()
+            else:
+                vec = json.loads(vjson)
         except Exception:
             continue
         vectors[rid] = vec
@@ -87,23 +103,43 @@ def _openai_client_or_none():
         return None
 
 
-def embed_query(text: str, *, model: str, dim: int, mock: bool, cache_dir: Optional[Path] = None) -> List[float]:
+def _mock_vector(text: str, model: str, dim: int) -> List[float]:
+    # Seeded from a stable digest: hash() is randomised per process.
+    rnd = random.Random(int.from_bytes(sha256((text + model).encode("utf-8")).digest()[:8], "little"))
+    return [rnd.uniform(-1.0, 1.0) for _ in range(max(1, dim))]
+
+
+def embed_query(
+    text: str,
+    *,
+    model: str,
+    dim: int,
+    mock: bool,
+    cache_dir: Optional[Path] = None,
+    embedder: Optional[LocalEmbedder] = None,
+    cache: Optional[ModelCache] = None,
+) -> List[float]:
+    if embedder is not None and model == embedder.model:
+        # Offline embedder the corpus vectors were built with: deterministic, no network.
+        return embedder.embed(text)
+    cached = None if mock or cache is None else cache.get_embedding(model, text)
     if mock:
-        rnd = random.Random(hash(text + model) & 0xFFFFFFFF)
-        v = [rnd.uniform(-1.0, 1.0) for _ in range(max(1, dim))]
+        v = _mock_vector(text, model, dim)
+    elif cached is not None:
+        v = cached
     else:
         client = _openai_client_or_none()
         if client is None:
             # Fallback to mock if no key available
-            rnd = random.Random(hash(text + model) & 0xFFFFFFFF)
-            v = [rnd.uniform(-1.0, 1.0) for _ in range(max(1, dim))]
+            v = _mock_vector(text, model, dim)
         else:
             try:
                 resp = client.embeddings.create(model=model, input=[text])
                 v = list(resp.data[0].embedding)
+                if cache is not None:
+                    cache.put_embedding(model, text, v)
             except Exception:
-                rnd = random.Random(hash(text + model) & 0xFFFFFFFF)
-                v = [rnd.uniform(-1.0, 1.0) for _ in range(max(1, dim))]
+                v = _mock_vector(text, model, dim)
     # L2 normalize
     s = math.sqrt(sum(x * x for x in v)) or 1.0
     return [x / s for x in v]
@@ -115,7 +151,18 @@ def _cosine(a: List[float], b: List[float]) -> float:
     return sum(x * y for x, y in zip(a, b))
 
 
-def vector_search(store: VecStore, qvec: List[float], k: int = 10) -> List[Tuple[str, float]]:
+def vector_search(
+    store: Union[VecStore, EmbeddingMatrix],
+    qvec: List[float],
+    k: int = 10,
+    *,
+    ann: Optional[IVFIndex] = None,
+    nprobe: Optional[int] = None,
+) -> List[Tuple[str, float]]:
+    if isinstance(store, EmbeddingMatrix):
+        if ann is not None:
+            return ann.search(store, qvec, k=k, nprobe=nprobe)
+        return store.search(qvec, k=k)
     scores: List[Tuple[str, float]] = []
     for rid, vec in store.vectors.items():
         sc = _cosine(vec, qvec)
@@ -136,8 +183,8 @@ def _minmax_norm(pairs: List[Tuple[str, float]]) -> Dict[str, float]:
 
 
 def search_hybrid(
-    idx: KeywordIndex,
-    store: VecStore,
+    idx: Union[KeywordIndex, CompactIndex],
+    store: Union[VecStore, EmbeddingMatrix],
     query: str,
     *,
     k: int = 10,
@@ -148,14 +195,26 @@ def search_hybrid(
     exclude_restricted: bool = False,
     mock_query_embed: bool = False,
     embed_model: Optional[str] = None,
+    ann: Optional[IVFIndex] = None,
+    nprobe: Optional[int] = None,
+    embedder: Optional[LocalEmbedder] = None,
+    cache: Optional[ModelCache] = None,
 ) -> List[Dict]:
     # Keyword phase
-    kw = kw_search(idx, query, k=k * 3, use_and=use_and, category=category, exclude_restricted=exclude_restricted)
+    search = idx.search if isinstance(idx, CompactIndex) else (lambda q, **kw: kw_search(idx, q, **kw))
+    kw = search(query, k=k * 3, use_and=use_and, category=category, exclude_restricted=exclude_restricted)
     kw_norm = _minmax_norm([(rid, sc) for rid, sc, _ in kw])
 
     # Vector phase
-    qvec = embed_query(query, model=(embed_model or store.model or "text-embedding-3-small"), dim=max(1, store.dim), mock=mock_query_embed)
-    vec = vector_search(store, qvec, k=k * 3)
+    qvec = embed_query(
+        query,
+        model=(embed_model or store.model or "text-embedding-3-small"),
+        dim=max(1, store.dim),
+        mock=mock_query_embed,
+        embedder=embedder,
+        cache=cache,
+    )
+    vec = vector_search(store, qvec, k=k * 3, ann=ann, nprobe=nprobe)
     vec_norm = _minmax_norm(vec)
 
     # Combine ids
@@ -5,7 +5,7 @@ import math
 import re
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 _TOKEN_RE = re.compile(r"[A-Za-z0-9_]+")
@@ -74,6 +74,38 @@ class KeywordIndex:
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
 
+    def add(self, rid: str, terms: Dict[str, float], meta: Dict) -> None:
+        """Add one document's postings (from `doc_terms`) in place."""
+        for tok, tfw in terms.items():
+            bucket = self.vocab.setdefault(tok, {})
+            if rid not in bucket:
+                self.df[tok] = self.df.get(tok, 0) + 1
+            bucket[rid] = bucket.get(rid, 0.0) + tfw
+        self.docs[rid] = meta
+        self.N = len(self.docs)
+
+    def remove(self, rids: Iterable[str]) -> int:
+        """Drop documents and their postings in place (one pass over the vocabulary); returns how many were present."""
+        gone = {rid for rid in rids if rid in self.docs}
+        if not gone:
+            return 0
+        for tok in list(self.vocab):
+            bucket = self.vocab[tok]
+            hit = [rid for rid in bucket if rid in gone]
+            if not hit:
+                continue
+            for rid in hit:
+                del bucket[rid]
+            if bucket:
+                self.df[tok] -= len(hit)
+            else:
+                del self.vocab[tok]
+                self.df.pop(tok, None)
+        for rid in gone:
+            del self.docs[rid]
+        self.N = len(self.docs)
+        return len(gone)
+
     @staticmethod
     def load(path: Path) -> "KeywordIndex":
         obj = json.loads(path.read_text(encoding="utf-8"))
@@ -88,50 +120,47 @@ def _add_tokens(weighted_tf: Dict[str, float], text: str, weight: float, stopwor
         weighted_tf[t] = weighted_tf.get(t, 0.0) + weight
 
 
-def build_index(snippets: List[Dict], cfg: Optional[KeywordConfig] = None) -> KeywordIndex:
+def doc_terms(rec: Dict, cfg: KeywordConfig) -> Dict[str, float]:
+    """Field-weighted term frequencies of one record."""
+    wtf: Dict[str, float] = {}
+    # name
+    if rec.get("name"):
+        _add_tokens(wtf, rec["name"], cfg.weight_name, cfg.stopwords)
+    # categories
+    for c in (rec.get("categories") or []):
+        _add_tokens(wtf, str(c), cfg.weight_categories, cfg.stopwords)
+    # inputs
+    for inp in (rec.get("inputs") or []):
+        _add_tokens(wtf, str(inp), cfg.weight_inputs, cfg.stopwords)
+    # description
+    if rec.get("description"):
+        _add_tokens(wtf, rec["description"], cfg.weight_description, cfg.stopwords)
+    # code head
+    if rec.get("code"):
+        _add_tokens(wtf, rec["code"][: cfg.code_head_chars], cfg.weight_code_head, cfg.stopwords)
+    return wtf
+
+
+def doc_meta(rec: Dict) -> Dict:
+    return {
+        "name": rec.get("name"),
+        "path": rec.get("path"),
+        "categories": rec.get("categories") or [],
+        "restricted": bool(rec.get("restricted")) if rec.get("restricted") is not None else False,
+        "description": rec.get("description") or "",
+    }
+
+
+def build_index(snippets: Iterable[Dict], cfg: Optional[KeywordConfig] = None) -> KeywordIndex:
     cfg = cfg or KeywordConfig()
-    vocab: Dict[str, Dict[str, float]] = {}
-    df: Dict[str, int] = {}
-    docs: Dict[str, Dict] = {}
-
+    index = KeywordIndex(vocab={}, df={}, docs={}, N=0, cfg=cfg)
     for rec in snippets:
         rid = rec.get("id")
-        if not rid:
+        # Copies of another record's code (see corpus_build) stay resolvable but are not ranked.
+        if not rid or rec.get("duplicate_of"):
             continue
-        wtf: Dict[str, float] = {}
-        # name
-        if rec.get("name"):
-            _add_tokens(wtf, rec["name"], cfg.weight_name, cfg.stopwords)
-        # categories
-        for c in (rec.get("categories") or []):
-            _add_tokens(wtf, str(c), cfg.weight_categories, cfg.stopwords)
-        # inputs
-        for inp in (rec.get("inputs") or []):
-            _add_tokens(wtf, str(inp), cfg.weight_inputs, cfg.stopwords)
-        # description
-        if rec.get("description"):
-            _add_tokens(wtf, rec["description"], cfg.weight_description, cfg.stopwords)
-        # code head
-        if rec.get("code"):
-            _add_tokens(wtf, rec["code"][: cfg.code_head_chars], cfg.weight_code_head, cfg.stopwords)
-
-        # Update vocab/df
-        for tok, tfw in wtf.items():
-            bucket = vocab.setdefault(tok, {})
-            if rid not in bucket:
-                df[tok] = df.get(tok, 0) + 1
-            bucket[rid] = bucket.get(rid, 0.0) + tfw
-
-        # Store doc meta
-        docs[rid] = {
-            "name": rec.get("name"),
-            "path": rec.get("path"),
-            "categories": rec.get("categories") or [],
-            "restricted": bool(rec.get("restricted")) if rec.get("restricted") is not None else False,
-            "description": rec.get("description") or "",
-        }
-
-    return KeywordIndex(vocab=vocab, df=df, docs=docs, N=len(docs), cfg=cfg)
+        index.add(rid, doc_terms(rec, cfg), doc_meta(rec))
+    return index
 
 
 def _idf(N: int, df: int) -> float:
@@ -0,0 +1,373 @@
+"""
+Small learned reranker trained offline from hand-graded queries on the production corpus.
+
+Each (query, candidate) pair becomes a handful of features: the hybrid keyword / vector / fused
+scores plus the saturated term-frequency overlap (tf / (tf + k1), averaged over query terms) of
+the query with the candidate's name, path, description and categories (one feature per field,
+so the field weights are learned), an exact-name flag and a category-mention flag. A logistic
+regression over those features is trained with plain gradient descent and stored as a JSON
+weight vector; scoring is a few field tokenisations and one dot product per candidate (tens of
+microseconds).
+
+Labels come from eval_rerank.json (grade 2 = answers the query, 1 = useful related code), graded
+against snippets_enriched.jsonl. `train` also stores the leave-one-query-out report in the
+model; the runtime only uses a model whose report beats both the token-overlap mock and
+keyword-only search, and otherwise keeps the mock.
+
+    python -m mcp_server.library_impl.snippets_runtime.learned_rerank train
+    python -m mcp_server.library_impl.snippets_runtime.learned_rerank report
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .keyword_index import _tokenize
+
+MODEL_VERSION = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELDS = ("name", "path", "desc", "category")
+CATEGORY_WORDS = {"class": "class", "function": "function", "func": "function", "method": "method", "const": "const", "constant": "const", "constants": "const"}
+
+FEATURES = (
+    "kw_score",
+    "vec_score",
+    "fused_score",
+    "name_exact",
+    "name_bm25",
+    "path_bm25",
+    "desc_bm25",
+    "category_bm25",
+    "category_mention",
+)
+
+
+def _field_tokens(row: Dict) -> Dict[str, List[str]]:
+    """Tokens per field; the description is cut to the 200-char preview search rows carry."""
+    return {
+        "name": _tokenize(str(row.get("name") or "")),
+        "path": _tokenize(str(row.get("path") or "")),
+        "desc": _tokenize(str(row.get("preview") or (row.get("description") or "")[:200])),
+        "category": [t for c in row.get("categories") or [] for t in _tokenize(str(c))],
+    }
+
+
+class FieldStats:
+    """Per-field document frequencies and average lengths of a corpus, for per-field BM25."""
+
+    def __init__(self, n: int = 0, avgdl: Optional[Dict[str, float]] = None, df: Optional[Dict[str, Dict[str, int]]] = None) -> None:
+        self.n = int(n)
+        self.avgdl = avgdl or {}
+        self.df = df or {}
+
+    @classmethod
+    def build(cls, records: Sequence[Dict]) -> "FieldStats":
+        n = 0
+        total = {f: 0 for f in FIELDS}
+        df: Dict[str, Dict[str, int]] = {f: {} for f in FIELDS}
+        for rec in records:
+            # Same documents as the keyword index: copies are never ranked.
+            if not rec.get("id") or rec.get("duplicate_of"):
+                continue
+            n += 1
+            for f, tokens in _field_tokens(rec).items():
+                total[f] += len(tokens)
+                for t in set(tokens):
+                    df[f][t] = df[f].get(t, 0) + 1
+        return cls(n, {f: total[f] / n if n else 0.0 for f in FIELDS}, df)
+
+    def to_dict(self) -> Dict:
+        return {"n": self.n, "avgdl": self.avgdl, "df": self.df}
+
+    @classmethod
+    def from_dict(cls, obj: Dict) -> "FieldStats":
+        return cls(obj.get("n", 0), obj.get("avgdl"), obj.get("df"))
+
+    def bm25(self, field: str, q_terms: Sequence[str], tokens: Sequence[str]) -> float:
+        if not tokens or not q_terms:
+            return 0.0
+        counts: Dict[str, int] = {}
+        for t in tokens:
+            counts[t] = counts.get(t, 0) + 1
+        avgdl = self.avgdl.get(field) or len(tokens)
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * len(tokens) / avgdl)
+        df = self.df.get(field) or {}
+        score = 0.0
+        for t in q_terms:
+            tf = counts.get(t, 0)
+            if tf:
+                d = df.get(t, 0)
+                idf = math.log(1.0 + (self.n - d + 0.5) / (d + 0.5))
+                score += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        return score
+
+
+_NO_STATS = FieldStats()
+
+
+def _query_parts(query: str) -> Tuple[List[str], str, set]:
+    q_tokens = [t for t in _tokenize(query) if t]
+    return q_tokens, "".join(q_tokens), {CATEGORY_WORDS[t] for t in q_tokens if t in CATEGORY_WORDS}
+
+
+def _row_features(parts: Tuple[List[str], str, set], row: Dict, stats: FieldStats) -> List[float]:
+    q_tokens, q_norm, mentioned = parts
+    name = str(row.get("name") or "")
+    cats = [str(c) for c in row.get("categories") or []]
+    fields = _field_tokens(row)
+    last_tokens = _tokenize(name.rsplit(".", 1)[-1])
+    q_terms = list(dict.fromkeys(q_tokens))
+    return [
+        float(row.get("kw_score") or 0.0),
+        float(row.get("vec_score") or 0.0),
+        float(row.get("score") or 0.0),
+        1.0 if q_norm and q_norm in ("".join(last_tokens), "".join(fields["name"])) else 0.0,
+        *(stats.bm25(f, q_terms, fields[f]) for f in FIELDS),
+        1.0 if mentioned & set(cats) else 0.0,
+    ]
+
+
+def features(query: str, row: Dict, stats: Optional[FieldStats] = None) -> List[float]:
+    """Feature vector (ordered as FEATURES) for one hybrid result row; `stats` come from the corpus."""
+    return _row_features(_query_parts(query), row, stats or _NO_STATS)
+
+
+def _sigmoid(z: float) -> float:
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+
+class LocalReranker:
+    def __init__(self, weights: Sequence[float], bias: float, *, stats: Optional[FieldStats] = None, meta: Optional[Dict] = None) -> None:
+        if len(weights) != len(FEATURES):
+            raise ValueError(f"expected {len(FEATURES)} weights, got {len(weights)}")
+        self.weights = list(weights)
+        self.bias = float(bias)
+        self.stats = stats or _NO_STATS
+        self.meta = meta or {}
+
+    def _score(self, parts, row: Dict) -> float:
+        return _sigmoid(self.bias + sum(w * x for w, x in zip(self.weights, _row_features(parts, row, self.stats))))
+
+    def score(self, query: str, row: Dict) -> float:
+        return self._score(_query_parts(query), row)
+
+    def score_rows(self, query: str, rows: Sequence[Dict]) -> Dict[str, float]:
+        parts = _query_parts(query)
+        return {str(r.get("id")): self._score(parts, r) for r in rows}
+
+    @classmethod
+    def train(
+        cls,
+        samples: Sequence[Tuple[List[float], int]],
+        *,
+        stats: Optional[FieldStats] = None,
+        epochs: int = 400,
+        lr: float = 0.5,
+        l2: float = 1e-3,
+    ) -> "LocalReranker":
+        """Pointwise logistic regression; positives are weighted by their relevance grade.
+
+        `stats` must be the FieldStats the sample features were computed with.
+        """
+        w = [0.0] * len(FEATURES)
+        b = 0.0
+        n = max(1, len(samples))
+        for _ in range(epochs):
+            gw = [l2 * wi for wi in w]
+            gb = 0.0
+            for x, grade in samples:
+                y = 1.0 if grade > 0 else 0.0
+                weight = float(grade) if grade > 0 else 1.0
+                err = weight * (_sigmoid(b + sum(wi * xi for wi, xi in zip(w, x))) - y) / n
+                gb += err
+                for i, xi in enumerate(x):
+                    gw[i] += err * xi
+            w = [wi - lr * g for wi, g in zip(w, gw)]
+            b -= lr * gb
+        return cls(w, b, stats=stats, meta={"samples": len(samples), "epochs": epochs, "l2": l2})
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        obj = {
+            "version": MODEL_VERSION,
+            "features": list(FEATURES),
+            "weights": self.weights,
+            "bias": self.bias,
+            "meta": self.meta,
+            "field_stats": self.stats.to_dict(),
+        }
+        path.write_text(json.dumps(obj, indent=2) + "\n", encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "LocalReranker":
+        obj = json.loads(path.read_text(encoding="utf-8"))
+        if obj.get("version") != MODEL_VERSION or obj.get("features") != list(FEATURES):
+            raise ValueError(f"{path}: reranker model does not match this feature set")
+        return cls(obj["weights"], obj["bias"], stats=FieldStats.from_dict(obj.get("field_stats") or {}), meta=obj.get("meta"))
+
+    @property
+    def qualified(self) -> bool:
+        """True when the stored evaluation shows this model beating the mock and keyword-only ranking."""
+        return beats_baselines(self.meta.get("report") or {})
+
+
+# ---------- labelled data, retrieval pipeline and metrics ----------
+
+
+def load_labels(path: Path) -> Dict[str, Dict[str, int]]:
+    """{query: {id: grade}} from a graded label file (see eval_rerank.json)."""
+    if not path.exists():
+        return {}
+    labels: Dict[str, Dict[str, int]] = {}
+    for q in json.loads(path.read_text(encoding="utf-8")).get("queries", []):
+        grades = labels.setdefault(q["text"], {})
+        for item in q.get("grades") or []:
+            grades[item["id"]] = max(grades.get(item["id"], 0), int(item["grade"]))
+    return labels
+
+
+def ndcg_at(ranked: Sequence[str], grades: Dict[str, int], k: int) -> float:
+    dcg = sum((2 ** grades.get(rid, 0) - 1) / math.log2(i + 2) for i, rid in enumerate(ranked[:k]))
+    ideal = sorted(grades.values(), reverse=True)[:k]
+    idcg = sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(ideal))
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def recall_at(ranked: Sequence[str], grades: Dict[str, int], k: int) -> float:
+    relevant = {rid for rid, g in grades.items() if g > 0}
+    return len(relevant & set(ranked[:k])) / len(relevant) if relevant else 0.0
+
+
+def _pipeline(records: List[Dict]) -> Callable[[str, int], List[Dict]]:
+    """Hybrid retrieval over `records` with the offline embedder, as snippets_search(mode='hybrid') does."""
+    from .compact_index import CompactIndex
+    from .hybrid_search import search_hybrid
+    from .keyword_index import build_index
+    from .local_embedder import LocalEmbedder
+
+    index = CompactIndex.from_keyword_index(build_index(records))
+    embedder = LocalEmbedder.train(records)
+    matrix = embedder.embed_corpus(records)
+    return lambda q, k: search_hybrid(index, matrix, q, k=k, embedder=embedder)
+
+
+def _samples(labels: Dict[str, Dict[str, int]], pools: Dict[str, List[Dict]], queries: Sequence[str], stats: FieldStats) -> List[Tuple[List[float], int]]:
+    return [(features(q, row, stats), labels[q].get(str(row.get("id")), 0)) for q in queries for row in pools[q]]
+
+
+def _rank(rows: List[Dict], scores: Optional[Dict[str, float]], beta: float = 0.7) -> List[str]:
+    if scores is None:
+        return [str(r.get("id")) for r in rows]
+    final = [(beta * scores.get(str(r.get("id")), 0.0) + (1 - beta) * float(r.get("score") or 0.0), r) for r in rows]
+    final.sort(key=lambda fr: (-fr[0], -float(fr[1].get("score") or 0.0), fr[1].get("name") or ""))
+    return [str(r.get("id")) for _, r in final]
+
+
+def beats_baselines(report: Dict[str, Dict[str, float]]) -> bool:
+    """Learned NDCG strictly above hybrid+mock and keyword-only, with recall no lower than either."""
+    learned = report.get("hybrid+learned") or {}
+    ndcg = next((m for m in learned if m.startswith("ndcg@")), None)
+    recall = next((m for m in learned if m.startswith("recall@")), None)
+    if ndcg is None or recall is None:
+        return False
+    for mode in ("hybrid+mock", "keyword"):
+        base = report.get(mode) or {}
+        if ndcg not in base or recall not in base or learned[ndcg] <= base[ndcg] or learned[recall] < base[recall]:
+            return False
+    return True
+
+
+def report(records: List[Dict], labels: Dict[str, Dict[str, int]], *, k: int = 5, pool: int = 20) -> Dict[str, Dict[str, float]]:
+    """NDCG@k / recall@k for keyword-only, hybrid, hybrid+mock rerank and hybrid+learned rerank.
+
+    Rerankers reorder the top `pool` hybrid rows, as rerank_results does with top_m. The learned
+    model is scored leave-one-query-out: each query is ranked by a model trained on the others,
+    so the report does not reward memorising the label set.
+    """
+    from .compact_index import CompactIndex
+    from .keyword_index import build_index
+    from .rerank import mock_rerank, prepare_candidates
+
+    search = _pipeline(records)
+    index = CompactIndex.from_keyword_index(build_index(records))
+    queries = [q for q in labels if labels[q]]
+    pools = {q: search(q, pool) for q in queries}
+    stats = FieldStats.build(records)
+    samples = {q: _samples(labels, pools, [q], stats) for q in queries}
+    modes: Dict[str, List[Tuple[float, float]]] = {"keyword": [], "hybrid": [], "hybrid+mock": [], "hybrid+learned": []}
+    for q in queries:
+        grades = labels[q]
+        kw = [rid for rid, _, _ in index.search(q, k=k)]
+        rows = pools[q]
+        mock = mock_rerank(q, prepare_candidates(q, rows, len(rows)))
+        model = LocalReranker.train([x for o in queries if o != q for x in samples[o]], stats=stats)
+        for mode, ranked in (
+            ("keyword", kw),
+            ("hybrid", _rank(rows, None)),
+            ("hybrid+mock", _rank(rows, mock)),
+            ("hybrid+learned", _rank(rows, model.score_rows(q, rows))),
+        ):
+            modes[mode].append((ndcg_at(ranked, grades, k), recall_at(ranked, grades, k)))
+    return {
+        mode: {
+            f"ndcg@{k}": sum(n for n, _ in vals) / max(1, len(vals)),
+            f"recall@{k}": sum(r for _, r in vals) / max(1, len(vals)),
+            "queries": len(vals),
+        }
+        for mode, vals in modes.items()
+    }
+
+
+def _print_report(rows: Dict[str, Dict[str, float]], k: int) -> None:
+    print(f"{'mode':<16} {'ndcg@' + str(k):>8} {'recall@' + str(k):>9} {'queries':>8}")
+    for mode, m in rows.items():
+        print(f"{mode:<16} {m[f'ndcg@{k}']:>8.3f} {m[f'recall@{k}']:>9.3f} {m['queries']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .store import load_records
+
+    data = Path(__file__).resolve().parents[3] / "data" / "krpc-snippets"
+    ap = argparse.ArgumentParser(description="Train / evaluate the local learned snippet reranker")
+    ap.add_argument("command", choices=("train", "report"))
+    ap.add_argument("--corpus", type=Path, default=data / "snippets_enriched.jsonl", help="Corpus the labels refer to")
+    ap.add_argument("--labels", type=Path, default=data / "eval_rerank.json", help="Graded queries")
+    ap.add_argument("--out", type=Path, default=data / "rerank_model.json")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--pool", type=int, default=20, help="Hybrid rows reranked per query (rerank top_m)")
+    args = ap.parse_args(argv)
+
+    records = load_records(args.corpus)
+    labels = load_labels(args.labels)
+    if not records or not labels:
+        print("no corpus records or labelled queries", file=sys.stderr)
+        return 1
+    rows = report(records, labels, k=args.k, pool=args.pool)
+    _print_report(rows, args.k)
+    if args.command == "report":
+        return 0
+    search = _pipeline(records)
+    stats = FieldStats.build(records)
+    samples = _samples(labels, {q: search(q, args.pool) for q in labels}, list(labels), stats)
+    model = LocalReranker.train(samples, stats=stats)
+    model.meta.update({"corpus": args.corpus.name, "labels": args.labels.name, "report": rows})
+    model.save(args.out)
+    print(f"wrote {args.out} ({len(samples)} samples from {len(labels)} queries)")
+    for name, w in zip(FEATURES, model.weights):
+        print(f"  {name:<20} {w:+.3f}")
+    print(f"  {'bias':<20} {model.bias:+.3f}")
+    if not model.qualified:
+        print("the learned model does not beat hybrid+mock and keyword-only; the runtime will keep the mock", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
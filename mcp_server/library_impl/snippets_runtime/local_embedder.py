@@ -0,0 +1,206 @@
+"""
+Deterministic offline query/document embedder for hybrid search.
+
+Text is turned into hashed features (camel/snake-split words, word bigrams and boundary-marked
+character 3..5-grams, hashed with crc32 into `buckets` slots), weighted by sublinear TF and a
+corpus IDF, L2-normalised, then projected to `dim` dimensions with an LSA/SVD basis trained on
+the snippet corpus. Where NumPy is unavailable at build time a fixed random projection is used
+instead. Applying a trained model needs no NumPy: a query touches only the projection rows of
+its own features, which keeps embedding well under a millisecond, and results are LRU-cached.
+
+Build the model and matching corpus embeddings with
+`python -m mcp_server.library_impl.snippets_runtime.local_embedder --corpus <snippets.jsonl>`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import mmap
+import random
+import sys
+import zlib
+from array import array
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .compact_index import _as_array
+from .keyword_index import _tokenize
+from .vector_matrix import EmbeddingMatrix, _read_npy_header, _write_npy
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - exercised only where NumPy is missing
+    np = None
+
+MODEL = "local-hash-lsa-v1"
+CACHE_SIZE = 4096
+
+
+@dataclass
+class LocalEmbedderConfig:
+    buckets: int = 4096
+    dim: int = 64
+    char_ngram_min: int = 3
+    char_ngram_max: int = 5
+    char_weight: float = 0.5
+    bigram_weight: float = 0.5
+    name_weight: float = 3.0
+    code_head_chars: int = 300
+
+
+def _bucket(feature: str, buckets: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % buckets
+
+
+def hashed_features(fields: Iterable[Tuple[str, float]], cfg: LocalEmbedderConfig) -> Dict[int, float]:
+    """Weighted raw term counts per hash bucket for (text, weight) fields."""
+    counts: Dict[int, float] = {}
+    for text, weight in fields:
+        toks = _tokenize(text)
+        for i, tok in enumerate(toks):
+            b = _bucket("w:" + tok, cfg.buckets)
+            counts[b] = counts.get(b, 0.0) + weight
+            if i:
+                b = _bucket("b:" + toks[i - 1] + "_" + tok, cfg.buckets)
+                counts[b] = counts.get(b, 0.0) + weight * cfg.bigram_weight
+            marked = f"<{tok}>"
+            for n in range(cfg.char_ngram_min, cfg.char_ngram_max + 1):
+                for j in range(len(marked) - n + 1):
+                    b = _bucket("c:" + marked[j:j + n], cfg.buckets)
+                    counts[b] = counts.get(b, 0.0) + weight * cfg.char_weight
+    return counts
+
+
+def record_fields(rec: Dict, cfg: LocalEmbedderConfig) -> List[Tuple[str, float]]:
+    fields = [(str(rec.get("name") or ""), cfg.name_weight)]
+    fields.extend((str(c), 1.0) for c in rec.get("categories") or [])
+    fields.extend((str(i), 1.0) for i in rec.get("inputs") or [])
+    fields.append((str(rec.get("description") or ""), 1.0))
+    fields.append((str(rec.get("code") or "")[: cfg.code_head_chars], 0.5))
+    return fields
+
+
+class LocalEmbedder:
+    def __init__(self, cfg: LocalEmbedderConfig, idf: Sequence[float], components, *, kind: str, _buffer=None) -> None:
+        self.cfg = cfg
+        self.idf = idf
+        self.components = components  # flat float32 (buckets * dim), row b = projection of bucket b
+        self.kind = kind
+        self.model = MODEL
+        self.dim = cfg.dim
+        self._buffer = _buffer
+        self._cached = lru_cache(maxsize=CACHE_SIZE)(self._embed_uncached)
+
+    def _weights(self, counts: Dict[int, float]) -> Dict[int, float]:
+        w = {b: (1.0 + math.log(c)) * self.idf[b] for b, c in counts.items() if c > 0}
+        norm = math.sqrt(sum(x * x for x in w.values())) or 1.0
+        return {b: x / norm for b, x in w.items()}
+
+    def _project(self, weights: Dict[int, float]) -> List[float]:
+        dim, comp = self.dim, self.components
+        v = [0.0] * dim
+        for b, x in weights.items():
+            row = comp[b * dim:(b + 1) * dim]
+            v = [a + x * c for a, c in zip(v, row)]
+        norm = math.sqrt(sum(a * a for a in v)) or 1.0
+        return [a / norm for a in v]
+
+    def _embed_uncached(self, text: str) -> Tuple[float, ...]:
+        return tuple(self._project(self._weights(hashed_features([(text, 1.0)], self.cfg))))
+
+    def embed(self, text: str) -> List[float]:
+        return list(self._cached(" ".join((text or "").split())))
+
+    def embed_record(self, rec: Dict) -> List[float]:
+        return self._project(self._weights(hashed_features(record_fields(rec, self.cfg), self.cfg)))
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    # ---- training / persistence ----
+
+    @classmethod
+    def train(cls, records: List[Dict], cfg: Optional[LocalEmbedderConfig] = None, *, seed: int = 0) -> "LocalEmbedder":
+        cfg = cfg or LocalEmbedderConfig()
+        counts = [hashed_features(record_fields(r, cfg), cfg) for r in records if r.get("id")]
+        df = [0] * cfg.buckets
+        for c in counts:
+            for b in c:
+                df[b] += 1
+        n_docs = len(counts)
+        idf = array("d", (math.log(1.0 + n_docs / (1.0 + d)) for d in df))
+        if np is not None and n_docs:
+            stub = cls(cfg, idf, None, kind="svd")
+            x = np.zeros((n_docs, cfg.buckets), dtype=np.float64)
+            for i, c in enumerate(counts):
+                for b, w in stub._weights(c).items():
+                    x[i, b] = w
+            _, _, vt = np.linalg.svd(x, full_matrices=False)
+            basis = np.zeros((cfg.buckets, cfg.dim), dtype=np.float32)
+            r = min(cfg.dim, vt.shape[0])
+            basis[:, :r] = vt[:r].T
+            return cls(cfg, idf, array("f", basis.ravel().tolist()), kind="svd")
+        rnd = random.Random(seed)
+        scale = 1.0 / math.sqrt(cfg.dim)
+        comps = array("f", (scale if rnd.random() < 0.5 else -scale for _ in range(cfg.buckets * cfg.dim)))
+        return cls(cfg, idf, comps, kind="random")
+
+    def save(self, path: Path) -> None:
+        """Writes `<path>.json` (config, idf) and `<path>.npy` (projection, buckets x dim float32)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        flat = array("f", self.components)
+        if sys.byteorder != "little":
+            flat.byteswap()
+        _write_npy(path.with_suffix(".npy"), self.cfg.buckets, self.dim, flat.tobytes())
+        meta = {"model": self.model, "kind": self.kind, "config": asdict(self.cfg), "idf": list(self.idf)}
+        path.with_suffix(".json").write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "LocalEmbedder":
+        meta = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+        if meta.get("model") != MODEL:
+            raise ValueError(f"{path}: model {meta.get('model')!r} is not {MODEL}")
+        cfg = LocalEmbedderConfig(**meta["config"])
+        with path.with_suffix(".npy").open("rb") as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, (rows, dim) = _read_npy_header(buf)
+        if (rows, dim) != (cfg.buckets, cfg.dim):
+            raise ValueError(f"{path}: projection shape {(rows, dim)} does not match the config")
+        comps = _as_array("f", memoryview(buf)[offset:offset + rows * dim * 4])
+        return cls(cfg, array("d", meta["idf"]), comps, kind=meta.get("kind", "svd"), _buffer=buf)
+
+    def embed_corpus(self, records: List[Dict]) -> EmbeddingMatrix:
+        return EmbeddingMatrix.from_vectors(
+            {r["id"]: self.embed_record(r) for r in records if r.get("id") and not r.get("duplicate_of")}, model=self.model
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .store import load_records
+
+    ap = argparse.ArgumentParser(description="Train the offline query embedder and embed the snippet corpus with it")
+    ap.add_argument("--corpus", required=True, type=Path, help="Snippets JSONL (e.g. snippets_enriched.jsonl)")
+    ap.add_argument("--out", type=Path, help="Model path stem (default: local_embedder next to the corpus)")
+    ap.add_argument("--embeddings-out", type=Path, help="Corpus embeddings .npy (default: embeddings.npy next to the corpus)")
+    ap.add_argument("--buckets", type=int, default=LocalEmbedderConfig.buckets)
+    ap.add_argument("--dim", type=int, default=LocalEmbedderConfig.dim)
+    args = ap.parse_args(argv)
+    records = load_records(args.corpus)
+    if not records:
+        print(f"no records in {args.corpus}", file=sys.stderr)
+        return 1
+    emb = LocalEmbedder.train(records, LocalEmbedderConfig(buckets=args.buckets, dim=args.dim))
+    out = args.out or args.corpus.with_name("local_embedder")
+    emb.save(out)
+    matrix = emb.embed_corpus(records)
+    emb_out = args.embeddings_out or args.corpus.with_name("embeddings.npy")
+    matrix.save(emb_out)
+    print(f"wrote {out}.json/.npy ({emb.kind}, {emb.cfg.buckets} buckets -> {emb.dim} dims) and {emb_out} ({len(matrix)} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
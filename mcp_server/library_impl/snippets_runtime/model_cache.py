@@ -0,0 +1,162 @@
+"""
+Size-bounded LRU cache for remote model results (query embeddings, rerank scores) in one SQLite file.
+
+Entries are keyed by (kind, sha256 of model + normalised query + candidate ids). Reads bump
+`last_used`; writes evict least-recently-used rows once the entry count or total value bytes
+exceed their limits. Hit/miss/eviction counters are kept per kind for the current process.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+EMBEDDING = "embedding"
+RERANK = "rerank"
+
+_SCHEMA = """
+create table if not exists cache (
+    kind text not null,
+    key text not null,
+    value blob not null,
+    size integer not null,
+    last_used real not null,
+    primary key (kind, key)
+);
+create index if not exists cache_last_used on cache (last_used);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form, so trivially different repeats share an entry."""
+    return " ".join((query or "").lower().split())
+
+
+def cache_key(model: str, query: str, ids: Optional[Sequence[str]] = None) -> str:
+    blob = json.dumps({"m": model, "q": normalize_query(query), "ids": list(ids or [])}, sort_keys=True)
+    return sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _pack_vector(vec: Sequence[float]) -> bytes:
+    arr = array("f", vec)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpack_vector(blob: bytes) -> List[float]:
+    arr = array("f")
+    arr.frombytes(blob)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tolist()
+
+
+class ModelCache:
+    def __init__(self, path: Path, *, max_entries: int = 20000, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._last_tick = 0.0
+
+    def _tick(self) -> float:
+        # Strictly increasing use stamps, so recency order survives coarse clocks.
+        self._last_tick = max(time.time(), self._last_tick + 1e-6)
+        return self._last_tick
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _count(self, kind: str, field: str, n: int = 1) -> None:
+        s = self._stats.setdefault(kind, {"hits": 0, "misses": 0, "writes": 0, "evictions": 0})
+        s[field] += n
+
+    def _get(self, kind: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            try:
+                db = self._db()
+                row = db.execute("select value from cache where kind = ? and key = ?", (kind, key)).fetchone()
+                if row is not None:
+                    db.execute("update cache set last_used = ? where kind = ? and key = ?", (self._tick(), kind, key))
+            except sqlite3.Error:
+                row = None
+            self._count(kind, "hits" if row is not None else "misses")
+            return None if row is None else bytes(row[0])
+
+    def _put(self, kind: str, key: str, value: bytes) -> None:
+        with self._lock:
+            try:
+                db = self._db()
+                db.execute(
+                    "insert or replace into cache (kind, key, value, size, last_used) values (?, ?, ?, ?, ?)",
+                    (kind, key, value, len(value), self._tick()),
+                )
+                self._count(kind, "writes")
+                self._evict(db)
+            except sqlite3.Error:
+                pass
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        count, total = db.execute("select count(*), coalesce(sum(size), 0) from cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        victims = []
+        for kind, key, size in db.execute("select kind, key, size from cache order by last_used asc"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((kind, key))
+            count -= 1
+            total -= size
+        db.executemany("delete from cache where kind = ? and key = ?", victims)
+        for kind, _ in victims:
+            self._count(kind, "evictions")
+
+    # ---- typed accessors ----
+
+    def get_embedding(self, model: str, query: str) -> Optional[List[float]]:
+        blob = self._get(EMBEDDING, cache_key(model, query))
+        return None if blob is None else _unpack_vector(blob)
+
+    def put_embedding(self, model: str, query: str, vec: Sequence[float]) -> None:
+        self._put(EMBEDDING, cache_key(model, query), _pack_vector(vec))
+
+    def get_rerank(self, model: str, query: str, ids: Sequence[str]) -> Optional[Dict[str, float]]:
+        blob = self._get(RERANK, cache_key(model, query, ids))
+        return None if blob is None else json.loads(blob.decode("utf-8"))
+
+    def put_rerank(self, model: str, query: str, ids: Sequence[str], scores: Dict[str, float]) -> None:
+        self._put(RERANK, cache_key(model, query, ids), json.dumps(scores).encode("utf-8"))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            out: Dict[str, object] = {k: dict(v) for k, v in self._stats.items()}
+            if self._conn is None and not self.path.exists():
+                return out
+            try:
+                count, total = self._db().execute("select count(*), coalesce(sum(size), 0) from cache").fetchone()
+                out["entries"], out["bytes"] = int(count), int(total)
+            except sqlite3.Error:
+                pass
+            return out
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
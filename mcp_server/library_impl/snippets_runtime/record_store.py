@@ -0,0 +1,220 @@
+"""
+Compressed, random-access snippet record store.
+
+Every record is serialized as compact JSON and zlib-compressed on its own into a frame, primed
+with a shared dictionary of the code lines that recur across the corpus (imports, connection
+boilerplate, common kRPC calls), so even small records compress well. Frames are laid end to
+end and addressed by an offsets array: id -> ordinal -> (offset, length). Reading a record
+decompresses that one frame and nothing else.
+
+Next to the frames the file carries one metadata row per record (id, name, path, categories,
+dependencies, restricted, plus the code size and hash). The runtime keeps only those rows in
+memory, for search filters, the dependency graph and the trigram code index, and fetches full
+records (code, description, license, ...) from the frames when a tool actually returns them.
+
+File layout (little-endian):
+    b"KSNR" | u32 version | u32 meta_len | meta JSON (rows, codec, dictionary length, source sha256)
+    | pad to 8 | offsets u64[N+1] | dictionary | frames
+
+Build it with `python -m mcp_server.library_impl.snippets_runtime.record_store --corpus <snippets.jsonl>`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from collections import Counter
+from hashlib import sha1
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .compact_index import _as_array, source_digest
+
+MAGIC = b"KSNR"
+VERSION = 1
+_HEADER = struct.Struct("<4sII")
+CODEC = "zlib"
+LEVEL = 9
+DICT_SIZE = 32 * 1024  # zlib only looks back 32 KiB, so a larger dictionary is wasted
+# Fields kept in memory for every record; the rest stays compressed until a record is read.
+META_FIELDS = ("id", "name", "path", "categories", "dependencies", "restricted")
+
+
+def code_digest(code: str) -> str:
+    return sha1(code.encode("utf-8")).hexdigest()
+
+
+def meta_row(rec: Dict) -> Dict:
+    row = {k: rec[k] for k in META_FIELDS if k in rec}
+    code = rec.get("code") or ""
+    row["code_bytes"] = len(code.encode("utf-8"))
+    row["code_sha1"] = code_digest(code)
+    return row
+
+
+def _encode(rec: Dict) -> bytes:
+    return json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def train_dictionary(blobs: Sequence[bytes], size: int = DICT_SIZE) -> bytes:
+    """Shared zlib dictionary: the lines that occur in the most records, most valuable last.
+
+    A line is a run between newlines of the serialized record (escaped `\\n` inside JSON strings
+    count too), so this picks up repeated code lines and the JSON field skeleton alike.
+    """
+    df: Counter = Counter()
+    for blob in blobs:
+        df.update({s for s in blob.replace(b"\\n", b"\n").split(b"\n") if len(s) >= 8})
+    ranked = sorted((s for s, n in df.items() if n >= 2), key=lambda s: (-(df[s] - 1) * len(s), s))
+    picked: List[bytes] = []
+    used = 0
+    for s in ranked:
+        if used + len(s) + 1 > size:
+            continue
+        picked.append(s)
+        used += len(s) + 1
+    # zlib matches nearer the end of the dictionary with shorter distances.
+    return b"\n".join(reversed(picked))
+
+
+def _compress(blob: bytes, zdict: bytes) -> bytes:
+    if zdict:
+        co = zlib.compressobj(LEVEL, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, zdict)
+    else:
+        co = zlib.compressobj(LEVEL)
+    return co.compress(blob) + co.flush()
+
+
+class RecordStore:
+    def __init__(
+        self,
+        *,
+        rows: List[Dict],
+        offsets: Sequence[int],
+        zdict: bytes,
+        frames,
+        source: Optional[str] = None,
+        _buffer=None,
+    ) -> None:
+        self.meta = rows
+        self.ids = [r.get("id") for r in rows]
+        self._pos = {rid: i for i, rid in enumerate(self.ids)}
+        self.offsets = offsets
+        self.zdict = zdict
+        self.frames = frames
+        self.source = source
+        self._buffer = _buffer  # keeps the mmap alive for the memoryviews above
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def __contains__(self, rid: object) -> bool:
+        return rid in self._pos
+
+    # ---- build / persist ----
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], *, source: Optional[str] = None) -> "RecordStore":
+        """Compress `records` (those without an id are skipped; a repeated id keeps the last)."""
+        latest: Dict[str, Dict] = {}
+        for rec in records:
+            rid = rec.get("id")
+            if rid:
+                latest.pop(rid, None)
+                latest[rid] = rec
+        blobs = [_encode(rec) for rec in latest.values()]
+        zdict = train_dictionary(blobs)
+        offsets = array("Q", [0])
+        frames = bytearray()
+        for blob in blobs:
+            frames += _compress(blob, zdict)
+            offsets.append(len(frames))
+        return cls(rows=[meta_row(rec) for rec in latest.values()], offsets=offsets, zdict=zdict, frames=bytes(frames), source=source)
+
+    def save(self, path: Path) -> None:
+        meta = json.dumps({
+            "rows": self.meta,
+            "codec": CODEC,
+            "dict_len": len(self.zdict),
+            "source": self.source,
+        }, ensure_ascii=False).encode("utf-8")
+        head = _HEADER.pack(MAGIC, VERSION, len(meta)) + meta
+        head += b"\0" * (-len(head) % 8)
+        offsets = array("Q", self.offsets)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with tmp.open("wb") as fh:
+            fh.write(head)
+            fh.write(offsets.tobytes())
+            fh.write(self.zdict)
+            fh.write(self.frames)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "RecordStore":
+        with path.open("rb") as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_len = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a v{VERSION} snippet record store: {path}")
+        pos = _HEADER.size
+        meta = json.loads(bytes(buf[pos:pos + meta_len]).decode("utf-8"))
+        if meta.get("codec") != CODEC:
+            raise ValueError(f"Unsupported codec {meta.get('codec')!r} in {path}")
+        pos += meta_len
+        pos += -pos % 8
+        view = memoryview(buf)
+        n = len(meta["rows"])
+        offsets = _as_array("Q", view[pos:pos + (n + 1) * 8])
+        pos += (n + 1) * 8
+        zdict = bytes(view[pos:pos + meta["dict_len"]])
+        pos += meta["dict_len"]
+        return cls(rows=meta["rows"], offsets=offsets, zdict=zdict, frames=view[pos:], source=meta.get("source"), _buffer=buf)
+
+    # ---- read ----
+
+    def _decode(self, i: int) -> Dict:
+        frame = self.frames[self.offsets[i]:self.offsets[i + 1]]
+        do = zlib.decompressobj(15, self.zdict) if self.zdict else zlib.decompressobj()
+        return json.loads(do.decompress(frame) + do.flush())
+
+    def get(self, rid: str) -> Optional[Dict]:
+        """The full record (a fresh dict), or None for an unknown id."""
+        i = self._pos.get(rid)
+        return None if i is None else self._decode(i)
+
+    def code(self, rid: str) -> str:
+        rec = self.get(rid)
+        return (rec.get("code") or "") if rec is not None else ""
+
+    def iter_records(self) -> Iterator[Dict]:
+        for i in range(len(self.meta)):
+            yield self._decode(i)
+
+    @property
+    def compressed_bytes(self) -> int:
+        return len(self.zdict) + len(self.frames)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Build the compressed random-access snippet record store from a snippets JSONL")
+    ap.add_argument("--corpus", required=True, type=Path, help="Path to snippets_enriched.jsonl")
+    ap.add_argument("--out", type=Path, help="Output path (default: <corpus>.bin next to the JSONL)")
+    args = ap.parse_args(argv)
+    from .store import load_records
+
+    out = args.out or args.corpus.with_suffix(".bin")
+    store = RecordStore.from_records(load_records(args.corpus), source=source_digest(args.corpus))
+    store.save(out)
+    print(f"wrote {out} ({out.stat().st_size} bytes, {len(store)} records, {store.compressed_bytes} compressed from {args.corpus.stat().st_size})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,9 +4,10 @@ import json
 import os
 import re
 from dataclasses import dataclass
-from hashlib import sha256
-from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from .learned_rerank import LocalReranker
+from .model_cache import ModelCache
 
 
 @dataclass
@@ -16,12 +17,10 @@ class RerankConfig:
     beta_rerank: float = 0.7
     temperature: float = 0.2
     max_output_tokens: int = 400
-    cache_dir: Path = Path("krpc-snippets/data/rerank_cache")
+    cache: Optional[ModelCache] = None
     mock: bool = False
-
-
-def _ensure_cache(cfg: RerankConfig) -> None:
-    cfg.cache_dir.mkdir(parents=True, exist_ok=True)
+    # Learned offline model; replaces the token-overlap mock when no remote reranker is used.
+    local: Optional[LocalReranker] = None
 
 
 def prepare_candidates(query: str, hybrid_results: List[Dict], top_m: int) -> List[Dict]:
@@ -68,20 +67,12 @@ def _openai_client_or_none():
         return None
 
 
-def _cache_key(cfg: RerankConfig, query: str, candidates: List[Dict]) -> Path:
-    blob = json.dumps({"m": cfg.model, "q": query, "ids": [c.get("id") for c in candidates]}, sort_keys=True)
-    h = sha256(blob.encode("utf-8")).hexdigest()
-    _ensure_cache(cfg)
-    return cfg.cache_dir / f"{h}.json"
-
-
 def call_openai_rerank(cfg: RerankConfig, query: str, candidates: List[Dict]) -> Dict[str, float]:
-    cache_path = _cache_key(cfg, query, candidates)
-    if cache_path.exists():
-        try:
-            return json.loads(cache_path.read_text(encoding="utf-8"))
-        except Exception:
-            pass
+    ids = [str(c.get("id")) for c in candidates]
+    if cfg.cache is not None:
+        cached = cfg.cache.get_rerank(cfg.model, query, ids)
+        if cached is not None:
+            return cached
     client = _openai_client_or_none()
     if client is None:
         return mock_rerank(query, candidates)
@@ -105,11 +96,8 @@ def call_openai_rerank(cfg: RerankConfig, query: str, candidates: List[Dict]) ->
             if sc > 1.0:
                 sc = 1.0
             out[rid] = sc
-        # Cache
-        try:
-            cache_path.write_text(json.dumps(out, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-        except Exception:
-            pass
+        if cfg.cache is not None:
+            cfg.cache.put_rerank(cfg.model, query, ids, out)
         return out
     except Exception:
         return mock_rerank(query, candidates)
@@ -137,7 +125,12 @@ def mock_rerank(query: str, candidates: List[Dict]) -> Dict[str, float]:
 
 def rerank_results(query: str, hybrid_results: List[Dict], cfg: RerankConfig) -> List[Dict]:
     cand = prepare_candidates(query, hybrid_results, cfg.top_m)
-    scores = mock_rerank(query, cand) if cfg.mock else call_openai_rerank(cfg, query, cand)
+    if not cfg.mock:
+        scores = call_openai_rerank(cfg, query, cand)
+    elif cfg.local is not None:
+        scores = cfg.local.score_rows(query, hybrid_results[: max(1, cfg.top_m)])
+    else:
+        scores = mock_rerank(query, cand)
     out: List[Dict] = []
     for row in hybrid_results:
         rid = str(row.get("id"))
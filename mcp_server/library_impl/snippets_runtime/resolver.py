@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
+from .bundler import shake_records
 from .utils import modulize_rel_path
 
 
@@ -17,40 +21,21 @@ class ResolveResult:
     stats: Dict[str, int]
 
 
-def _load_snippets(path: Path) -> Tuple[List[Dict], Dict[str, Dict], Dict[str, Dict]]:
+def _load_snippets(path: Path) -> List[Dict]:
     recs: List[Dict] = []
-    id_map: Dict[str, Dict] = {}
-    sym_map: Dict[str, Dict] = {}
     for line in path.read_text(encoding="utf-8").splitlines():
         if not line.strip():
             continue
-        r = json.loads(line)
-        recs.append(r)
-        rid = r.get("id")
-        if rid:
-            id_map[rid] = r
-        # Build symbol map
-        mod = modulize_rel_path(str(r.get("path", "")).replace("\\", "/"))
-        name = str(r.get("name", ""))
-        if name:
-            sym = f"{mod}.{name}"
-            sym_map[sym] = r
-    return recs, id_map, sym_map
-
-
-def _const_record_for_module(recs: List[Dict], module: str) -> Optional[Dict]:
-    # Find a record with category 'const' and matching module
-    for r in recs:
-        if (r.get("categories") or [None])[0] == "const":
-            mod_r = modulize_rel_path(str(r.get("path", "")).replace("\\", "/"))
-            if mod_r == module:
-                return r
-    return None
+        recs.append(json.loads(line))
+    return recs
+
+
+def _module_of(rec: Dict) -> str:
+    return modulize_rel_path(str(rec.get("path", "")).replace("\\", "/"))
 
 
 def _symbol_key(rec: Dict) -> str:
-    mod = modulize_rel_path(str(rec.get("path", "")).replace("\\", "/"))
-    return f"{mod}.{rec.get('name')}"
+    return f"{_module_of(rec)}.{rec.get('name')}"
 
 
 def _class_symbol_from_method_symbol(symbol: str) -> Optional[str]:
@@ -61,6 +46,11 @@ def _class_symbol_from_method_symbol(symbol: str) -> Optional[str]:
     return None
 
 
+def _code_bytes(rec: Dict) -> int:
+    size = rec.get("code_bytes")
+    return int(size) if size is not None else len((rec.get("code") or "").encode("utf-8"))
+
+
 def _deps_for(rec: Dict) -> List[str]:
     deps = []
     for d in rec.get("dependencies") or []:
@@ -78,112 +68,189 @@ def _deps_for(rec: Dict) -> List[str]:
     return list(dict.fromkeys(deps))
 
 
-def _dfs_collect(
-    sym: str,
-    *,
-    sym_map: Dict[str, Dict],
-    visiting: Set[str],
-    visited: Set[str],
-    order: List[str],
-    unresolved: Set[str],
-    size_cap_nodes: int,
-) -> None:
-    if sym in visited:
-        return
-    if sym in visiting:
-        return  # cycle, ignore
-    if len(order) >= size_cap_nodes:
-        return
-    rec = sym_map.get(sym)
-    if not rec:
-        unresolved.add(sym)
-        return
-    visiting.add(sym)
-    for dep in _deps_for(rec):
-        _dfs_collect(dep, sym_map=sym_map, visiting=visiting, visited=visited, order=order, unresolved=unresolved, size_cap_nodes=size_cap_nodes)
+class DepGraph:
+    """
+    Dependency graph over a snippet corpus, built once and shared by every resolve.
+
+    Holds the symbol (module.qualname) and id tables, the first const record per module and the
+    dependency adjacency list of every symbol, so resolving is a walk over dicts instead of a
+    rescan of the records. Resolved bundles are memoized by (target id, byte cap, node cap,
+    tree-shaking flags) in a small LRU; the graph is immutable, so a new corpus means a new graph
+    (and an empty memo).
+    Records may be metadata rows without code (see record_store.py): the byte cap then uses their
+    `code_bytes` and `code_of(id)` fetches the code of just the records a bundle includes.
+    """
+
+    def __init__(self, records: List[Dict], *, code_of: Optional[Callable[[str], str]] = None, memo_size: int = 256) -> None:
+        self.records = records
+        self.code_of = code_of or (lambda rid: self.by_id[rid].get("code") or "")
+        self.by_id: Dict[str, Dict] = {}
+        self.by_symbol: Dict[str, Dict] = {}
+        self.const_by_module: Dict[str, Dict] = {}
+        for r in records:
+            rid = r.get("id")
+            if rid:
+                self.by_id[rid] = r
+            name = str(r.get("name", ""))
+            if name:
+                self.by_symbol[f"{_module_of(r)}.{name}"] = r
+            if (r.get("categories") or [None])[0] == "const":
+                self.const_by_module.setdefault(_module_of(r), r)
+        self.deps: Dict[str, List[str]] = {sym: _deps_for(r) for sym, r in self.by_symbol.items()}
+        self.memo_size = int(memo_size)
+        self._memo: "OrderedDict[Tuple[str, int, int, bool, bool], ResolveResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _dfs(self, sym: str, visiting: Set[str], visited: Set[str], order: List[str], unresolved: Set[str], size_cap_nodes: int) -> None:
+        if sym in visited or sym in visiting:
+            return  # done, or a cycle: ignore
         if len(order) >= size_cap_nodes:
-            break
-    visiting.remove(sym)
-    visited.add(sym)
-    if sym not in order:
-        order.append(sym)
-
-
-def build_dep_graph(
-    target_rec: Dict,
-    recs: List[Dict],
-    id_map: Dict[str, Dict],
-    sym_map: Dict[str, Dict],
-    *,
-    size_cap_bytes: int = 25000,
-    size_cap_nodes: int = 25,
-) -> Tuple[List[str], List[str], bool]:
-    # Collect symbols in dependency order
-    order_syms: List[str] = []
-    unresolved: Set[str] = set()
-    visiting: Set[str] = set()
-    visited: Set[str] = set()
-
-    target_sym = _symbol_key(target_rec)
-    # If target is method, pivot to parent class for emission
-    if (target_rec.get("categories") or [None])[0] == "method":
-        cls_sym = _class_symbol_from_method_symbol(target_sym)
-        if cls_sym and cls_sym in sym_map:
-            target_sym = cls_sym
-
-    _dfs_collect(target_sym, sym_map=sym_map, visiting=visiting, visited=visited, order=order_syms, unresolved=unresolved, size_cap_nodes=size_cap_nodes)
-
-    # Include const block for each module in order
-    to_emit_syms: List[str] = []
-    seen_modules: Set[str] = set()
-    for sym in order_syms:
-        rec = sym_map.get(sym)
-        if not rec:
-            continue
-        mod = modulize_rel_path(str(rec.get("path", "")).replace("\\", "/"))
-        if mod not in seen_modules:
-            cst = _const_record_for_module(recs, mod)
-            if cst:
-                cst_sym = _symbol_key(cst)
-                if cst_sym not in to_emit_syms:
-                    to_emit_syms.append(cst_sym)
-            seen_modules.add(mod)
-        if sym not in to_emit_syms:
-            to_emit_syms.append(sym)
-
-    # Enforce size cap by bytes of concatenated code
-    included_ids: List[str] = []
-    total_bytes = 0
-    truncated = False
-    for sym in to_emit_syms:
-        rec = sym_map.get(sym)
-        if not rec:
-            continue
-        rid = rec.get("id")
-        code = (rec.get("code") or "").encode("utf-8")
-        if rid in included_ids:
-            continue
-        if total_bytes + len(code) > size_cap_bytes:
-            truncated = True
-            break
-        included_ids.append(rid)
-        total_bytes += len(code)
+            return
+        if sym not in self.by_symbol:
+            unresolved.add(sym)
+            return
+        visiting.add(sym)
+        for dep in self.deps[sym]:
+            self._dfs(dep, visiting, visited, order, unresolved, size_cap_nodes)
+            if len(order) >= size_cap_nodes:
+                break
+        visiting.remove(sym)
+        visited.add(sym)
+        if sym not in order:
+            order.append(sym)
+
+    def collect(self, target_rec: Dict, *, size_cap_bytes: int = 25000, size_cap_nodes: int = 25) -> Tuple[List[str], List[str], bool]:
+        """(included ids in emission order, unresolved symbols, truncated) for one target."""
+        order_syms: List[str] = []
+        unresolved: Set[str] = set()
+
+        target_sym = _symbol_key(target_rec)
+        # If target is method, pivot to parent class for emission
+        if (target_rec.get("categories") or [None])[0] == "method":
+            cls_sym = _class_symbol_from_method_symbol(target_sym)
+            if cls_sym and cls_sym in self.by_symbol:
+                target_sym = cls_sym
+
+        self._dfs(target_sym, set(), set(), order_syms, unresolved, size_cap_nodes)
+
+        # Include const block for each module in order
+        to_emit: List[Dict] = []
+        emitted_ids: Set[str] = set()
+        seen_modules: Set[str] = set()
+        for sym in order_syms:
+            rec = self.by_symbol[sym]
+            mod = _module_of(rec)
+            if mod not in seen_modules:
+                seen_modules.add(mod)
+                cst = self.const_by_module.get(mod)
+                if cst is not None and id(cst) not in emitted_ids:
+                    to_emit.append(cst)
+                    emitted_ids.add(id(cst))
+            if id(rec) not in emitted_ids:
+                to_emit.append(rec)
+                emitted_ids.add(id(rec))
 
-    return included_ids, sorted(unresolved), truncated
+        # Enforce size cap by bytes of concatenated code
+        included_ids: List[str] = []
+        total_bytes = 0
+        truncated = False
+        for rec in to_emit:
+            rid = rec.get("id")
+            if rid in included_ids:
+                continue
+            size = _code_bytes(rec)
+            if total_bytes + size > size_cap_bytes:
+                truncated = True
+                break
+            included_ids.append(rid)
+            total_bytes += size
 
+        return included_ids, sorted(unresolved), truncated
 
-def assemble_bundle(include_ids: List[str], id_map: Dict[str, Dict]) -> str:
+    def resolve(
+        self,
+        *,
+        target_id: Optional[str] = None,
+        target_name: Optional[str] = None,
+        size_cap_bytes: int = 25000,
+        size_cap_nodes: int = 25,
+        shake: bool = False,
+        strip_docstrings: bool = False,
+    ) -> ResolveResult:
+        target_rec: Optional[Dict] = None
+        if target_id:
+            target_rec = self.by_id.get(target_id)
+        elif target_name:
+            # target_name is module.qualname
+            target_rec = self.by_symbol.get(target_name)
+        if not target_rec:
+            raise ValueError("Target snippet not found by id or name")
+
+        key = (str(target_rec.get("id") or _symbol_key(target_rec)), int(size_cap_bytes), int(size_cap_nodes), bool(shake), bool(strip_docstrings))
+        with self._lock:
+            res = self._memo.get(key)
+            if res is not None:
+                self._memo.move_to_end(key)
+                self.hits += 1
+        if res is None:
+            if shake or strip_docstrings:
+                res = self._bundle_shaken(target_rec, size_cap_bytes, size_cap_nodes, shake, strip_docstrings)
+            else:
+                include_ids, unresolved, truncated = self.collect(target_rec, size_cap_bytes=size_cap_bytes, size_cap_nodes=size_cap_nodes)
+                bundle = assemble_bundle(include_ids, self.by_id, code=self._codes(include_ids))
+                stats = {"nodes": len(include_ids), "bytes": len(bundle.encode("utf-8"))}
+                res = ResolveResult(bundle_code=bundle, include_ids=include_ids, unresolved_deps=unresolved, truncated=truncated, stats=stats)
+            with self._lock:
+                self.misses += 1
+                self._memo[key] = res
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        # Callers get their own lists; the memoized result stays untouched.
+        return replace(res, include_ids=list(res.include_ids), unresolved_deps=list(res.unresolved_deps), stats=dict(res.stats))
+
+    def _bundle_shaken(self, target_rec: Dict, size_cap_bytes: int, size_cap_nodes: int, prune: bool, strip_docstrings: bool) -> ResolveResult:
+        """Collect without the byte cap, tree-shake, then apply the cap to the shaken code."""
+        all_ids, unresolved, _ = self.collect(target_rec, size_cap_bytes=sys.maxsize, size_cap_nodes=size_cap_nodes)
+        full = self._codes(all_ids)
+        code = shake_records([dict(self.by_id[rid], code=full[rid]) for rid in all_ids], target_rec, prune=prune, strip_docstrings=strip_docstrings)
+        include_ids: List[str] = []
+        total_bytes = 0
+        truncated = False
+        for rid in all_ids:
+            if rid not in code:
+                continue
+            size = len(code[rid].encode("utf-8"))
+            if total_bytes + size > size_cap_bytes:
+                truncated = True
+                break
+            include_ids.append(rid)
+            total_bytes += size
+        bundle = assemble_bundle(include_ids, self.by_id, code=code)
+        unshaken = len(assemble_bundle(all_ids, self.by_id, code=full).encode("utf-8"))
+        stats = {"nodes": len(include_ids), "bytes": len(bundle.encode("utf-8"))}
+        stats["bytes_unshaken"] = unshaken
+        stats["bytes_saved"] = max(0, unshaken - stats["bytes"])
+        return ResolveResult(bundle_code=bundle, include_ids=include_ids, unresolved_deps=unresolved, truncated=truncated, stats=stats)
+
+    def _codes(self, ids: List[str]) -> Dict[str, str]:
+        return {rid: self.code_of(rid) for rid in ids}
+
+
+def assemble_bundle(include_ids: List[str], id_map: Dict[str, Dict], *, code: Optional[Dict[str, str]] = None) -> str:
+    """Concatenate records with a header each; `code` overrides a record's source (e.g. shaken)."""
     parts: List[str] = []
     for rid in include_ids:
         rec = id_map.get(rid)
         if not rec:
             continue
         cat = (rec.get("categories") or [None])[0]
-        mod = modulize_rel_path(str(rec.get("path", "")).replace("\\", "/"))
+        mod = _module_of(rec)
         name = rec.get("name")
         header = f"# --- {cat}: {mod} ({name})\n"
-        code = rec.get("code") or ""
-        parts.append(header + code.rstrip() + "\n\n")
+        src = code[rid] if code is not None and rid in code else rec.get("code") or ""
+        parts.append(header + src.rstrip() + "\n\n")
     return "".join(parts)
 
 
@@ -191,22 +258,34 @@ def resolve_snippet(
     *,
     target_id: Optional[str] = None,
     target_name: Optional[str] = None,
-    snippets_path: Path,
+    snippets_path: Optional[Path] = None,
+    records: Optional[List[Dict]] = None,
+    graph: Optional[DepGraph] = None,
     size_cap_bytes: int = 25000,
     size_cap_nodes: int = 25,
+    shake: bool = False,
+    strip_docstrings: bool = False,
     emit_map: bool = False,
 ) -> ResolveResult:
-    recs, id_map, sym_map = _load_snippets(snippets_path)
-    target_rec: Optional[Dict] = None
-    if target_id:
-        target_rec = id_map.get(target_id)
-    elif target_name:
-        # target_name is module.qualname
-        target_rec = sym_map.get(target_name)
-    if not target_rec:
-        raise ValueError("Target snippet not found by id or name")
-
-    include_ids, unresolved, truncated = build_dep_graph(target_rec, recs, id_map, sym_map, size_cap_bytes=size_cap_bytes, size_cap_nodes=size_cap_nodes)
-    bundle = assemble_bundle(include_ids, id_map)
-    stats = {"nodes": len(include_ids), "bytes": len(bundle.encode("utf-8"))}
-    return ResolveResult(bundle_code=bundle, include_ids=include_ids, unresolved_deps=unresolved, truncated=truncated, stats=stats)
+    """
+    Resolve against a prebuilt `graph` (memoized), else one built from `records` / `snippets_path`.
+
+    `shake` keeps only the code reachable from the target (see bundler.py) and applies the byte
+    cap to the shaken code; `strip_docstrings` also drops docstrings and comments. Either adds
+    `bytes_unshaken` / `bytes_saved` to the stats.
+    """
+    if graph is None:
+        if records is not None:
+            graph = DepGraph(records)
+        elif snippets_path is not None:
+            graph = DepGraph(_load_snippets(snippets_path))
+        else:
+            raise ValueError("Provide snippets_path, records or graph")
+    return graph.resolve(
+        target_id=target_id,
+        target_name=target_name,
+        size_cap_bytes=size_cap_bytes,
+        size_cap_nodes=size_cap_nodes,
+        shake=shake,
+        strip_docstrings=strip_docstrings,
+    )
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .ann_index import IVFIndex
+from .code_index import CodeIndex
+from .compact_index import CompactIndex, source_digest
+from .hybrid_search import VecStore, load_embeddings_jsonl, load_embeddings_parquet, load_embeddings_sqlite
+from .learned_rerank import LocalReranker
+from .local_embedder import LocalEmbedder
+from .keyword_index import KeywordConfig, KeywordIndex, build_index
+from .record_store import RecordStore
+from .resolver import DepGraph
+from .vector_matrix import EmbeddingMatrix
+
+
+@dataclass(frozen=True)
+class FileStamp:
+    """Identity of a data file on disk; a change in mtime or size means the file must be reloaded."""
+
+    path: str
+    mtime_ns: int
+    size: int
+
+    @staticmethod
+    def of(path: Optional[Path]) -> Optional["FileStamp"]:
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return FileStamp(str(path), st.st_mtime_ns, st.st_size)
+
+
+@dataclass
+class SnippetData:
+    """Immutable snapshot of the corpus, keyword index and vectors; swapped as a whole on reload.
+
+    `records`, `by_id` and `by_symbol` hold metadata rows (see record_store.META_FIELDS); the full
+    record, code included, comes from `record_store.get(id)`.
+    """
+
+    records: List[Dict]
+    record_store: RecordStore
+    by_id: Dict[str, Dict]
+    by_symbol: Dict[str, Dict]
+    graph: DepGraph
+    code_index: CodeIndex
+    index: CompactIndex
+    vectors: Optional[EmbeddingMatrix]
+    ann: Optional[IVFIndex] = None
+    embedder: Optional[LocalEmbedder] = None
+    reranker: Optional[LocalReranker] = None
+    stamps: Dict[str, Optional[FileStamp]] = field(default_factory=dict)
+
+
+def load_records(path: Optional[Path]) -> List[Dict]:
+    recs: List[Dict] = []
+    if path is None:
+        return recs
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError:
+        return recs
+    for line in text.splitlines():
+        s = line.strip()
+        if not s:
+            continue
+        try:
+            recs.append(json.loads(s))
+        except Exception:
+            continue
+    return recs
+
+
+def load_compact_index(json_path: Optional[Path], bin_path: Optional[Path]) -> Optional[CompactIndex]:
+    """Memory-map the prebuilt binary index when it was built from the current JSON, else convert the JSON."""
+    if json_path is None:
+        return None
+    try:
+        digest = source_digest(json_path)
+    except OSError:
+        return None
+    if bin_path is not None:
+        try:
+            compact = CompactIndex.load(bin_path)
+            if compact.source == digest:
+                return compact
+        except Exception:
+            pass
+    try:
+        return CompactIndex.from_keyword_index(KeywordIndex.load(json_path), source=digest)
+    except Exception:
+        return None
+
+
+def load_record_store(corpus: Optional[Path], bin_path: Optional[Path]) -> RecordStore:
+    """Memory-map the prebuilt record store when it was built from the current corpus, else compress the JSONL."""
+    try:
+        digest = source_digest(corpus) if corpus is not None else None
+    except OSError:
+        digest = None
+    if digest is None:
+        return RecordStore.from_records([])
+    if bin_path is not None:
+        try:
+            store = RecordStore.load(bin_path)
+            if store.source == digest:
+                return store
+        except Exception:
+            pass
+    return RecordStore.from_records(load_records(corpus), source=digest)
+
+
+def load_vectors(path: Optional[Path]) -> Optional[EmbeddingMatrix]:
+    if path is None:
+        return None
+    try:
+        if path.suffix == ".npy":
+            return EmbeddingMatrix.load(path)
+        store: Optional[VecStore] = None
+        if path.suffix == ".sqlite":
+            store = load_embeddings_sqlite(path)
+        elif path.suffix == ".jsonl":
+            store = load_embeddings_jsonl(path)
+        elif path.suffix == ".parquet":
+            store = load_embeddings_parquet(path)
+        return EmbeddingMatrix.from_vecstore(store) if store is not None else None
+    except Exception:
+        return None
+
+
+def load_ann(path: Optional[Path], vectors: Optional[EmbeddingMatrix]) -> Optional[IVFIndex]:
+    """The IVF index when present, loadable (NumPy installed) and built from these exact vectors."""
+    if path is None or vectors is None:
+        return None
+    try:
+        ann = IVFIndex.load(path)
+    except Exception:
+        return None
+    return ann if ann.matches(vectors) else None
+
+
+def load_embedder(path: Optional[Path]) -> Optional[LocalEmbedder]:
+    if path is None:
+        return None
+    try:
+        return LocalEmbedder.load(path)
+    except Exception:
+        return None
+
+
+def load_reranker(path: Optional[Path]) -> Optional[LocalReranker]:
+    """The learned reranker, only when its stored evaluation beats the mock and keyword-only ranking."""
+    if path is None:
+        return None
+    try:
+        model = LocalReranker.load(path)
+    except Exception:
+        return None
+    return model if model.qualified else None
+
+
+class SnippetStore:
+    """
+    Process-wide cache of snippet data files.
+
+    `paths()` returns the current corpus (JSONL and prebuilt compressed record store) / keyword
+    index (JSON and prebuilt binary) / embeddings paths, plus the optional ANN index, offline query
+    embedder and learned reranker (None when absent). The index is always held in CompactIndex
+    form, the embeddings as an EmbeddingMatrix and the corpus as a RecordStore: compressed frames
+    plus per-record metadata rows, from which the DepGraph (which carries the memoized resolve
+    bundles) and the trigram CodeIndex (rebuilt incrementally from the previous one) are built.
+    Code and full records are decompressed only for the records a call returns or scans.
+    Every `snapshot()` stats those files; if any stamp changed, only the affected parts are
+    reloaded into a fresh SnippetData, which then replaces the old one in a single assignment.
+    Callers keep using whichever snapshot they already hold, so readers never see a half-loaded
+    state and no lock is taken on the fast path.
+    """
+
+    def __init__(self, paths: Callable[[], Dict[str, Optional[Path]]]) -> None:
+        self._paths = paths
+        self._data: Optional[SnippetData] = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _current_stamps(self) -> Tuple[Dict[str, Optional[Path]], Dict[str, Optional[FileStamp]]]:
+        paths = self._paths()
+        return paths, {name: FileStamp.of(p) for name, p in paths.items()}
+
+    def snapshot(self) -> SnippetData:
+        data = self._data
+        paths, stamps = self._current_stamps()
+        if data is not None and data.stamps == stamps:
+            return data
+        with self._lock:
+            data = self._data
+            if data is not None and data.stamps == stamps:
+                return data
+            self._data = self._load(paths, stamps, data)
+            self.reloads += 1
+            return self._data
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data = None
+
+    def get(self, rid: str) -> Optional[Dict]:
+        return self.snapshot().record_store.get(rid)
+
+    def _load(
+        self,
+        paths: Dict[str, Optional[Path]],
+        stamps: Dict[str, Optional[FileStamp]],
+        old: Optional[SnippetData],
+    ) -> SnippetData:
+        def unchanged(*names: str) -> bool:
+            return old is not None and all(old.stamps.get(n) == stamps.get(n) for n in names)
+
+        if unchanged("corpus", "corpus_bin"):
+            record_store, graph, code_index = old.record_store, old.graph, old.code_index
+        else:
+            record_store = load_record_store(paths.get("corpus"), paths.get("corpus_bin"))
+            graph = DepGraph(record_store.meta, code_of=record_store.code)
+            previous = old.code_index if old is not None else None
+            code_index = CodeIndex.build(record_store.meta, previous=previous, code_of=record_store.code)
+
+        index = None
+        index_path = paths.get("index")
+        if unchanged("index", "index_bin") and (index_path is not None or unchanged("corpus", "corpus_bin")):
+            index = old.index
+        elif index_path is not None:
+            index = load_compact_index(index_path, paths.get("index_bin"))
+        if index is None:
+            index = CompactIndex.from_keyword_index(build_index(record_store.iter_records(), KeywordConfig()))
+
+        vectors = old.vectors if unchanged("vectors") else load_vectors(paths.get("vectors"))
+        ann = old.ann if unchanged("vectors", "ann") else load_ann(paths.get("ann"), vectors)
+        embedder = old.embedder if unchanged("embedder") else load_embedder(paths.get("embedder"))
+        reranker = old.reranker if unchanged("reranker") else load_reranker(paths.get("reranker"))
+        return SnippetData(
+            records=record_store.meta,
+            record_store=record_store,
+            by_id=graph.by_id,
+            by_symbol=graph.by_symbol,
+            graph=graph,
+            code_index=code_index,
+            index=index,
+            vectors=vectors,
+            ann=ann,
+            embedder=embedder,
+            reranker=reranker,
+            stamps=stamps,
+        )
@@ -0,0 +1,172 @@
+"""
+Contiguous float32 embedding matrix for hybrid search.
+
+Vectors are kept as one row-major (N, dim) float32 block with the ids alongside, stored as a
+standard `.npy` file plus a small `<name>.ids.json` sidecar (ids, model). With NumPy the file is
+opened with `mmap_mode="r"`, a query is a single matrix-vector product and top-k uses
+`argpartition`. Without NumPy the same file is memory-mapped and read through a float32
+memoryview, with a per-row dot product and `heapq.nlargest`.
+
+Build it from any existing embeddings file with
+`python -m mcp_server.library_impl.snippets_runtime.vector_matrix --embeddings <sqlite|jsonl|parquet>`.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import heapq
+import json
+import mmap
+import operator
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from .compact_index import _as_array
+
+try:  # optional acceleration
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - exercised only where NumPy is missing
+    np = None
+
+_NPY_MAGIC = b"\x93NUMPY"
+
+
+def ids_path(npy_path: Path) -> Path:
+    return npy_path.with_suffix(".ids.json")
+
+
+def _write_npy(path: Path, n: int, dim: int, payload: bytes) -> None:
+    """Write a version 1.0 .npy header for a little-endian float32 (n, dim) C-order array."""
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (n, dim)
+    pad = -(len(_NPY_MAGIC) + 4 + len(header) + 1) % 64
+    header = (header + " " * pad + "\n").encode("latin1")
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as fh:
+        fh.write(_NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(header)) + header)
+        fh.write(payload)
+    tmp.replace(path)
+
+
+def _read_npy_header(buf) -> Tuple[int, Tuple[int, int]]:
+    if bytes(buf[:6]) != _NPY_MAGIC:
+        raise ValueError("not a .npy file")
+    major = buf[6]
+    if major == 1:
+        (hlen,) = struct.unpack_from("<H", buf, 8)
+        start = 10
+    else:
+        (hlen,) = struct.unpack_from("<I", buf, 8)
+        start = 12
+    meta = ast.literal_eval(bytes(buf[start:start + hlen]).decode("latin1"))
+    if meta.get("descr") != "<f4" or meta.get("fortran_order"):
+        raise ValueError(f"unsupported embedding matrix layout: {meta}")
+    shape = tuple(meta["shape"])
+    if len(shape) != 2:
+        raise ValueError(f"embedding matrix must be 2-D, got shape {shape}")
+    return start + hlen, (int(shape[0]), int(shape[1]))
+
+
+class EmbeddingMatrix:
+    """Row-aligned ids and float32 vectors; exposes `dim` and `model` like VecStore."""
+
+    def __init__(self, ids: List[str], rows, dim: int, model: str = "", *, _buffer=None) -> None:
+        self.ids = ids
+        self.rows = rows  # numpy (N, dim) float32 array, or a flat float32 memoryview/array
+        self.dim = dim
+        self.model = model
+        self._buffer = _buffer
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_vectors(cls, vectors: dict, *, model: str = "") -> "EmbeddingMatrix":
+        """Build from {id: [floats]}; rows whose length differs from the first vector are dropped."""
+        ids: List[str] = []
+        flat = array("f")
+        dim = 0
+        for rid, vec in vectors.items():
+            dim = dim or len(vec)
+            if len(vec) != dim:
+                continue
+            ids.append(rid)
+            flat.extend(float(x) for x in vec)
+        rows = np.frombuffer(flat, dtype=np.float32).reshape(len(ids), dim) if np is not None and ids else flat
+        return cls(ids, rows, dim, model)
+
+    @classmethod
+    def from_vecstore(cls, store) -> "EmbeddingMatrix":
+        return cls.from_vectors(store.vectors, model=store.model)
+
+    def _flat_bytes(self) -> bytes:
+        if np is not None and isinstance(self.rows, np.ndarray):
+            return np.ascontiguousarray(self.rows, dtype="<f4").tobytes()
+        flat = array("f", self.rows)
+        if sys.byteorder != "little":
+            flat.byteswap()
+        return flat.tobytes()
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Sidecar first: readers key reloads off the .npy stamp, which only changes on the final replace.
+        ids_path(path).write_text(json.dumps({"ids": self.ids, "model": self.model}), encoding="utf-8")
+        _write_npy(path, len(self.ids), self.dim, self._flat_bytes())
+
+    @classmethod
+    def load(cls, path: Path) -> "EmbeddingMatrix":
+        meta = json.loads(ids_path(path).read_text(encoding="utf-8"))
+        ids = list(meta["ids"])
+        if np is not None:
+            rows = np.load(path, mmap_mode="r")
+            if rows.dtype != np.float32 or rows.ndim != 2:
+                raise ValueError(f"unsupported embedding matrix {rows.dtype} {rows.shape}")
+            n, dim = rows.shape
+            buf = None
+        else:
+            with path.open("rb") as fh:
+                buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            offset, (n, dim) = _read_npy_header(buf)
+            rows = _as_array("f", memoryview(buf)[offset:offset + n * dim * 4])
+        if n != len(ids):
+            raise ValueError(f"{path}: {n} rows but {len(ids)} ids")
+        return cls(ids, rows, dim, meta.get("model") or "", _buffer=buf)
+
+    def search(self, qvec: Sequence[float], k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (id, dot product) pairs, highest first; ties keep row order."""
+        n = len(self.ids)
+        if n == 0 or k <= 0 or len(qvec) != self.dim:
+            return []
+        k = min(k, n)
+        if np is not None and isinstance(self.rows, np.ndarray):
+            scores = self.rows @ np.asarray(qvec, dtype=np.float32)
+            top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+            top = top[np.lexsort((top, -scores[top]))]
+            return [(self.ids[i], float(scores[i])) for i in top]
+        rows, dim, mul = self.rows, self.dim, operator.mul
+        q = [float(x) for x in qvec]
+        scores = [sum(map(mul, rows[i * dim:(i + 1) * dim], q)) for i in range(n)]
+        return [(self.ids[i], scores[i]) for i in heapq.nlargest(k, range(n), key=scores.__getitem__)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .store import load_vectors
+
+    ap = argparse.ArgumentParser(description="Convert an embeddings file into a memory-mappable float32 .npy matrix")
+    ap.add_argument("--embeddings", required=True, type=Path, help="embeddings.(sqlite|jsonl|parquet)")
+    ap.add_argument("--out", type=Path, help="Output .npy (default: embeddings.npy next to the input)")
+    args = ap.parse_args(argv)
+    matrix = load_vectors(args.embeddings)
+    if matrix is None:
+        print(f"could not load embeddings from {args.embeddings}", file=sys.stderr)
+        return 1
+    out = args.out or args.embeddings.with_name("embeddings.npy")
+    matrix.save(out)
+    print(f"wrote {out} ({len(matrix)} x {matrix.dim} float32, model {matrix.model or '-'})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
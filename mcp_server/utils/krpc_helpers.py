@@ -126,3 +126,28 @@ def best_effort_paused_state(conn) -> bool | None:
         except Exception:
             continue
     return None
+
+
+def best_effort_cut_throttle(conn) -> bool:
+    """Zero throttle and RCS translation on the active vessel and release the autopilot; never raises."""
+    try:
+        vessel = conn.space_center.active_vessel
+        ctrl = vessel.control
+    except Exception:
+        return False
+    ok = False
+    try:
+        ctrl.throttle = 0.0
+        ok = True
+    except Exception:
+        pass
+    for axis in ("forward", "right", "up"):
+        try:
+            setattr(ctrl, axis, 0.0)
+        except Exception:
+            continue
+    try:
+        vessel.auto_pilot.disengage()
+    except Exception:
+        pass
+    return ok
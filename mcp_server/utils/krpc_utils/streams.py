@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Any, Callable, List
+
+
+class StreamGroup:
+    """
+    Owns a set of kRPC streams so guidance loops can read telemetry without per-frame RPCs.
+
+    Streams are created through the connection's add_stream() and removed together on close(),
+    so a job that fails halfway does not leave server-side streams running.
+    """
+
+    def __init__(self, conn) -> None:
+        self._conn = conn
+        self._streams: List[Any] = []
+
+    def add(self, func: Callable[..., Any], *args: Any) -> Any:
+        stream = self._conn.add_stream(func, *args)
+        self._streams.append(stream)
+        return stream
+
+    def attr(self, obj: Any, name: str) -> Any:
+        """Stream a property (equivalent to add_stream(getattr, obj, name))."""
+        return self.add(getattr, obj, name)
+
+    def close(self) -> None:
+        while self._streams:
+            stream = self._streams.pop()
+            try:
+                stream.remove()
+            except Exception:
+                pass
+
+
+class FrameClock:
+    """Block until the next physics frame by waiting on a universal-time stream."""
+
+    def __init__(self, streams: StreamGroup, space_center) -> None:
+        self._ut = streams.attr(space_center, "ut")
+
+    def now(self) -> float:
+        return float(self._ut())
+
+    def wait(self, timeout: float = 0.25) -> float:
+        """Wait for the next UT update (or timeout, e.g. while paused) and return the current UT."""
+        try:
+            with self._ut.condition:
+                self._ut.wait(timeout)
+        except Exception:
+            pass
+        return self.now()
@@ -23,3 +23,22 @@ def tsiolkovsky_burn_time(mass_kg: float, thrust_n: float, isp_s: float | None,
         return (isp_s * G0 * (1.0 - math.exp(-dv_m_s / (G0 * isp_s))) * mass_kg) / thrust_n
     except OverflowError:
         return None
+
+
+def feathered_throttle(remaining_dv_m_s: float, accel_m_s2: float | None, *, feather_s: float = 1.0, min_throttle: float = 0.05) -> float:
+    """
+    Throttle for closing out a burn: full thrust until the remaining Δv would take less than
+    `feather_s` seconds at full thrust, then proportional, never below `min_throttle`.
+    """
+    if remaining_dv_m_s <= 0:
+        return 0.0
+    if not accel_m_s2 or accel_m_s2 <= 0 or feather_s <= 0:
+        return 1.0
+    return max(min_throttle, min(1.0, remaining_dv_m_s / (accel_m_s2 * feather_s)))
+
+
+def twr_limited_throttle(max_twr: float | None, mass_kg: float, gravity_m_s2: float, available_thrust_n: float) -> float:
+    """Throttle that caps thrust-to-weight at `max_twr` (1.0 when uncapped or thrust is unknown)."""
+    if not max_twr or max_twr <= 0 or available_thrust_n <= 0 or mass_kg <= 0 or gravity_m_s2 <= 0:
+        return 1.0
+    return max(0.0, min(1.0, max_twr * mass_kg * gravity_m_s2 / available_thrust_n))
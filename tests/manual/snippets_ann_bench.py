@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from mcp_server.library_impl import snippets  # noqa: E402
+from mcp_server.library_impl.snippets_runtime import EmbeddingMatrix, IVFIndex  # noqa: E402
+from mcp_server.library_impl.snippets_runtime.hybrid_search import embed_query  # noqa: E402
+from mcp_server.library_impl.snippets_runtime.store import load_embedder, load_vectors  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:
+    print("NumPy is required for the ANN benchmark", file=sys.stderr)
+    raise SystemExit(1)
+
+
+def _synthetic(n: int, dim: int, clusters: int, seed: int = 0) -> EmbeddingMatrix:
+    # Clustered unit vectors: a stand-in for a larger snippet library when no embeddings exist.
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    rows = centers[rng.integers(0, clusters, size=n)] + 0.6 * rng.normal(size=(n, dim))
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    return EmbeddingMatrix([f"syn-{i}" for i in range(n)], rows.astype(np.float32), dim, "synthetic")
+
+
+def _timed(fn, repeat: int):
+    samples = []
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return out, statistics.median(samples)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Recall@k and latency of the IVF ANN index against exact vector search")
+    ap.add_argument("--eval", default=str(ROOT / "data" / "krpc-snippets" / "eval_hybrid.json"))
+    ap.add_argument("--embeddings", help="Embeddings file (default: the one the snippet store uses, else synthetic)")
+    ap.add_argument("--synthetic", type=int, default=20000, help="Synthetic rows when no embeddings file exists")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--k", type=int, default=15, help="Hybrid search asks the vector phase for 3*k; default 3*5")
+    ap.add_argument("--nlist", type=int)
+    ap.add_argument("--nprobe", default="1,2,4,8,16,32", help="Comma-separated nprobe values to sweep")
+    ap.add_argument("--extra-queries", type=int, default=100, help="Perturbed corpus rows added to the eval queries")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    path = Path(args.embeddings) if args.embeddings else snippets._store_paths()["vectors"]
+    matrix = load_vectors(path) if path else None
+    if matrix is None:
+        matrix = _synthetic(args.synthetic, args.dim, clusters=max(8, args.synthetic // 200))
+        source = f"synthetic {len(matrix)} x {matrix.dim}"
+    else:
+        matrix = EmbeddingMatrix(matrix.ids, np.asarray(matrix.rows, dtype=np.float32).reshape(len(matrix), matrix.dim), matrix.dim, matrix.model)
+        source = f"{path} ({len(matrix)} x {matrix.dim})"
+
+    texts = [q["text"] for q in json.loads(Path(args.eval).read_text(encoding="utf-8"))["per_query"]]
+    mock = not bool(os.environ.get("OPENAI_API_KEY"))
+    model = matrix.model or "text-embedding-3-small"
+    # The shipped vectors come from the offline local embedder; queries must use the same model.
+    embedder = load_embedder(snippets._store_paths()["embedder"])
+    if embedder is not None and embedder.model == model:
+        query_embedder = f"local {embedder.model}"
+    elif mock:
+        query_embedder = "mock (hash vectors, eval recall is not meaningful)"
+    else:
+        query_embedder = f"OpenAI {model}"
+    queries = [("eval", embed_query(t, model=model, dim=matrix.dim, mock=mock, embedder=embedder)) for t in texts]
+    rng = np.random.default_rng(1)
+    for i in rng.choice(len(matrix), size=min(args.extra_queries, len(matrix)), replace=False):
+        v = np.asarray(matrix.rows[i]) + 0.3 * rng.normal(size=matrix.dim) / np.sqrt(matrix.dim)
+        queries.append(("near-row", (v / np.linalg.norm(v)).tolist()))
+
+    t0 = time.perf_counter()
+    ivf = IVFIndex.build(matrix, nlist=args.nlist)
+    build_s = time.perf_counter() - t0
+    print(f"corpus: {source}; queries: {len(texts)} eval + {len(queries) - len(texts)} near-row; k={args.k}")
+    print(f"IVF build: nlist {ivf.nlist} in {build_s:.2f}s\n")
+
+    exact = []
+    exact_ms = []
+    for _, q in queries:
+        res, ms = _timed(lambda: matrix.search(q, k=args.k), args.repeat)
+        exact.append({rid for rid, _ in res})
+        exact_ms.append(ms)
+    print(f"eval query embedder: {query_embedder}")
+    print(f"{'nprobe':>7} {'recall@k eval':>14} {'recall@k all':>13} {'median ms':>10} {'speedup':>8}")
+    print(f"{'exact':>7} {1.0:>14.3f} {1.0:>13.3f} {statistics.median(exact_ms):>10.3f} {1.0:>7.1f}x")
+    for nprobe in (int(x) for x in args.nprobe.split(",") if x.strip()):
+        recalls = []
+        times = []
+        for (kind, q), truth in zip(queries, exact):
+            res, ms = _timed(lambda: ivf.search(matrix, q, k=args.k, nprobe=nprobe), args.repeat)
+            recalls.append((kind, len(truth & {rid for rid, _ in res}) / max(1, len(truth))))
+            times.append(ms)
+        eval_recall = statistics.mean(r for kind, r in recalls if kind == "eval")
+        all_recall = statistics.mean(r for _, r in recalls)
+        med = statistics.median(times)
+        print(f"{nprobe:>7} {eval_recall:>14.3f} {all_recall:>13.3f} {med:>10.3f} "
+              f"{statistics.median(exact_ms) / max(med, 1e-9):>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
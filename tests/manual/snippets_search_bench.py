@@ -0,0 +1,152 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from mcp_server.library_impl import snippets  # noqa: E402
+from mcp_server.library_impl.snippets_runtime import (  # noqa: E402
+    CompactIndex,
+    EmbeddingMatrix,
+    KeywordIndex,
+    VecStore,
+    keyword_search,
+)
+from mcp_server.library_impl.snippets_runtime import vector_matrix  # noqa: E402
+from mcp_server.library_impl.snippets_runtime.hybrid_search import vector_search  # noqa: E402
+from mcp_server.library_impl.snippets_runtime.compact_index import source_digest  # noqa: E402
+from mcp_server.library_impl.snippets_runtime.store import load_vectors  # noqa: E402
+
+
+def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+
+def _reload_per_call(query: str, k: int) -> None:
+    # Pre-store behaviour: parse the keyword index JSON on every search.
+    idx = KeywordIndex.load(snippets._default_paths()["keyword_index"])
+    keyword_search(idx, query, k=k)
+
+
+def _scan_get(rid: str) -> None:
+    # Pre-store behaviour: re-read and parse the whole corpus to find one id.
+    for line in snippets.snippets_path().read_text(encoding="utf-8").splitlines():
+        if line.strip() and json.loads(line).get("id") == rid:
+            return
+
+
+def _retained_kib(load) -> tuple:
+    # Python heap still held by the loaded object (mmap'd pages are file-backed and not counted).
+    tracemalloc.start()
+    obj = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size / 1024.0
+
+
+def _compare_indexes(queries, k: int, repeat: int, scratch: Path) -> None:
+    paths = snippets._default_paths()
+    json_path, bin_path = paths["keyword_index"], paths["keyword_index_bin"]
+    try:
+        fresh = CompactIndex.load(bin_path).source == source_digest(json_path)
+    except (OSError, ValueError):
+        fresh = False
+    if not fresh:
+        # Never touch the shipped data: convert the JSON into the scratch directory instead.
+        bin_path = scratch / "keyword_index.bin"
+        CompactIndex.from_keyword_index(KeywordIndex.load(json_path), source=source_digest(json_path)).save(bin_path)
+        print(f"\n(shipped keyword_index.bin is stale or missing; benchmarking a fresh build in {bin_path})")
+    dict_idx, dict_kib = _retained_kib(lambda: KeywordIndex.load(json_path))
+    compact, compact_kib = _retained_kib(lambda: CompactIndex.load(bin_path))
+    load_dict = _timed(lambda: KeywordIndex.load(json_path), repeat)
+    load_compact = _timed(lambda: CompactIndex.load(bin_path), repeat)
+
+    print(f"\n{'index':<8} {'file KiB':>9} {'heap KiB':>9} {'load ms':>8}")
+    print(f"{'json':<8} {json_path.stat().st_size / 1024:>9.0f} {dict_kib:>9.0f} {load_dict:>8.2f}")
+    print(f"{'compact':<8} {bin_path.stat().st_size / 1024:>9.0f} {compact_kib:>9.0f} {load_compact:>8.2f}")
+    print(f"\n{'query':<22} {'filters':<18} {'dict ms':>8} {'compact ms':>10} {'speedup':>8}")
+    for q in queries:
+        for label, kw in (("-", {}), ("function,no-restr", {"category": "function", "exclude_restricted": True})):
+            before = _timed(lambda: keyword_search(dict_idx, q, k=k, **kw), repeat)
+            after = _timed(lambda: compact.search(q, k=k, **kw), repeat)
+            print(f"{q[:22]:<22} {label:<18} {before:>8.3f} {after:>10.3f} {before / max(after, 1e-9):>7.1f}x")
+
+
+def _compare_vectors(label: str, vectors: dict, dim: int, q, k: int, repeat: int) -> None:
+    dict_store = VecStore(vectors=vectors, dim=dim, model="bench")
+    matrix = EmbeddingMatrix.from_vecstore(dict_store)
+    before = _timed(lambda: vector_search(dict_store, q, k=k * 3), repeat)
+    after = _timed(lambda: vector_search(matrix, q, k=k * 3), repeat)
+    backend = "numpy" if vector_matrix.np is not None else "pure-python"
+    print(f"vector search {label} {len(vectors)} x {dim} ({backend}): dict {before:.3f} ms, matrix {after:.3f} ms, "
+          f"{before / max(after, 1e-9):.1f}x")
+
+
+def _shipped_vectors() -> tuple:
+    """{id: row} from the embeddings the snippet store serves, or (None, 0) when there are none."""
+    path = snippets._store_paths()["vectors"]
+    matrix = load_vectors(path) if path else None
+    if matrix is None:
+        return None, 0
+    flat = [float(x) for x in (matrix.rows.ravel() if vector_matrix.np is not None and hasattr(matrix.rows, "ravel") else matrix.rows)]
+    d = matrix.dim
+    return {rid: flat[i * d:(i + 1) * d] for i, rid in enumerate(matrix.ids)}, d
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark snippet search/get latency on the eval_keyword queries")
+    ap.add_argument("--eval", default=str(ROOT / "data" / "krpc-snippets" / "eval_keyword.json"))
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--vectors", type=int, default=333, help="Synthetic embedding rows for the extra vector benchmark")
+    ap.add_argument("--dim", type=int, default=1536, help="Synthetic dimension (OpenAI text-embedding-3-small size)")
+    args = ap.parse_args()
+
+    queries = [q["text"] for q in json.loads(Path(args.eval).read_text(encoding="utf-8"))["per_query"]]
+    ids = list(snippets._snapshot().by_id)[:: max(1, len(snippets._snapshot().by_id) // len(queries))][: len(queries)]
+
+    rows = []
+    for q in queries:
+        before = _timed(lambda: _reload_per_call(q, args.k), args.repeat)
+        after = _timed(lambda: snippets.snippets_search_impl(q, k=args.k), args.repeat)
+        rows.append(("search", q, before, after))
+    for rid in ids:
+        before = _timed(lambda: _scan_get(rid), args.repeat)
+        after = _timed(lambda: snippets.snippets_get_impl(rid), args.repeat)
+        rows.append(("get", rid[:12], before, after))
+
+    print(f"{'op':<7} {'query/id':<14} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for op, label, before, after in rows:
+        print(f"{op:<7} {label:<14} {before:>10.3f} {after:>10.3f} {before / max(after, 1e-9):>7.0f}x")
+    print(f"store reloads: {snippets._STORE.reloads}")
+    with tempfile.TemporaryDirectory() as scratch:
+        _compare_indexes(queries + ["orbit vessel", "get vessel speed"], args.k, args.repeat, Path(scratch))
+
+    print()
+    shipped, dim = _shipped_vectors()
+    embedder = snippets._snapshot().embedder
+    if shipped is not None:
+        q = embedder.embed(queries[0]) if embedder is not None else []
+        _compare_vectors("shipped", shipped, dim, q if len(q) == dim else next(iter(shipped.values())), args.k, args.repeat)
+    # Plus random vectors at the size a remote embedding model would produce.
+    rnd = random.Random(0)
+    synthetic = {f"id-{i}": [rnd.uniform(-1.0, 1.0) for _ in range(args.dim)] for i in range(args.vectors)}
+    _compare_vectors("synthetic", synthetic, args.dim, [rnd.uniform(-1.0, 1.0) for _ in range(args.dim)], args.k, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
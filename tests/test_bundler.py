@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import ast
+
+from mcp_server.library_impl.snippets_runtime import DepGraph
+from mcp_server.library_impl.snippets_runtime.bundler import shake_records
+
+CONST = """import math
+import os
+HEADING_EAST = 90
+HEADING_WEST = 270  # unused
+print("side effect")
+"""
+
+NAV = '''class Nav(Base):
+    """Navigation helper."""
+    G = 9.81
+
+    def __init__(self, conn):
+        self.conn = conn  # keep
+
+    # circ comment
+    def circ_dv(self):
+        return self._mu() * HEADING_EAST
+
+    def _mu(self):
+        return math.sqrt(self.G)
+
+    def unused(self):
+        return launch()
+
+    def __repr__(self):
+        return "Nav"
+'''
+
+BASE = """class Base:
+    def helper(self):
+        return 1
+"""
+
+
+def _records():
+    return [
+        {"id": "const", "name": "CONST_BLOCK", "path": "nav.py", "categories": ["const"], "code": CONST},
+        {"id": "base", "name": "Base", "path": "nav.py", "categories": ["class"], "code": BASE},
+        {"id": "nav", "name": "Nav", "path": "nav.py", "categories": ["class"], "code": NAV, "dependencies": ["nav.Base"]},
+        {"id": "launch", "name": "launch", "path": "nav.py", "categories": ["function"], "code": "def launch():\n    return 1\n"},
+        {"id": "meth", "name": "Nav.circ_dv", "path": "nav.py", "categories": ["method"], "code": "    def circ_dv(self):\n        return 0\n"},
+    ]
+
+
+def test_shake_keeps_only_reachable_code():
+    recs = _records()
+    target = recs[-1]
+    out = shake_records(recs[:4], target)
+    assert out["const"] == 'import math\nHEADING_EAST = 90\nprint("side effect")\n'
+    assert out["base"] == "class Base:\n    pass\n"
+    nav = out["nav"]
+    for kept in ("# circ comment", "def circ_dv", "def _mu", "def __init__", "def __repr__", "G = 9.81"):
+        assert kept in nav
+    assert "def unused" not in nav and "launch" not in out
+
+    stripped = shake_records(recs[:4], target, strip_docstrings=True)["nav"]
+    assert '"""' not in stripped and "#" not in stripped
+    ast.parse(stripped)
+
+
+def test_resolve_reports_bytes_saved_and_caps_shaken_code():
+    graph = DepGraph(_records())
+    full = graph.resolve(target_id="meth")
+    shaken = graph.resolve(target_id="meth", shake=True)
+    assert shaken.include_ids == ["const", "base", "nav"]
+    assert shaken.stats["bytes_unshaken"] == full.stats["bytes"]
+    assert shaken.stats["bytes_saved"] == full.stats["bytes"] - shaken.stats["bytes"] > 0
+    ast.parse(shaken.bundle_code)
+
+    # The byte cap applies to shaken code, so a cap that truncates the full bundle can fit it.
+    cap = sum(len(r["code"]) for r in _records()[:3]) - 1
+    assert graph.resolve(target_id="meth", size_cap_bytes=cap).truncated
+    assert not graph.resolve(target_id="meth", size_cap_bytes=cap, shake=True).truncated
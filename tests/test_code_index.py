@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import re
+from hashlib import sha1
+from pathlib import Path
+
+import pytest
+
+from mcp_server.library_impl.snippets_runtime import CodeIndex
+from mcp_server.library_impl.snippets_runtime.code_index import required_literals
+from mcp_server.library_impl.snippets_runtime.store import load_records
+
+DATA = Path(__file__).resolve().parents[1] / "data" / "krpc-snippets"
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        (r"add_stream\(getattr", ["add_stream(getattr"]),
+        (r"foo\.bar(baz)?qux", ["foo.bar", "qux"]),
+        (r"def \w+_burn", ["def ", "_burn"]),
+        (r"abcd?e", ["abc"]),
+        (r"vessel|orbit", []),
+        (r"[abc]def\d+", ["def"]),
+    ],
+)
+def test_required_literals(pattern, expected):
+    assert required_literals(pattern) == expected
+
+
+def test_code_search_matches_brute_force_scan():
+    records = load_records(DATA / "snippets_enriched.jsonl")
+    index = CodeIndex.build(records)
+    cases = [
+        ("auto_pilot.target_pitch_and_heading", False, False),
+        ("add_stream(getattr", False, False),
+        ("UT", False, True),
+        (r"def \w+_burn", True, False),
+        (r"vessel\.(control|auto_pilot)\.\w+", True, False),
+        (r"(?x) add_stream \( getattr", True, False),
+    ]
+    for pattern, regex, ignore_case in cases:
+        rx = re.compile(pattern if regex else re.escape(pattern), re.IGNORECASE if ignore_case else 0)
+        expected = [r["id"] for r in records if rx.search(r.get("code") or "")]
+        hits, _ = index.search(pattern, regex=regex, ignore_case=ignore_case)
+        assert [rid for rid, _, _ in hits] == expected, pattern
+
+    hits, scanned = index.search("add_stream(getattr", context=1)
+    assert scanned == len(hits) < len(records) // 10
+    rid, matches, total = hits[0]
+    code = next(r["code"] for r in records if r["id"] == rid).split("\n")
+    m = matches[0]
+    assert code[m.line - 1] == m.text and m.text[m.col - 1:].startswith("add_stream(getattr")
+    assert m.before == code[m.line - 2:m.line - 1] and len(matches) <= total
+
+
+def test_code_index_rebuild_reuses_unchanged_records():
+    records = [{"id": "a", "code": "x = vessel.control"}, {"id": "b", "code": "y = 1"}]
+    first = CodeIndex.build(records)
+    code = {"a": records[0]["code"], "b": "y = vessel.flight()"}
+    fetched = []
+
+    def code_of(rid):
+        fetched.append(rid)
+        return code[rid]
+
+    # Metadata rows carry only the code hash; the unchanged record keeps its postings unfetched.
+    rows = [dict(id=rid, code_sha1=sha1(c.encode("utf-8")).hexdigest()) for rid, c in code.items()]
+    second = CodeIndex.build(rows, previous=first, code_of=code_of)
+    assert fetched == ["b"]
+    hits, scanned = second.search("vessel.")
+    assert [rid for rid, _, _ in hits] == ["a", "b"] and scanned == 2
+    assert [rid for rid, _, _ in second.search("y = 1")[0]] == []
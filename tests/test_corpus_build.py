@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from mcp_server.library_impl.snippets_runtime import EmbeddingMatrix, IVFIndex, KeywordIndex, LocalEmbedder, LocalEmbedderConfig, RecordStore, build_index
+from mcp_server.library_impl.snippets_runtime.corpus_build import BuildPaths, build_corpus, discover_shards
+from mcp_server.library_impl.snippets_runtime.store import load_records
+
+PID = "def clamp(x, lo, hi):\n    return max(lo, min(hi, x))\n"
+
+
+def _rec(rid, repo, path, name, code, **kw):
+    rec = {"id": rid, "repo": repo, "path": path, "name": name, "code": code, "categories": ["function"],
+           "description": f"{name} helper", "dependencies": [], "license": "UNKNOWN", "license_url": "about:blank",
+           "created_at": "2025-01-01T00:00:00Z"}
+    rec.update(kw)
+    return rec
+
+
+def _shard(path: Path, recs) -> Path:
+    path.write_text("".join(json.dumps(r) + "\n" for r in recs), encoding="utf-8")
+    return path
+
+
+def test_incremental_build_dedupes_and_updates_indexes_in_place(tmp_path: Path):
+    a, b = "https://github.com/a/ksp", "https://github.com/b/ksp"
+    ann = [
+        _rec("a1", a, "pid.py", "clamp", PID),
+        _rec("a2", a, "launch.py", "ascent", "def ascent(vessel):\n    vessel.control.throttle = 1\n"),
+    ]
+    bob = [
+        # Same code as a1 in another repo; launch.main depends on this copy, so it stays as an alias.
+        _rec("b1", b, "launch.py", "clamp", "    def clamp(x, lo, hi):   \n        return max(lo, min(hi, x))\n"),
+        _rec("b2", b, "launch.py", "main", "def main():\n    clamp(1, 0, 2)\n", dependencies=["launch.clamp"]),
+        _rec("b3", b, "util.py", "clamp", PID, created_at="2024-01-01T00:00:00Z"),
+        _rec("fx", "file://test_repo", "x.py", "fixture", "x = 1\n"),
+    ]
+    _shard(tmp_path / "snippets_extracted_ann.jsonl", [dict(r, description="stale") for r in ann])
+    _shard(tmp_path / "snippets_enriched_ann.jsonl", ann)
+    _shard(tmp_path / "snippets_with_deps_bob.jsonl", bob)
+    _shard(tmp_path / "snippets_enriched_carl.jsonl", [])
+    (tmp_path / "repo_licenses.json").write_text(json.dumps({b: {"license": "GPL-3.0", "license_url": "https://gpl"}}))
+    LocalEmbedder.train(ann + bob, LocalEmbedderConfig(buckets=64, dim=8)).save(tmp_path / "local_embedder")
+
+    paths = BuildPaths.under(tmp_path)
+    shards = discover_shards(tmp_path, exclude=[paths.corpus])
+    assert [p.name for p in shards] == ["snippets_enriched_ann.jsonl", "snippets_with_deps_bob.jsonl"]
+
+    report = build_corpus(shards, paths, jobs=1)
+    corpus = {r["id"]: r for r in load_records(paths.corpus)}
+    assert sorted(corpus) == ["a1", "a2", "b1", "b2"]  # b3 dropped, fixture excluded
+    # The unrestricted copy wins over the older GPL one; the needed copy points at it.
+    assert corpus["a1"]["duplicates"] == [
+        {"id": "b1", "repo": b, "path": "launch.py", "commit": None},
+        {"id": "b3", "repo": b, "path": "util.py", "commit": None},
+    ]
+    assert corpus["b1"]["duplicate_of"] == "a1" and corpus["b2"]["restricted"] and corpus["b2"]["license_url"] == "https://gpl"
+    assert corpus["a1"]["license_url"] == "" and corpus["a1"]["restricted"] is False
+    assert (report.enriched, report.reused, report.aliases, report.dropped, report.indexed) == (5, 0, 1, 1, 3)
+
+    def check() -> None:
+        index = KeywordIndex.load(paths.index)
+        expected = build_index(load_records(paths.corpus))
+        assert (index.vocab, index.df, index.docs) == (expected.vocab, expected.df, expected.docs)
+        assert sorted(EmbeddingMatrix.load(paths.vectors).ids) == sorted(expected.docs) == ["a1", "a2", "b2"]
+
+    check()
+
+    # Edit one record: only it is re-enriched, re-indexed and re-embedded.
+    bob[1] = dict(bob[1], description="main entry point")
+    _shard(tmp_path / "snippets_with_deps_bob.jsonl", bob)
+    before = EmbeddingMatrix.load(paths.vectors)
+    report = build_corpus(shards, paths, jobs=1)
+    # b3 was dropped last time; the build state kept its enriched fields, so it is reused too.
+    assert (report.reused, report.enriched, report.indexed, report.embedded, report.removed) == (4, 1, 1, 1, 1)
+    assert load_records(paths.corpus)[3]["description"] == "main entry point"
+    assert RecordStore.load(paths.records).get("b2") == load_records(paths.corpus)[3]
+    check()
+    after = EmbeddingMatrix.load(paths.vectors)
+    row = lambda m, rid: list(m.rows[m.ids.index(rid) * m.dim:(m.ids.index(rid) + 1) * m.dim])
+    assert row(after, "a2") == row(before, "a2") and row(after, "b2") != row(before, "b2")
+
+    report = build_corpus(shards, paths, jobs=1)
+    assert (report.reused, report.enriched, report.indexed, report.dropped) == (5, 0, 0, 1)
+    assert load_records(paths.corpus)[0]["duplicates"] == corpus["a1"]["duplicates"]
+
+    assert build_corpus(shards, paths, jobs=1, full=True).reused == 0
+    check()
+
+
+def test_rebuild_refreshes_an_existing_ivf_index(tmp_path: Path):
+    pytest.importorskip("numpy")
+    recs = [_rec(f"r{i}", "https://github.com/a/ksp", f"m{i}.py", f"f{i}", f"def f{i}(vessel):\n    return {i}\n") for i in range(6)]
+    _shard(tmp_path / "snippets_enriched_ann.jsonl", recs)
+    LocalEmbedder.train(recs, LocalEmbedderConfig(buckets=64, dim=8)).save(tmp_path / "local_embedder")
+    paths = BuildPaths.under(tmp_path)
+    shards = discover_shards(tmp_path, exclude=[paths.corpus])
+    build_corpus(shards, paths, jobs=1)
+    IVFIndex.build(EmbeddingMatrix.load(paths.vectors), nlist=2, nprobe=1).save(paths.ann)
+    stale = IVFIndex.load(paths.ann)
+
+    recs[0] = dict(recs[0], description="burn to circularize")
+    _shard(tmp_path / "snippets_enriched_ann.jsonl", recs)
+    build_corpus(shards, paths, jobs=1)
+    ivf = IVFIndex.load(paths.ann)
+    matrix = EmbeddingMatrix.load(paths.vectors)
+    assert not stale.matches(matrix) and ivf.matches(matrix) and (ivf.nlist, ivf.nprobe) == (2, 1)
@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from mcp_server.executor_impl import ascent_guidance, docking_guidance, landing_guidance, warp_control
+from mcp_server.executor_tools import flight_jobs
+from mcp_server.executor_tools.job_artifacts import job_artifact_path, job_resource_uri
+from mcp_server.executor_tools.jobs import JobStatus, job_registry
+from mcp_server.utils.descent_model import DescentModel, find_ignition_delay, simulate
+from mcp_server.utils.krpc_utils.streams import FrameClock, StreamGroup
+from mcp_server.utils.physics_utils import feathered_throttle, twr_limited_throttle
+
+
+class DummyAutoPilot:
+    def __init__(self) -> None:
+        self.engaged = True
+
+    def disengage(self) -> None:
+        self.engaged = False
+
+
+class DummyConn:
+    def __init__(self) -> None:
+        self.closed = False
+        self.control = SimpleNamespace(throttle=1.0, forward=0.0, right=0.0, up=0.0)
+        self.vessel = SimpleNamespace(control=self.control, auto_pilot=DummyAutoPilot())
+        self.space_center = SimpleNamespace(active_vessel=self.vessel)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _patch_connect(monkeypatch, conn: DummyConn) -> None:
+    def fake_connect(address: str, rpc_port: int, stream_port: int, name: str | None, timeout: float) -> DummyConn:
+        return conn
+
+    monkeypatch.setattr(flight_jobs, "connect_to_game", fake_connect)
+
+
+def test_feathered_throttle_profile():
+    assert feathered_throttle(0.0, 10.0) == 0.0
+    assert feathered_throttle(100.0, 10.0) == 1.0
+    assert feathered_throttle(5.0, 10.0) == 0.5
+    assert feathered_throttle(0.01, 10.0) == 0.05
+    assert feathered_throttle(5.0, None) == 1.0
+
+
+def test_start_execute_node_job_writes_burn_report(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr("mcp_server.executor_tools.job_artifacts.JOB_ARTIFACTS_DIR", tmp_path, raising=False)
+    conn = DummyConn()
+    _patch_connect(monkeypatch, conn)
+    captured: dict = {}
+
+    def fake_execute_node(c, handle, stop, **kwargs):
+        captured.update(kwargs)
+        handle.log("[execute_node] burning")
+        return {"residual_dv_m_s": 0.05, "cutoff_reason": "tolerance"}
+
+    monkeypatch.setattr(flight_jobs.node_execution, "execute_node", fake_execute_node)
+
+    payload = json.loads(flight_jobs.start_execute_node_job("1.2.3.4", node_index=1, tolerance_m_s=0.2))
+    job_id = payload["job_id"]
+    job_registry.wait_for(job_id, timeout=5)
+
+    state = job_registry.get_state(job_id)
+    assert state is not None
+    assert state.status is JobStatus.SUCCEEDED
+    assert state.result_resource == job_resource_uri(job_id)
+    assert captured["node_index"] == 1
+    assert captured["tolerance_m_s"] == 0.2
+
+    data = json.loads(job_artifact_path(job_id).read_text())
+    assert data["kind"] == "execute_node"
+    assert data["result"]["cutoff_reason"] == "tolerance"
+    assert data["cancelled"] is False
+    assert conn.control.throttle == 0.0
+    assert conn.closed
+
+
+def test_cancel_flight_job_zeroes_throttle(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr("mcp_server.executor_tools.job_artifacts.JOB_ARTIFACTS_DIR", tmp_path, raising=False)
+    conn = DummyConn()
+    _patch_connect(monkeypatch, conn)
+    throttle_at_cancel: list[float] = []
+
+    def fake_execute_node(c, handle, stop, **kwargs):
+        c.control.throttle = 1.0
+        handle.log("[execute_node] burning")
+        stop.wait(5)
+        throttle_at_cancel.append(c.control.throttle)
+        return {"cutoff_reason": "cancelled"}
+
+    monkeypatch.setattr(flight_jobs.node_execution, "execute_node", fake_execute_node)
+
+    job_id = json.loads(flight_jobs.start_execute_node_job("1.2.3.4"))["job_id"]
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        state = job_registry.get_state(job_id)
+        if state is not None and any("burning" in line for line in state.logs):
+            break
+        time.sleep(0.01)
+    assert job_registry.cancel_job(job_id)["ok"]
+    job_registry.wait_for(job_id, timeout=5)
+
+    state = job_registry.get_state(job_id)
+    assert state is not None
+    assert state.status is JobStatus.CANCELLED
+    assert throttle_at_cancel == [0.0]
+    data = json.loads(job_artifact_path(job_id).read_text())
+    assert data["cancelled"] is True
+
+
+def test_turn_profile_and_twr_limit():
+    profile = ascent_guidance.TurnProfile.from_dict({"turn_start_alt_m": 1000, "turn_end_alt_m": 11000, "shape": 1})
+    assert profile.pitch_at(500.0) == 90.0
+    assert profile.pitch_at(6000.0) == 45.0
+    assert profile.pitch_at(50000.0) == 0.0
+    assert twr_limited_throttle(2.0, 1000.0, 10.0, 40000.0) == 0.5
+    assert twr_limited_throttle(None, 1000.0, 10.0, 40000.0) == 1.0
+    assert twr_limited_throttle(2.0, 1000.0, 10.0, 10000.0) == 1.0
+
+
+def test_start_ascent_job_passes_profile(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr("mcp_server.executor_tools.job_artifacts.JOB_ARTIFACTS_DIR", tmp_path, raising=False)
+    conn = DummyConn()
+    _patch_connect(monkeypatch, conn)
+    captured: dict = {}
+
+    def fake_fly_ascent(c, handle, stop, **kwargs):
+        captured.update(kwargs)
+        return {"outcome": "orbit", "telemetry": [{"ut": 1.0, "altitude_m": 100.0}]}
+
+    monkeypatch.setattr(flight_jobs.ascent_guidance, "fly_ascent", fake_fly_ascent)
+
+    job_id = json.loads(
+        flight_jobs.start_ascent_job("1.2.3.4", target_apoapsis_m=100000.0, turn_profile={"shape": 0.4})
+    )["job_id"]
+    job_registry.wait_for(job_id, timeout=5)
+
+    assert captured["target_apoapsis_m"] == 100000.0
+    assert captured["turn_profile"] == {"shape": 0.4}
+    data = json.loads(job_artifact_path(job_id).read_text())
+    assert data["kind"] == "ascent"
+    assert data["result"]["telemetry"][0]["altitude_m"] == 100.0
+
+
+def test_descent_model_matches_vertical_stopping_distance():
+    model = DescentModel(mu=3.5316e12, radius_m=600000.0, rotation_rate_rad_s=0.0, thrust_n=30000.0)
+    start_r = 610000.0
+    pred = simulate(model, (start_r, 0.0, 0.0), (-200.0, 0.0, 0.0), 1000.0, terrain_alt_m=0.0, throttle=1.0)
+    g = 3.5316e12 / start_r**2
+    assert pred.stopped
+    assert abs((10000.0 - pred.altitude_m) - 200.0**2 / (2 * (30.0 - g))) < 5.0
+
+    delay, burn = find_ignition_delay(
+        model, (start_r, 0.0, 0.0), (-200.0, 0.0, 0.0), 1000.0, terrain_alt_m=0.0, stop_alt_m=50.0
+    )
+    assert delay is not None and delay > 0
+    assert 50.0 <= burn.altitude_m < 60.0
+
+
+class FakeLandingVessel:
+    """Straight-down fall onto an airless Kerbin-sized body; the engine always pushes straight up."""
+
+    MU, RADIUS = 3.5316e12, 600000.0
+
+    def __init__(self, altitude_m: float, vertical_speed_m_s: float, thrust_n: float, mass_kg: float) -> None:
+        self.r = self.RADIUS + altitude_m
+        self.vs = vertical_speed_m_s
+        self.available_thrust = thrust_n
+        self.mass = mass_kg
+        self.ut = 0.0
+        self.touchdown_vs: float | None = None
+        self.throttles: list = []
+        self.control = SimpleNamespace(throttle=0.0, current_stage=1, gear=False, sas=False)
+        self.auto_pilot = SimpleNamespace(engage=lambda: None, disengage=lambda: None, target_pitch_and_heading=lambda p, h: None)
+        self.orbit = SimpleNamespace(body=SimpleNamespace(
+            name="Kerbin", gravitational_parameter=self.MU, equatorial_radius=self.RADIUS, rotational_speed=0.0,
+            reference_frame="body", has_atmosphere=False, surface_height=lambda lat, lon: 0.0,
+        ))
+        self.surface_reference_frame = self.surface_velocity_reference_frame = "surface"
+
+    @property
+    def situation(self) -> str:
+        return "landed" if self.touchdown_vs is not None else "flying"
+
+    def position(self, rf):
+        return (self.r, 0.0, 0.0)
+
+    def velocity(self, rf):
+        return (self.vs, 0.0, 0.0)
+
+    def bounding_box(self, rf):
+        return (-1.0, -1.0, -1.0), (1.0, 1.0, 1.0)
+
+    def flight(self, rf):
+        return SimpleNamespace(surface_altitude=self.r - self.RADIUS, dynamic_pressure=0.0, drag=(0.0, 0.0, 0.0))
+
+    def step(self, dt: float = 0.02) -> None:
+        self.ut += dt
+        if self.touchdown_vs is not None:
+            return
+        thr = self.control.throttle
+        self.throttles.append((self.ut, self.r - self.RADIUS, thr))
+        self.vs += (thr * self.available_thrust / self.mass - self.MU / self.r**2) * dt
+        self.r += self.vs * dt
+        if self.r - self.RADIUS <= 1.0:  # the bounding box bottom touches the ground
+            self.touchdown_vs, self.vs = self.vs, 0.0
+
+
+class FakeLandingConn:
+    def __init__(self, vessel: FakeLandingVessel) -> None:
+        self.vessel = vessel
+        self.space_center = SimpleNamespace(active_vessel=vessel)
+
+    def add_stream(self, func, *args):
+        if func is getattr and args[0] is self.space_center:
+            ut = FakeStream(lambda: self.vessel.ut)
+            ut.wait = lambda timeout=None: self.vessel.step()
+            return ut
+        if func is getattr and args[1] in ("surface_altitude", "dynamic_pressure", "drag"):
+            return FakeStream(lambda: getattr(self.vessel.flight(None), args[1]))
+        return FakeStream(lambda: func(*args))
+
+
+def _fly_fake_landing(monkeypatch, vessel: FakeLandingVessel) -> dict:
+    monkeypatch.setattr(landing_guidance, "_stage_performance", lambda conn, stage: {
+        "stage": 1, "max_thrust_n": vessel.available_thrust, "combined_isp_s": None, "available_dv_m_s": None,
+    })
+    handle = SimpleNamespace(log=lambda line: None)
+    return landing_guidance.fly_landing(FakeLandingConn(vessel), handle, threading.Event(), margin_m=10.0)
+
+
+def test_fly_landing_goes_full_throttle_when_ignition_is_too_late(monkeypatch):
+    # 120 m/s down at 300 m with 20 m/s² of thrust: even a full burn needs ~700 m.
+    vessel = FakeLandingVessel(300.0, -120.0, thrust_n=20000.0, mass_kg=1000.0)
+    report = _fly_fake_landing(monkeypatch, vessel)
+
+    assert report["ignition"]["late"] and report["abort"]["reason"] == "abort_cannot_stop"
+    assert report["abort"]["predicted_stop_agl_m"] is None and report["abort"]["surface_altitude_m"] > 250.0
+    ignition = report["ignition"]["ut"]
+    burn = [thr for ut, alt, thr in vessel.throttles if ut > ignition and alt > landing_guidance.FINAL_ALT_M + 1.0]
+    assert len(burn) > 10 and min(burn[1:]) == 1.0  # full throttle from the first commanded frame on
+    assert report["outcome"] == "landed" and vessel.touchdown_vs < -50.0
+
+
+def test_fly_landing_hoverslam_touches_down_softly(monkeypatch):
+    vessel = FakeLandingVessel(1500.0, -80.0, thrust_n=20000.0, mass_kg=1000.0)
+    report = _fly_fake_landing(monkeypatch, vessel)
+
+    assert report["abort"] is None and not report["ignition"]["late"]
+    assert report["outcome"] == "landed" and -3.0 < vessel.touchdown_vs < 0.0
+
+
+def test_start_landing_job_requires_both_coordinates(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr("mcp_server.executor_tools.job_artifacts.JOB_ARTIFACTS_DIR", tmp_path, raising=False)
+    conn = DummyConn()
+    _patch_connect(monkeypatch, conn)
+
+    job_id = json.loads(flight_jobs.start_landing_job("1.2.3.4", target_lat=0.1))["job_id"]
+    job_registry.wait_for(job_id, timeout=5)
+
+    state = job_registry.get_state(job_id)
+    assert state is not None
+    assert state.status is JobStatus.FAILED
+    data = json.loads(job_artifact_path(job_id).read_text())
+    assert data["kind"] == "landing"
+    assert "target_lat and target_lon" in data["error"]
+
+
+def test_docking_approach_velocity_phases():
+    kwargs = {"standoff_m": 10.0, "max_speed_m_s": 1.0, "final_speed_m_s": 0.15}
+    desired, phase = docking_guidance.approach_velocity((0.0, 50.0, 0.0), aligned=True, **kwargs)
+    assert phase == "approach"
+    assert desired == (0.0, -1.0, 0.0)
+    desired, phase = docking_guidance.approach_velocity((0.0, 1.0, 0.0), aligned=True, **kwargs)
+    assert desired[1] == -0.15
+    desired, phase = docking_guidance.approach_velocity((3.0, 2.0, 0.0), aligned=True, **kwargs)
+    assert phase == "backoff"
+    assert desired[0] < 0 and desired[1] > 0
+    _desired, phase = docking_guidance.approach_velocity((0.0, 50.0, 0.0), aligned=False, **kwargs)
+    assert phase == "align"
+
+
+def test_choose_warp_respects_altitude_limit_and_horizon():
+    assert warp_control.choose_warp(None, 7) == ("rails", 7)
+    assert warp_control.choose_warp(None, 3) == ("rails", 3)
+    assert warp_control.choose_warp(250.0, 7) == ("rails", 4)
+    assert warp_control.choose_warp(1.0, 7) == ("none", 0)
+    assert warp_control.choose_warp(None, 7, max_rails_rate=1000) == ("rails", 5)
+    assert warp_control.choose_warp(None, 0) == ("none", 0)
+    assert warp_control.choose_warp(None, 0, allow_physics=True) == ("physics", 3)
+
+
+class FakeStream:
+    def __init__(self, fn) -> None:
+        self._fn = fn
+        self.condition = threading.Condition()
+
+    def __call__(self):
+        return self._fn()
+
+    def wait(self, timeout=None) -> None:
+        pass
+
+    def remove(self) -> None:
+        pass
+
+
+class FakeWarpCenter:
+    """Advances UT by the current rails rate every frame."""
+
+    def __init__(self) -> None:
+        self.ut = 0.0
+        self.rails_warp_factor = 0
+        self.physics_warp_factor = 0
+        self.maximum_rails_warp_factor = 7
+        self.ticks = 0
+
+    @property
+    def warp_rate(self) -> float:
+        return float(warp_control.RAILS_RATES[self.rails_warp_factor])
+
+    def tick(self) -> float:
+        self.ticks += 1
+        self.ut += self.warp_rate * 0.02
+        return self.ut
+
+
+class FakeWarpConn:
+    def __init__(self, sc: FakeWarpCenter) -> None:
+        self.sc = sc
+
+    def add_stream(self, func, obj, attr):
+        if attr == "ut":
+            return FakeStream(self.sc.tick)
+        return FakeStream(lambda: getattr(obj, attr))
+
+
+def test_warp_until_stops_on_first_condition():
+    sc = FakeWarpCenter()
+    streams = StreamGroup(FakeWarpConn(sc))
+    clock = FrameClock(streams, sc)
+    conditions = [warp_control.UTCondition("node_lead", 50000.0), warp_control.UTCondition("ut", 90000.0)]
+
+    result = warp_control.warp_until(sc, streams, clock, conditions, threading.Event())
+
+    assert result["fired"] == "node_lead"
+    assert 50000.0 <= result["ut"] < 50001.0
+    assert result["max_rate"] > 1000
+    assert sc.ticks < 10000
+    assert sc.rails_warp_factor == 0
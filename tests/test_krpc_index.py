@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from krpc_index import ApiLinks, KRPCSearchIndex, SymbolTable
+from krpc_index.chunks import chunk_text
+from krpc_index.links import extract_api_uses
+from krpc_index.symbols import format_symbol
+from mcp_server.library_impl import api_links
+
+VESSEL = (
+    "Vessel\n¶\nclass\nVessel\n¶\nThese objects are used to interact with vessels.\n"
+    "name\n¶\nThe name of the vessel.\nReturn type\n:\nstr\n"
+    "flight\n(\n[\nreference_frame\n=\nNone\n]\n)\n¶\nReturns a Flight object for the vessel.\n"
+    "orbit\n¶\nThe current orbit of the vessel.\nReturn type\n:\nOrbit\n"
+)
+
+DOCS = [
+    {"url": "u/orbit", "title": "Orbit", "anchors": ["orbit", "SpaceCenter.Orbit", "SpaceCenter.Orbit.apoapsis"],
+     "content_text": "Orbit\n¶\nclass\nOrbit\n¶\nDescribes an orbit.\napoapsis\n¶\nThe apoapsis of the orbit, in meters."},
+    {"url": "u/vessel", "title": "Vessel", "anchors": ["vessel", "SpaceCenter.Vessel", "SpaceCenter.Vessel.name", "SpaceCenter.Vessel.flight", "SpaceCenter.Vessel.orbit"],
+     "content_text": VESSEL},
+    {"url": "u/long", "title": "Tutorial", "anchors": ["tutorial"], "content_text": "Tutorial\n¶\n" + "Then burn to raise the orbit.\n" * 6},
+    {"url": "u/parts", "title": "Parts", "anchors": [], "content_text": "Parts of a vessel!\n\nEngines, tanks and more."},
+]
+
+
+def _write(path: Path, docs) -> Path:
+    path.write_text("\n".join(json.dumps(d) for d in docs) + "\n\n", encoding="utf-8")
+    return path
+
+
+def test_chunk_text_splits_on_permalink_headers():
+    chunks = chunk_text(VESSEL, DOCS[1]["anchors"])
+    # The page title has no body of its own and merges into the class chunk.
+    assert [(c.label, c.anchor) for c in chunks] == [
+        ("class Vessel", "SpaceCenter.Vessel"),
+        ("name", "SpaceCenter.Vessel.name"),
+        ("flight([reference_frame=None])", "SpaceCenter.Vessel.flight"),
+        ("orbit", "SpaceCenter.Vessel.orbit"),
+    ]
+    assert "".join(VESSEL[c.start:c.end] for c in chunks) == VESSEL
+    assert VESSEL[chunks[2].start:chunks[2].end].startswith("flight\n(\n[")
+
+    long = chunk_text("Intro\n¶\n" + "word " * 50 + "\n" + "line\n" * 100, ["intro"], max_chars=120)
+    assert [c.label for c in long[:2]] == ["Intro", "Intro (part 2)"]
+    assert all(c.end - c.start <= 260 for c in long) and {c.anchor for c in long} == {"intro"}
+
+
+def test_bm25f_ranking_chunks_and_snippets(tmp_path: Path):
+    idx = KRPCSearchIndex.build(_write(tmp_path / "docs.jsonl", DOCS))
+    # A page ranks by its best chunk; title and section-label hits beat body repetition.
+    assert [d.url for d, _, _ in idx.search("orbit")] == ["u/orbit", "u/vessel", "u/long"]
+    assert [d.url for d, _, _ in idx.search("orbit", top_k=1)] == ["u/orbit"]
+    (doc, _, snippet), = idx.search("engines")
+    assert doc.url == "u/parts" and snippet == "Engines, tanks and more."
+    assert idx.search("apoapsis")[0][2] == "The apoapsis of the orbit, in meters."
+    assert idx.search("nothing here") == [] and idx.search("") == []
+    assert idx.get("u/vessel#SpaceCenter.Vessel.name").title == "Vessel" and idx.get("missing") is None
+
+    hits = idx.search_chunks("vessel flight")
+    assert idx.chunk_url(hits[0][1]) == "u/vessel#SpaceCenter.Vessel.flight"
+    assert hits[0][3] == "Returns a Flight object for the vessel."
+    within = idx.search_chunks("orbit", url="u/vessel")
+    assert [c.label for _, c, _, _ in within] == ["orbit"]
+    assert idx.chunk_text(within[0][1]).startswith("orbit\n¶\nThe current orbit")
+    assert idx.passage_text(within[0][1]) == "orbit\nThe current orbit of the vessel. Return type: Orbit"
+    assert idx.passage_text(hits[0][1]).startswith("flight ([reference_frame = None])\nReturns a Flight")
+    assert [c.label for c in idx.page_chunks("u/orbit")] == ["class Orbit", "apoapsis"]
+
+
+def test_saved_index_is_mmapped_and_checked_against_the_dataset(tmp_path: Path):
+    data = _write(tmp_path / "docs.jsonl", DOCS)
+    built = KRPCSearchIndex.build(data)
+    built.save(data.with_suffix(".bin"))
+
+    opened = KRPCSearchIndex.open(data)
+    assert opened.source == built.source and opened._lines == built._lines
+    assert opened.chunks == built.chunks
+    for q in ("orbit", "vessel flight", "parts engines"):
+        assert [(d.url, s, sn) for d, s, sn in opened.search(q)] == [(d.url, s, sn) for d, s, sn in built.search(q)]
+    assert opened.get("u/parts").content_text.startswith("Parts of a vessel")
+
+    # A changed dataset no longer matches the saved digest, so open() rebuilds in memory.
+    _write(data, DOCS[:2])
+    rebuilt = KRPCSearchIndex.open(data)
+    assert len(rebuilt.docs) == 2 and rebuilt.get("u/parts") is None
+
+
+def test_symbol_table_exact_and_fuzzy_lookup(tmp_path: Path):
+    api = [
+        {"url": "k/python/api/vessel.html", "title": "Vessel", "anchors": DOCS[1]["anchors"], "content_text": VESSEL},
+        {"url": "k/python/api/orbit.html", "title": "Orbit", "anchors": ["orbit", "SpaceCenter.Orbit", "SpaceCenter.Orbit.time_to_apoapsis"],
+         "content_text": "Orbit\n¶\nclass\nOrbit\n¶\nDescribes an orbit.\ntime_to_apoapsis\n¶\nThe time until apoapsis, in seconds.\n"
+                         "Attribute\n:\nRead-only, cannot be set\nReturn type\n:\nfloat\n"},
+        {"url": "k/tutorials/orbit.html", "title": "Tutorial", "anchors": ["SpaceCenter.Orbit.apoapsis"], "content_text": "apoapsis\n¶\nNot an API page."},
+    ]
+    data = _write(tmp_path / "docs.jsonl", api)
+    idx = KRPCSearchIndex.build(data)
+    table = SymbolTable.from_index(idx)
+    assert sorted(s.name for s in table.symbols) == [
+        "SpaceCenter.Orbit", "SpaceCenter.Orbit.time_to_apoapsis",
+        "SpaceCenter.Vessel", "SpaceCenter.Vessel.flight", "SpaceCenter.Vessel.name", "SpaceCenter.Vessel.orbit",
+    ]
+
+    exact, (flight,) = table.lookup("conn.space_center.vessel.flight(ref)")
+    assert exact and flight.kind == "method" and flight.returns == ""
+    assert flight.signature == "SpaceCenter.Vessel.flight([reference_frame=None])"
+    assert flight.url == "k/python/api/vessel.html#SpaceCenter.Vessel.flight"
+    exact, (tta,) = table.lookup("Orbit.time_to_apoapsis")
+    assert (tta.kind, tta.returns, tta.access, tta.summary) == ("attribute", "float", "Read-only, cannot be set", "The time until apoapsis, in seconds.")
+    exact, hits = table.lookup("orbit")  # class first, then the member of the same name
+    assert exact and [s.name for s in hits] == ["SpaceCenter.Orbit", "SpaceCenter.Vessel.orbit"]
+
+    exact, hits = table.lookup("Vessel.fligth")
+    assert not exact and hits[0].name == "SpaceCenter.Vessel.flight"
+    assert table.lookup("time_to_apoaps")[1][0].name == "SpaceCenter.Orbit.time_to_apoapsis"
+    assert table.lookup("zzzz") == (False, []) and table.lookup("") == (False, [])
+
+    path = tmp_path / "docs.symbols.json"
+    table.save(path)
+    assert SymbolTable.open(idx, path).symbols == table.symbols
+    assert "flight([reference_frame=None])" in format_symbol(flight)
+
+
+def test_api_links_follow_return_types_both_ways(tmp_path: Path):
+    api = [
+        {"url": "k/python/api/space-center.html", "title": "SpaceCenter", "anchors": ["SpaceCenter.active_vessel"],
+         "content_text": "active_vessel\n¶\nThe currently active vessel.\nReturn type\n:\nVessel\n"},
+        {"url": "k/python/api/vessel.html", "title": "Vessel", "anchors": DOCS[1]["anchors"], "content_text": VESSEL},
+        {"url": "k/python/api/orbit.html", "title": "Orbit", "anchors": ["SpaceCenter.Orbit", "SpaceCenter.Orbit.time_to_apoapsis"],
+         "content_text": "class\nOrbit\n¶\nDescribes an orbit.\ntime_to_apoapsis\n¶\nThe time until apoapsis.\nReturn type\n:\nfloat\n"},
+    ]
+    table = SymbolTable.from_index(KRPCSearchIndex.build(_write(tmp_path / "docs.jsonl", api)))
+    code = "def go(conn):\n    vessel = conn.space_center.active_vessel\n    print(vessel.orbit.time_to_apoapsis)\n"
+    assert extract_api_uses(code, table) == ["SpaceCenter.active_vessel", "SpaceCenter.Vessel.orbit", "SpaceCenter.Orbit.time_to_apoapsis"]
+    # Indented method source, a parameter typed by its name, and the add_stream(getattr, ...) idiom.
+    method = "    def tick(self, vessel):\n        s = self.conn.add_stream(getattr, vessel, 'name')\n        return vessel.flight()\n"
+    assert extract_api_uses(method, table) == ["SpaceCenter.Vessel.name", "SpaceCenter.Vessel.flight"]
+    assert extract_api_uses("def f(x):\n    return x.orbit + math.pi\n", table) == []
+    assert extract_api_uses("def g(o):\n    return o.time_to_apoapsis\n", table) == ["SpaceCenter.Orbit.time_to_apoapsis"]  # unique member
+
+    records = [
+        {"id": "g", "name": "g", "path": "b.py", "code": "def g(o):\n    return o.time_to_apoapsis\n", "restricted": False, "lines_of_code": 2},
+        {"id": "go", "name": "go", "path": "a.py", "code": code, "restricted": False, "lines_of_code": 3},
+        {"id": "tick", "name": "T.tick", "path": "a.py", "code": method, "restricted": True, "lines_of_code": 3},
+        {"id": "none", "name": "f", "path": "c.py", "code": "def f(x):\n    return x\n"},
+    ]
+    snippets = tmp_path / "snippets.jsonl"
+    _write(snippets, records)
+    links = ApiLinks.open(table, snippets, tmp_path / "docs.links.json")
+    assert len(links) == 3 and links.apis("none") == [] and links.apis("missing") == []
+    assert links.apis("go")[0] == ("SpaceCenter.active_vessel", "k/python/api/space-center.html#SpaceCenter.active_vessel")
+    assert [e[0] for e in links.examples_for("k/python/api/orbit.html#SpaceCenter.Orbit.time_to_apoapsis")] == ["g", "go"]
+    # A page lists snippets using the most of its members first: the restricted tick uses two Vessel
+    # members and outranks go; restriction and size only break ties.
+    assert [e[0] for e in links.examples_for("k/python/api/vessel.html")] == ["tick", "go"]
+    assert [e[0] for e in links.examples_for("k/python/api/vessel.html#SpaceCenter.Vessel.orbit", limit=1)] == ["go"]
+
+    path = tmp_path / "docs.links.json"
+    links.save(path)
+    loaded = ApiLinks.open(table, snippets, path)
+    assert (loaded.uses, loaded.examples, loaded.pages) == (links.uses, links.examples, links.pages)
+    assert ApiLinks.load_fresh(path, table.source, snippets).uses == links.uses
+    _write(snippets, records[1:2])  # a changed snippet corpus invalidates the saved links
+    assert ApiLinks.load_fresh(path, table.source, snippets) is None
+    assert len(ApiLinks.open(table, snippets, path)) == 1
+
+
+def test_shared_links_follow_snippet_corpus_rebuilds(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(api_links, "SNIPPETS_DIR", tmp_path)
+    monkeypatch.setattr(api_links, "_LINKS", (None, None))
+    rec = {"id": "s1", "name": "go", "path": "a.py", "code": "def go(conn):\n    return conn.space_center.active_vessel\n"}
+    corpus = _write(tmp_path / "snippets_enriched.jsonl", [rec])
+    links = api_links.get_links()
+    assert [name for name, _ in links.apis("s1")] == ["SpaceCenter.active_vessel"] and api_links.get_links() is links
+
+    # A rebuilt corpus (new mtime/size) is picked up like the snippet store picks it up.
+    _write(corpus, [rec, dict(rec, id="s2")])
+    assert [name for name, _ in api_links.get_links().apis("s2")] == ["SpaceCenter.active_vessel"]
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import io
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+from mcp_server.library_impl import ksp_wiki
+from mcp_server.library_impl.ksp_wiki_client import KspWikiClient, RateLimiter, requests_cache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(round(seconds, 6))
+        self.now += seconds
+
+
+def test_rate_limiter_token_bucket():
+    clock = FakeClock()
+    limiter = RateLimiter(4.0, burst=2, clock=clock, sleep=clock.sleep)
+    assert [limiter.acquire() for _ in range(2)] == [0.0, 0.0]  # burst
+    assert limiter.acquire() == 0.25
+    clock.now += 10.0  # refill caps at the burst size
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.25]
+    assert clock.slept == [0.25, 0.25] and limiter.acquired == 6
+    assert RateLimiter(0).acquire() == 0.0
+
+
+_PARSE = {
+    "sections": {"parse": {"sections": [{"index": "1", "line": "Calculating delta-v"}, {"index": "2", "line": "Delta-v map"}]}},
+    "text": {"parse": {"text": "<p>Add up the <b>stages</b>.</p>"}},
+}
+
+
+def test_client_charges_network_requests_and_reuses_parsed_sections(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # requests_cache writes its sqlite file to the cwd
+    sent = []
+
+    def fake_send(self, request, **kwargs):
+        sent.append(request.url)
+        body = json.dumps(_PARSE["text" if "prop=text" in request.url else "sections"]).encode("utf-8")
+        raw = HTTPResponse(
+            body=io.BytesIO(body),
+            headers={"Content-Type": "application/json"},
+            status=200,
+            preload_content=False,
+            request_url=request.url,
+        )
+        return self.build_response(request, raw)
+
+    monkeypatch.setattr(HTTPAdapter, "send", fake_send)
+    clock = FakeClock()
+    limiter = RateLimiter(4.0, burst=1, clock=clock, sleep=clock.sleep)
+    client = KspWikiClient(limiter=limiter)
+
+    assert client.get_section("Delta-v", "calculating") == "Add up the stages."
+    assert client.get_section("Delta-v", "Calculating delta-v") == "Add up the stages."
+    assert client.get_section("Delta-v", "Aerobraking") is None
+    assert client.list_sections("Delta-v")[1] == ("2", "Delta-v map")
+    # One sections parse and one text parse; everything else came from the parsed cache.
+    assert len(sent) == 2 and limiter.acquired == 2
+    assert clock.slept == [0.25]
+
+    if requests_cache is not None:
+        # A fresh client misses the in-memory cache but hits requests_cache: no new charge.
+        other = KspWikiClient(limiter=limiter)
+        assert other.list_sections("Delta-v") == client.list_sections("Delta-v")
+        assert len(sent) == 2 and limiter.acquired == 2
+
+    # The section tool's not-found hint reuses the parsed sections instead of refetching.
+    monkeypatch.setattr(ksp_wiki, "_client", client)
+    monkeypatch.setattr(ksp_wiki, "_get_mirror", lambda: None)
+    monkeypatch.delenv("KSP_WIKI_OFFLINE", raising=False)
+    out = ksp_wiki.get_ksp_wiki_section_impl("Delta-v", "Aerobraking")
+    assert out == "Section not found. Available sections include: Calculating delta-v, Delta-v map"
+    assert len(sent) == 2
+
+
+def test_get_pages_batches_titles_and_falls_back_to_rest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sent = []
+    extracts = {"Delta-v": "Delta-v is the change in velocity.", "Kerbin": "Kerbin is the home planet."}
+
+    def reply(request):
+        params = parse_qs(urlsplit(request.url).query)
+        if "/rest_v1/page/plain/" in request.url:
+            return (200, "Mun is a moon.") if request.url.endswith("/Mun") else (404, "")
+        titles = params["titles"][0].split("|")
+        query = {
+            "normalized": [{"from": "kerbin", "to": "Kerbin"}],
+            "redirects": [{"from": "DV", "to": "Delta-v"}],
+            "pages": [],
+        }
+        data = {"query": query}
+        # Whole-page extracts come one per response; the rest is paged with `continue`.
+        offset = int(params.get("excontinue", ["0"])[0])
+        finals = sorted({"kerbin": "Kerbin", "DV": "Delta-v"}.get(t, t) for t in titles)
+        for i, t in enumerate(finals):
+            page = {"title": t}
+            if i == offset and t in extracts:
+                page["extract"] = extracts[t]
+            query["pages"].append(page)
+        if offset + 1 < len(finals):
+            data["continue"] = {"excontinue": str(offset + 1), "continue": "||"}
+        return 200, json.dumps(data)
+
+    def fake_send(self, request, **kwargs):
+        sent.append(request.url)
+        status, body = reply(request)
+        raw = HTTPResponse(body=io.BytesIO(body.encode("utf-8")), headers={}, status=status, preload_content=False, request_url=request.url)
+        return self.build_response(request, raw)
+
+    monkeypatch.setattr(HTTPAdapter, "send", fake_send)
+    client = KspWikiClient(limiter=RateLimiter(0))
+    pages = client.get_pages(["DV", "kerbin", "Mun", "Duna", "DV"], batch_size=4)
+    assert pages == {"DV": extracts["Delta-v"], "kerbin": extracts["Kerbin"], "Mun": "Mun is a moon.", "Duna": None}
+    queries = [u for u in sent if "api.php" in u]
+    assert len(queries) == 4 and all("DV%7Ckerbin%7CMun%7CDuna" in u for u in queries)
+    assert len(sent) == 6  # plus one REST call each for Mun and Duna
+
+    assert client.get_page("Mun") == "Mun is a moon." and len(sent) == 6  # page cache
+
+    monkeypatch.setattr(ksp_wiki, "_client", client)
+    monkeypatch.setattr(ksp_wiki, "_get_mirror", lambda: None)
+    monkeypatch.delenv("KSP_WIKI_OFFLINE", raising=False)
+    out = ksp_wiki.get_ksp_wiki_pages_impl(["Mun", "Duna"], max_chars=5)
+    assert out == "Mun\nhttps://wiki.kerbalspaceprogram.com/wiki/Mun\n\nMun…\n\n---\n\nDuna\n\nPage not found."
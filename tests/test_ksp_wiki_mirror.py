@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from mcp_server.library_impl import ksp_wiki
+from mcp_server.library_impl.ksp_wiki_mirror import WikiMirror, build_mirror, read_dump, wikitext_to_text
+
+FIXTURE = Path(__file__).resolve().parents[1] / "data" / "ksp_wiki" / "fixtures" / "sample_export.xml"
+
+
+@pytest.fixture()
+def mirror_path(tmp_path: Path) -> Path:
+    out = tmp_path / "mirror.sqlite"
+    counts = build_mirror(read_dump(FIXTURE), out)
+    # Talk: namespace and the /de translation are skipped; DV is stored as a redirect.
+    assert (counts["pages"], counts["redirects"], counts["skipped"]) == (3, 1, 2)
+    return out
+
+
+def test_wikitext_to_text():
+    src = "{{Infobox|a={{b}}}}'''Mun''' orbits [[Kerbin|the home world]] [[Category:Moons]]<ref>x</ref> [http://x.org site]"
+    assert wikitext_to_text(src) == "Mun orbits the home world  site"
+
+
+def test_mirror_search_page_and_section(mirror_path: Path):
+    mirror = WikiMirror(mirror_path)
+    assert [r.title for r in mirror.search("minmus transfer")] == ["Delta-v"]
+    assert mirror.search("aerobraking")[0].snippet.startswith("Returning to Kerbin")
+
+    page = mirror.get_page("dv")  # redirect + case-insensitive title
+    assert page.startswith("Delta-v (Δv) is the change in velocity")
+    assert "Mun transfer | 860" in page and "{{" not in page and "Category" not in page
+
+    assert mirror.list_sections("Delta-v") == [("1", "Calculating delta-v"), ("2", "Delta-v map"), ("3", "Aerobraking")]
+    assert mirror.get_section("maneuver_node", "executing").startswith("Start burning at half")
+    assert mirror.get_section("Maneuver node", "2") == mirror.get_section("Maneuver node", "Executing a burn")
+    assert mirror.get_page("Duna") is None
+    mirror.close()
+
+
+def test_tools_serve_from_mirror_with_optional_live_fallback(mirror_path: Path, monkeypatch):
+    class LiveClient:
+        calls = 0
+
+        def get_page(self, title):
+            LiveClient.calls += 1
+            return f"live text for {title}"
+
+    monkeypatch.setenv("KSP_WIKI_MIRROR", str(mirror_path))
+    monkeypatch.setattr(ksp_wiki, "_get_client", lambda: LiveClient())
+
+    out = ksp_wiki.get_ksp_wiki_section_impl("Delta-v", "map")
+    assert out.startswith("Delta-v — map\n") and "Minmus transfer | 930" in out
+    assert "- Kerbin — https://wiki.kerbalspaceprogram.com/wiki/Kerbin" in ksp_wiki.search_ksp_wiki_impl("atmosphere")
+    assert LiveClient.calls == 0
+
+    assert ksp_wiki.get_ksp_wiki_page_impl("Duna").endswith("live text for Duna")
+    assert LiveClient.calls == 1
+
+    monkeypatch.setenv("KSP_WIKI_OFFLINE", "1")
+    assert ksp_wiki.get_ksp_wiki_page_impl("Duna") == "Page not found."
+    assert LiveClient.calls == 1
+
+
+def test_reingested_mirror_swap_keeps_old_handles_usable(mirror_path: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(ksp_wiki, "_mirror", (None, None))
+    monkeypatch.setenv("KSP_WIKI_MIRROR", str(mirror_path))
+    old = ksp_wiki._get_mirror()
+    assert old is not None and ksp_wiki._get_mirror() is old
+
+    other = tmp_path / "other.sqlite"
+    build_mirror(read_dump(FIXTURE), other)
+    monkeypatch.setenv("KSP_WIKI_MIRROR", str(other))
+    new = ksp_wiki._get_mirror()
+    # A call that fetched the old mirror before the swap can still finish its queries.
+    assert new is not old and old.get_section("Delta-v", "map") == new.get_section("Delta-v", "map")
+
+
+def test_mirror_errors_fall_back_to_live(monkeypatch):
+    class BrokenMirror:
+        def get_page(self, title):
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+
+    monkeypatch.setattr(ksp_wiki, "_get_mirror", lambda: BrokenMirror())
+    monkeypatch.setattr(ksp_wiki, "_get_client", lambda: SimpleNamespace(get_page=lambda title: f"live text for {title}"))
+    assert ksp_wiki.get_ksp_wiki_page_impl("Duna").endswith("live text for Duna")
+    monkeypatch.setenv("KSP_WIKI_OFFLINE", "1")
+    assert ksp_wiki.get_ksp_wiki_page_impl("Duna") == "Page not found."
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from mcp_server.library_impl.snippets_runtime import LocalReranker, RerankConfig, rerank
+from mcp_server.library_impl.snippets_runtime.learned_rerank import FieldStats, features, load_labels
+from mcp_server.library_impl.snippets_runtime.store import load_records, load_reranker
+
+DATA = Path(__file__).resolve().parents[1] / "data" / "krpc-snippets"
+
+
+def _row(rid: str, name: str, score: float, kw: float, vec: float) -> dict:
+    return {"id": rid, "name": name, "path": f"lib/{name}.py", "description": "", "categories": [],
+            "score": score, "kw_score": kw, "vec_score": vec}
+
+
+def test_learned_reranker_round_trip_and_ordering(tmp_path: Path):
+    good = _row("a", "circularize_orbit", 0.4, 0.9, 0.3)
+    bad = _row("b", "launch_to_orbit", 0.6, 0.1, 0.8)
+    samples = [(features("circularize orbit", good), 2), (features("circularize orbit", bad), 0)]
+    model = LocalReranker.train(samples, epochs=200)
+    path = tmp_path / "rerank_model.json"
+    model.save(path)
+    loaded = LocalReranker.load(path)
+    assert loaded.weights == model.weights and loaded.bias == model.bias
+
+    scores = loaded.score_rows("circularize orbit", [good, bad])
+    assert scores["a"] > scores["b"]
+
+    # Without a remote key the learned model replaces the token-overlap mock.
+    out = rerank.rerank_results("circularize orbit", [bad, good], RerankConfig(mock=True, local=loaded, top_m=2))
+    assert [r["id"] for r in out] == ["a", "b"]
+    assert out[0]["rerank_score"] == scores["a"]
+
+
+def test_field_bm25_weights_rare_terms_and_runtime_requires_a_qualified_model(tmp_path: Path):
+    recs = [_row(str(i), f"orbit_{n}", 0, 0, 0) for i, n in enumerate(["util", "helper", "circularize"])]
+    stats = FieldStats.build(recs)
+    # "orbit" is in every name, "circularize" in one: only the rare term carries much weight.
+    assert features("orbit", recs[2], stats)[4] < features("circularize", recs[2], stats)[4]
+
+    good = _row("a", "circularize_orbit", 0.4, 0.9, 0.3)
+    model = LocalReranker.train([(features("circularize", good, stats), 2)], stats=stats, epochs=10)
+    path = tmp_path / "rerank_model.json"
+    model.save(path)
+    assert LocalReranker.load(path).stats.df == stats.df
+    assert load_reranker(path) is None  # no evaluation report: keep the mock
+    base = {"ndcg@5": 0.6, "recall@5": 0.5}
+    model.meta["report"] = {"keyword": base, "hybrid+mock": base, "hybrid+learned": {"ndcg@5": 0.7, "recall@5": 0.4}}
+    model.save(path)
+    assert load_reranker(path) is None  # recall regressed
+    model.meta["report"]["hybrid+learned"]["recall@5"] = 0.5
+    model.save(path)
+    assert load_reranker(path) is not None
+
+
+def test_shipped_reranker_labels_refer_to_the_production_corpus():
+    ids = {r["id"] for r in load_records(DATA / "snippets_enriched.jsonl") if not r.get("duplicate_of")}
+    labels = load_labels(DATA / "eval_rerank.json")
+    assert len(labels) >= 40 and all(set(g) <= ids for g in labels.values())
+    model = load_reranker(DATA / "rerank_model.json")
+    assert model is not None and model.meta["corpus"] == "snippets_enriched.jsonl" and model.stats.n == len(ids)
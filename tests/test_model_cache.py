@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from pathlib import Path
+from types import SimpleNamespace
+
+from mcp_server.library_impl.snippets_runtime import ModelCache, RerankConfig, rerank
+from mcp_server.library_impl.snippets_runtime.hybrid_search import embed_query
+
+
+def test_model_cache_lru_eviction_and_stats(tmp_path: Path):
+    cache = ModelCache(tmp_path / "cache.sqlite", max_entries=2)
+    cache.put_embedding("m", "Vis  Viva", [0.5, -0.25])
+    cache.put_rerank("m", "dock", ["a", "b"], {"a": 1.0, "b": 0.2})
+    assert cache.get_embedding("m", "vis viva") == [0.5, -0.25]  # normalised query, and now most recent
+    assert cache.get_rerank("m", "dock", ["b", "a"]) is None  # candidate order is part of the key
+
+    cache.put_embedding("m", "circ dv", [1.0])  # over the limit: evicts the least recently used (rerank)
+    assert cache.get_rerank("m", "dock", ["a", "b"]) is None
+    assert cache.get_embedding("m", "VIS VIVA") is not None
+    assert cache.get_embedding("other-model", "vis viva") is None
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["embedding"] == {"hits": 2, "misses": 1, "writes": 2, "evictions": 0}
+    assert stats["rerank"] == {"hits": 0, "misses": 2, "writes": 1, "evictions": 1}
+    cache.close()
+
+
+def test_remote_calls_are_served_from_cache(tmp_path: Path, monkeypatch):
+    calls = {"embed": 0, "rerank": 0}
+
+    def embeddings_create(model, input):
+        calls["embed"] += 1
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[3.0, 4.0])])
+
+    def chat_create(**kwargs):
+        calls["rerank"] += 1
+        msg = SimpleNamespace(content='{"items": [{"id": "a", "score": 0.9}]}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=msg)])
+
+    client = SimpleNamespace(
+        embeddings=SimpleNamespace(create=embeddings_create),
+        chat=SimpleNamespace(completions=SimpleNamespace(create=chat_create)),
+    )
+    from mcp_server.library_impl.snippets_runtime import hybrid_search
+
+    monkeypatch.setattr(hybrid_search, "_openai_client_or_none", lambda: client)
+    monkeypatch.setattr(rerank, "_openai_client_or_none", lambda: client)
+    cache = ModelCache(tmp_path / "cache.sqlite")
+
+    for q in ("orbit helper", "Orbit  helper"):
+        assert embed_query(q, model="emb", dim=2, mock=False, cache=cache) == [0.6, 0.8]
+    cfg = RerankConfig(cache=cache)
+    for _ in range(2):
+        assert rerank.call_openai_rerank(cfg, "orbit helper", [{"id": "a"}]) == {"a": 0.9}
+    assert calls == {"embed": 1, "rerank": 1}
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from mcp_server.library_impl import search_all
+from mcp_server.library_impl.search_all import Hit, fuse
+
+
+def _hits(source, *refs):
+    return [Hit(source, r.upper(), r, f"about {r}") for r in refs]
+
+
+def test_fuse_interleaves_by_rank_and_merges_shared_refs():
+    ranked = {"docs": _hits("docs", "a", "b", "c"), "wiki": _hits("wiki", "x", "b")}
+    fused = fuse(ranked, 10, order=["docs", "wiki"])
+    # "b" is ranked by both sources, so its fused score beats every single-source hit.
+    assert [h.ref for _, h in fused] == ["b", "a", "x", "c"]
+    assert fused[0][0] == 1 / 62 + 1 / 62 and fused[0][1].source == "docs"
+    assert [h.ref for _, h in fuse(ranked, 2, order=["docs", "wiki"])] == ["b", "a"]
+
+
+def test_search_all_degrades_when_a_source_misses_its_deadline(monkeypatch):
+    release = threading.Event()
+
+    def slow_wiki(query, k):
+        release.wait(5)
+        return _hits("wiki", "late")
+
+    def broken(query, k):
+        raise RuntimeError("index missing")
+
+    monkeypatch.setattr(search_all, "_SEARCHERS", {
+        "docs": lambda q, k: _hits("docs", "u/vessel#flight", "u/orbit")[:k],
+        "snippets": broken,
+        "wiki": slow_wiki,
+    })
+    monkeypatch.setattr(search_all, "DEADLINES", {"docs": 0.5, "snippets": 0.5, "wiki": 0.2})
+    monkeypatch.setattr(search_all, "_inflight", {})
+    t0 = time.monotonic()
+    try:
+        out = search_all.search_all_impl("vessel flight", k=5)
+        # The timed-out wiki call is still running, so the next call does not queue another behind it.
+        again = search_all.search_all_impl("vessel flight", k=1)
+    finally:
+        release.set()
+    assert time.monotonic() - t0 < 2.0
+    assert again.startswith("1. [docs] U/VESSEL#FLIGHT") and "wiki skipped (previous call still running)" in again
+    lines = out.splitlines()
+    assert lines[:4] == ["1. [docs] U/VESSEL#FLIGHT — u/vessel#flight", "   about u/vessel#flight", "2. [docs] U/ORBIT — u/orbit", "   about u/orbit"]
+    status = lines[-1]
+    assert status.startswith("Sources: docs 2 in ") and "snippets error: RuntimeError" in status and "wiki timed out after 0.2 s" in status
+
+    out = search_all.search_all_impl("vessel", sources=["docs", "forum"], k=1)
+    assert out.splitlines()[-1] == "Ignored unknown sources: forum" and "[wiki]" not in out
+    assert search_all.search_all_impl("vessel", sources=["forum"]).startswith("No known sources")
+    assert search_all.search_all_impl("  ") == "Provide a query."
+
+
+def test_search_all_prints_multiline_previews_on_one_line(monkeypatch):
+    hit = Hit("snippets", "ascent", "snippets/ascent", "def ascent(vessel):\n    vessel.control.throttle = 1\n")
+    monkeypatch.setattr(search_all, "_SEARCHERS", {"snippets": lambda q, k: [hit]})
+    out = search_all.search_all_impl("ascent", sources=["snippets"])
+    assert out.splitlines()[1] == "   def ascent(vessel): vessel.control.throttle = 1"
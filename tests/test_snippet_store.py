@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import sqlite3
+from array import array
+from hashlib import sha1
+from pathlib import Path
+
+import pytest
+
+from mcp_server.library_impl.snippets_runtime import (
+    CompactIndex,
+    DepGraph,
+    EmbeddingMatrix,
+    IVFIndex,
+    KeywordConfig,
+    KeywordIndex,
+    LocalEmbedder,
+    LocalEmbedderConfig,
+    RecordStore,
+    SnippetStore,
+    VecStore,
+    build_index,
+    keyword_search,
+)
+from mcp_server.library_impl.snippets_runtime.compact_index import source_digest
+from mcp_server.library_impl.snippets_runtime.hybrid_search import search_hybrid, vector_search
+from mcp_server.library_impl.snippets_runtime.store import load_records, load_vectors
+
+DATA = Path(__file__).resolve().parents[1] / "data" / "krpc-snippets"
+
+
+def _write_corpus(path: Path, names: list[str]) -> None:
+    recs = [
+        {"id": f"id-{n}", "name": n, "path": "pkg/mod.py", "categories": ["function"], "description": f"{n} helper"}
+        for n in names
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in recs) + "\n", encoding="utf-8")
+
+
+def test_store_loads_once_and_reloads_on_change(tmp_path: Path):
+    corpus = tmp_path / "snippets.jsonl"
+    _write_corpus(corpus, ["alpha", "beta"])
+    store = SnippetStore(lambda: {"corpus": corpus, "index": None, "vectors": None})
+
+    first = store.snapshot()
+    assert store.snapshot() is first
+    assert store.reloads == 1
+    assert store.get("id-beta")["name"] == "beta"
+    assert first.by_symbol["pkg.mod.alpha"]["id"] == "id-alpha"
+    assert [rid for rid, _, _ in first.index.search("alpha")] == ["id-alpha"]
+
+    _write_corpus(corpus, ["alpha", "beta", "gamma"])
+    st = os.stat(corpus)
+    os.utime(corpus, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = store.snapshot()
+    assert second is not first
+    assert store.reloads == 2
+    assert store.get("id-gamma") is not None
+    # Snapshots already handed out stay consistent.
+    assert "id-gamma" not in first.by_id
+
+
+def test_dep_graph_memoizes_bundles():
+    recs = load_records(DATA / "snippets_full.jsonl")
+    graph = DepGraph(recs)
+    target = next(r for r in recs if r["name"] == "NavHelper.circ_dv")
+
+    first = graph.resolve(target_id=target["id"])
+    # Methods pivot to their class; the module's const block is emitted first.
+    assert [graph.by_id[i]["name"] for i in first.include_ids] == ["CONST_BLOCK", "NavHelper"]
+    first.include_ids.append("mutated")
+    again = graph.resolve(target_name="a.sample.NavHelper.circ_dv")
+    assert again.include_ids == first.include_ids[:-1] and again.bundle_code == first.bundle_code
+    assert (graph.hits, graph.misses) == (1, 1)
+    graph.resolve(target_id=target["id"], size_cap_nodes=1)
+    assert graph.misses == 2
+
+
+def test_record_store_reads_single_frames_and_matches_full_records(tmp_path: Path):
+    corpus = DATA / "snippets_enriched.jsonl"
+    recs = load_records(corpus)
+    RecordStore.from_records(recs, source=source_digest(corpus)).save(tmp_path / "snippets.bin")
+    store = RecordStore.load(tmp_path / "snippets.bin")
+    assert len(store) == len(recs) and store.compressed_bytes < corpus.stat().st_size // 2
+    assert all(store.get(r["id"]) == r for r in recs) and store.get("missing") is None
+    assert "code" not in store.meta[0] and store.meta[0]["code_bytes"] == len(recs[0]["code"].encode("utf-8"))
+
+    # Bundles built from metadata rows + per-record fetches match the full-record graph.
+    fetched = []
+    lazy = DepGraph(store.meta, code_of=lambda rid: fetched.append(rid) or store.code(rid))
+    full = DepGraph(recs)
+    for target in [r for r in recs if r.get("dependencies")][:20]:
+        for shake in (False, True):
+            fetched.clear()
+            got = lazy.resolve(target_id=target["id"], shake=shake, size_cap_bytes=6000)
+            assert got == full.resolve(target_id=target["id"], shake=shake, size_cap_bytes=6000)
+            assert set(fetched) <= set(got.include_ids) | set(lazy.collect(target, size_cap_bytes=10**9)[0])
+
+
+def test_store_serves_records_from_matching_record_store(tmp_path: Path):
+    corpus = tmp_path / "snippets.jsonl"
+    corpus_bin = tmp_path / "snippets.bin"
+    _write_corpus(corpus, ["alpha"])
+    RecordStore.from_records(load_records(corpus), source=source_digest(corpus)).save(corpus_bin)
+    store = SnippetStore(lambda: {"corpus": corpus, "corpus_bin": corpus_bin, "index": None, "vectors": None})
+    data = store.snapshot()
+    assert data.record_store._buffer is not None  # memory-mapped, not rebuilt
+    assert data.by_id["id-alpha"] == {"id": "id-alpha", "name": "alpha", "path": "pkg/mod.py", "categories": ["function"], "code_bytes": 0, "code_sha1": sha1(b"").hexdigest()}
+    assert store.get("id-alpha")["description"] == "alpha helper"
+
+    _write_corpus(corpus, ["alpha", "beta"])  # the .bin is now stale and gets ignored
+    assert store.get("id-beta")["description"] == "beta helper"
+    assert store.snapshot().record_store._buffer is None
+
+
+def test_compact_index_matches_keyword_search(tmp_path: Path):
+    json_path = DATA / "keyword_index.json"
+    idx = KeywordIndex.load(json_path)
+    CompactIndex.from_keyword_index(idx, source=source_digest(json_path)).save(tmp_path / "kw.bin")
+    compact = CompactIndex.load(tmp_path / "kw.bin")
+    assert compact.source == source_digest(json_path)
+
+    queries = [q["text"] for q in json.loads((DATA / "eval_keyword.json").read_text(encoding="utf-8"))["per_query"]]
+    for q in queries + ["orbit vessel", "helper helper nav"]:
+        for use_and in (False, True):
+            for category in (None, "function", "class"):
+                for exclude_restricted in (False, True):
+                    kw = dict(k=7, use_and=use_and, category=category, exclude_restricted=exclude_restricted)
+                    expected = [(rid, sc) for rid, sc, _ in keyword_search(idx, q, **kw)]
+                    assert [(rid, sc) for rid, sc, _ in compact.search(q, **kw)] == expected
+
+
+def test_store_ignores_stale_compact_index(tmp_path: Path):
+    corpus = tmp_path / "snippets.jsonl"
+    _write_corpus(corpus, ["alpha"])
+    index_json = tmp_path / "keyword_index.json"
+    index_bin = tmp_path / "keyword_index.bin"
+    stale = SnippetStore(lambda: {"corpus": corpus, "index": None, "vectors": None}).snapshot().index
+    stale.save(index_bin)  # built without a source digest, so it cannot match any JSON
+    _write_corpus(corpus, ["alpha", "beta"])
+    build_index(load_records(corpus), KeywordConfig()).save(index_json)
+
+    store = SnippetStore(lambda: {"corpus": corpus, "index": index_json, "index_bin": index_bin, "vectors": None})
+    assert [rid for rid, _, _ in store.snapshot().index.search("beta")] == ["id-beta"]
+
+
+def test_embedding_matrix_roundtrip_matches_vector_search(tmp_path: Path):
+    rnd = random.Random(7)
+    vectors = {f"id-{i}": [rnd.uniform(-1.0, 1.0) for _ in range(16)] for i in range(40)}
+    db = tmp_path / "embeddings.sqlite"
+    conn = sqlite3.connect(str(db))
+    conn.execute("create table embeddings (id text, model text, dim int, vector)")
+    for i, (rid, vec) in enumerate(vectors.items()):
+        # Mixed storage: JSON text rows and float32 BLOB rows.
+        blob = array("f", vec).tobytes() if i % 2 else json.dumps(vec)
+        conn.execute("insert into embeddings values (?, ?, ?, ?)", (rid, "m", 16, blob))
+    conn.commit()
+    conn.close()
+
+    load_vectors(db).save(tmp_path / "embeddings.npy")
+    matrix = load_vectors(tmp_path / "embeddings.npy")
+    assert isinstance(matrix, EmbeddingMatrix)
+    assert (len(matrix), matrix.dim, matrix.model) == (40, 16, "m")
+
+    exact = VecStore(vectors=vectors, dim=16, model="m")
+    q = [rnd.uniform(-1.0, 1.0) for _ in range(16)]
+    for k in (1, 5, 40, 100):
+        assert [rid for rid, _ in vector_search(matrix, q, k=k)] == [rid for rid, _ in vector_search(exact, q, k=k)]
+
+
+def test_ivf_index_full_probe_is_exact(tmp_path: Path):
+    pytest.importorskip("numpy")
+    rnd = random.Random(3)
+    vectors = {f"id-{i}": [rnd.gauss(0.0, 1.0) for _ in range(8)] for i in range(200)}
+    matrix = EmbeddingMatrix.from_vectors(vectors, model="m")
+    IVFIndex.build(matrix, nlist=10, nprobe=2).save(tmp_path / "ivf.npz")
+    ivf = IVFIndex.load(tmp_path / "ivf.npz")
+    assert (ivf.nlist, ivf.nprobe) == (10, 2) and ivf.matches(matrix)
+    assert sorted(ivf.order.tolist()) == list(range(200))
+
+    q = [rnd.gauss(0.0, 1.0) for _ in range(8)]
+    exact = matrix.search(q, k=10)
+    assert [rid for rid, _ in ivf.search(matrix, q, k=10, nprobe=10)] == [rid for rid, _ in exact]
+    approx = ivf.search(matrix, q, k=10)
+    assert len(approx) == 10 and approx == sorted(approx, key=lambda kv: -kv[1])
+
+    vectors["id-1"] = [-x for x in vectors["id-1"]]
+    assert not ivf.matches(EmbeddingMatrix.from_vectors(vectors, model="m"))  # re-embedded in place
+    vectors.pop("id-0")
+    assert not ivf.matches(EmbeddingMatrix.from_vectors(vectors, model="m"))
+
+
+def test_local_embedder_is_deterministic_and_drives_hybrid_search(tmp_path: Path):
+    records = load_records(DATA / "snippets_full.jsonl")
+    emb = LocalEmbedder.train(records, LocalEmbedderConfig(buckets=512, dim=16))
+    emb.save(tmp_path / "local_embedder")
+    loaded = LocalEmbedder.load(tmp_path / "local_embedder")
+    assert loaded.embed("vis viva speed") == emb.embed("vis viva speed")
+    assert loaded.embed("vis  viva speed") == loaded.embed("vis viva speed")
+    assert (loaded.cache_info().hits, loaded.cache_info().misses) == (2, 1)
+
+    matrix = loaded.embed_corpus(records)
+    assert matrix.model == loaded.model and matrix.dim == 16
+    index = CompactIndex.from_keyword_index(build_index(records))
+    target = next(r for r in records if r.get("name") == "vis_viva_speed")
+    res = search_hybrid(index, matrix, "vis_viva_speed", k=3, embedder=loaded)
+    assert res[0]["id"] == target["id"] and res[0]["vec_score"] == 1.0